@@ -0,0 +1,8 @@
+"""
+Python toolkit for the Infinity Pixel customer service chatbot.
+
+The production system runs as n8n workflows (see ``workflows/``); this package
+holds the supporting tooling that works on the same ticket schema offline.
+"""
+
+__version__ = "1.1.0.dev0"
@@ -0,0 +1,536 @@
+"""
+Python ticket backend: the ``Ticket Manager (Airtable)`` workflow as a library.
+
+``TicketBackend.handle(payload)`` accepts the same payloads as the
+``tt`` webhook (``action`` plus ticket fields) and returns the same response
+objects, built by the code-node ports in ``tickets``. Each stage runs in a
+span named after the n8n node it replaces, so traces line up with the
+workflow canvas, and request, Airtable and notification metrics are
+recorded in a ``metrics.Registry`` (see ``BackendMetrics``). Repeated
+create/update/close calls are answered from an ``IdempotencyCache``, and
+status responses are served from a read-through cache that the create,
+update and close paths keep current. Lookups of ticket IDs that cannot
+exist are answered by a ``bloom.TicketIdGuard`` without querying the store.
+
+Besides the workflow's four actions the backend answers ``search``
+(``query``, optional ``status``/``priority`` filters and ``limit``) from a
+``search.StoreSearchIndex`` and ``list`` (a customer's tickets by ``email``,
+optional ``status``, ``limit`` and ``cursor``) from a
+``listing.StoreCustomerIndex``, both kept current by create, update and
+close.
+
+Updates append to the Conversation Log with a compare-and-swap on the
+record version; when another writer got there first the append is re-applied
+to the fresh record and retried, so concurrent updates are merged rather
+than lost. Concurrent updates of one ticket within this process share a
+write (``combine.WriteCombiner``) instead of conflicting with each other.
+
+Before creating a ticket the backend looks for open tickets describing the
+same issue (``similarity.StoreDuplicateDetector``). If the customer already
+has one, the response has status ``possible_duplicate`` and offers to add
+to it instead; ``allowDuplicate: true`` creates the ticket anyway. Similar
+open tickets of other customers are noted in the new ticket's Internal
+Notes.
+
+Airtable and the notifiers are called through ``resilience.Dependencies``
+(timeouts and circuit breakers). While Airtable is unavailable, creates are
+queued in a ``resilience.CreateJournal`` under their ticket ID and filed by
+``replay_journal`` (run by one background worker once Airtable answers
+again; pass ``CreateJournal(path)`` so the queue survives a restart),
+status is answered from the last known status marked ``stale``, and update
+and close ask the customer to retry.
+
+Usage:
+    backend = TicketBackend(InMemoryTicketStore(), notifiers=[RecordingNotifier()])
+    backend.handle({"action": "create", "name": "Ada", "email": "ada@example.com",
+                    "subject": "Login", "description": "Cannot log in"}, session_id=session)
+"""
+
+import random
+import threading
+import time
+
+from . import tickets
+from .bloom import TicketIdGuard
+from .cache import ReadThroughCache, TTLCache
+from .combine import WriteCombiner
+from .idempotency import IdempotencyCache, idempotency_key
+from .listing import StoreCustomerIndex, list_params, list_response
+from .metrics import get_registry
+from .resilience import (STATE_CODES, CreateJournal, Dependencies, is_outage, queued_create_response,
+                         queued_response, stale_status_response, unavailable_response)
+from .search import StoreSearchIndex, search_params, search_response
+from .similarity import StoreDuplicateDetector, allow_duplicate, duplicate_response, similar_tickets_note
+from .store import StoreError, VersionConflict
+from .tracing import get_tracer
+
+
+ACTIONS = tickets.ACTIONS + ("search", "list")
+
+
+class BackendMetrics:
+    """Metric families recorded by ``TicketBackend``"""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.requests = registry.counter(
+            "ticket_requests_total", "Ticket requests by action and outcome", ["action", "outcome"])
+        self.latency = registry.histogram(
+            "ticket_request_duration_ms", "Ticket request latency in milliseconds", ["action"])
+        self.airtable_calls = registry.counter(
+            "airtable_requests_total", "Airtable API calls by operation", ["operation"])
+        self.airtable_throttled = registry.counter(
+            "airtable_throttled_total", "Airtable calls rejected with HTTP 429", ["operation"])
+        self.airtable_latency = registry.histogram(
+            "airtable_request_duration_ms", "Airtable call latency in milliseconds", ["operation"])
+        self.notifications = registry.counter(
+            "notifications_total", "Notifications sent by notifier and result", ["notifier", "result"])
+        self.notification_queue = registry.gauge(
+            "notification_queue_depth", "Notifications waiting or in flight", ["notifier"])
+        self.sla_breaches = registry.counter(
+            "ticket_sla_breached_total", "Requests that touched an open ticket past its SLA", ["action"])
+        self.cache = registry.counter(
+            "cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"])
+        self.write_conflicts = registry.counter(
+            "ticket_write_conflicts_total", "Writes retried because the ticket changed since it was read",
+            ["action"])
+        self.degraded = registry.counter(
+            "ticket_degraded_responses_total", "Responses given while Airtable was unavailable, by action and mode "
+            "(queued/pending/stale/unavailable)", ["action", "mode"])
+        self.dependency_state = registry.gauge(
+            "dependency_circuit_state", "Circuit breaker state by dependency (0 closed, 1 half-open, 2 open)",
+            ["dependency"])
+
+
+def _outcome(response, replayed=False):
+    if replayed:
+        return "duplicate"
+    if response.get("degraded"):
+        return "degraded"
+    if response.get("status") in ("not_found", "possible_duplicate", "conflict"):
+        return response["status"]
+    if response.get("skipUpdate"):
+        return "rejected"
+    return "ok"
+
+
+def _retry_later(response):
+    """Responses asking the customer to send the request again; never replayed from the idempotency cache"""
+    return response.get("status") in ("conflict", "unavailable")
+
+
+def conflict_response(action, ticket_id):
+    """Response when a write kept losing to concurrent writers"""
+    return {
+        "action": action,
+        "ticketId": ticket_id,
+        "status": "conflict",
+        "messageForUser": f"Ticket {ticket_id} is being updated by someone else right now. "
+                          "Please send your update again in a moment.",
+        "internalNotes": "",
+        "skipUpdate": True,
+    }
+
+
+class TicketBackend:
+    """Create/status/update/close over a ``TicketStore``"""
+
+    def __init__(self, store, notifiers=(), tracer=None, registry=None, idempotency=None,
+                 status_cache=None, ticket_ids=None, search_index=None, duplicates=None,
+                 customers=None, combiner=None, write_retries=10, dependencies=None, journal=None,
+                 clock=tickets.now_ms, rng=random):
+        self.store = store
+        self.notifiers = list(notifiers)
+        self.idempotency = IdempotencyCache() if idempotency is None else idempotency
+        if status_cache is None:
+            status_cache = TTLCache(max_entries=10_000, ttl=60.0)
+        self.status_cache = ReadThroughCache(status_cache) if status_cache is not False else None
+        # The table scans behind these indexes run in background threads, through the Airtable breaker
+        self.ticket_ids = TicketIdGuard(store, call=self._scan) if ticket_ids is None else (ticket_ids or None)
+        self.search_index = (StoreSearchIndex(store, call=self._scan) if search_index is None
+                             else (search_index or None))
+        self.duplicates = (StoreDuplicateDetector(store, call=self._scan) if duplicates is None
+                           else (duplicates or None))
+        self.customers = StoreCustomerIndex(store, call=self._scan) if customers is None else (customers or None)
+        self.tracer = tracer or get_tracer()
+        self.metrics = BackendMetrics(registry or get_registry())
+        self.combiner = WriteCombiner() if combiner is None else (combiner or None)
+        self.write_retries = write_retries
+        self.dependencies = Dependencies() if dependencies is None else (dependencies or None)
+        if self.dependencies is not None:
+            self.dependencies.on_state = lambda name, state: self.metrics.dependency_state.labels(name).set(
+                STATE_CODES[state])
+        self.journal = CreateJournal() if journal is None else (None if journal is False else journal)
+        self.metrics.registry.gauge("ticket_journal_depth", "Creates queued while Airtable was unavailable",
+                                    fn=lambda: len(self.journal) if self.journal is not None else 0)
+        self.last_known = TTLCache(max_entries=10_000, ttl=86_400.0)  # (status response, as of ms)
+        self._replay_lock = threading.Lock()
+        self._replay_worker = threading.Lock()  # held while the background replay thread runs
+        self.clock = clock
+        self.rng = rng
+
+    def handle(self, payload, session_id=None):
+        """Run one request; ``session_id`` is the chat session it came from"""
+        tracer = self.tracer
+        start = time.perf_counter()
+        action = "unknown"
+        outcome = "error"
+        try:
+            with tracer.trace("Ticket Manager", session_id=session_id) as root:
+                with tracer.span("Normalize & Validate Action"):
+                    normalized = tickets.normalize_action(payload, ACTIONS)
+                    request = tickets.normalize_inputs(normalized)
+                    if request["action"] == "search":
+                        request.update(search_params(normalized))
+                    elif request["action"] == "list":
+                        request.update(list_params(normalized))
+                    elif request["action"] == "create":
+                        request["allowDuplicate"] = allow_duplicate(normalized)
+                action = request["action"]
+                root.set(action=action)
+                if request.get("ticketId"):
+                    root.set(ticketId=request["ticketId"])
+                response, replayed = self._dispatch(request, session_id)
+                root.set(status=response.get("status", ""), duplicate=replayed)
+                outcome = _outcome(response, replayed)
+                return response
+        finally:
+            self.metrics.requests.labels(action, outcome).inc()
+            self.metrics.latency.labels(action).observe((time.perf_counter() - start) * 1000)
+
+    def _dispatch(self, request, session_id):
+        """Run the action, or replay the response of an identical recent call"""
+        action = request["action"]
+        handler = getattr(self, f"_{action}")
+        if self.journal is not None and action in ("status", "update", "close"):
+            entry = self.journal.get(request["ticketId"])
+            if entry is not None:
+                self.metrics.degraded.labels(action, "pending").inc()
+                return queued_response(action, request["ticketId"], entry), False
+        try:
+            if not self.idempotency or not self.idempotency.applies_to(action):
+                return handler(request), False
+            with self.tracer.span("Idempotency Check") as span:
+                key = idempotency_key(request, session_id)
+                span.set(key=key[:16])
+            response, replayed = self.idempotency.run(
+                key, lambda: handler(request), cacheable=lambda response: not _retry_later(response))
+            self.metrics.cache.labels("idempotency", "hit" if replayed else "miss").inc()
+            return dict(response), replayed
+        except StoreError as exc:
+            # Outside the idempotency cache, so a retry after the outage is not answered from it
+            if not is_outage(exc):
+                raise
+            return self._degraded(request, exc), False
+
+    def _degraded(self, request, exc):
+        action = request["action"]
+        ticket_id = request.get("ticketId") or ""
+        with self.tracer.span("Degraded Response", error=str(exc)) as span:
+            known = self.last_known.get(ticket_id) if action == "status" and ticket_id else None
+            mode = "stale" if known else "unavailable"
+            span.set(mode=mode)
+        self.metrics.degraded.labels(action, mode).inc()
+        return stale_status_response(*known) if known else unavailable_response(action, ticket_id)
+
+    def _store_call(self, operation, fn, *args, **guard):
+        """Call the store, counting Airtable requests, latency and throttling"""
+        start = time.perf_counter()
+        self.metrics.airtable_calls.labels(operation).inc()
+        try:
+            if self.dependencies is None:
+                result = fn(*args)
+            else:
+                result = self.dependencies.get("airtable").call(fn, *args, **guard)
+        except StoreError as exc:
+            if exc.status == 429:
+                self.metrics.airtable_throttled.labels(operation).inc()
+            raise
+        finally:
+            self.metrics.airtable_latency.labels(operation).observe((time.perf_counter() - start) * 1000)
+        if self.journal and self._replay_worker.acquire(blocking=False):
+            # Airtable answers again: file the creates queued during the outage
+            threading.Thread(target=self._replay_in_background, name="journal-replay", daemon=True).start()
+        return result
+
+    def _replay_in_background(self):
+        try:
+            self.replay_journal()
+        finally:
+            self._replay_worker.release()
+
+    def _scan(self, fn):
+        """A full table scan for a ``cache.BackgroundIndex`` build; it runs in the index's own thread"""
+        return self._store_call("scan", fn, timeout_s=None)
+
+    def _might_exist(self, ticket_id):
+        if self.ticket_ids is None:
+            return True
+        try:
+            exists, reason = self.ticket_ids.might_exist(ticket_id)
+        except Exception:
+            return True  # the guard only saves queries; never fail a lookup because of it
+        if not exists:
+            self.metrics.cache.labels("negative" if reason == "negative" else "bloom", "hit").inc()
+        return exists
+
+    def _find(self, request):
+        action = request["action"]
+        ticket_id = request["ticketId"]
+        with self.tracer.span(f"Airtable - Find Ticket ({action.title()})", ticketId=ticket_id) as span:
+            record = None
+            if ticket_id and self._might_exist(ticket_id):
+                record = self._store_call("search", self.store.find, ticket_id)
+                if record is None and self.ticket_ids is not None:
+                    self.ticket_ids.missing(ticket_id)
+            else:
+                span.set(rejected=True)
+            span.set(found=record is not None)
+        if record is not None:
+            self._remember(record)
+        if record is not None and tickets.is_sla_breached(tickets.record_fields(record), self.clock()):
+            self.metrics.sla_breaches.labels(action).inc()
+        return record
+
+    def _remember(self, record):
+        """Keep the record's status for answering while Airtable is unavailable"""
+        response = tickets.build_status_response(record)
+        if response["ticketId"]:
+            self.last_known.set(response["ticketId"], (response, self.clock()))
+
+    def _update_record(self, node, record_id, fields, version=None):
+        with self.tracer.span(node, recordId=record_id):
+            if version is None:
+                return self._store_call("update", self.store.update, record_id, fields)
+            return self._store_call("update", self.store.compare_and_swap, record_id, version, fields)
+
+    def _notify(self, event, record, response):
+        for notifier in self.notifiers:
+            queue = self.metrics.notification_queue.labels(notifier.name)
+            queue.inc()
+            with self.tracer.span(notifier.name, event=event) as span:
+                try:
+                    if self.dependencies is None:
+                        notifier.notify(event, record, response)
+                    else:
+                        self.dependencies.get(notifier.name).call(notifier.notify, event, record, response)
+                    result = "ok"
+                except Exception as exc:
+                    # A failed notification must not lose the ticket write
+                    span.set(notifyError=f"{type(exc).__name__}: {exc}")
+                    result = "error"
+                finally:
+                    queue.dec()
+            self.metrics.notifications.labels(notifier.name, result).inc()
+
+    def _check_duplicates(self, request):
+        if self.duplicates is None:
+            return []
+        with self.tracer.span("Duplicate Check") as span:
+            try:
+                matches = self.duplicates.check(request["customerEmail"], request["customerName"],
+                                                request["subject"], request["description"])
+            except Exception as exc:
+                # Detection only saves work; never fail a create because of it
+                span.set(duplicateError=f"{type(exc).__name__}: {exc}")
+                return []
+            span.set(matches=len(matches))
+        return matches
+
+    def _create(self, request):
+        matches = self._check_duplicates(request)
+        own = [m for m in matches if m["sameCustomer"]]
+        if own and not request.get("allowDuplicate"):
+            return duplicate_response(request, own)
+        with self.tracer.span("Code - Prepare Create"):
+            prepared = tickets.prepare_create(request, ts_ms=self.clock(), rng=self.rng)
+            others = [m for m in matches if not m["sameCustomer"]]
+            if others:
+                note = similar_tickets_note(others)
+                prepared["additionalContext"] = "\n".join(filter(None, [prepared["additionalContext"], note]))
+        fields = tickets.to_airtable_fields(prepared)
+        with self.tracer.span("Airtable - Create Ticket", ticketId=prepared["ticketId"]) as span:
+            try:
+                record = self._store_call("create", self.store.create, fields)
+            except StoreError as exc:
+                if self.journal is None or not is_outage(exc):
+                    raise
+                span.set(queued=True, error=str(exc))
+                record = None
+        if record is None:
+            self.journal.add(prepared["ticketId"], fields, self.clock())
+            self.metrics.degraded.labels("create", "queued").inc()
+            return queued_create_response(fields, self.journal.durable)
+        return self._filed(prepared["ticketId"], record)
+
+    def _filed(self, ticket_id, record):
+        """Index, cache and announce a newly created record; returns the create response"""
+        if self.ticket_ids is not None:
+            self.ticket_ids.added(ticket_id)
+        self._reindex(record)
+        response = tickets.build_action_response("create", {**record, "ticketId": ticket_id})
+        if self.status_cache:
+            self.status_cache.put(ticket_id, tickets.build_status_response(record))
+        self._remember(record)
+        self._notify("create", record, response)
+        return response
+
+    def replay_journal(self):
+        """
+        File the creates queued while Airtable was unavailable; returns how many were filed.
+
+        Tickets that reached Airtable after all (a create that timed out) are
+        not created twice, but are still announced. Stops at the first outage error; tickets Airtable
+        rejects stay queued for a person to look at.
+        """
+        if self.journal is None:
+            return 0
+        filed = 0
+        with self._replay_lock:
+            for ticket_id, entry in self.journal.pending():
+                with self.tracer.trace("Replay Create Journal", ticketId=ticket_id) as root:
+                    try:
+                        with self.tracer.span("Airtable - Find Ticket (Replay)", ticketId=ticket_id):
+                            record = self._store_call("search", self.store.find, ticket_id)
+                        existed = record is not None
+                        if not existed:
+                            with self.tracer.span("Airtable - Create Ticket", ticketId=ticket_id):
+                                record = self._store_call("create", self.store.create, entry["fields"])
+                    except StoreError as exc:
+                        root.set(error=str(exc))
+                        if is_outage(exc):
+                            break
+                        continue
+                    self.journal.done(ticket_id)
+                    root.set(existed=existed)
+                    self._filed(ticket_id, record)
+                    filed += 1
+        return filed
+
+    def _status(self, request):
+        if not self.status_cache or not request["ticketId"]:
+            record = self._find(request)
+            return tickets.build_status_response(record) if record else tickets.not_found_response("status")
+
+        def load():
+            record = self._find(request)
+            return tickets.build_status_response(record) if record else None
+
+        response, hit = self.status_cache.get_or_load(request["ticketId"], load)
+        self.metrics.cache.labels("status", "hit" if hit else "miss").inc()
+        return dict(response) if response else tickets.not_found_response("status")
+
+    def _reindex(self, record):
+        if self.search_index is not None:
+            with self.tracer.span("Search Index - Upsert"):
+                self.search_index.upsert(record)
+        if self.duplicates is not None:
+            with self.tracer.span("Duplicate Index - Upsert"):
+                self.duplicates.upsert(record)
+        if self.customers is not None:
+            with self.tracer.span("Customer Index - Upsert"):
+                self.customers.upsert(record)
+
+    def _search(self, request):
+        if self.search_index is None:
+            return search_response(request, [])
+        with self.tracer.span("Search Index - Query", query=request["query"]) as span:
+            results = self.search_index.search(request["query"], request["statusFilter"] or None,
+                                               request["priorityFilter"] or None, request["limit"])
+            span.set(results=len(results))
+        return search_response(request, results)
+
+    def _list(self, request):
+        if not request["customerEmail"]:
+            return list_response(request, [], None, "Please tell me the email address you used for your tickets.")
+        if self.customers is None:
+            return list_response(request, [], None)
+        with self.tracer.span("Customer Index - List", status=request["statusFilter"]) as span:
+            try:
+                page, cursor = self.customers.page(request["customerEmail"], request["statusFilter"] or None,
+                                                   request["limit"], request["cursor"] or None)
+            except ValueError:
+                span.set(invalidCursor=True)
+                return list_response(request, [], None, "That page link is no longer valid; "
+                                                        "ask me to list your tickets again.")
+            span.set(results=len(page), more=bool(cursor))
+        return list_response(request, page, cursor)
+
+    def _invalidate_status(self, ticket_id):
+        if self.status_cache and ticket_id:
+            self.status_cache.invalidate(ticket_id)
+
+    def _update(self, request):
+        record = self._find(request)
+        if record is None:
+            return tickets.not_found_response("update")
+        with self.tracer.span("Code - Prepare Update"):
+            prepared = tickets.prepare_update(record, request.get("description"), self.clock())
+        if prepared["skipUpdate"]:
+            return prepared
+        item = (request["description"].strip(), self.clock())
+        if self.combiner is None:
+            outcome, record = self._append_log(request, record, [item])
+        else:
+            outcome, record = self.combiner.submit(
+                record["id"], item, lambda items, first=record: self._append_log(request, first, items))
+        if outcome == "skipped":
+            return tickets.prepare_update(record, request.get("description"), self.clock())
+        if outcome == "conflict":
+            return conflict_response("update", request["ticketId"])
+        self._invalidate_status(request["ticketId"])
+        if record is None:
+            return tickets.not_found_response("update")
+        self._remember(record)
+        self._reindex(record)
+        response = tickets.build_action_response("update", record)
+        self._notify("update", record, response)
+        return response
+
+    def _append_log(self, request, record, items):
+        """
+        Append ``(text, ts_ms)`` items to the Conversation Log with compare-and-swap.
+
+        On a conflict the items are re-applied to the record as the other
+        writer left it. Returns ``(outcome, record)``: written, skipped (the
+        ticket was closed meanwhile), missing or conflict.
+        """
+        for attempt in range(self.write_retries + 1):
+            fields = tickets.record_fields(record)
+            if (fields.get("Status") or "open") in tickets.CLOSED_STATUSES:
+                return "skipped", record
+            log = fields.get("Conversation Log") or ""
+            for text, ts_ms in items:
+                log = tickets.append_log(log, text, ts_ms)
+            try:
+                updated = self._update_record("Airtable - Update Ticket", record["id"], {
+                    "Conversation Log": log,
+                    "Updated At": tickets.format_timestamp(max(ts for _, ts in items)),
+                }, version=self.store.version(record))
+                return ("written", updated) if updated is not None else ("missing", None)
+            except VersionConflict as exc:
+                self.metrics.write_conflicts.labels("update").inc()
+                time.sleep(self.rng.uniform(0, min(0.05, 0.001 * 2 ** attempt)))
+                record = exc.current or self._find(request)
+                if record is None:
+                    return "missing", None
+        return "conflict", record
+
+    def _close(self, request):
+        record = self._find(request)
+        if record is None:
+            return tickets.not_found_response("close")
+        with self.tracer.span("Code - Prepare Close"):
+            prepared = tickets.prepare_close(record, self.clock())
+        updated = self._update_record("Airtable - Close Ticket", prepared["airtableRecordId"], {
+            "Status": "closed",
+            "Updated At": prepared["updatedAt"],
+        })
+        self._invalidate_status(request["ticketId"])
+        if updated is None:
+            return tickets.not_found_response("close")
+        self._remember(updated)
+        self._reindex(updated)
+        response = tickets.build_action_response("close", updated, prepared["messageForUser"])
+        self._notify("close", updated, response)
+        return response
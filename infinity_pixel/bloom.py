@@ -0,0 +1,135 @@
+"""
+Bloom filter and unknown-ticket guard.
+
+Mistyped or hallucinated ticket IDs would otherwise each cost an Airtable
+``filterByFormula`` search that returns nothing. ``TicketIdGuard`` answers
+"might this ticket exist?" without a query:
+
+* IDs not in the ``TCK-{13 digit ms}-{3 digits}`` format are rejected.
+* IDs absent from a Bloom filter over every known Ticket ID are rejected,
+  unless their embedded timestamp is newer than the last rebuild (the n8n
+  workflow may have created them directly in Airtable since). The filter
+  is rebuilt in the background (see ``cache.BackgroundIndex``); until the
+  first build is done every well-formed ID is let through.
+* IDs the store recently reported missing are rejected by a short-TTL
+  negative cache, which also absorbs Bloom false positives.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from .cache import BackgroundIndex, TTLCache
+from .tickets import now_ms, ticket_id_timestamp
+
+
+class BloomFilter:
+    """Bit-array Bloom filter with ``k`` double-hashed probes"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and 0 < error_rate < 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        # Concurrent read-modify-writes of one byte could drop a bit, i.e. a false negative
+        with self._lock:
+            for p in positions:
+                self.bits[p >> 3] |= 1 << (p & 7)
+            self.count += 1
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+    def false_positive_rate(self):
+        """Expected false-positive rate at the current fill"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class TicketIdGuard(BackgroundIndex):
+    """Rejects ticket IDs that cannot exist before they reach the store"""
+
+    def __init__(self, store, error_rate=0.001, refresh_s=900.0, negative_ttl=30.0,
+                 skew_ms=5 * 60 * 1000, min_capacity=10_000, wait_s=0.5, call=None, clock=time.monotonic,
+                 wall_ms=now_ms):
+        super().__init__(store, refresh_s, wait_s=wait_s, call=call, clock=clock)
+        self.error_rate = error_rate
+        self.skew_ms = skew_ms
+        self.min_capacity = min_capacity
+        self.wall_ms = wall_ms
+        self.negative = TTLCache(max_entries=50_000, ttl=negative_ttl, clock=clock)
+
+    def scan(self):
+        """Every Ticket ID in the store, and the wall time the scan started"""
+        started_ms = self.wall_ms()
+        return started_ms, list(self.store.ticket_ids())
+
+    def build(self, scanned):
+        started_ms, ids = scanned
+        bloom = BloomFilter(max(self.min_capacity, 2 * len(ids)), self.error_rate)
+        bloom.update(ids)
+        return bloom, started_ms
+
+    def apply(self, index, ticket_id):
+        index[0].add(ticket_id)
+
+    @property
+    def filter(self):
+        index = self.index
+        return index[0] if index else None
+
+    @property
+    def built_at_ms(self):
+        index = self.index
+        return index[1] if index else None
+
+    def might_exist(self, ticket_id):
+        """``(might_exist, reason)``; reason is why an ID was rejected or let through"""
+        created_ms = ticket_id_timestamp(ticket_id)
+        if created_ms is None:
+            return False, "malformed"
+        if ticket_id in self.negative:
+            return False, "negative"
+        index = self.current()
+        if index is None:
+            return True, "unbuilt"  # the first build is still running, or failed and waits to be retried
+        bloom, built_at_ms = index
+        if bloom.count >= bloom.capacity:
+            self.refresh()  # too full for its error rate
+        if ticket_id in bloom:
+            return True, "bloom"
+        if created_ms >= built_at_ms - self.skew_ms:
+            return True, "newer_than_filter"
+        return False, "bloom"
+
+    def added(self, ticket_id):
+        """Record a ticket created through the backend"""
+        self.negative.pop(ticket_id)
+        self.upsert(ticket_id)
+
+    def missing(self, ticket_id):
+        """Record that the store has no such ticket"""
+        self.negative.set(ticket_id, True)
@@ -0,0 +1,245 @@
+"""
+In-process caches shared by the ticket backend.
+
+``TTLCache`` is a thread-safe LRU map whose entries also expire after a
+time-to-live. Expired entries are dropped lazily when read and evicted
+first when the cache is full.
+
+``BackgroundIndex`` is the base of the indexes the backend keeps over the
+whole ticket table (search, duplicates, customer listing, known ticket
+IDs): each is built from a full scan in a background thread and swapped in
+when complete, so requests never wait for a rebuild.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .store import StoreError
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU cache with per-entry expiry; ``clock`` returns seconds"""
+
+    def __init__(self, max_entries=10_000, ttl=300.0, clock=time.monotonic):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                if entry[0] > self.clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        now = self.clock()
+        expired = [k for k, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > self.clock()
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ReadThroughCache:
+    """
+    Loads missing keys on demand and supports precise invalidation.
+
+    Each key being loaded has a generation bumped by ``invalidate``; a value
+    loaded while the key was being invalidated is returned but not cached, so
+    a read that races with a write cannot reinstate the old value. Only keys
+    with a load in flight have a generation, so they are bounded by the
+    concurrent loads.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._generations = {}  # key -> invalidations while it had loads in flight
+        self._loading = {}  # key -> loads in flight
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, load):
+        """``(value, hit)``; ``load()`` returning None is not cached"""
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value, True
+        with self._lock:
+            generation = self._generations.get(key, 0)
+            self._loading[key] = self._loading.get(key, 0) + 1
+        value = None
+        try:
+            value = load()
+        finally:
+            with self._lock:
+                if value is not None and self._generations.get(key, 0) == generation:
+                    self.cache.set(key, value)
+                self._loading[key] -= 1
+                if not self._loading[key]:
+                    del self._loading[key]
+                    self._generations.pop(key, None)
+        return value, False
+
+    def put(self, key, value):
+        with self._lock:
+            self.cache.set(key, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._loading:
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self.cache.pop(key)
+
+
+class BackgroundIndex:
+    """
+    An in-memory index over a ticket store, rebuilt from a full scan in a background thread.
+
+    Subclasses implement ``build(rows)`` (a fresh index from ``scan()``'s
+    rows, every record by default) and ``apply(index, row)`` (one created
+    or updated row). ``current()`` starts the first build and waits for it
+    up to ``wait_s`` (None: until done); once the index is ``refresh_s``
+    old a replacement is built in the background while the old one keeps
+    answering, and rows ``upsert`` records meanwhile are replayed onto the
+    new index before it is swapped in. A failed build is retried after
+    ``retry_s``, doubling up to ``refresh_s``, rather than on every request.
+    ``call(fn)`` runs the scan; the backend passes one that goes through
+    its Airtable metrics and circuit breaker.
+    """
+
+    def __init__(self, store, refresh_s=900.0, retry_s=30.0, wait_s=None, call=None, clock=time.monotonic):
+        self.store = store
+        self.refresh_s = refresh_s
+        self.retry_s = retry_s
+        self.wait_s = wait_s
+        self.call = call
+        self.clock = clock
+        self.index = None
+        self.error = None  # why the last build failed
+        self.failures = 0  # consecutive failed builds
+        self._next_build = None  # clock time the next build is due
+        self._pending = None  # rows upserted while a build runs
+        self._thread = None
+        self._lock = threading.Lock()
+        self._built = threading.Condition(self._lock)
+
+    def scan(self):
+        return list(self.store.all_records())
+
+    def build(self, rows):
+        raise NotImplementedError
+
+    def apply(self, index, row):
+        raise NotImplementedError
+
+    def current(self):
+        """The index being served; None while the first build runs (past ``wait_s``) or after it failed"""
+        with self._lock:
+            if self._thread is None and (self._next_build is None or self.clock() >= self._next_build):
+                self._start()
+            if self.index is None and self._thread is not None:
+                self._built.wait_for(lambda: self._thread is None, self.wait_s)
+            return self.index
+
+    def require(self):
+        """``current()``, or ``StoreError`` when there is no index to answer from"""
+        index = self.current()
+        if index is None:
+            error = self.error
+            if error is None:
+                raise StoreError(f"{type(self).__name__} is still being built")
+            raise StoreError(f"{type(self).__name__} could not be built: {error}", getattr(error, "status", None))
+        return index
+
+    def refresh(self):
+        """Start a rebuild now unless one is running"""
+        with self._lock:
+            if self._thread is None:
+                self._start()
+
+    def join(self, timeout=None):
+        """Wait for a running build; returns whether none is running"""
+        with self._lock:
+            return self._built.wait_for(lambda: self._thread is None, timeout)
+
+    def _start(self):
+        self._pending = []
+        self._thread = threading.Thread(target=self._rebuild, name=f"{type(self).__name__}-build", daemon=True)
+        self._thread.start()
+
+    def _rebuild(self):
+        started = self.clock()
+        try:
+            index = self.build(self.call(self.scan) if self.call else self.scan())
+        except Exception as exc:
+            with self._lock:
+                self.error = exc
+                self.failures += 1
+                self._next_build = self.clock() + min(self.refresh_s, self.retry_s * 2 ** (self.failures - 1))
+                self._finish()
+            return
+        with self._lock:
+            for row in self._pending:
+                self.apply(index, row)
+            self.index = index
+            self.error = None
+            self.failures = 0
+            self._next_build = started + self.refresh_s
+            self._finish()
+
+    def _finish(self):
+        self._pending = None
+        self._thread = None
+        self._built.notify_all()
+
+    def upsert(self, row):
+        """Apply a created or updated row to the served index, and to the one being built"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(row)
+            index = self.index
+        if index is not None:
+            self.apply(index, row)
@@ -0,0 +1,527 @@
+"""
+Streaming chat gateway: the ``AI Agent`` with tokens relayed as they arrive.
+
+In n8n, ``When chat message received`` answers only after the whole
+``AI Agent`` run, tool calls included, so users stare at a spinner for the
+full generation time. ``ChatAgent.run`` is the same agent loop as a
+generator of ``ChatEvent``\\ s:
+
+* ``token``: a piece of the answer, as soon as the model produced it;
+* ``status``: an interim message such as "Looking up your ticket…" when a
+  tool call starts, repeated every ``interim_every_s`` while it runs;
+* ``done``: the full output with time-to-first-token and total time;
+* ``error``: the run failed.
+
+``serve`` exposes it as ``POST /chat`` (the chat trigger's ``sessionId`` /
+``chatInput`` payload) answering with Server-Sent Events, or with one JSON
+``{"output"}`` object when the client does not accept ``text/event-stream``.
+
+The model is pluggable: ``OpenAIChatModel`` streams the Chat Completions
+API (``gpt-4.1-mini`` like the workflow) and ``FakeChatModel`` is a scripted
+local model with configurable latencies for tests and benchmarks. The
+``ManageTickets`` tool calls ``TicketBackend.handle`` in process, and
+``knowledge_base`` searches a retriever. The reads the agent is likely to
+make (see ``prefetch``) start as soon as the message arrives. With a
+``router`` (see ``router``), greetings, thanks and similar trivial turns are
+answered from templates without calling the model.
+
+Usage:
+    agent = ChatAgent(FakeChatModel(), tools=[ticket_tool(TicketBackend(store))])
+    for event in agent.run(session_id, "What is the status of TCK-1764314974531-001?"):
+        print(event.type, event.data)
+
+    python -m infinity_pixel.chat --port 8081                 # fake model, in-memory tickets
+    python -m infinity_pixel.chat --port 8081 --router        # trivial turns answered locally
+    OPENAI_API_KEY=... python -m infinity_pixel.chat --openai
+    curl -N -H 'Accept: text/event-stream' -d '{"sessionId": "s1", "chatInput": "hi"}' localhost:8081/chat
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .metrics import get_registry
+from .outbound import get_client
+from .prefetch import Prefetcher
+from .tickets import TICKET_ID_IN_TEXT
+from .tracing import get_tracer
+
+SYSTEM_PROMPT = ("You are the Quantum-Ops AI Service Assistant. Answer questions about Quantum-Ops services and "
+                 "manage customer support tickets with the ManageTickets tool. After calling the tool, include "
+                 "its messageForUser in your reply.")
+OPENAI_URL = "https://api.openai.com/v1/chat/completions"
+KNOWLEDGE_TOOL = "knowledge_base"
+
+# Interim message per ticket action while the tool call is in flight
+INTERIM_MESSAGES = {
+    "status": "Looking up your ticket…",
+    "create": "Creating your ticket…",
+    "update": "Adding your update to the ticket…",
+    "close": "Closing your ticket…",
+    "search": "Searching tickets…",
+    "list": "Looking up your tickets…",
+}
+
+
+@dataclass
+class ChatEvent:
+    type: str
+    data: dict
+
+    def sse(self):
+        return f"event: {self.type}\ndata: {json.dumps(self.data)}\n\n".encode("utf-8")
+
+
+@dataclass
+class ToolCall:
+    id: str
+    name: str
+    arguments: dict
+
+
+@dataclass
+class Tool:
+    """A function the model may call; ``interim(arguments)`` is the message shown while it runs"""
+
+    name: str
+    description: str
+    parameters: dict
+    fn: object
+    interim: object = None
+
+    def spec(self):
+        return {"type": "function",
+                "function": {"name": self.name, "description": self.description, "parameters": self.parameters}}
+
+
+class ChatError(Exception):
+    """The model could not be called"""
+
+
+def ticket_tool(backend, name="ManageTickets"):
+    """The ``Call 'Ticket Manager (Airtable)'`` tool over a ``TicketBackend``"""
+    parameters = {
+        "type": "object",
+        "properties": {
+            "action": {"type": "string", "enum": ["create", "status", "update", "close", "search", "list"]},
+            "name": {"type": "string"},
+            "email": {"type": "string"},
+            "subject": {"type": "string"},
+            "description": {"type": "string"},
+            "priority": {"type": "string", "enum": ["low", "medium", "high", "urgent"]},
+            "ticketId": {"type": "string"},
+            "query": {"type": "string"},
+            "status": {"type": "string"},
+            "cursor": {"type": "string"},
+            "limit": {"type": "integer"},
+        },
+        "required": ["action"],
+    }
+
+    def call(arguments, session_id=None):
+        return backend.handle(arguments, session_id=session_id)
+
+    def interim(arguments):
+        return INTERIM_MESSAGES.get(str(arguments.get("action") or "").lower(), "Working on your ticket…")
+
+    return Tool(name, "Create, check, update, close, search or list customer support tickets", parameters, call,
+                interim)
+
+
+def knowledge_tool(retrieve, name=KNOWLEDGE_TOOL, packer=None):
+    """
+    The ``Answer questions with a vector store`` tool; ``retrieve(query)`` returns passages.
+
+    With a ``retrieval.ContextPacker``, ``retrieve`` returns ``Chunk``\\ s (best first) and the tool
+    answers with them deduplicated, merged and packed into the packer's token budget.
+    """
+    parameters = {"type": "object", "properties": {"query": {"type": "string"}}, "required": ["query"]}
+
+    def call(arguments, session_id=None):
+        results = retrieve(str(arguments.get("query") or ""))
+        if packer is None:
+            return {"passages": list(results)}
+        packed = packer.pack(results)
+        return {"context": packed.text, "sources": packed.sources}
+
+    return Tool(name, "Look up Quantum-Ops services and policies in the knowledge base", parameters, call,
+                lambda arguments: "Searching our knowledge base…")
+
+
+class ChatModel:
+    """Streams one assistant turn"""
+
+    def stream(self, messages, tools):
+        """Yield answer text pieces (str), then any ``ToolCall``\\ s the model made"""
+        raise NotImplementedError
+
+
+class FakeChatModel(ChatModel):
+    """
+    Scripted local model.
+
+    Like the workflow's agent it first consults the knowledge base (when
+    the ``knowledge_base`` tool is available), then, if the message
+    mentions a ticket ID, calls ``ManageTickets`` (status, or close/update
+    when the message says so), and finally streams the ticket's
+    ``messageForUser`` or ``answer``. Every turn takes ``first_token_s``
+    before its first piece and each further word ``token_s``.
+    """
+
+    def __init__(self, answer=None, first_token_s=0.0, token_s=0.0):
+        self.answer = answer or ("Quantum-Ops offers Application Development, Cloud Application Development, "
+                                 "Cloud Management, Custom Software Development, SaaS Development and Ads "
+                                 "Management. Which of these can I help you with?")
+        self.first_token_s = first_token_s
+        self.token_s = token_s
+
+    def _words(self, text):
+        words = text.split(" ")
+        for n, word in enumerate(words):
+            if n:
+                time.sleep(self.token_s)
+            yield word if n == len(words) - 1 else word + " "
+
+    def stream(self, messages, tools):
+        time.sleep(self.first_token_s)
+        names = {t.name for t in tools}
+        called = {c["function"]["name"] for m in messages for c in m.get("tool_calls") or ()}
+        text = next(m["content"] for m in reversed(messages) if m["role"] == "user")
+        if KNOWLEDGE_TOOL in names and KNOWLEDGE_TOOL not in called:
+            yield ToolCall(f"call_{len(messages)}", KNOWLEDGE_TOOL, {"query": text})
+            return
+        match = TICKET_ID_IN_TEXT.search(text)
+        if match and "ManageTickets" in names and "ManageTickets" not in called:
+            lowered = text.lower()
+            if "close" in lowered:
+                arguments = {"action": "close", "ticketId": match.group()}
+            elif "update" in lowered or "add" in lowered:
+                arguments = {"action": "update", "ticketId": match.group(), "description": text}
+            else:
+                arguments = {"action": "status", "ticketId": match.group()}
+            yield ToolCall(f"call_{len(messages)}", "ManageTickets", arguments)
+            return
+        last = messages[-1]
+        result = json.loads(last["content"]) if last["role"] == "tool" else {}
+        yield from self._words(result.get("messageForUser") or self.answer)
+
+
+class OpenAIChatModel(ChatModel):
+    """Chat Completions with ``stream: true`` over a pooled keep-alive connection"""
+
+    def __init__(self, api_key, model="gpt-4.1-mini", url=OPENAI_URL, timeout=60.0, client=None):
+        self.api_key = api_key
+        self.model = model
+        self.url = url
+        self.timeout = timeout
+        self.client = client or get_client()
+
+    def stream(self, messages, tools):
+        parts = urllib.parse.urlsplit(self.url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        pool = self.client.pool(parts.scheme, parts.hostname, port)
+        body = {"model": self.model, "messages": messages, "stream": True}
+        if tools:
+            body["tools"] = [t.spec() for t in tools]
+        try:
+            conn, _ = pool.acquire(self.timeout)
+        except OSError as exc:
+            raise ChatError(f"OpenAI connection failed: {exc}") from exc
+        reusable = False
+        try:
+            conn.request("POST", parts.path or "/", json.dumps(body).encode("utf-8"), {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream",
+            })
+            response = conn.getresponse()
+            if response.status != 200:
+                raise ChatError(f"OpenAI HTTP {response.status}: {response.read()[:200]!r}")
+            calls = {}  # index -> [id, name, argument text]
+            for line in response:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                for choice in json.loads(data).get("choices") or []:
+                    delta = choice.get("delta") or {}
+                    if delta.get("content"):
+                        yield delta["content"]
+                    for call in delta.get("tool_calls") or []:
+                        entry = calls.setdefault(call.get("index", 0), ["", "", ""])
+                        entry[0] = call.get("id") or entry[0]
+                        function = call.get("function") or {}
+                        entry[1] = function.get("name") or entry[1]
+                        entry[2] += function.get("arguments") or ""
+            response.read()
+            reusable = not response.will_close
+        except OSError as exc:
+            raise ChatError(f"OpenAI stream failed: {exc}") from exc
+        finally:
+            pool.release(conn, reusable)
+        for _, (call_id, name, arguments) in sorted(calls.items()):
+            yield ToolCall(call_id, name, json.loads(arguments or "{}"))
+
+
+class SessionMemory:
+    """The last ``window`` messages of each session, like n8n's ``Simple Memory`` node"""
+
+    def __init__(self, window=10, max_sessions=10_000):
+        self.window = window
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            return list(self._sessions.get(session_id, ()))
+
+    def add(self, session_id, *messages):
+        with self._lock:
+            history = self._sessions.setdefault(session_id, deque(maxlen=self.window))
+            self._sessions.move_to_end(session_id)
+            history.extend(messages)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+
+@dataclass
+class _Run:
+    start: float
+    first_token: float = None
+    parts: list = field(default_factory=list)
+
+
+class ChatAgent:
+    """The ``AI Agent`` loop: stream the model, run tool calls, stream again"""
+
+    def __init__(self, model, tools=(), system_prompt=SYSTEM_PROMPT, memory=None, max_steps=4,
+                 interim_every_s=2.0, tracer=None, registry=None, max_workers=16, prefetcher=None, router=None):
+        self.model = model
+        self.tools = {tool.name: tool for tool in tools}
+        self.system_prompt = system_prompt
+        self.memory = memory or SessionMemory()
+        self.max_steps = max_steps
+        self.interim_every_s = interim_every_s
+        self.tracer = tracer or get_tracer()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chat-tool")
+        registry = registry or get_registry()
+        self.prefetcher = None if prefetcher is False else prefetcher or Prefetcher(registry=registry)
+        self.router = router or None
+        self.ttft = registry.histogram(
+            "chat_time_to_first_token_ms", "Time from chat message to the first answer token in milliseconds")
+        self.duration = registry.histogram(
+            "chat_response_duration_ms", "Time from chat message to the complete answer in milliseconds")
+        self.tool_calls = registry.counter("chat_tool_calls_total", "Agent tool calls by tool", ["tool"])
+        self.routes = registry.counter("chat_routes_total", "Chat turns by route (intent answered locally, or llm)",
+                                       ["route"])
+
+    def run(self, session_id, text):
+        """Yield ``ChatEvent``\\ s for one user message"""
+        run = _Run(time.perf_counter())
+        messages = [{"role": "system", "content": self.system_prompt}, *self.memory.get(session_id),
+                    {"role": "user", "content": text}]
+        route = None
+        turn = None
+        with self.tracer.trace("When chat message received", session_id=session_id):
+            try:
+                route = self._route(text)
+                if route is not None and route.answer is not None:
+                    run.first_token = time.perf_counter()
+                    run.parts.append(route.answer)
+                    yield ChatEvent("token", {"text": route.answer})
+                else:
+                    turn = self.prefetcher.start(session_id, text, self.tools) if self.prefetcher else None
+                    yield from self._agent_loop(messages, session_id, run, turn)
+            except Exception as exc:
+                yield ChatEvent("error", {"message": "Sorry, something went wrong. Please try again.",
+                                          "error": f"{type(exc).__name__}: {exc}"})
+                return
+            finally:
+                if turn:
+                    turn.finish()
+        output = "".join(run.parts)
+        self.memory.add(session_id, {"role": "user", "content": text}, {"role": "assistant", "content": output})
+        end = time.perf_counter()
+        ttft_ms = (run.first_token - run.start) * 1000 if run.first_token is not None else None
+        if ttft_ms is not None:
+            self.ttft.observe(ttft_ms)
+        self.duration.observe((end - run.start) * 1000)
+        done = {"output": output, "ttftMs": ttft_ms and round(ttft_ms, 1),
+                "totalMs": round((end - run.start) * 1000, 1)}
+        if route is not None:
+            done["route"] = route.intent if route.answer is not None else "llm"
+        yield ChatEvent("done", done)
+
+    def _route(self, text):
+        """The router's decision for ``text``, or None without a router"""
+        if self.router is None:
+            return None
+        with self.tracer.span("Router") as span:
+            route = self.router.route(text)
+            span.set(intent=route.intent, confidence=round(route.confidence, 3), answered=route.answer is not None)
+        self.routes.labels(route.intent if route.answer is not None else "llm").inc()
+        return route
+
+    def _agent_loop(self, messages, session_id, run, turn):
+        """Stream model steps and run their tool calls until the model answers without one"""
+        for _ in range(self.max_steps):
+            calls = []
+            with self.tracer.span("AI Agent") as span:
+                step_parts = []
+                for item in self.model.stream(messages, list(self.tools.values())):
+                    if isinstance(item, ToolCall):
+                        calls.append(item)
+                        continue
+                    if run.first_token is None:
+                        run.first_token = time.perf_counter()
+                        span.set(firstTokenMs=round((run.first_token - run.start) * 1000, 1))
+                    step_parts.append(item)
+                    yield ChatEvent("token", {"text": item})
+                span.set(toolCalls=len(calls))
+            run.parts.extend(step_parts)
+            if not calls:
+                break
+            messages.append({"role": "assistant", "content": "".join(step_parts) or None, "tool_calls": [
+                {"id": c.id, "type": "function",
+                 "function": {"name": c.name, "arguments": json.dumps(c.arguments)}} for c in calls]})
+            for call in calls:
+                result = yield from self._call_tool(call, session_id, turn)
+                messages.append({"role": "tool", "tool_call_id": call.id, "content": json.dumps(result)})
+
+    def _call_tool(self, call, session_id, turn=None):
+        """Run one tool call (or take its prefetched result), yielding interim status events; returns the result"""
+        tool = self.tools.get(call.name)
+        if tool is None:
+            return {"error": f"unknown tool {call.name}"}
+        self.tool_calls.labels(call.name).inc()
+        message = tool.interim(call.arguments) if tool.interim else f"Running {call.name}…"
+        yield ChatEvent("status", {"message": message, "tool": call.name})
+        with self.tracer.span(f"Call '{call.name}'", tool=call.name) as span:
+            future = turn.take(call.name, call.arguments) if turn else None
+            span.set(prefetched=future is not None)
+            if future is None:
+                future = self._executor.submit(tool.fn, call.arguments, session_id)
+            while True:
+                try:
+                    return future.result(self.interim_every_s)
+                except FutureTimeout:
+                    yield ChatEvent("status", {"message": message, "tool": call.name, "stillWorking": True})
+                except Exception as exc:
+                    return {"error": f"{type(exc).__name__}: {exc}"}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self.prefetcher:
+            self.prefetcher.close()
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    agent = None
+    path_prefix = "/chat"
+
+    def do_POST(self):
+        if self.path.split("?", 1)[0] != self.path_prefix:
+            self.send_error(404)
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except ValueError:
+            self.send_error(400, "invalid JSON")
+            return
+        if not isinstance(payload, dict):
+            self.send_error(400, "expected a JSON object")
+            return
+        session_id = str(payload.get("sessionId") or "")
+        text = str(payload.get("chatInput") or payload.get("message") or "")
+        events = self.agent.run(session_id, text)
+        if "text/event-stream" not in (self.headers.get("Accept") or ""):
+            final = {}
+            for event in events:
+                if event.type in ("done", "error"):
+                    final = event.data
+            body = json.dumps({"output": final.get("output") or final.get("message", "")}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Accel-Buffering", "no")  # keep proxies from buffering the stream
+        self.end_headers()
+        try:
+            for event in events:
+                self.wfile.write(event.sse())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            events.close()  # the client went away; stop generating
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(agent, host="127.0.0.1", port=8081, path="/chat"):
+    """Serve ``POST path`` from a background thread; returns the server (``.shutdown()`` stops it)"""
+    handler = type("ChatHandler", (_ChatHandler,), {"agent": agent, "path_prefix": path})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="chat", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the streaming chat gateway")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--openai", action="store_true", help="use the OpenAI API (OPENAI_API_KEY)")
+    parser.add_argument("--model", default="gpt-4.1-mini")
+    parser.add_argument("--system-prompt", help="file with the system prompt (e.g. docs/sys_prompt.txt)")
+    parser.add_argument("--router", action="store_true", help="answer greetings, thanks etc. from templates")
+    parser.add_argument("--router-model", help="classifier saved by `python -m infinity_pixel.router train`")
+    args = parser.parse_args(argv)
+
+    from .backend import TicketBackend
+    from .router import IntentClassifier, Router
+    from .store import InMemoryTicketStore
+
+    if args.openai:
+        if not os.environ.get("OPENAI_API_KEY"):
+            print("❌ OPENAI_API_KEY is not set")
+            return 1
+        model = OpenAIChatModel(os.environ["OPENAI_API_KEY"], args.model)
+    else:
+        model = FakeChatModel(first_token_s=0.3, token_s=0.03)
+    system_prompt = SYSTEM_PROMPT
+    if args.system_prompt:
+        with open(args.system_prompt, encoding="utf-8") as f:
+            system_prompt = f.read()
+    router = None
+    if args.router or args.router_model:
+        router = Router(IntentClassifier.load(args.router_model) if args.router_model else None)
+    agent = ChatAgent(model, [ticket_tool(TicketBackend(InMemoryTicketStore()))], system_prompt, router=router)
+    server = serve(agent, args.host, args.port)
+    source = f"OpenAI {args.model}" if args.openai else "fake model"
+    print(f"✅ Serving POST http://{args.host}:{args.port}/chat ({source})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
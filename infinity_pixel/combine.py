@@ -0,0 +1,71 @@
+"""
+Group commit of concurrent writes to one record.
+
+When many requests append to the same ticket at once, writing each append
+separately makes them queue (or, with compare-and-swap, conflict) on that
+one record. ``WriteCombiner.submit`` lets them share writes instead: the
+first caller for a key becomes the leader, callers arriving while a write
+for that key is in progress join the next batch, and each batch is handed
+to ``write(items)`` once. Every caller in the batch gets that call's
+result (or exception).
+
+Usage:
+    combiner = WriteCombiner()
+    result = combiner.submit(record_id, ("note", ts_ms), lambda items: append_all(record_id, items))
+"""
+
+import threading
+
+
+class _Batch:
+    def __init__(self):
+        self.items = []
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WriteCombiner:
+    """Runs at most one write per key at a time, batching the callers that arrive meanwhile"""
+
+    def __init__(self):
+        self._keys = {}  # key -> [open batch or None, write lock]
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, key, item, write):
+        """Add ``item`` to the key's open batch and return the result of the write that carried it"""
+        with self._lock:
+            state = self._keys.setdefault(key, [None, threading.Lock()])
+            batch = state[0]
+            leader = batch is None
+            if leader:
+                batch = state[0] = _Batch()
+            batch.items.append(item)
+        if not leader:
+            batch.done.wait()
+            if batch.error is not None:
+                raise batch.error
+            return batch.result
+
+        try:
+            with state[1]:  # the previous batch's write finishes first; arrivals meanwhile join ours
+                with self._lock:
+                    state[0] = None
+                    items = list(batch.items)
+                    self.batches += 1
+                    self.items += len(items)
+                try:
+                    batch.result = write(items)
+                    return batch.result
+                except BaseException as exc:
+                    batch.error = exc
+                    raise
+                finally:
+                    batch.done.set()
+        finally:
+            with self._lock:
+                # Forget idle keys; a new leader always opens a batch before releasing the lock
+                if state[0] is None and not state[1].locked() and self._keys.get(key) is state:
+                    del self._keys[key]
@@ -0,0 +1,85 @@
+"""
+Idempotent handling of repeated ticket actions.
+
+The chat agent re-issues a tool call when it times out, so the same
+``create`` can reach the backend twice and open two tickets. Requests are
+keyed by a SHA-256 of the normalized fields (the output of ``Normalize &
+Validate Action`` / ``Code in JavaScript``) plus the chat session; within
+the TTL window a repeat gets the stored response without touching the
+store, and a repeat that arrives while the first call is still running
+waits for its result instead of running again.
+"""
+
+import hashlib
+import json
+import threading
+
+from .cache import TTLCache
+
+# Read-only actions are not deduplicated: a repeated status check must see later updates
+IDEMPOTENT_ACTIONS = ("create", "update", "close")
+
+
+def idempotency_key(request, session_id=None):
+    """Hex SHA-256 of the normalized request fields and the session"""
+    canonical = json.dumps({"session": session_id or "", "request": request},
+                           sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.failed = False
+
+
+class IdempotencyCache:
+    """Stores recent responses by idempotency key and coalesces concurrent repeats"""
+
+    def __init__(self, ttl=300.0, max_entries=10_000, actions=IDEMPOTENT_ACTIONS, cache=None):
+        self.actions = tuple(actions)
+        self.cache = cache if cache is not None else TTLCache(max_entries=max_entries, ttl=ttl)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def applies_to(self, action):
+        return action in self.actions
+
+    def run(self, key, fn, cacheable=None):
+        """
+        ``(response, replayed)``: the stored/in-flight response, or ``fn()``'s.
+
+        A response for which ``cacheable(response)`` is false (e.g. "try
+        again in a moment") goes to the callers already waiting but is not
+        stored, so a later repeat runs again.
+        """
+        while True:
+            response = self.cache.get(key)
+            if response is not None:
+                return response, True
+            with self._lock:
+                pending = self._in_flight.get(key)
+                if pending is None:
+                    pending = self._in_flight[key] = _InFlight()
+                    owner = True
+                else:
+                    owner = False
+            if not owner:
+                pending.done.wait()
+                if pending.failed:
+                    continue  # the first attempt raised; try again ourselves
+                return pending.response, True
+            try:
+                response = fn()
+                pending.response = response
+                if cacheable is None or cacheable(response):
+                    self.cache.set(key, response)
+                return response, False
+            except BaseException:
+                pending.failed = True
+                raise
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                pending.done.set()
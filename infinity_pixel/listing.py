@@ -0,0 +1,181 @@
+"""
+Customer ticket listing with keyset pagination.
+
+``CustomerIndex`` keeps, per ``Customer Email`` and per (email, Status), the
+customer's tickets sorted by ``Updated At`` (newest first, then Ticket ID).
+A page is a binary search for the cursor position followed by a slice, so
+page 100 of a customer with thousands of tickets costs the same as page 1.
+
+Cursors are opaque URL-safe strings encoding the sort key of the last
+ticket returned. A ticket updated while a customer pages through the list
+moves to the front and is not repeated; ``list`` never skips tickets that
+did not change.
+
+Usage:
+    index = CustomerIndex.from_records(records)
+    tickets, cursor = index.page("ada@example.com", status="open", limit=10)
+    more, cursor = index.page("ada@example.com", status="open", limit=10, cursor=cursor)
+"""
+
+import base64
+import binascii
+import json
+import threading
+from bisect import bisect_right, insort
+
+from .cache import BackgroundIndex
+from .tickets import parse_timestamp, record_fields
+
+
+def _normalize(value):
+    return str(value or "").strip().lower()
+
+
+def _updated_ms(fields):
+    for name in ("Updated At", "Created At"):
+        try:
+            ms = parse_timestamp(fields.get(name))
+        except (TypeError, ValueError):
+            ms = None
+        if ms is not None:
+            return ms
+    return 0
+
+
+def encode_cursor(key):
+    """Opaque cursor for the sort key ``(-updated_ms, ticket_id)`` of the last ticket on a page"""
+    raw = json.dumps([-key[0], key[1]], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Inverse of ``encode_cursor``; raises ValueError for anything it did not produce"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_ms, ticket_id = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(updated_ms, int) or not isinstance(ticket_id, str):
+        raise ValueError("invalid cursor")
+    return -updated_ms, ticket_id
+
+
+class CustomerIndex:
+    """Tickets by customer email and status, ordered by Updated At descending"""
+
+    def __init__(self):
+        self.entries = {}  # ticket id -> (email, status, sort key, summary)
+        self.lists = {}  # (email, status or None) -> sorted keys
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_records(cls, records):
+        index = cls()
+        for record in records:
+            index.upsert(record)
+        return index
+
+    def __len__(self):
+        return len(self.entries)
+
+    def upsert(self, record):
+        """Index a ticket (record or field dict), replacing any earlier version"""
+        fields = record_fields(record)
+        ticket_id = fields.get("Ticket ID")
+        if not ticket_id:
+            return
+        email = _normalize(fields.get("Customer Email"))
+        status = _normalize(fields.get("Status"))
+        key = (-_updated_ms(fields), ticket_id)
+        summary = {
+            "ticketId": ticket_id,
+            "subject": fields.get("Subject") or "",
+            "status": status,
+            "priority": fields.get("Priority") or "",
+            "updatedAt": fields.get("Updated At") or fields.get("Created At") or "",
+        }
+        with self._lock:
+            self._remove(ticket_id)
+            if not email:
+                return
+            self.entries[ticket_id] = (email, status, key, summary)
+            for list_key in ((email, None), (email, status)):
+                insort(self.lists.setdefault(list_key, []), key)
+
+    def remove(self, ticket_id):
+        with self._lock:
+            self._remove(ticket_id)
+
+    def _remove(self, ticket_id):
+        entry = self.entries.pop(ticket_id, None)
+        if entry is None:
+            return
+        email, status, key, _ = entry
+        for list_key in ((email, None), (email, status)):
+            keys = self.lists[list_key]
+            i = bisect_right(keys, key) - 1
+            del keys[i]
+            if not keys:
+                del self.lists[list_key]
+
+    def page(self, email, status=None, limit=10, cursor=None):
+        """``(summaries, next_cursor)``; next_cursor is None on the last page"""
+        after = decode_cursor(cursor) if cursor else None
+        with self._lock:
+            keys = self.lists.get((_normalize(email), _normalize(status) or None), [])
+            start = bisect_right(keys, after) if after else 0
+            page = keys[start:start + limit]
+            summaries = [dict(self.entries[ticket_id][3]) for _, ticket_id in page]
+            more = start + limit < len(keys)
+        return summaries, encode_cursor(page[-1]) if more and page else None
+
+
+class StoreCustomerIndex(BackgroundIndex):
+    """A ``CustomerIndex`` over a ticket store, rebuilt in the background every ``refresh_s``"""
+
+    def build(self, records):
+        return CustomerIndex.from_records(records)
+
+    def apply(self, index, record):
+        index.upsert(record)
+
+    def page(self, email, status=None, limit=10, cursor=None):
+        return self.require().page(email, status, limit, cursor)
+
+
+def list_params(item):
+    """Status filter, limit and cursor of a ``list`` request (top level or ``body``)"""
+    body = item.get("body") or {}
+
+    def get(name):
+        return item.get(name) or body.get(name) or ""
+
+    try:
+        limit = max(1, min(int(get("limit") or 10), 100))
+    except (TypeError, ValueError):
+        limit = 10
+    return {
+        "statusFilter": str(get("statusFilter") or get("status")).lower(),
+        "limit": limit,
+        "cursor": str(get("cursor")),
+    }
+
+
+def list_response(params, tickets, next_cursor, message=""):
+    """Response of the ``list`` action, shaped like the other actions' responses"""
+    status_filter = params.get("statusFilter") or ""
+    kind = f"{status_filter.replace('_', ' ')} tickets" if status_filter else "tickets"
+    if not message:
+        if tickets:
+            more = " There are more; ask me for the next page." if next_cursor else ""
+            message = f"Here are your {kind}, most recently updated first.{more}"
+        else:
+            message = f"I could not find any {kind} for {params.get('customerEmail') or 'that email'}."
+    return {
+        "action": "list",
+        "customerEmail": params.get("customerEmail") or "",
+        "status": "ok" if tickets else "not_found",
+        "tickets": tickets,
+        "nextCursor": next_cursor or "",
+        "messageForUser": message,
+    }
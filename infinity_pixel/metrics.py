@@ -0,0 +1,473 @@
+"""
+Low-overhead metrics with a Prometheus text endpoint.
+
+Counters and histograms are sharded per thread: the hot path only touches
+the calling thread's own cell, so recording takes no lock, and a scrape sums
+the shards. When a thread exits its cell is folded into a shared base cell,
+so servers that start a thread per request keep one cell per live thread.
+Histograms use HDR-style log-linear buckets (exact below ``2**sig_bits``
+units, then ``2**(sig_bits-1)`` sub-buckets per power of two, i.e. under 2%
+relative error with the default 7 bits) and are exported as Prometheus
+summaries with p50/p90/p99 quantiles. The quantiles cover every observation
+since the process started and do not decay; for recent latency use
+``rate()`` of ``_sum``/``_count``, or compare scrapes.
+
+Components that share a registry but must stay apart (one backend per
+tenant) register through ``registry.labelled(tenant="acme")``, which puts
+the constant label in front of each metric's own labels.
+
+Usage:
+    registry = Registry()
+    requests = registry.counter("ticket_requests_total", "Ticket requests", ["action"])
+    requests.labels("create").inc()
+    registry.labelled(tenant="acme").counter("ticket_requests_total", "Ticket requests", ["action"])
+    server = serve(registry, port=9464)   # GET /metrics
+
+    python -m infinity_pixel.metrics --port 9464   # demo endpoint
+"""
+
+import argparse
+import math
+import sys
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class _Owner:
+    """Lives in a thread's local storage; collected when the thread exits"""
+
+    __slots__ = ("__weakref__",)
+
+
+class _Sharded:
+    """Per-thread cells; ``_cell()`` returns the calling thread's cell"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._cells = {}  # id -> cell of a live thread
+        self._base = self._new_cell()  # cells of threads that have exited
+        self._lock = threading.Lock()
+
+    def _new_cell(self):
+        raise NotImplementedError
+
+    def _fold(self, base, cell):
+        raise NotImplementedError
+
+    def _cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = self._new_cell()
+            owner = self._local.owner = _Owner()
+            weakref.finalize(owner, self._retire, cell)
+            with self._lock:
+                self._cells[id(cell)] = cell
+            return cell
+
+    def _retire(self, cell):
+        with self._lock:
+            del self._cells[id(cell)]
+            self._fold(self._base, cell)
+
+    def _read(self, fn):
+        """``fn(cells)`` over the live cells and the base, with no cell folded in between"""
+        with self._lock:
+            return fn([*self._cells.values(), self._base])
+
+
+class CounterValue(_Sharded):
+    """Monotonic counter for one label set"""
+
+    def _new_cell(self):
+        return [0]
+
+    def _fold(self, base, cell):
+        base[0] += cell[0]
+
+    def inc(self, amount=1):
+        self._cell()[0] += amount
+
+    @property
+    def value(self):
+        return self._read(lambda cells: sum(cell[0] for cell in cells))
+
+
+class GaugeValue:
+    """Settable value, or a callback evaluated at scrape time"""
+
+    def __init__(self, fn=None):
+        self._value = 0
+        self._fn = fn
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    @property
+    def value(self):
+        return self._fn() if self._fn else self._value
+
+
+class HistogramValue(_Sharded):
+    """HDR-style log-linear histogram for one label set"""
+
+    def __init__(self, unit=0.001, sig_bits=7):
+        super().__init__()
+        self.unit = unit  # recorded values are stored as integer multiples of this
+        self.sig_bits = sig_bits
+
+    def _new_cell(self):
+        return [{}, 0, 0.0]  # bucket counts, count, sum
+
+    def _fold(self, base, cell):
+        counts = base[0]
+        for i, c in list(cell[0].items()):  # a live thread may be adding buckets
+            counts[i] = counts.get(i, 0) + c
+        base[1] += cell[1]
+        base[2] += cell[2]
+
+    def bucket_index(self, x):
+        sub = 1 << self.sig_bits
+        if x < sub:
+            return x
+        e = x.bit_length() - self.sig_bits
+        half = sub >> 1
+        return sub + (e - 1) * half + ((x >> e) - half)
+
+    def bucket_bounds(self, index):
+        """Inclusive ``(low, high)`` integer range of a bucket"""
+        sub = 1 << self.sig_bits
+        if index < sub:
+            return index, index
+        half = sub >> 1
+        e, m = divmod(index - sub, half)
+        e += 1
+        m += half
+        return m << e, ((m + 1) << e) - 1
+
+    def observe(self, value):
+        cell = self._cell()
+        x = int(value / self.unit) if value > 0 else 0
+        i = self.bucket_index(x)
+        counts = cell[0]
+        counts[i] = counts.get(i, 0) + 1
+        cell[1] += 1
+        cell[2] += value
+
+    def merged(self):
+        merged = self._new_cell()
+
+        def fold(cells):
+            for cell in cells:
+                self._fold(merged, cell)
+
+        self._read(fold)
+        return tuple(merged)
+
+    @property
+    def count(self):
+        return self.merged()[1]
+
+    def quantiles(self, qs=QUANTILES):
+        counts, n, _ = self.merged()
+        if not n:
+            return {q: math.nan for q in qs}
+        result = {}
+        ordered = sorted(counts.items())
+        for q in qs:
+            rank = max(1, math.ceil(q * n))
+            seen = 0
+            for i, c in ordered:
+                seen += c
+                if seen >= rank:
+                    low, high = self.bucket_bounds(i)
+                    result[q] = (low + high) / 2 * self.unit
+                    break
+        return result
+
+    def quantile(self, q):
+        return self.quantiles((q,))[q]
+
+
+class Metric:
+    """A metric family: name, help text and one value per label set"""
+
+    type = "untyped"
+
+    def __init__(self, name, help, labels=(), **options):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.options = options
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _make(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._make())
+        return child
+
+    def samples(self):
+        """``(suffix, labels dict, value)`` tuples for exposition"""
+        for key, child in sorted(self._children.items()):
+            yield from self._child_samples(dict(zip(self.label_names, key)), child)
+
+    def _child_samples(self, labels, child):
+        yield "", labels, child.value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _make(self):
+        return CounterValue()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def _make(self):
+        return GaugeValue(self.options.get("fn"))
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+
+class Histogram(Metric):
+    """Exported as a Prometheus summary (quantiles since start, _sum, _count)"""
+
+    type = "summary"
+
+    def _make(self):
+        return HistogramValue(self.options.get("unit", 0.001), self.options.get("sig_bits", 7))
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _child_samples(self, labels, child):
+        _, n, total = child.merged()
+        for q, v in child.quantiles().items():
+            yield "", {**labels, "quantile": str(q)}, v
+        yield "_sum", labels, total
+        yield "_count", labels, n
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+class Registry:
+    """Collection of metric families rendered together"""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, cls, name, help, labels, options):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labels, **options)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"metric {name!r} already registered as {metric.type}")
+            elif metric.label_names != tuple(labels):
+                raise ValueError(f"metric {name!r} already registered with labels {metric.label_names}, "
+                                 f"not {tuple(labels)}")
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter, name, help, labels, {})
+
+    def gauge(self, name, help, labels=(), fn=None):
+        return self._add(Gauge, name, help, labels, {"fn": fn})
+
+    def histogram(self, name, help, labels=(), unit=0.001, sig_bits=7):
+        return self._add(Histogram, name, help, labels, {"unit": unit, "sig_bits": sig_bits})
+
+    def get(self, name):
+        return self.metrics[name]
+
+    def labelled(self, **labels):
+        """A view registering every metric with these constant labels first"""
+        return LabelledRegistry(self, **labels)
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4"""
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{name}{suffix}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class _Bound:
+    """A metric family seen through a ``LabelledRegistry``: ``labels`` takes only the metric's own labels"""
+
+    def __init__(self, metric, values):
+        self.metric = metric
+        self.values = values
+
+    def labels(self, *values):
+        return self.metric.labels(*self.values, *values)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class LabelledRegistry:
+    """
+    A ``Registry`` view adding constant labels to the metrics registered through it.
+
+    A callback gauge keeps its own callback per label set; ``close`` drops
+    them (the gauges then read 0), so the registry holds no reference to a
+    component that has been shut down.
+    """
+
+    def __init__(self, registry, **labels):
+        self.registry = registry
+        self.names = tuple(labels)
+        self.values = tuple(str(v) for v in labels.values())
+        self._callbacks = []
+
+    def counter(self, name, help, labels=()):
+        return _Bound(self.registry.counter(name, help, (*self.names, *labels)), self.values)
+
+    def gauge(self, name, help, labels=(), fn=None):
+        bound = _Bound(self.registry.gauge(name, help, (*self.names, *labels)), self.values)
+        if fn is not None:
+            child = bound.labels()
+            child._fn = fn
+            self._callbacks.append(child)
+        return bound
+
+    def histogram(self, name, help, labels=(), unit=0.001, sig_bits=7):
+        return _Bound(self.registry.histogram(name, help, (*self.names, *labels), unit, sig_bits), self.values)
+
+    def labelled(self, **labels):
+        return LabelledRegistry(self.registry, **dict(zip(self.names, self.values)), **labels)
+
+    def get(self, name):
+        return self.registry.get(name)
+
+    def render(self):
+        return self.registry.render()
+
+    def close(self):
+        for child in self._callbacks:
+            child._fn = None
+            child.set(0)
+        self._callbacks = []
+
+
+_default = Registry()
+
+
+def get_registry():
+    """The process-wide registry used when none is passed explicitly"""
+    return _default
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(registry, host="127.0.0.1", port=9464):
+    """Serve ``/metrics`` from a background thread; returns the server (``.shutdown()`` stops it)"""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a demo /metrics endpoint for the ticket backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9464)
+    args = parser.parse_args(argv)
+
+    from .backend import TicketBackend
+    from .store import InMemoryTicketStore
+
+    registry = Registry()
+    backend = TicketBackend(InMemoryTicketStore(), registry=registry)
+    created = backend.handle({"action": "create", "name": "Demo", "email": "demo@example.com",
+                              "subject": "Demo", "description": "Metrics demo"})
+    backend.handle({"action": "status", "ticketId": created["ticketId"]})
+    server = serve(registry, args.host, args.port)
+    print(f"✅ Serving http://{args.host}:{server.server_port}/metrics (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
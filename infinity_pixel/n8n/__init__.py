@@ -0,0 +1,7 @@
+"""
+Offline tooling for the n8n workflow exports in ``workflows/``.
+"""
+
+from .graph import Edge, Node, Workflow, load_workflow, load_workflows
+
+__all__ = ["Edge", "Node", "Workflow", "load_workflow", "load_workflows"]
@@ -0,0 +1,110 @@
+"""
+Python stand-ins for the JavaScript code nodes in our workflows.
+
+The simulator has no JavaScript engine; a code node runs the stub
+registered under its name. Stubs take ``(items, run)`` where ``items`` are
+``{"json": ...}`` dicts and ``run`` gives access to earlier node outputs, and
+return the output items. Ticket logic lives in ``infinity_pixel.tickets``.
+"""
+
+from .. import tickets
+
+
+def _json(items):
+    return [item.get("json") or {} for item in items]
+
+
+def normalize_and_validate(items, run):
+    return [{"json": tickets.normalize_action(_json(items)[0])}]
+
+
+def code_in_javascript(items, run):
+    return [{"json": tickets.normalize_inputs(j)} for j in _json(items)]
+
+
+def prepare_create(items, run):
+    return [{"json": tickets.prepare_create(j, ts_ms=run.now_ms, rng=run.rng)} for j in _json(items)]
+
+
+def build_status_response(items, run):
+    if not items:
+        return [{"json": tickets.not_found_response("status")}]
+    return [{"json": tickets.build_status_response(j)} for j in _json(items)]
+
+
+def _request(run):
+    """The normalized request, standing in for n8n's paired-item lookup"""
+    first = run.first_json("Code in JavaScript")
+    return first or {}
+
+
+def prepare_update(items, run):
+    if not items:
+        return [{"json": tickets.not_found_response("update")}]
+    description = _request(run).get("description", "")
+    return [{"json": tickets.prepare_update(j, j.get("description") or description, run.now_ms)}
+            for j in _json(items)]
+
+
+def prepare_close(items, run):
+    if not items:
+        return [{"json": tickets.not_found_response("close")}]
+    return [{"json": tickets.prepare_close(j, run.now_ms)} for j in _json(items)]
+
+
+def _response(action):
+    def build(items, run):
+        out = []
+        for j in _json(items):
+            if action != "create" and not j.get("ticketId") and not (j.get("fields") or {}).get("Ticket ID"):
+                prepared = run.first_json(f"Code - Prepare {action.title()}")
+                j = {**j, "ticketId": prepared.get("ticketId", "")}
+            out.append({"json": tickets.build_action_response(action, j)})
+        return out
+    return build
+
+
+def _slack(event):
+    def build(items, run):
+        return [{"json": tickets.slack_message(event, j)} for j in _json(items)[:1]]
+    return build
+
+
+def build_email_content(items, run):
+    item = _json(items)[0]
+    event = (item.get("event") or "").lower()
+    event = event if event in ("created", "updated", "closed") else "updated"
+    prefix = {"created": "Ticket created", "updated": "Ticket updated", "closed": "Ticket closed"}[event]
+    ticket_id = item.get("ticketId") or "unknown"
+    body = (
+        f"Hi {item.get('customerName') or 'Customer'},\n\n"
+        f"{item.get('messageForUser') or 'Here is an update on your ticket.'}\n\n"
+        f"Ticket ID: {ticket_id}\nSubject: {item.get('subject') or 'Ticket update'}\n"
+        f"Priority: {item.get('priority') or 'medium'}\nStatus: {item.get('status') or 'open'}\n"
+        f"Channel: {item.get('channel') or 'chat'}\n\n"
+        "If you have more details to add, just reply to this email or chat with us.\n\n"
+        "Thanks,\nQuantum-Ops Support"
+    )
+    return [{"json": {**item, "event": event, "emailSubject": f"{prefix} | {ticket_id}", "emailBody": body}}]
+
+
+def passthrough(items, run):
+    return items
+
+
+DEFAULT_STUBS = {
+    "Normalize & Validate Action": normalize_and_validate,
+    "Code in JavaScript": code_in_javascript,
+    "Code - Prepare Create": prepare_create,
+    "Code - Build Status Response": build_status_response,
+    "Code - Prepare Update": prepare_update,
+    "Code - Prepare Close": prepare_close,
+    "Code - Build Create Response": _response("create"),
+    "Code - Build Update Response1": _response("update"),
+    "Code - Build Close Response": _response("close"),
+    "Code - Prepare Slack Message (Create)": _slack("create"),
+    "Code - Prepare Slack Message (Update)": _slack("update"),
+    "Code - Prepare Slack Message (Close)": _slack("close"),
+    "Code - Build Email Content": build_email_content,
+    "Slack Debug": passthrough,
+}
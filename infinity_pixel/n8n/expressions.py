@@ -0,0 +1,329 @@
+"""
+Evaluator for the subset of n8n expressions used in our workflows.
+
+Parameters starting with ``=`` are expressions: ``{{ ... }}`` segments are
+evaluated and spliced into the surrounding text, and a parameter that is a
+single ``{{ ... }}`` segment keeps the raw value (object, bool, ...).
+
+Supported JavaScript: literals (strings, numbers, ``true``/``false``/
+``null``/``undefined``, object and array literals), ``$json``, ``$('Node')``
+with ``.item``/``.first()``/``.last()``/``.all()``, member access with
+``.``/``?.``/``[]``, the string methods ``toLowerCase``/``toUpperCase``/
+``trim``, ``!``, ``===``/``!==``/``==``/``!=``, ``&&``, ``||``, ``??`` and
+parentheses. Anything else raises ``ExpressionError``.
+"""
+
+import re
+
+UNDEFINED = None
+
+
+class ExpressionError(Exception):
+    """Raised for expressions outside the supported subset"""
+
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+      (?P<number>\d+(?:\.\d+)?)
+    | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+    | (?P<name>[A-Za-z_$][A-Za-z0-9_$]*)
+    | (?P<op>===|!==|==|!=|\?\?|\?\.|\|\||&&|[.()\[\]{}:,!])
+    )""", re.VERBOSE)
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "'": "'", '"': '"', "\\": "\\"}
+
+
+def _unquote(literal):
+    body = literal[1:-1]
+    return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(1)), body)
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise ExpressionError(f"unexpected input at {text[pos:pos + 20]!r}")
+        kind = m.lastgroup
+        tokens.append((kind, m.group(kind)))
+        pos = m.end()
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+    tokens.append(("end", None))
+    return tokens
+
+
+def truthy(value):
+    """JavaScript truthiness (empty containers are truthy, unlike Python)"""
+    if value is None or value is False:
+        return False
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value != 0
+    if isinstance(value, str):
+        return value != ""
+    return True
+
+
+class NodeRef:
+    """Value of ``$('Node Name')`` inside an expression"""
+
+    def __init__(self, items, index=0):
+        self._items = items or []
+        self._index = index
+
+    @property
+    def item(self):
+        if not self._items:
+            return None
+        return self._items[min(self._index, len(self._items) - 1)]
+
+    def first(self):
+        return self._items[0] if self._items else None
+
+    def last(self):
+        return self._items[-1] if self._items else None
+
+    def all(self):
+        return list(self._items)
+
+
+class Context:
+    """Data an expression can see while a node runs"""
+
+    def __init__(self, json=None, node_items=None, index=0):
+        self.json = json or {}
+        self.node_items = node_items or {}
+        self.index = index
+
+    def node(self, name):
+        if name not in self.node_items:
+            raise ExpressionError(f"node {name!r} has not run yet")
+        return NodeRef(self.node_items[name], self.index)
+
+
+def _member(obj, key, optional):
+    if obj is None:
+        if optional:
+            return UNDEFINED
+        raise ExpressionError(f"cannot read {key!r} of undefined")
+    if isinstance(obj, dict):
+        return obj.get(key)
+    if isinstance(obj, list) and key == "length":
+        return len(obj)
+    if isinstance(obj, str) and key == "length":
+        return len(obj)
+    if isinstance(obj, list) and isinstance(key, int):
+        return obj[key] if 0 <= key < len(obj) else UNDEFINED
+    attr = getattr(obj, key, UNDEFINED) if not str(key).startswith("_") else UNDEFINED
+    return attr
+
+
+_STRING_METHODS = {
+    "toLowerCase": str.lower,
+    "toUpperCase": str.upper,
+    "trim": str.strip,
+}
+
+
+class _Parser:
+    """Pratt-style parser compiling tokens into a Python closure"""
+
+    BINARY = {"??": 1, "||": 2, "&&": 3, "===": 4, "!==": 4, "==": 4, "!=": 4}
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def take(self, value=None):
+        kind, tok = self.tokens[self.pos]
+        if value is not None and tok != value:
+            raise ExpressionError(f"expected {value!r}, got {tok!r}")
+        self.pos += 1
+        return kind, tok
+
+    def parse(self):
+        fn = self.expression(0)
+        if self.peek()[0] != "end":
+            raise ExpressionError(f"unexpected token {self.peek()[1]!r}")
+        return fn
+
+    def expression(self, min_prec):
+        left = self.unary()
+        while True:
+            kind, tok = self.peek()
+            prec = self.BINARY.get(tok) if kind == "op" else None
+            if prec is None or prec < min_prec:
+                return left
+            self.take()
+            right = self.expression(prec + 1)
+            left = self._binary(tok, left, right)
+
+    @staticmethod
+    def _binary(op, left, right):
+        if op == "||":
+            return lambda ctx: (lambda v: v if truthy(v) else right(ctx))(left(ctx))
+        if op == "&&":
+            return lambda ctx: (lambda v: right(ctx) if truthy(v) else v)(left(ctx))
+        if op == "??":
+            return lambda ctx: (lambda v: right(ctx) if v is None else v)(left(ctx))
+        if op in ("===", "=="):
+            return lambda ctx: left(ctx) == right(ctx)
+        return lambda ctx: left(ctx) != right(ctx)
+
+    def unary(self):
+        kind, tok = self.peek()
+        if kind == "op" and tok == "!":
+            self.take()
+            operand = self.unary()
+            return lambda ctx: not truthy(operand(ctx))
+        return self.postfix(self.primary())
+
+    def primary(self):
+        kind, tok = self.take()
+        if kind == "number":
+            value = float(tok) if "." in tok else int(tok)
+            return lambda ctx: value
+        if kind == "string":
+            value = _unquote(tok)
+            return lambda ctx: value
+        if kind == "name":
+            constants = {"true": True, "false": False, "null": None, "undefined": None}
+            if tok in constants:
+                value = constants[tok]
+                return lambda ctx: value
+            if tok == "$json":
+                return lambda ctx: ctx.json
+            if tok == "$":
+                self.take("(")
+                name = self.expression(0)
+                self.take(")")
+                return lambda ctx: ctx.node(name(ctx))
+            raise ExpressionError(f"unsupported identifier {tok!r}")
+        if tok == "(":
+            inner = self.expression(0)
+            self.take(")")
+            return inner
+        if tok == "{":
+            return self._object()
+        if tok == "[":
+            return self._array()
+        raise ExpressionError(f"unexpected token {tok!r}")
+
+    def _object(self):
+        entries = []
+        while self.peek()[1] != "}":
+            kind, key = self.take()
+            if kind == "string":
+                key = _unquote(key)
+            elif kind != "name":
+                raise ExpressionError(f"bad object key {key!r}")
+            self.take(":")
+            entries.append((key, self.expression(0)))
+            if self.peek()[1] == ",":
+                self.take(",")
+        self.take("}")
+        return lambda ctx: {k: v(ctx) for k, v in entries}
+
+    def _array(self):
+        values = []
+        while self.peek()[1] != "]":
+            values.append(self.expression(0))
+            if self.peek()[1] == ",":
+                self.take(",")
+        self.take("]")
+        return lambda ctx: [v(ctx) for v in values]
+
+    def postfix(self, target):
+        while True:
+            kind, tok = self.peek()
+            if kind != "op" or tok not in (".", "?.", "["):
+                return target
+            self.take()
+            optional = tok == "?."
+            if tok == "[":
+                key = self.expression(0)
+                self.take("]")
+            else:
+                _, name = self.take()
+                key = (lambda n: lambda ctx: n)(name)
+            if self.peek()[1] == "(":
+                self.take("(")
+                self.take(")")
+                target = self._call(target, key, optional)
+            else:
+                target = (lambda t, k, o: lambda ctx: _member(t(ctx), k(ctx), o))(target, key, optional)
+
+    @staticmethod
+    def _call(target, key, optional):
+        def call(ctx):
+            obj = target(ctx)
+            name = key(ctx)
+            if obj is None and optional:
+                return UNDEFINED
+            if isinstance(obj, str) and name in _STRING_METHODS:
+                return _STRING_METHODS[name](obj)
+            if isinstance(obj, NodeRef) and name in ("first", "last", "all"):
+                return getattr(obj, name)()
+            raise ExpressionError(f"unsupported call {name}()")
+        return call
+
+
+_CACHE = {}
+
+
+def compile_expression(source):
+    """Compile the body of one ``{{ }}`` segment"""
+    fn = _CACHE.get(source)
+    if fn is None:
+        fn = _CACHE[source] = _Parser(_tokenize(source)).parse()
+    return fn
+
+
+def _to_text(value):
+    if value is None:
+        return ""
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    return str(value)
+
+
+def _segments(template):
+    """Split a template into literal text and ``{{ }}`` expression bodies"""
+    parts = []
+    pos = 0
+    while True:
+        start = template.find("{{", pos)
+        if start < 0:
+            parts.append(("text", template[pos:]))
+            return parts
+        end = template.find("}}", start + 2)
+        # Object literals end in "} }}"; extend to the last "}}" before the next "{{"
+        while end >= 0 and template.startswith("}}", end + 1) and template.find("{{", start + 2, end + 1) < 0:
+            end += 1
+        if end < 0:
+            raise ExpressionError(f"unterminated expression in {template!r}")
+        parts.append(("text", template[pos:start]))
+        parts.append(("expr", template[start + 2:end]))
+        pos = end + 2
+
+
+def evaluate(value, ctx):
+    """Resolve a node parameter: expressions are evaluated, other values returned as-is"""
+    if isinstance(value, dict):
+        return {k: evaluate(v, ctx) for k, v in value.items()}
+    if isinstance(value, list):
+        return [evaluate(v, ctx) for v in value]
+    if not isinstance(value, str) or not value.startswith("="):
+        return value
+    parts = [p for p in _segments(value[1:]) if p != ("text", "")]
+    if len(parts) == 1 and parts[0][0] == "expr":
+        return compile_expression(parts[0][1])(ctx)
+    return "".join(text if kind == "text" else _to_text(compile_expression(text)(ctx))
+                   for kind, text in parts)
@@ -0,0 +1,173 @@
+"""
+Local fakes for the external services our workflows call.
+
+Each fake keeps its state in memory and returns ``(result, latency_ms)``;
+latencies are drawn from a configurable distribution so the simulator can
+model slow or noisy dependencies without sleeping.
+
+Latency specs (``parse_latency``):
+    "250"                 constant 250 ms
+    "uniform:100:400"     uniform between 100 and 400 ms
+    "lognormal:250:0.4"   log-normal with median 250 ms and sigma 0.4
+    "normal:250:50"       normal, clipped at 0
+"""
+
+import itertools
+import math
+import random
+import re
+
+
+class Latency:
+    """A latency distribution sampled with a seeded ``random.Random``"""
+
+    def __init__(self, kind="constant", a=0.0, b=0.0):
+        if kind not in ("constant", "uniform", "lognormal", "normal"):
+            raise ValueError(f"unknown latency distribution {kind!r}")
+        self.kind = kind
+        self.a = float(a)
+        self.b = float(b)
+
+    def sample(self, rng):
+        if self.kind == "constant":
+            return self.a
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(self.a), self.b)
+        return max(0.0, rng.gauss(self.a, self.b))
+
+    def __repr__(self):
+        return f"Latency({self.kind!r}, {self.a}, {self.b})"
+
+
+def parse_latency(spec):
+    """Parse a latency spec string (see module docstring)"""
+    if isinstance(spec, Latency):
+        return spec
+    if isinstance(spec, (int, float)):
+        return Latency("constant", spec)
+    parts = str(spec).split(":")
+    if len(parts) == 1:
+        return Latency("constant", parts[0])
+    return Latency(parts[0], *parts[1:3])
+
+
+class FakeService:
+    """Base class: latency sampling plus a log of every call"""
+
+    name = "service"
+
+    def __init__(self, latency=0, rng=None):
+        self.latency = parse_latency(latency)
+        self.rng = rng or random.Random(0)
+        self.calls = []
+
+    def _done(self, operation, result, **details):
+        ms = self.latency.sample(self.rng)
+        self.calls.append({"operation": operation, "latency_ms": ms, **details})
+        return result, ms
+
+
+_FORMULA = re.compile(r"^\{(?P<field>[^}]+)\}\s*=\s*'(?P<value>(?:[^'\\]|\\.)*)'$")
+
+
+class FakeAirtable(FakeService):
+    """In-memory Airtable table supporting create, search and update"""
+
+    name = "airtable"
+
+    def __init__(self, latency="lognormal:250:0.3", rng=None, records=None):
+        super().__init__(latency, rng)
+        self.records = {}
+        self._ids = itertools.count(1)
+        for fields in records or []:
+            self._insert(fields)
+
+    def _insert(self, fields):
+        record_id = f"rec{next(self._ids):014d}"
+        self.records[record_id] = {"id": record_id, "createdTime": "", "fields": dict(fields)}
+        return self.records[record_id]
+
+    def create(self, fields):
+        return self._done("create", dict(self._insert(fields)))
+
+    def search(self, formula, limit=None):
+        matches = list(self._filter(formula))
+        if limit:
+            matches = matches[:limit]
+        return self._done("search", [dict(r) for r in matches], formula=formula)
+
+    def update(self, record_id, fields):
+        record = self.records.get(record_id)
+        if record is None:
+            return self._done("update", None, record_id=record_id)
+        record["fields"].update(fields)
+        return self._done("update", dict(record), record_id=record_id)
+
+    def _filter(self, formula):
+        formula = (formula or "").strip()
+        if not formula:
+            return iter(self.records.values())
+        m = _FORMULA.match(formula)
+        if not m:
+            raise ValueError(f"unsupported filterByFormula {formula!r}")
+        field, value = m.group("field"), m.group("value").replace("\\'", "'")
+        return (r for r in self.records.values() if str(r["fields"].get(field, "")) == value)
+
+
+class FakeSlack(FakeService):
+    """Records chat.postMessage calls"""
+
+    name = "slack"
+
+    def __init__(self, latency="lognormal:350:0.3", rng=None):
+        super().__init__(latency, rng)
+        self.messages = []
+
+    def post_message(self, channel, text, blocks=None):
+        self.messages.append({"channel": channel, "text": text, "blocks": blocks})
+        ts = f"{len(self.messages)}.000000"
+        return self._done("chat.postMessage", {"ok": True, "channel": channel, "ts": ts})
+
+
+class FakeHttp(FakeService):
+    """Outbound HTTP: routes URLs to handler callables, echoing by default"""
+
+    name = "http"
+
+    def __init__(self, latency="lognormal:400:0.3", rng=None, routes=None):
+        super().__init__(latency, rng)
+        self.routes = dict(routes or {})
+
+    def request(self, method, url, body=None):
+        handler = self.routes.get(url)
+        result = handler(body) if handler else {"ok": True}
+        return self._done(method, result, url=url, body=body)
+
+
+class FakeEmail(FakeService):
+    """Collects sent emails"""
+
+    name = "email"
+
+    def __init__(self, latency="lognormal:600:0.3", rng=None):
+        super().__init__(latency, rng)
+        self.outbox = []
+
+    def send(self, to, subject, text, sender=None):
+        self.outbox.append({"to": to, "subject": subject, "text": text, "from": sender})
+        return self._done("send", {"accepted": [to]}, to=to)
+
+
+def default_services(seed=0, **latencies):
+    """One fake per service, sharing a seeded RNG; ``latencies`` overrides per name"""
+    rng = random.Random(seed)
+    classes = {"airtable": FakeAirtable, "slack": FakeSlack, "http": FakeHttp, "email": FakeEmail}
+    services = {}
+    for name, cls in classes.items():
+        kwargs = {"rng": rng}
+        if name in latencies:
+            kwargs["latency"] = latencies[name]
+        services[name] = cls(**kwargs)
+    return services
@@ -0,0 +1,163 @@
+"""
+Graph model of n8n workflow exports.
+
+Loads the JSON files in ``workflows/`` into nodes and typed edges and
+reproduces n8n's ``executionOrder: v1`` scheduling: a node's children run
+branch by branch, top-most (then left-most) on the canvas first, and each
+branch completes before the next one starts.
+"""
+
+import glob
+import json
+import os
+from dataclasses import dataclass, field
+
+WORKFLOWS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "workflows")
+
+TRIGGER_TYPES = {
+    "webhook",
+    "executeWorkflowTrigger",
+    "chatTrigger",
+    "googleDriveTrigger",
+    "manualTrigger",
+    "scheduleTrigger",
+}
+IGNORED_TYPES = {"stickyNote"}
+
+
+@dataclass
+class Node:
+    name: str
+    type: str
+    parameters: dict = field(default_factory=dict)
+    position: tuple = (0, 0)
+    type_version: float = 1
+    disabled: bool = False
+    always_output_data: bool = False
+
+    @property
+    def kind(self):
+        """Short node type, e.g. ``airtable`` for ``n8n-nodes-base.airtable``"""
+        return self.type.rsplit(".", 1)[-1]
+
+    @property
+    def is_trigger(self):
+        return self.kind in TRIGGER_TYPES
+
+    @property
+    def sort_key(self):
+        x, y = self.position
+        return (y, x)
+
+
+@dataclass(frozen=True)
+class Edge:
+    source: str
+    target: str
+    kind: str = "main"
+    output: int = 0
+    input: int = 0
+
+
+class Workflow:
+    """A single workflow export: nodes keyed by name plus connections"""
+
+    def __init__(self, name, nodes, edges, settings=None, path=None):
+        self.name = name
+        self.nodes = {n.name: n for n in nodes}
+        self.edges = list(edges)
+        self.settings = settings or {}
+        self.path = path
+        self._out = {}
+        self._in = {}
+        for edge in self.edges:
+            self._out.setdefault(edge.source, []).append(edge)
+            self._in.setdefault(edge.target, []).append(edge)
+
+    @classmethod
+    def from_dict(cls, data, path=None):
+        nodes = [
+            Node(
+                name=n["name"],
+                type=n.get("type", ""),
+                parameters=n.get("parameters") or {},
+                position=tuple(n.get("position") or (0, 0)),
+                type_version=n.get("typeVersion", 1),
+                disabled=bool(n.get("disabled")),
+                always_output_data=bool(n.get("alwaysOutputData")),
+            )
+            for n in data.get("nodes", [])
+        ]
+        edges = []
+        for source, kinds in (data.get("connections") or {}).items():
+            for kind, outputs in kinds.items():
+                for output, targets in enumerate(outputs or []):
+                    for target in targets or []:
+                        edges.append(Edge(source, target["node"], kind, output, target.get("index", 0)))
+        return cls(data.get("name") or path or "workflow", nodes, edges, data.get("settings"), path)
+
+    def __repr__(self):
+        return f"<Workflow {self.name!r} nodes={len(self.nodes)}>"
+
+    def active_nodes(self):
+        """Nodes that take part in execution (no sticky notes or disabled nodes)"""
+        return [n for n in self.nodes.values() if n.kind not in IGNORED_TYPES and not n.disabled]
+
+    def triggers(self):
+        return sorted((n for n in self.active_nodes() if n.is_trigger), key=lambda n: n.sort_key)
+
+    def out_edges(self, name, kind="main"):
+        return [e for e in self._out.get(name, []) if kind is None or e.kind == kind]
+
+    def in_edges(self, name, kind="main"):
+        return [e for e in self._in.get(name, []) if kind is None or e.kind == kind]
+
+    def children(self, name, output=None):
+        """Main-connection children, ordered the way n8n v1 runs them"""
+        edges = [e for e in self.out_edges(name) if output is None or e.output == output]
+        targets = [self.nodes[e.target] for e in edges if e.target in self.nodes]
+        return sorted({n.name: n for n in targets}.values(), key=lambda n: n.sort_key)
+
+    def parents(self, name):
+        return [self.nodes[e.source] for e in self.in_edges(name) if e.source in self.nodes]
+
+    def sub_nodes(self, name):
+        """AI sub-nodes (models, memory, tools, embeddings...) attached to a node"""
+        return [self.nodes[e.source] for e in self.in_edges(name, kind=None)
+                if e.kind != "main" and e.source in self.nodes]
+
+    def execution_order(self, start, choose=None):
+        """
+        Names of the nodes executed from ``start``, in n8n v1 order.
+
+        ``choose(node)`` returns the output index a branching node takes
+        (``None`` follows every output); by default every output is followed.
+        """
+        order = []
+        seen = set()
+        stack = [start]
+        while stack:
+            name = stack.pop()
+            if name in seen or name not in self.nodes:
+                continue
+            node = self.nodes[name]
+            if node.disabled:
+                continue
+            seen.add(name)
+            order.append(name)
+            output = choose(node) if choose else None
+            # Push in reverse so the top-most child runs (and finishes) first
+            for child in reversed(self.children(name, output)):
+                stack.append(child.name)
+        return order
+
+
+def load_workflow(path):
+    """Load one workflow export from disk"""
+    with open(path, encoding="utf-8") as f:
+        return Workflow.from_dict(json.load(f), path=path)
+
+
+def load_workflows(directory=WORKFLOWS_DIR):
+    """Load every ``*.json`` workflow export in a directory, sorted by file name"""
+    return [load_workflow(p) for p in sorted(glob.glob(os.path.join(directory, "*.json")))]
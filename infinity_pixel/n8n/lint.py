@@ -0,0 +1,489 @@
+"""
+Static performance linter for the n8n workflow exports.
+
+Loads every workflow in ``workflows/`` into a graph and reports:
+
+* per-action latency estimates from configurable per-node costs, with the
+  chain of sequential external calls on the response path
+* ``redundant-lookup``       identical Airtable searches in one workflow
+* ``blocking-notification``  Slack/email/notify calls that run before the
+                             webhook response is sent (error)
+* ``duplicated-subgraph``    identical node chains inside a workflow
+* ``duplicated-workflow``    near-identical workflow files that have diverged
+* ``polling-trigger``        triggers that poll more often than every 15 minutes
+* ``latency-budget``         actions whose estimated response time is over
+                             budget (error)
+
+Usage:
+    python -m infinity_pixel.n8n.lint [workflows/] [--costs costs.json]
+        [--budget-ms 1500] [--format text|json] [--fail-on warning]
+        [--baseline lint-baseline.json] [--write-baseline]
+
+``costs.json`` maps node types (``airtable``) or node names
+(``Airtable - Create Ticket``) to milliseconds; node names win.
+``--baseline`` lists findings already known (written with
+``--write-baseline``): they are still reported, marked ``baseline``, but
+only new findings count towards ``--fail-on``, so CI fails on hazards a
+change introduces.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass, field
+
+from .graph import WORKFLOWS_DIR, load_workflow, load_workflows
+
+# Rough p50 costs of a single execution, in milliseconds
+DEFAULT_COSTS_MS = {
+    "airtable": 250,
+    "slack": 350,
+    "httpRequest": 400,
+    "httpRequestTool": 400,
+    "email": 600,
+    "emailSend": 600,
+    "googleDrive": 500,
+    "googleDriveTrigger": 300,
+    "lmChatOpenAi": 1500,
+    "embeddingsOpenAi": 200,
+    "vectorStorePinecone": 150,
+    "toolVectorStore": 5,
+    "toolWorkflow": 50,
+    "executeWorkflow": 50,
+    "agent": 10,
+    "code": 5,
+    "set": 1,
+    "switch": 1,
+    "if": 1,
+    "respondToWebhook": 1,
+}
+
+EXTERNAL_KINDS = {
+    "airtable", "slack", "httpRequest", "httpRequestTool", "email", "emailSend",
+    "googleDrive", "lmChatOpenAi", "embeddingsOpenAi", "vectorStorePinecone",
+}
+NOTIFICATION_KINDS = {"slack", "email", "emailSend"}
+BRANCHING_KINDS = {"if"}
+SEVERITIES = ["info", "warning", "error"]
+MAX_VARIANTS = 16
+
+
+@dataclass
+class Finding:
+    rule: str
+    severity: str
+    workflow: str
+    message: str
+    nodes: list = field(default_factory=list)
+    baseline: bool = False
+
+    def key(self):
+        return [self.rule, self.workflow, sorted(self.nodes)]
+
+
+@dataclass
+class ActionEstimate:
+    workflow: str
+    action: str
+    trigger: str
+    response_ms: float
+    total_ms: float
+    response_calls: list = field(default_factory=list)
+    deferred_calls: list = field(default_factory=list)
+    variants: int = 1
+
+
+@dataclass
+class Report:
+    findings: list = field(default_factory=list)
+    estimates: list = field(default_factory=list)
+
+    def worst_severity(self):
+        """The most severe finding not in the baseline"""
+        levels = [SEVERITIES.index(f.severity) for f in self.findings if not f.baseline]
+        return SEVERITIES[max(levels)] if levels else None
+
+    def apply_baseline(self, keys):
+        known = {json.dumps(k) for k in keys}
+        for f in self.findings:
+            f.baseline = json.dumps(f.key()) in known
+
+
+def label(workflow):
+    """Identify a workflow by file name (several exports share a workflow name)"""
+    return os.path.basename(workflow.path) if workflow.path else workflow.name
+
+
+def is_notification(node):
+    """Outbound notifications: Slack, email, or an HTTP call to another webhook"""
+    if node.kind in NOTIFICATION_KINDS:
+        return True
+    return node.kind == "httpRequest" and "/webhook/" in str(node.parameters.get("url", ""))
+
+
+def node_cost(workflow, node, costs, _seen=None):
+    """Cost of one node including the AI sub-nodes (model, tools, memory) it drives"""
+    _seen = _seen or set()
+    _seen.add(node.name)
+    cost = costs.get(node.name, costs.get(node.kind, 0))
+    for sub in workflow.sub_nodes(node.name):
+        if sub.name not in _seen and not sub.disabled:
+            cost += node_cost(workflow, sub, costs, _seen)
+    return cost
+
+
+def external_calls(workflow, node, _seen=None):
+    """External services a node calls, directly or through its AI sub-nodes"""
+    _seen = _seen or set()
+    _seen.add(node.name)
+    calls = [node.name] if node.kind in EXTERNAL_KINDS else []
+    for sub in workflow.sub_nodes(node.name):
+        if sub.name not in _seen and not sub.disabled:
+            calls.extend(external_calls(workflow, sub, _seen))
+    return calls
+
+
+def switch_outputs(node):
+    """Output names of a Switch node, in output order"""
+    params = node.parameters
+    rules = params.get("rules") or {}
+    entries = rules.get("rules") or rules.get("values") or []
+    names = []
+    for i, rule in enumerate(entries):
+        name = rule.get("outputKey") or rule.get("value2") or f"output{i}"
+        names.append(str(name))
+    return names
+
+
+def _first_switch(workflow, trigger):
+    for name in workflow.execution_order(trigger.name):
+        if workflow.nodes[name].kind == "switch":
+            return workflow.nodes[name]
+    return None
+
+
+def scenarios(workflow):
+    """
+    Yield ``(action, trigger, order)`` for every distinct execution path.
+
+    Paths fork at the first Switch node (one scenario per output) and at
+    IF nodes (every combination, up to ``MAX_VARIANTS``). Triggers that
+    lead to identical paths are reported once.
+    """
+    seen = set()
+    for trigger in workflow.triggers():
+        switch = _first_switch(workflow, trigger)
+        actions = list(enumerate(switch_outputs(switch))) if switch else [(None, trigger.name)]
+        for output, action in actions:
+            pending = [{switch.name: output} if switch else {}]
+            explored = 0
+            while pending and explored < MAX_VARIANTS:
+                fixed = pending.pop(0)
+                explored += 1
+
+                def choose(node, fixed=fixed):
+                    if node.name in fixed:
+                        return fixed[node.name]
+                    if node.kind in BRANCHING_KINDS or node.kind == "switch":
+                        return 0
+                    return None
+
+                order = workflow.execution_order(trigger.name, choose)
+                for name in order:
+                    node = workflow.nodes[name]
+                    if node.kind in BRANCHING_KINDS and name not in fixed:
+                        pending.append({**fixed, name: 1})
+                        fixed = {**fixed, name: 0}
+                key = (action, tuple(order[1:]))
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield action, trigger, order
+
+
+def estimate(workflow, action, trigger, order, costs):
+    """Estimate response and total latency of one execution path"""
+    responds_early = (
+        trigger.kind == "webhook"
+        and trigger.parameters.get("responseMode", "onReceived") == "onReceived"
+    )
+    elapsed = 0.0
+    response_ms = 0.0 if responds_early else None
+    response_calls, deferred_calls = [], []
+    for name in order:
+        node = workflow.nodes[name]
+        elapsed += node_cost(workflow, node, costs)
+        calls = external_calls(workflow, node)
+        (deferred_calls if response_ms is not None else response_calls).extend(calls)
+        if response_ms is None and node.kind == "respondToWebhook":
+            response_ms = elapsed
+    if response_ms is None:
+        response_ms = elapsed
+    return ActionEstimate(
+        workflow=label(workflow),
+        action=action,
+        trigger=trigger.name,
+        response_ms=response_ms,
+        total_ms=elapsed,
+        response_calls=response_calls,
+        deferred_calls=deferred_calls,
+    )
+
+
+def estimate_actions(workflow, costs=None):
+    """Worst-case estimate per action of a workflow"""
+    costs = {**DEFAULT_COSTS_MS, **(costs or {})}
+    variants = {}
+    for action, trigger, order in scenarios(workflow):
+        est = estimate(workflow, action, trigger, order, costs)
+        variants.setdefault(action or trigger.name, []).append(est)
+    estimates = []
+    for ests in variants.values():
+        worst = max(ests, key=lambda e: (e.response_ms, e.total_ms))
+        worst.variants = len(ests)
+        estimates.append(worst)
+    return estimates
+
+
+def check_redundant_lookups(workflow):
+    groups = {}
+    for node in workflow.active_nodes():
+        params = node.parameters
+        if node.kind != "airtable" or params.get("operation") != "search":
+            continue
+        key = (
+            (params.get("base") or {}).get("value"),
+            (params.get("table") or {}).get("value"),
+            params.get("filterByFormula", ""),
+        )
+        groups.setdefault(key, []).append(node.name)
+    for (_, table, formula), names in groups.items():
+        if len(names) > 1:
+            yield Finding(
+                "redundant-lookup", "warning", label(workflow),
+                f"{len(names)} Airtable searches on {table} use the identical formula "
+                f"{formula!r}; run one lookup before the action switch or cache it",
+                sorted(names),
+            )
+
+
+def check_blocking_notifications(workflow):
+    blocking = {}
+    for action, trigger, order in scenarios(workflow):
+        respond = next((i for i, n in enumerate(order)
+                        if workflow.nodes[n].kind == "respondToWebhook"), None)
+        if respond is None:
+            continue
+        for name in order[:respond]:
+            if is_notification(workflow.nodes[name]):
+                blocking.setdefault(name, set()).add(action or trigger.name)
+    for name, actions in sorted(blocking.items()):
+        yield Finding(
+            "blocking-notification", "error", label(workflow),
+            f"{name!r} runs before 'Respond to Webhook' on the {', '.join(sorted(actions))} "
+            "path; move the response branch above it or send it asynchronously",
+            [name],
+        )
+
+
+def _subgraph_signatures(workflow):
+    sigs = {}
+
+    def sig(name, stack=()):
+        if name in sigs:
+            return sigs[name]
+        if name in stack:
+            return "cycle"
+        node = workflow.nodes[name]
+        children = sorted(sig(c.name, stack + (name,)) for c in workflow.children(name))
+        payload = json.dumps([node.kind, node.parameters, children], sort_keys=True, default=str)
+        sigs[name] = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        return sigs[name]
+
+    for node in workflow.active_nodes():
+        sig(node.name)
+    return sigs
+
+
+def _subgraph_size(workflow, name):
+    return len(workflow.execution_order(name))
+
+
+def check_duplicated_subgraphs(workflow):
+    sigs = _subgraph_signatures(workflow)
+    groups = {}
+    for node in workflow.active_nodes():
+        on_main_path = workflow.in_edges(node.name) or workflow.out_edges(node.name)
+        if on_main_path and not node.is_trigger:
+            groups.setdefault(sigs[node.name], []).append(node.name)
+    duplicated = {s: names for s, names in groups.items() if len(names) > 1}
+    member_of = {name: s for s, names in duplicated.items() for name in names}
+    for s, names in duplicated.items():
+        # Skip groups that are only the tail of a larger duplicated chain
+        parent_groups = set()
+        for name in names:
+            parents = workflow.parents(name)
+            parent_groups.add(member_of.get(parents[0].name) if len(parents) == 1 else None)
+        if len(parent_groups) == 1 and None not in parent_groups:
+            continue
+        size = _subgraph_size(workflow, names[0])
+        yield Finding(
+            "duplicated-subgraph", "info", label(workflow),
+            f"{len(names)} identical {size}-node subgraphs; consider one shared "
+            "node fed by all branches",
+            sorted(names),
+        )
+
+
+def _node_set(workflow):
+    return {(n.name, n.kind) for n in workflow.active_nodes()}
+
+
+def check_duplicated_workflows(workflows, threshold=0.6):
+    for a, b in itertools.combinations(workflows, 2):
+        set_a, set_b = _node_set(a), _node_set(b)
+        union = set_a | set_b
+        if not union:
+            continue
+        similarity = len(set_a & set_b) / len(union)
+        if similarity < threshold:
+            continue
+        only_a = sorted(name for name, _ in set_a - set_b)
+        only_b = sorted(name for name, _ in set_b - set_a)
+        changed = sorted(
+            name for name, _ in set_a & set_b
+            if a.nodes[name].parameters != b.nodes[name].parameters
+        )
+        if not (only_a or only_b or changed):
+            detail = "identical node sets"
+        else:
+            detail = (f"{len(only_a)} nodes only in the first, {len(only_b)} only in the second, "
+                      f"{len(changed)} with different parameters")
+        yield Finding(
+            "duplicated-workflow", "warning", label(a),
+            f"{label(a)} and {label(b)} "
+            f"share {similarity:.0%} of their nodes ({detail}); keep a single source of truth",
+            only_a + only_b + changed,
+        )
+
+
+POLL_MINUTES = {"everyMinute": 1, "everyHour": 60, "everyDay": 1440, "everyWeek": 10080}
+
+
+def check_polling_triggers(workflow, min_interval=15):
+    for node in workflow.triggers():
+        for item in (node.parameters.get("pollTimes") or {}).get("item", []):
+            mode = item.get("mode")
+            minutes = POLL_MINUTES.get(mode)
+            if mode == "everyX":
+                value = int(item.get("value", 1))
+                minutes = value if item.get("unit") == "minutes" else value * 60
+            if minutes is not None and minutes < min_interval:
+                per_day = 1440 // minutes if minutes > 0 else "unbounded"
+                yield Finding(
+                    "polling-trigger", "warning", label(workflow),
+                    f"{node.name!r} polls every {minutes} min ({per_day} list calls/day); "
+                    "prefer a push or change-feed trigger",
+                    [node.name],
+                )
+
+
+def check_latency_budget(estimates, budget_ms):
+    for est in estimates:
+        if est.response_ms > budget_ms:
+            yield Finding(
+                "latency-budget", "error", est.workflow,
+                f"{est.action or est.trigger!r} responds in ~{est.response_ms:.0f} ms "
+                f"(budget {budget_ms:.0f} ms)",
+                est.response_calls,
+            )
+
+
+def analyze(workflows, costs=None, budget_ms=None):
+    """Run every check over a list of workflows"""
+    report = Report()
+    for workflow in workflows:
+        report.findings.extend(check_redundant_lookups(workflow))
+        report.findings.extend(check_blocking_notifications(workflow))
+        report.findings.extend(check_duplicated_subgraphs(workflow))
+        report.findings.extend(check_polling_triggers(workflow))
+        report.estimates.extend(estimate_actions(workflow, costs))
+    report.findings.extend(check_duplicated_workflows(workflows))
+    if budget_ms is not None:
+        report.findings.extend(check_latency_budget(report.estimates, budget_ms))
+    return report
+
+
+ICONS = {"info": "ℹ️ ", "warning": "⚠️ ", "error": "❌"}
+
+
+def format_text(report):
+    lines = []
+    current = None
+    for est in report.estimates:
+        if est.workflow != current:
+            current = est.workflow
+            lines.append(f"\n{current}")
+            lines.append(f"  {'action':<28} {'response':>10} {'total':>10}  external calls before response")
+        name = est.action or est.trigger
+        calls = " → ".join(est.response_calls) or "-"
+        lines.append(f"  {name:<28} {est.response_ms:>7.0f} ms {est.total_ms:>7.0f} ms  {calls}")
+    known = sum(f.baseline for f in report.findings)
+    lines.append(f"\nFindings ({len(report.findings)}" + (f", {known} in the baseline" if known else "") + "):")
+    for f in report.findings:
+        mark = " (baseline)" if f.baseline else ""
+        lines.append(f"  {ICONS[f.severity]} {f.rule:<22} {f.workflow}: {f.message}{mark}")
+        if f.nodes:
+            lines.append(f"      nodes: {', '.join(f.nodes)}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Static performance linter for n8n workflows")
+    parser.add_argument("paths", nargs="*", default=[WORKFLOWS_DIR],
+                        help="workflow files or directories (default: workflows/)")
+    parser.add_argument("--costs", help="JSON file of per-type or per-node costs in ms")
+    parser.add_argument("--budget-ms", type=float, help="flag actions slower than this")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    parser.add_argument("--fail-on", choices=SEVERITIES + ["never"], default="error",
+                        help="exit non-zero when a finding is at least this severe")
+    parser.add_argument("--baseline", help="JSON file of known findings that do not fail the run")
+    parser.add_argument("--write-baseline", action="store_true", help="write the current findings to --baseline")
+    args = parser.parse_args(argv)
+    if args.write_baseline and not args.baseline:
+        parser.error("--write-baseline needs --baseline")
+
+    workflows = []
+    for path in args.paths:
+        workflows.extend(load_workflows(path) if os.path.isdir(path) else [load_workflow(path)])
+    costs = None
+    if args.costs:
+        with open(args.costs, encoding="utf-8") as f:
+            costs = json.load(f)
+
+    report = analyze(workflows, costs=costs, budget_ms=args.budget_ms)
+    if args.write_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            keys = sorted(finding.key() for finding in report.findings)
+            f.write("[\n" + ",\n".join(f"  {json.dumps(k, ensure_ascii=False)}" for k in keys) + "\n]\n")
+        print(f"✅ Wrote {len(report.findings)} findings to {args.baseline}")
+        return 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report.apply_baseline(json.load(f))
+    if args.format == "json":
+        print(json.dumps(asdict(report), indent=2, ensure_ascii=False))
+    else:
+        print(format_text(report))
+
+    worst = report.worst_severity()
+    if args.fail_on != "never" and worst and SEVERITIES.index(worst) >= SEVERITIES.index(args.fail_on):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
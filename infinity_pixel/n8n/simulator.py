@@ -0,0 +1,520 @@
+"""
+Offline execution simulator for n8n workflows.
+
+Interprets a workflow export node by node in n8n's v1 order on a virtual
+clock. Control-flow nodes (``set``, ``switch``, ``if``, ``respondToWebhook``)
+are evaluated from their parameters, code nodes run the Python stubs in
+``code_nodes``, and Airtable/Slack/HTTP/Email nodes call the local fakes in
+``fakes``, whose latency distributions drive the timing trace.
+
+Usage:
+    python -m infinity_pixel.n8n.simulator ["workflows/Ticket Manager (Airtable).json"]
+        [--payloads payloads.jsonl] [--entry Webhook] [--compare] [--runs 50]
+        [--latency airtable=lognormal:250:0.4 ...] [--seed 0] [--trace trace.jsonl]
+
+``--compare`` replays the payloads through every trigger of the workflow
+(e.g. the ``Webhook`` vs ``When Executed by Another Workflow`` entry points)
+and reports the latency each caller observes.
+"""
+
+import argparse
+import json
+import random
+import sys
+from dataclasses import asdict, dataclass, field
+
+from .code_nodes import DEFAULT_STUBS
+from .expressions import Context, evaluate
+from .fakes import default_services, parse_latency
+from .graph import WORKFLOWS_DIR, load_workflow
+from .lint import DEFAULT_COSTS_MS, EXTERNAL_KINDS
+
+DEFAULT_WORKFLOW = f"{WORKFLOWS_DIR}/Ticket Manager (Airtable).json"
+
+# Time from the caller's request to the trigger firing, per trigger type
+DEFAULT_INVOCATION_LATENCY = {
+    "webhook": "lognormal:120:0.3",
+    "executeWorkflowTrigger": "lognormal:40:0.3",
+    "chatTrigger": "lognormal:120:0.3",
+}
+
+LAST_TICKET_ID = "$lastTicketId"
+
+SAMPLE_PAYLOADS = [
+    {"action": "create", "name": "Sim User", "email": "sim@example.com", "subject": "Login issue",
+     "description": "Cannot access dashboard", "priority": "high"},
+    {"action": "status", "ticketId": LAST_TICKET_ID},
+    {"action": "update", "ticketId": LAST_TICKET_ID, "description": "Still failing after reset"},
+    {"action": "close", "ticketId": LAST_TICKET_ID},
+    {"action": "status", "ticketId": "TCK-0000000000000-000"},
+]
+
+
+@dataclass
+class NodeSpan:
+    node: str
+    kind: str
+    start_ms: float
+    end_ms: float
+    items_in: int
+    items_out: int
+    service_ms: float = 0.0
+
+    @property
+    def duration_ms(self):
+        return self.end_ms - self.start_ms
+
+
+@dataclass
+class Execution:
+    entry: str
+    payload: dict
+    spans: list = field(default_factory=list)
+    response: object = None
+    response_code: int = None
+    response_ms: float = None
+    total_ms: float = 0.0
+    invocation_ms: float = 0.0
+    caller_ms: float = 0.0
+    warnings: list = field(default_factory=list)
+
+    @property
+    def action(self):
+        if isinstance(self.response, dict) and self.response.get("action"):
+            return self.response["action"]
+        return self.payload.get("action") or "unknown"
+
+    def to_dict(self):
+        data = asdict(self)
+        data["action"] = self.action
+        return data
+
+
+class Run:
+    """State of one execution, handed to code-node stubs"""
+
+    def __init__(self, simulator, execution, start_ms):
+        self.simulator = simulator
+        self.execution = execution
+        self.rng = simulator.rng
+        self.outputs = {}
+        self.elapsed_ms = 0.0
+        self.start_ms = start_ms
+
+    @property
+    def now_ms(self):
+        return int(self.start_ms + self.elapsed_ms)
+
+    def first_json(self, node_name):
+        items = self.outputs.get(node_name) or []
+        return (items[0].get("json") or {}) if items else {}
+
+    def context(self, item, index=0):
+        return Context(item.get("json") or {}, self.outputs, index)
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+class Simulator:
+    """Executes one workflow against local fakes"""
+
+    def __init__(self, workflow, services=None, stubs=None, node_costs=None,
+                 invocation_latency=None, seed=0, start_ms=1764314974531):
+        self.workflow = workflow
+        self.rng = random.Random(seed)
+        self.services = services if services is not None else default_services(seed)
+        self.stubs = {**DEFAULT_STUBS, **(stubs or {})}
+        self.node_costs = {**DEFAULT_COSTS_MS, **(node_costs or {})}
+        self.invocation_latency = {
+            kind: parse_latency(spec)
+            for kind, spec in {**DEFAULT_INVOCATION_LATENCY, **(invocation_latency or {})}.items()
+        }
+        self.clock_ms = start_ms
+        self._handlers = {
+            "set": self._set,
+            "switch": self._switch,
+            "if": self._if,
+            "code": self._code,
+            "respondToWebhook": self._respond,
+            "airtable": self._airtable,
+            "slack": self._slack,
+            "httpRequest": self._http,
+            "email": self._email,
+            "emailSend": self._email,
+        }
+
+    # -- running -------------------------------------------------------------
+
+    def entry_points(self):
+        return [t.name for t in self.workflow.triggers()]
+
+    def run(self, payload, entry=None):
+        """Execute the workflow for one payload; returns an ``Execution``"""
+        entry = entry or self.entry_points()[0]
+        trigger = self.workflow.nodes[entry]
+        execution = Execution(entry=entry, payload=payload)
+        run = Run(self, execution, self.clock_ms)
+
+        if trigger.kind == "webhook":
+            items = [{"json": {"headers": {"content-type": "application/json"}, "params": {},
+                               "query": {}, "body": payload}}]
+        else:
+            items = [{"json": dict(payload)}]
+
+        stack = [(entry, items)]
+        while stack:
+            name, items = stack.pop()
+            node = self.workflow.nodes[name]
+            start = run.elapsed_ms
+            outputs, service_ms = self._execute(node, items, run)
+            # External nodes are timed by their fake; the lint costs cover the rest
+            if node.kind in EXTERNAL_KINDS and node.kind in self._handlers:
+                run.elapsed_ms += service_ms
+            else:
+                run.elapsed_ms += self.node_costs.get(name, self.node_costs.get(node.kind, 0))
+            produced = [item for out in outputs for item in out]
+            run.outputs[name] = produced
+            execution.spans.append(NodeSpan(name, node.kind, start, run.elapsed_ms,
+                                            len(items), len(produced), service_ms))
+            if node.kind == "respondToWebhook" and execution.response_ms is None:
+                execution.response_ms = run.elapsed_ms
+
+            pending = []
+            for index, out in enumerate(outputs):
+                if not out and node.always_output_data:
+                    out = [{"json": {}}]
+                if not out:
+                    continue
+                for child in self.workflow.children(name, index):
+                    if not child.disabled:
+                        pending.append((child, out))
+            pending.sort(key=lambda pair: pair[0].sort_key)
+            for child, out in reversed(pending):
+                stack.append((child.name, out))
+
+        execution.total_ms = run.elapsed_ms
+        latency = self.invocation_latency.get(trigger.kind)
+        execution.invocation_ms = latency.sample(self.rng) if latency else 0.0
+        if trigger.kind == "webhook":
+            mode = trigger.parameters.get("responseMode", "onReceived")
+            if mode == "onReceived":
+                waited = 0.0
+            elif execution.response_ms is None:
+                execution.warnings.append("workflow finished without reaching a Respond to Webhook node")
+                waited = execution.total_ms
+            else:
+                waited = execution.response_ms
+        else:
+            # Sub-workflow and chat callers wait for the whole execution
+            waited = execution.total_ms
+        execution.caller_ms = execution.invocation_ms + waited
+        self.clock_ms += int(execution.total_ms) + 1
+        return execution
+
+    def replay(self, payloads, entry=None):
+        """Run payloads in order, substituting ``$lastTicketId`` from earlier creates"""
+        executions = []
+        last_ticket_id = ""
+        for payload in payloads:
+            payload = {k: (last_ticket_id if v == LAST_TICKET_ID else v) for k, v in payload.items()}
+            execution = self.run(payload, entry)
+            response = execution.response if isinstance(execution.response, dict) else {}
+            if response.get("action") == "create" and response.get("ticketId"):
+                last_ticket_id = response["ticketId"]
+            elif payload.get("action") == "create":
+                created = [r for r in self.services["airtable"].records.values()]
+                if created:
+                    last_ticket_id = created[-1]["fields"].get("Ticket ID", last_ticket_id)
+            executions.append(execution)
+        return executions
+
+    def _execute(self, node, items, run):
+        if node.is_trigger:
+            return [items], 0.0
+        handler = self._handlers.get(node.kind)
+        if handler is None:
+            run.execution.warnings.append(f"{node.name!r}: no simulator support for {node.kind!r}, passing items through")
+            return [items], 0.0
+        return handler(node, items, run)
+
+    # -- control flow ----------------------------------------------------------
+
+    def _set(self, node, items, run):
+        params = node.parameters
+        out = []
+        for i, item in enumerate(items):
+            ctx = run.context(item, i)
+            if params.get("mode") == "raw":
+                raw = evaluate(params.get("jsonOutput", "{}"), ctx)
+                data = json.loads(raw) if isinstance(raw, str) else raw
+                out.append({"json": data if params.get("keepOnlySet") else {**ctx.json, **data}})
+                continue
+            values = {}
+            for group in ("string", "number", "boolean"):
+                for entry in (params.get("values") or {}).get(group, []):
+                    values[entry["name"]] = evaluate(entry.get("value"), ctx)
+            base = {} if params.get("keepOnlySet") else dict(ctx.json)
+            out.append({"json": {**base, **values}})
+        return [out], 0.0
+
+    def _switch(self, node, items, run):
+        params = node.parameters
+        rules = (params.get("rules") or {}).get("rules") or []
+        outputs = [[] for _ in rules]
+        fallback = params.get("fallbackOutput", -1)
+        if isinstance(fallback, int) and fallback >= 0:
+            outputs.extend([] for _ in range(fallback + 1 - len(outputs)))
+        for i, item in enumerate(items):
+            ctx = run.context(item, i)
+            value = evaluate(params.get("value1"), ctx)
+            for index, rule in enumerate(rules):
+                expected = evaluate(rule.get("value2"), ctx)
+                if params.get("dataType") == "number":
+                    matched = float(value or 0) == float(expected or 0)
+                else:
+                    matched = str(value if value is not None else "") == str(expected)
+                if matched:
+                    outputs[index].append(item)
+                    break
+            else:
+                if isinstance(fallback, int) and fallback >= 0:
+                    outputs[fallback].append(item)
+        return outputs, 0.0
+
+    @staticmethod
+    def _compare(operation, left, right):
+        if operation in ("equals", "equal"):
+            return left == right
+        if operation in ("notEquals", "notEqual"):
+            return left != right
+        if operation == "isEmpty":
+            return left in (None, "", [], {})
+        if operation == "isNotEmpty":
+            return left not in (None, "", [], {})
+        if operation == "true":
+            return left is True
+        if operation == "false":
+            return left is False
+        if operation == "exists":
+            return left is not None
+        if operation == "notExists":
+            return left is None
+        if operation == "contains":
+            return str(right) in str(left or "")
+        raise ValueError(f"unsupported IF operation {operation!r}")
+
+    def _if(self, node, items, run):
+        params = node.parameters
+        conditions = params.get("conditions") or {}
+        true_items, false_items = [], []
+        for i, item in enumerate(items):
+            ctx = run.context(item, i)
+            results = []
+            if "conditions" in conditions:  # v2 filter conditions
+                for cond in conditions["conditions"]:
+                    left = evaluate(cond.get("leftValue"), ctx)
+                    right = evaluate(cond.get("rightValue"), ctx)
+                    results.append(self._compare(cond["operator"]["operation"], left, right))
+                combine_any = conditions.get("combinator") == "or"
+            else:  # v1 typed condition lists
+                for group in ("string", "number", "boolean"):
+                    for cond in conditions.get(group, []):
+                        left = evaluate(cond.get("value1"), ctx)
+                        right = evaluate(cond.get("value2"), ctx)
+                        results.append(self._compare(cond.get("operation", "equal"), left, right))
+                combine_any = params.get("combineOperation") == "any"
+            passed = any(results) if combine_any else all(results)
+            (true_items if passed else false_items).append(item)
+        return [true_items, false_items], 0.0
+
+    def _code(self, node, items, run):
+        stub = self.stubs.get(node.name)
+        if stub is None:
+            run.execution.warnings.append(f"{node.name!r}: no code stub registered, passing items through")
+            return [items], 0.0
+        return [stub(items, run)], 0.0
+
+    def _respond(self, node, items, run):
+        execution = run.execution
+        if execution.response_ms is None and execution.response is None:
+            params = node.parameters
+            body = items[0].get("json") if items else {}
+            if "responseBody" in params:
+                body = evaluate(params["responseBody"], run.context(items[0] if items else {}))
+                if isinstance(body, str):
+                    try:
+                        body = json.loads(body)
+                    except ValueError:
+                        pass
+            execution.response = body
+            execution.response_code = int(params.get("responseCode", 200))
+        return [items], 0.0
+
+    # -- external services -----------------------------------------------------
+
+    def _columns(self, params, ctx):
+        columns = params.get("columns") or {}
+        removed = {s["id"] for s in columns.get("schema", []) if s.get("removed")}
+        fields = {}
+        for column, expr in (columns.get("value") or {}).items():
+            if column in removed:
+                continue
+            value = evaluate(expr, ctx)
+            if value is not None:
+                fields[column] = value
+        return fields
+
+    def _airtable(self, node, items, run):
+        service = self.services["airtable"]
+        params = node.parameters
+        operation = params.get("operation", "create")
+        out, total = [], 0.0
+        for i, item in enumerate(items):
+            ctx = run.context(item, i)
+            if operation == "search":
+                limit = None if params.get("returnAll") else params.get("limit", 50)
+                records, ms = service.search(evaluate(params.get("filterByFormula", ""), ctx), limit)
+                out.extend({"json": r} for r in records)
+            elif operation == "create":
+                record, ms = service.create(self._columns(params, ctx))
+                out.append({"json": record})
+            elif operation == "update":
+                fields = self._columns(params, ctx)
+                record, ms = service.update(fields.pop("id", ""), fields)
+                if record is None:
+                    run.execution.warnings.append(f"{node.name!r}: update of unknown record")
+                else:
+                    out.append({"json": record})
+            else:
+                raise ValueError(f"unsupported Airtable operation {operation!r}")
+            total += ms
+        return [out], total
+
+    def _slack(self, node, items, run):
+        service = self.services["slack"]
+        params = node.parameters
+        out, total = [], 0.0
+        for i, item in enumerate(items):
+            ctx = run.context(item, i)
+            channel = (params.get("channelId") or {}).get("value", "")
+            blocks = evaluate(params.get("blocksUi"), ctx) if params.get("messageType") == "block" else None
+            result, ms = service.post_message(channel, evaluate(params.get("text", ""), ctx), blocks)
+            out.append({"json": result})
+            total += ms
+        return [out], total
+
+    def _http(self, node, items, run):
+        service = self.services["http"]
+        params = node.parameters
+        out, total = [], 0.0
+        for i, item in enumerate(items):
+            ctx = run.context(item, i)
+            body = None
+            if params.get("sendBody"):
+                body = {p["name"]: evaluate(p.get("value"), ctx)
+                        for p in (params.get("bodyParameters") or {}).get("parameters", [])}
+            result, ms = service.request(params.get("method", "GET"), evaluate(params.get("url", ""), ctx), body)
+            out.append({"json": result if isinstance(result, dict) else {"data": result}})
+            total += ms
+        return [out], total
+
+    def _email(self, node, items, run):
+        service = self.services["email"]
+        params = node.parameters
+        out, total = [], 0.0
+        for i, item in enumerate(items):
+            ctx = run.context(item, i)
+            result, ms = service.send(
+                evaluate(params.get("toEmail", ""), ctx),
+                evaluate(params.get("subject", ""), ctx),
+                evaluate(params.get("text", ""), ctx),
+                evaluate(params.get("fromEmail"), ctx),
+            )
+            out.append({"json": {**ctx.json, **result}})
+            total += ms
+        return [out], total
+
+
+def summarize(executions):
+    """Per-entry/per-action latency percentiles and per-node mean durations"""
+    groups = {}
+    for ex in executions:
+        groups.setdefault((ex.entry, ex.action), []).append(ex)
+    summary = []
+    for (entry, action), group in sorted(groups.items()):
+        caller = [e.caller_ms for e in group]
+        nodes = {}
+        for ex in group:
+            for span in ex.spans:
+                nodes.setdefault(span.node, []).append(span.duration_ms)
+        summary.append({
+            "entry": entry,
+            "action": action,
+            "runs": len(group),
+            "caller_p50_ms": _percentile(caller, 0.5),
+            "caller_p95_ms": _percentile(caller, 0.95),
+            "total_p50_ms": _percentile([e.total_ms for e in group], 0.5),
+            "no_response": sum(e.response_ms is None for e in group),
+            "nodes_mean_ms": {n: sum(v) / len(v) for n, v in nodes.items()},
+        })
+    return summary
+
+
+def _load_payloads(path):
+    if not path:
+        return list(SAMPLE_PAYLOADS)
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline n8n workflow simulator")
+    parser.add_argument("workflow", nargs="?", default=DEFAULT_WORKFLOW)
+    parser.add_argument("--payloads", help="JSONL file of request payloads (default: built-in samples)")
+    parser.add_argument("--entry", help="trigger node to start from (default: first trigger)")
+    parser.add_argument("--compare", action="store_true", help="replay through every trigger")
+    parser.add_argument("--runs", type=int, default=20, help="replays of the payload set per entry")
+    parser.add_argument("--latency", action="append", default=[], metavar="SERVICE=SPEC",
+                        help="latency distribution per service, e.g. airtable=lognormal:250:0.4")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace", help="write every execution as JSONL")
+    args = parser.parse_args(argv)
+
+    workflow = load_workflow(args.workflow)
+    latencies = dict(spec.split("=", 1) for spec in args.latency)
+    payloads = _load_payloads(args.payloads)
+    probe = Simulator(workflow)
+    entries = probe.entry_points() if args.compare else [args.entry or probe.entry_points()[0]]
+
+    executions = []
+    for entry in entries:
+        sim = Simulator(workflow, services=default_services(args.seed, **latencies), seed=args.seed)
+        for _ in range(args.runs):
+            executions.extend(sim.replay(payloads, entry))
+
+    if args.trace:
+        with open(args.trace, "w", encoding="utf-8") as f:
+            for ex in executions:
+                f.write(json.dumps(ex.to_dict(), ensure_ascii=False) + "\n")
+
+    print(f"{workflow.name}: {len(executions)} executions")
+    print(f"  {'entry':<36} {'action':<8} {'caller p50':>11} {'caller p95':>11} {'total p50':>10}  no-response")
+    for row in summarize(executions):
+        print(f"  {row['entry']:<36} {row['action']:<8} {row['caller_p50_ms']:>8.0f} ms "
+              f"{row['caller_p95_ms']:>8.0f} ms {row['total_p50_ms']:>7.0f} ms  {row['no_response']}")
+    warnings = sorted({w for ex in executions for w in ex.warnings})
+    for warning in warnings:
+        print(f"  ⚠️  {warning}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
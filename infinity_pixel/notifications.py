@@ -0,0 +1,80 @@
+"""
+Notifications sent after a ticket is written.
+
+Mirrors the notification nodes of the ``Ticket Manager (Airtable)``
+workflow: a Slack message to the support channel (``Send a message``) and a
+POST to the ``notify-customer`` webhook (``HTTP Request``), which emails the
+customer. Both go through the shared ``outbound.OutboundClient``, so
+consecutive tickets reuse their connections. ``RecordingNotifier`` keeps
+messages in memory for tests.
+"""
+
+from .outbound import get_client
+from .tickets import slack_message
+
+SLACK_CHANNEL = "C09VBFVEP5M"
+NOTIFY_CUSTOMER_URL = "https://polarmedia.app.n8n.cloud/webhook/notify-customer"
+
+# Response keys forwarded to the notify-customer webhook
+CUSTOMER_FIELDS = ("ticketId", "status", "subject", "priority", "customerEmail", "customerName", "messageForUser")
+
+
+def _post_json(client, url, body, headers=None, timeout=10.0):
+    return client.request("POST", url, body, headers, timeout=timeout).raise_for_status().json()
+
+
+class Notifier:
+    """Base class; ``name`` is the n8n node the notifier stands in for"""
+
+    name = "notify"
+
+    def notify(self, event, record, response):
+        """``record`` is the written Airtable record, ``response`` the action response"""
+        raise NotImplementedError
+
+
+class SlackNotifier(Notifier):
+    """Posts the ticket summary with chat.postMessage"""
+
+    name = "Send a message"
+
+    def __init__(self, token, channel=SLACK_CHANNEL, timeout=10.0, client=None):
+        self.token = token
+        self.channel = channel
+        self.timeout = timeout
+        self.client = client or get_client()
+
+    def notify(self, event, record, response):
+        message = slack_message(event, record)
+        result = _post_json(self.client, "https://slack.com/api/chat.postMessage",
+                            {"channel": self.channel, "text": message["text"]},
+                            {"Authorization": f"Bearer {self.token}"}, self.timeout)
+        if not result.get("ok"):
+            raise RuntimeError(f"Slack error: {result.get('error', 'unknown')}")
+        return result
+
+
+class CustomerNotifier(Notifier):
+    """Calls the notify-customer webhook with the response fields"""
+
+    name = "HTTP Request"
+
+    def __init__(self, url=NOTIFY_CUSTOMER_URL, timeout=10.0, client=None):
+        self.url = url
+        self.timeout = timeout
+        self.client = client or get_client()
+
+    def notify(self, event, record, response):
+        fields = {k: response.get(k, "") for k in CUSTOMER_FIELDS}
+        return _post_json(self.client, self.url, fields, timeout=self.timeout)
+
+
+class RecordingNotifier(Notifier):
+    """Keeps ``(event, ticketId, message)`` tuples in ``sent``"""
+
+    def __init__(self, name="notify"):
+        self.name = name
+        self.sent = []
+
+    def notify(self, event, record, response):
+        self.sent.append((event, response.get("ticketId"), slack_message(event, record)["text"]))
@@ -0,0 +1,470 @@
+"""
+Shared client for the backend's outbound HTTP calls.
+
+Each ticket action calls Airtable, Slack and the ``notify-customer``
+webhook. With ``urllib`` every call pays a DNS lookup, a TCP handshake and
+a TLS handshake before the request is sent. ``OutboundClient`` keeps a
+pool of keep-alive connections per host instead:
+
+* Idle connections are reused (LIFO); ones the server has closed, or idle
+  longer than ``idle_s``, are dropped. A request that fails on a reused
+  connection while it is being sent is retried once on a new one; one that
+  was sent but got no response is retried only for idempotent methods
+  (``IDEMPOTENT_METHODS``), since a POST or PATCH may have been applied.
+* ``max_per_host`` bounds the connections to each host; callers wait for a
+  free one up to the request timeout, then get ``PoolTimeout`` (which does
+  not count against the host's breaker).
+* Host names are resolved through a ``DNSCache`` (``dns_ttl_s``); TLS still
+  verifies the host name, not the address.
+* ``connect_timeout`` bounds connection setup and ``timeout`` each read.
+* Each host has a ``CircuitBreaker``: after ``breaker_failures`` straight
+  failures (connection errors, timeouts, HTTP 5xx) calls fail fast with
+  ``CircuitOpenError`` for ``breaker_reset_s``, then a single probe call
+  decides whether the host is back.
+* ``http2=True`` sends requests through ``httpx`` with HTTP/2, multiplexing
+  concurrent requests to a host over one connection. It needs
+  ``pip install 'httpx[http2]'``; DNS caching and connection counts do not
+  apply on that path.
+
+Per-host counts are available from ``stats()`` and as
+``outbound_requests_total``, ``outbound_connections_total`` and
+``outbound_request_duration_ms`` metrics.
+
+Usage:
+    client = get_client()   # process-wide, used by AirtableTicketStore and the notifiers
+    response = client.request("POST", url, {"text": "hello"}, {"Authorization": f"Bearer {token}"})
+    response.raise_for_status().json()
+"""
+
+import http.client
+import json
+import select
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+
+from .metrics import get_registry
+
+RETRY_ON_REUSED = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class OutboundError(Exception):
+    """An outbound call failed; ``status`` is the HTTP status when there was a response"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(OutboundError):
+    """The host's circuit breaker is open; the call was not attempted"""
+
+
+class PoolTimeout(OutboundError):
+    """Every connection to the host stayed busy for the whole timeout; the call was not attempted"""
+
+
+@dataclass
+class Response:
+    status: int
+    headers: dict
+    data: bytes
+    url: str = ""
+
+    def json(self):
+        return json.loads(self.data or b"{}")
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise OutboundError(f"HTTP {self.status} from {self.url}", self.status)
+        return self
+
+
+class DNSCache:
+    """Caches one address per ``(host, port)`` for ``ttl_s`` seconds"""
+
+    def __init__(self, ttl_s=300.0, resolver=socket.getaddrinfo, clock=time.monotonic):
+        self.ttl_s = ttl_s
+        self.resolver = resolver
+        self.clock = clock
+        self.lookups = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        key = (host, port)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                return entry[0]
+        infos = self.resolver(host, port, 0, socket.SOCK_STREAM)
+        if not infos:
+            raise OSError(f"no addresses for {host}")
+        address = infos[0][4][:2]
+        with self._lock:
+            self.lookups += 1
+            self._entries[key] = (address, now + self.ttl_s)
+        return address
+
+    def invalidate(self, host, port):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+class CircuitBreaker:
+    """
+    Closed until ``failures`` consecutive failures, then open for ``reset_s``
+    seconds. After that it is half-open: one probe call is let through and
+    its result closes the circuit or opens it again.
+    """
+
+    def __init__(self, failures=5, reset_s=30.0, clock=time.monotonic):
+        self.failures = failures
+        self.reset_s = reset_s
+        self.clock = clock
+        self.consecutive = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "open" if self._probing or self.clock() - self.opened_at < self.reset_s else "half_open"
+
+    def allow(self):
+        """True if a call may go ahead; in half-open state only the first caller gets through"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._probing or self.clock() - self.opened_at < self.reset_s:
+                return False
+            self._probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.consecutive = 0
+            self.opened_at = None
+            self._probing = False
+
+    def cancel(self):
+        """The call ``allow`` let through was not made; a half-open circuit lets the next caller probe"""
+        with self._lock:
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self.consecutive += 1
+            if self.opened_at is not None or self.consecutive >= self.failures:
+                # A failed probe opens the circuit for another reset_s
+                self.opened_at = self.clock()
+            self._probing = False
+
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    errors: int = 0
+    rejected: int = 0
+    connections: int = 0
+    reused: int = 0
+    retried: int = 0
+    statuses: dict = field(default_factory=dict)
+
+    def as_dict(self):
+        return {"requests": self.requests, "errors": self.errors, "rejected": self.rejected,
+                "connections": self.connections, "reused": self.reused, "retried": self.retried,
+                "statuses": dict(self.statuses)}
+
+
+def _is_stale(conn):
+    """True if an idle connection was closed by the server (it became readable)"""
+    if conn.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+class HostPool:
+    """Keep-alive connections to one ``scheme://host:port``"""
+
+    def __init__(self, scheme, host, port, max_size=10, connect_timeout=3.0, idle_s=30.0,
+                 dns=None, ssl_context=None, clock=time.monotonic):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.idle_s = idle_s
+        self.dns = dns or DNSCache()
+        self.ssl_context = ssl_context
+        self.clock = clock
+        self.stats = HostStats()
+        self.breaker = None
+        self._idle = []  # (connection, returned_at), most recent last
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+
+    def _connect(self, address, timeout=None, source_address=None):
+        try:
+            return socket.create_connection(self.dns.resolve(*address), self.connect_timeout, source_address)
+        except OSError:
+            self.dns.invalidate(*address)
+            raise
+
+    def _new_connection(self, timeout):
+        if self.scheme == "https":
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=timeout,
+                                               context=self.ssl_context or ssl.create_default_context())
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        conn._create_connection = self._connect
+        conn.connect()
+        conn.sock.settimeout(timeout)
+        with self._lock:
+            self.stats.connections += 1
+        return conn
+
+    def acquire(self, timeout):
+        """``(connection, reused)``; waits up to ``timeout`` for a free slot"""
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"no free connection to {self.host} within {timeout}s")
+        try:
+            now = self.clock()
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    conn, returned_at = self._idle.pop()
+                if now - returned_at <= self.idle_s and not _is_stale(conn):
+                    conn.sock.settimeout(timeout)
+                    with self._lock:
+                        self.stats.reused += 1
+                    return conn, True
+                conn.close()
+            return self._new_connection(timeout), False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, reusable=True):
+        if reusable:
+            with self._lock:
+                self._idle.append((conn, self.clock()))
+        else:
+            conn.close()
+        self._slots.release()
+
+    def idle(self):
+        with self._lock:
+            return len(self._idle)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+
+class OutboundClient:
+    """Per-host keep-alive pools with DNS caching, timeouts and circuit breakers"""
+
+    def __init__(self, max_per_host=10, timeout=10.0, connect_timeout=3.0, idle_s=30.0, dns_ttl_s=300.0,
+                 breaker_failures=5, breaker_reset_s=30.0, http2=False, registry=None, resolver=socket.getaddrinfo,
+                 ssl_context=None, clock=time.monotonic):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.idle_s = idle_s
+        self.breaker_failures = breaker_failures
+        self.breaker_reset_s = breaker_reset_s
+        self.ssl_context = ssl_context
+        self.clock = clock
+        self.dns = DNSCache(dns_ttl_s, resolver, clock)
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._httpx = None
+        if http2:
+            try:
+                import httpx
+                import h2  # noqa: F401  (httpx needs it for HTTP/2)
+            except ImportError as exc:
+                raise ImportError("http2=True needs httpx with HTTP/2 support: pip install 'httpx[http2]'") from exc
+            self._httpx = httpx.Client(
+                http2=True, verify=ssl_context or True,
+                timeout=httpx.Timeout(timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=max_per_host * 8, max_keepalive_connections=max_per_host * 8,
+                                    keepalive_expiry=idle_s))
+        registry = registry or get_registry()
+        self.requests = registry.counter(
+            "outbound_requests_total", "Outbound HTTP calls by host and result (status class, error, open)",
+            ["host", "result"])
+        self.connections = registry.counter(
+            "outbound_connections_total", "Outbound connections opened (DNS + TCP + TLS setup) by host", ["host"])
+        self.latency = registry.histogram(
+            "outbound_request_duration_ms", "Outbound HTTP call latency in milliseconds", ["host"])
+
+    def pool(self, scheme, host, port):
+        key = (scheme, host, port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = HostPool(scheme, host, port, self.max_per_host, self.connect_timeout,
+                                                   self.idle_s, self.dns, self.ssl_context, self.clock)
+                pool.breaker = CircuitBreaker(self.breaker_failures, self.breaker_reset_s, self.clock)
+            return pool
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        """
+        Send one request and return its ``Response`` (any status).
+
+        ``body`` may be bytes, str or a JSON-serialisable object. Raises
+        ``CircuitOpenError`` when the host's breaker is open and
+        ``OutboundError`` when no response was received.
+        """
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"not an http(s) URL: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        pool = self.pool(parts.scheme, parts.hostname, port)
+        label = parts.hostname if port in (80, 443) else f"{parts.hostname}:{port}"
+        headers = dict(headers or {})
+        if body is not None and not isinstance(body, (bytes, str)):
+            body = json.dumps(body).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+
+        if not pool.breaker.allow():
+            with pool._lock:
+                pool.stats.rejected += 1
+            self.requests.labels(label, "open").inc()
+            raise CircuitOpenError(f"circuit open for {label}")
+
+        timeout = self.timeout if timeout is None else timeout
+        target = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        start = time.perf_counter()
+        try:
+            if self._httpx is not None:
+                response = self._send_http2(method, url, body, headers, timeout)
+            else:
+                response = self._send(pool, label, method, target, body, headers, timeout)
+        except PoolTimeout:
+            # Our own pool was busy; says nothing about the host's health
+            pool.breaker.cancel()
+            with pool._lock:
+                pool.stats.errors += 1
+            self.requests.labels(label, "busy").inc()
+            raise
+        except OutboundError:
+            pool.breaker.failure()
+            with pool._lock:
+                pool.stats.errors += 1
+            self.requests.labels(label, "error").inc()
+            raise
+        except BaseException:
+            pool.breaker.cancel()  # the caller's request was bad, not the host
+            raise
+        finally:
+            self.latency.labels(label).observe((time.perf_counter() - start) * 1000)
+        response.url = url
+        if response.status >= 500:
+            pool.breaker.failure()
+        else:
+            pool.breaker.success()
+        with pool._lock:
+            pool.stats.requests += 1
+            status_class = f"{response.status // 100}xx"
+            pool.stats.statuses[status_class] = pool.stats.statuses.get(status_class, 0) + 1
+        self.requests.labels(label, status_class).inc()
+        return response
+
+    def _send(self, pool, label, method, target, body, headers, timeout):
+        for attempt in (0, 1):
+            try:
+                conn, reused = pool.acquire(timeout)
+            except OSError as exc:
+                raise OutboundError(f"{method} {label}{target} failed: {exc}") from exc
+            if not reused:
+                self.connections.labels(label).inc()
+            sent = False
+            try:
+                conn.request(method, target, body=body, headers=headers)
+                sent = True
+                raw = conn.getresponse()
+                data = raw.read()
+            except RETRY_ON_REUSED as exc:
+                pool.release(conn, reusable=False)
+                if reused and attempt == 0 and (not sent or method.upper() in IDEMPOTENT_METHODS):
+                    # The server closed the idle connection as we sent; a repeat is harmless
+                    with pool._lock:
+                        pool.stats.retried += 1
+                    continue
+                raise OutboundError(f"{method} {label}{target} failed: {exc}") from exc
+            except (OSError, http.client.HTTPException) as exc:
+                pool.release(conn, reusable=False)
+                raise OutboundError(f"{method} {label}{target} failed: {exc}") from exc
+            except BaseException:  # e.g. ValueError for a header value with CR/LF: free the slot
+                pool.release(conn, reusable=False)
+                raise
+            pool.release(conn, reusable=not raw.will_close)
+            return Response(raw.status, {k.lower(): v for k, v in raw.getheaders()}, data)
+
+    def _send_http2(self, method, url, body, headers, timeout):
+        import httpx
+
+        try:
+            raw = self._httpx.request(method, url, content=body, headers=headers, timeout=timeout)
+        except httpx.HTTPError as exc:
+            raise OutboundError(f"{method} {url} failed: {exc}") from exc
+        return Response(raw.status_code, {k.lower(): v for k, v in raw.headers.items()}, raw.content)
+
+    def stats(self):
+        """Per-host counters, idle connections and breaker state"""
+        with self._lock:
+            pools = list(self._pools.values())
+        result = {}
+        for pool in pools:
+            host = pool.host if pool.port in (80, 443) else f"{pool.host}:{pool.port}"
+            with pool._lock:
+                result[host] = {**pool.stats.as_dict(), "idle": len(pool._idle), "breaker": pool.breaker.state}
+        return result
+
+    def close(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
+        if self._httpx is not None:
+            self._httpx.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide client shared by the store and the notifiers"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = OutboundClient()
+        return _default
+
+
+def set_client(client):
+    """Replace the process-wide client; returns the old one"""
+    global _default
+    with _default_lock:
+        old, _default = _default, client
+    return old
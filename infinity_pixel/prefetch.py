@@ -0,0 +1,198 @@
+"""
+Speculative tool calls started as soon as a chat message arrives.
+
+The ``AI Agent`` works serially: one model step decides to search the
+knowledge base, the next waits for the passages and then decides to look
+up the ticket the customer mentioned. Both lookups are predictable from the
+message alone, so ``Prefetcher.start`` runs them in parallel with the
+model's first step, and ``ChatAgent`` hands a prefetched result to the
+agent when its tool call matches the prediction:
+
+* ``RetrievalSpeculation``: the knowledge-base search with the message as
+  query, accepted when the agent's query shares enough words with it;
+* ``TicketSpeculation``: a ``status`` lookup for every ``TCK-`` ID in the
+  message, accepted by a status call for the same ID and invalidated when
+  the agent updates or closes that ticket first.
+
+Only reads are speculated. Every prediction ends as a ``hit`` (used) or
+``waste`` (never asked for, invalidated, or left over at the end of the
+turn); a read the speculations could have predicted but did not (a status
+or knowledge query, not a write) is a ``miss``. The counts
+are exported as ``prefetch_requests_total{tool,result}`` and summarized by
+``Prefetcher.stats``.
+
+Usage:
+    turn = prefetcher.start(session_id, text, tools)   # tools: name -> Tool
+    future = turn.take("ManageTickets", {"action": "status", "ticketId": ticket_id})  # or None
+    ...
+    turn.finish()
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import get_registry
+from .search import tokenize
+from .tickets import TICKET_ID_IN_TEXT
+
+RESULTS = ("started", "hit", "waste", "miss")
+
+
+class Speculation:
+    """Predicts the calls one tool will get for a message"""
+
+    tool = None
+
+    def predict(self, text):
+        """Arguments of the calls to start for ``text``"""
+        raise NotImplementedError
+
+    def accepts(self, predicted, arguments):
+        """True when the prefetched result answers a call with ``arguments``"""
+        return predicted == arguments
+
+    def invalidates(self, predicted, arguments):
+        """True when a call with ``arguments`` makes the prefetched result stale"""
+        return False
+
+    def covers(self, arguments):
+        """True for the kind of call this speculation predicts; an unmatched one counts as a miss"""
+        return True
+
+
+class TicketSpeculation(Speculation):
+    """``status`` lookups for the ticket IDs mentioned in the message"""
+
+    def __init__(self, tool="ManageTickets"):
+        self.tool = tool
+
+    def predict(self, text):
+        ids = dict.fromkeys(match.group() for match in TICKET_ID_IN_TEXT.finditer(text or ""))
+        return [{"action": "status", "ticketId": ticket_id} for ticket_id in ids]
+
+    def accepts(self, predicted, arguments):
+        return (str(arguments.get("action") or "").lower() == "status"
+                and str(arguments.get("ticketId") or "").strip().upper() == predicted["ticketId"])
+
+    def invalidates(self, predicted, arguments):
+        return (str(arguments.get("action") or "").lower() != "status"
+                and str(arguments.get("ticketId") or "").strip().upper() == predicted["ticketId"])
+
+    def covers(self, arguments):
+        return str(arguments.get("action") or "").lower() == "status"
+
+
+class RetrievalSpeculation(Speculation):
+    """A knowledge-base search with the message as query"""
+
+    def __init__(self, tool="knowledge_base", min_overlap=0.5):
+        self.tool = tool
+        self.min_overlap = min_overlap
+
+    def predict(self, text):
+        return [{"query": text}] if tokenize(text or "") else []
+
+    def accepts(self, predicted, arguments):
+        expected = set(tokenize(predicted["query"]))
+        actual = set(tokenize(str(arguments.get("query") or "")))
+        if not expected or not actual:
+            return False
+        return len(expected & actual) / min(len(expected), len(actual)) >= self.min_overlap
+
+
+class _Entry:
+    __slots__ = ("speculation", "arguments", "future", "state")
+
+    def __init__(self, speculation, arguments, future):
+        self.speculation = speculation
+        self.arguments = arguments
+        self.future = future
+        self.state = "pending"
+
+
+class PrefetchTurn:
+    """The speculative calls of one chat turn"""
+
+    def __init__(self, prefetcher, entries):
+        self.prefetcher = prefetcher
+        self.entries = entries
+        self._lock = threading.Lock()
+
+    def take(self, tool, arguments):
+        """The future of a prefetched call answering ``tool(arguments)``, or None"""
+        hit = None
+        with self._lock:
+            for entry in self.entries:
+                if entry.speculation.tool != tool or entry.state != "pending":
+                    continue
+                if entry.speculation.invalidates(entry.arguments, arguments):
+                    entry.state = "waste"
+                    self.prefetcher._count(tool, "waste")
+                elif hit is None and entry.speculation.accepts(entry.arguments, arguments):
+                    entry.state = "hit"
+                    hit = entry
+        if hit is not None:
+            self.prefetcher._count(tool, "hit")
+            return hit.future
+        if any(s.tool == tool and s.covers(arguments) for s in self.prefetcher.speculations):
+            self.prefetcher._count(tool, "miss")
+        return None
+
+    def finish(self):
+        """Count the predictions the agent never asked for as waste"""
+        with self._lock:
+            for entry in self.entries:
+                if entry.state == "pending":
+                    entry.state = "waste"
+                    entry.future.cancel()
+                    self.prefetcher._count(entry.speculation.tool, "waste")
+
+
+class Prefetcher:
+    """Starts the ``speculations``' predicted tool calls on a thread pool"""
+
+    def __init__(self, speculations=None, max_workers=16, registry=None):
+        self.speculations = list(speculations if speculations is not None
+                                 else [RetrievalSpeculation(), TicketSpeculation()])
+        self.tools = {speculation.tool for speculation in self.speculations}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._counts = {}
+        self._lock = threading.Lock()
+        self.requests = (registry or get_registry()).counter(
+            "prefetch_requests_total", "Speculative tool calls by tool and result", ["tool", "result"])
+
+    def _count(self, tool, result):
+        self.requests.labels(tool, result).inc()
+        with self._lock:
+            key = (tool, result)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def start(self, session_id, text, tools):
+        """Start the predicted calls for one message; ``tools`` maps names to tools with ``fn(arguments, session)``"""
+        entries = []
+        for speculation in self.speculations:
+            tool = tools.get(speculation.tool)
+            if tool is None:
+                continue
+            for arguments in speculation.predict(text):
+                future = self._executor.submit(tool.fn, dict(arguments), session_id)
+                entries.append(_Entry(speculation, arguments, future))
+                self._count(speculation.tool, "started")
+        return PrefetchTurn(self, entries)
+
+    def stats(self):
+        """Counts per result, and hit/waste rates of the started calls"""
+        with self._lock:
+            counts = dict(self._counts)
+        totals = {result: sum(n for (_, r), n in counts.items() if r == result) for result in RESULTS}
+        started = totals["started"]
+        return {
+            **totals,
+            "hitRate": round(totals["hit"] / started, 3) if started else 0.0,
+            "wasteRate": round(totals["waste"] / started, 3) if started else 0.0,
+            "tools": {tool: {result: counts.get((tool, result), 0) for result in RESULTS}
+                      for tool in sorted({tool for tool, _ in counts})},
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,751 @@
+"""
+Record chat sessions and replay them against the local stack.
+
+The shell tests (``tests/test_all_actions_responses.sh``,
+``test_close_bug_reproduction.sh``) send one hand-written payload each.
+``Recorder`` wraps a ``ChatAgent`` (pass it to ``chat.serve`` in its place)
+and appends every turn to a JSONL file: the user's message, each model
+step (its text, tool calls and timing), each tool call with its result
+and duration, and the answer with time-to-first-token and total time.
+A session's turns are held until it goes idle (``idle_s``) and then
+anonymized together, so a name given before the tool call that carries it
+is caught too: session ids are replaced by keyed hashes, e-mail addresses
+and phone numbers by stable pseudonyms, and customer names
+(``name``/``customerName`` arguments and results) by ``Customer <hash>``,
+also where they appear in that session's text. Ticket IDs
+are kept so later turns still refer to the tickets earlier ones created.
+
+``Replayer`` plays a recording against an agent built on the local stack,
+with the LLM replaced by ``RecordedChatModel``, which streams each turn's
+recorded steps with their recorded latencies (scaled by ``latency``).
+Sessions run concurrently and keep their recorded pacing, ``speed`` times
+faster (0: back to back); the turns of one session run in order. Ticket
+IDs created during the replay are mapped back to the recorded ones, so
+tool results and answers compare directly. ``compare`` reports latency
+regressions (p95 of total, time-to-first-token and each tool, beyond
+``threshold`` and ``min_ms``) and response diffs between a recording and
+a replay, or between two replays (e.g. ``main`` and a branch).
+
+Usage:
+    serve(Recorder(agent, "var/sessions.jsonl"))
+    replayed = Replayer(lambda model: ChatAgent(model, [ticket_tool(backend)]), speed=10).replay(load(path))
+    print(compare(load(path), replayed).render())
+
+    python -m infinity_pixel.replay record --port 8081 --out sessions.jsonl     # fake model, in-memory tickets
+    python -m infinity_pixel.replay run sessions.jsonl --speed 10 --save replay.jsonl
+    python -m infinity_pixel.replay run sessions.jsonl --speed 10 --baseline replay.jsonl   # exit 1 on regressions
+    python -m infinity_pixel.replay diff replay.jsonl other.jsonl
+"""
+
+import argparse
+import difflib
+import hashlib
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+
+from .chat import ChatModel, ToolCall
+from .tickets import TICKET_ID_IN_TEXT
+
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE = re.compile(r"(?<![\w-])\+?\d[\d ().-]{6,}\d(?![\w-])")
+TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?")
+NAME_KEYS = ("name", "customerName", "Customer Name")
+
+
+class _Names:
+    """The customer names learned in one session, replaced by a single alternation"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.pseudonyms = {}  # name -> pseudonym
+        self._pattern = None
+
+    def add(self, name, pseudonym):
+        if name not in self.pseudonyms and len(self.pseudonyms) < self.limit:
+            self.pseudonyms[name] = pseudonym
+            self._pattern = None
+
+    def sub(self, value):
+        if not self.pseudonyms:
+            return value
+        if self._pattern is None:
+            names = sorted(self.pseudonyms, key=len, reverse=True)  # "Ada Lovelace" before "Ada"
+            self._pattern = re.compile(rf"\b(?:{'|'.join(map(re.escape, names))})\b")
+        return self._pattern.sub(lambda m: self.pseudonyms[m.group()], value)
+
+
+class Anonymizer:
+    """
+    Stable, keyed pseudonyms for session ids, e-mail addresses, phone numbers and customer names.
+
+    Customer names are learned per session and only replaced in that session's turns, so a name one
+    customer gave does not rewrite other sessions' text; ``max_sessions`` sessions (least recently
+    used first out) of up to ``max_names`` names each are kept.
+    """
+
+    def __init__(self, key=None, max_sessions=10_000, max_names=64):
+        self.key = key if key is not None else os.urandom(16)
+        self.max_sessions = max_sessions
+        self.max_names = max_names
+        self._sessions = OrderedDict()  # session id -> _Names
+
+    def _hash(self, value, n=8):
+        return hmac.new(self.key, value.strip().lower().encode("utf-8"), hashlib.sha256).hexdigest()[:n]
+
+    def session(self, session_id):
+        return f"s-{self._hash(str(session_id), 12)}"
+
+    def names(self, session_id):
+        """The names learned in ``session_id`` so far (created on first use)"""
+        names = self._sessions.get(session_id)
+        if names is None:
+            names = self._sessions[session_id] = _Names(self.max_names)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return names
+
+    def _phone(self, match):
+        digits = re.sub(r"\D", "", match.group())
+        return f"+1-555-{int(self._hash(digits), 16) % 10_000_000:07d}" if len(digits) >= 9 else match.group()
+
+    def text(self, value, names=None):
+        value = EMAIL.sub(lambda m: f"user-{self._hash(m.group())}@example.com", value)
+        value = PHONE.sub(self._phone, value)
+        return names.sub(value) if names is not None else value
+
+    def learn(self, value, names):
+        """Collect the customer names in tool arguments or results into ``names``"""
+        if isinstance(value, dict):
+            for k, v in value.items():
+                if k in NAME_KEYS and isinstance(v, str) and len(v.strip()) > 1 and not v.startswith("Customer "):
+                    names.add(v.strip(), f"Customer {self._hash(v, 6)}")
+                else:
+                    self.learn(v, names)
+        elif isinstance(value, list):
+            for v in value:
+                self.learn(v, names)
+
+    def value(self, value, names=None):
+        if isinstance(value, str):
+            return self.text(value, names)
+        if isinstance(value, dict):
+            return {k: self.value(v, names) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.value(v, names) for v in value]
+        return value
+
+    def turns(self, records):
+        """Anonymize turns of one session with every name learned in any of them (or earlier in the session)"""
+        if not records:
+            return []
+        names = self.names(records[0]["session"])
+        for record in records:
+            for entry in record["tools"]:
+                self.learn(entry["arguments"], names)
+                self.learn(entry["result"], names)
+            for step in record["steps"]:
+                for call in step["toolCalls"]:
+                    self.learn(call["arguments"], names)
+        return [{**self.value(record, names), "session": self.session(record["session"])} for record in records]
+
+    def turn(self, record):
+        return self.turns([record])[0]
+
+
+def _jsonable(value):
+    return json.loads(json.dumps(value, default=str))
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def _call_key(session_id, name, arguments):
+    return session_id, name, json.dumps(arguments, sort_keys=True, default=str)
+
+
+class _Turns:
+    """
+    The turns in progress, shared by the model and tool wrappers.
+
+    Tools run on the agent's executor threads, so a tool call is matched to its turn by the call the
+    turn's model step asked for (session, tool and arguments); several turns of one session can be in
+    progress at once. A call no step asked for (a prefetch) goes to the session's turn if it has one.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._expected = {}  # (session, tool, arguments) -> deque of turns
+        self._open = {}  # session -> turns in progress
+        self._lock = threading.Lock()
+
+    def begin(self, session_id, record):
+        self._local.turn = record
+        with self._lock:
+            self._open.setdefault(session_id, []).append(record)
+
+    def end(self, session_id):
+        record = self._local.turn
+        self._local.turn = None
+        with self._lock:
+            open_turns = [t for t in self._open.get(session_id, ()) if t is not record]
+            if open_turns:
+                self._open[session_id] = open_turns
+            else:
+                self._open.pop(session_id, None)
+            for key in record.pop("_expects", ()) if record else ():  # calls the turn never made
+                waiting = deque(t for t in self._expected.get(key, ()) if t is not record)
+                if waiting:
+                    self._expected[key] = waiting
+                else:
+                    self._expected.pop(key, None)
+
+    def current(self):
+        return getattr(self._local, "turn", None)
+
+    def expect(self, session_id, call):
+        """Note that the current turn's model step asked for ``call``"""
+        turn = self.current()
+        if turn is None:
+            return
+        key = _call_key(session_id, call.name, call.arguments)
+        with self._lock:
+            self._expected.setdefault(key, deque()).append(turn)
+            turn.setdefault("_expects", []).append(key)
+
+    def add_tool(self, session_id, name, arguments, entry):
+        """Append a tool call to the turn that asked for it; returns the turn (None outside one)"""
+        key = _call_key(session_id, name, arguments)
+        with self._lock:
+            waiting = self._expected.get(key)
+            if waiting:
+                turn = waiting.popleft()
+                turn["_expects"].remove(key)
+                if not waiting:
+                    del self._expected[key]
+            else:
+                open_turns = self._open.get(session_id)
+                turn = open_turns[0] if open_turns and len(open_turns) == 1 else None
+            if turn is not None:
+                turn["tools"].append(entry)
+            return turn
+
+
+class _ExpectingModel(ChatModel):
+    """Tells ``turns`` which tool calls each model step asked for, from the turn's own thread"""
+
+    def __init__(self, model, turns):
+        self.model = model
+        self.turns = turns
+
+    def stream(self, messages, tools):
+        for item in self.model.stream(messages, tools):
+            if isinstance(item, ToolCall):
+                turn = self.turns.current()
+                if turn is not None:
+                    self.turns.expect(turn["session"], item)
+            yield item
+
+
+def _wrap_tools(agent, turns, on_result=None):
+    """Time each tool call into the turn that asked for it (``on_result(turn, entry, result)`` sees the raw result)"""
+
+    def wrap(tool):
+        def fn(arguments, session_id=None):
+            start = time.perf_counter()
+            result = tool.fn(arguments, session_id)
+            entry = {"name": tool.name, "arguments": _jsonable(arguments), "result": _jsonable(result),
+                     "ms": _ms(start)}
+            turn = turns.add_tool(session_id, tool.name, arguments, entry)
+            if turn is not None and on_result:
+                on_result(turn, entry, result)
+            return result
+
+        return replace(tool, fn=fn)
+
+    agent.model = _ExpectingModel(agent.model, turns)
+    agent.tools = {name: wrap(tool) for name, tool in agent.tools.items()}
+
+
+def _collect(events, record):
+    for event in events:
+        if event.type == "done":
+            record.update(output=event.data["output"], ttftMs=event.data.get("ttftMs"),
+                          totalMs=event.data["totalMs"])
+            if "route" in event.data:
+                record["route"] = event.data["route"]
+        elif event.type == "error":
+            record["error"] = event.data.get("error") or event.data.get("message")
+        yield event
+
+
+class _RecordingModel(ChatModel):
+    def __init__(self, model, turns):
+        self.model = model
+        self.turns = turns
+
+    def stream(self, messages, tools):
+        start = time.perf_counter()
+        step = {"text": "", "toolCalls": [], "firstMs": None, "ms": None}
+        parts = []
+        try:
+            for item in self.model.stream(messages, tools):
+                if isinstance(item, ToolCall):
+                    step["toolCalls"].append({"id": item.id, "name": item.name, "arguments": item.arguments})
+                else:
+                    if step["firstMs"] is None:
+                        step["firstMs"] = _ms(start)
+                    parts.append(item)
+                yield item
+        finally:
+            step["text"] = "".join(parts)
+            step["ms"] = _ms(start)
+            turn = self.turns.current()
+            if turn is not None:
+                turn["steps"].append(_jsonable(step))
+
+
+class Recorder:
+    """
+    A ``ChatAgent`` whose turns are appended, anonymized, to ``path`` as JSON lines.
+
+    The customer's name usually comes up turns before the tool call that carries it, so a session's turns
+    are held until it has been idle for ``idle_s`` (or ``close``) and anonymized together.
+    """
+
+    def __init__(self, agent, path, anonymizer=None, clock=time.monotonic, idle_s=300.0):
+        self.agent = agent
+        self.path = path
+        self.anonymizer = anonymizer or Anonymizer()
+        self.clock = clock
+        self.idle_s = idle_s
+        self.started = clock()
+        self.turns = 0
+        self._counts = {}  # session -> turns so far
+        self._held = {}  # session -> complete turns not written yet
+        self._active = {}  # session -> turns in progress
+        self._seen = {}  # session -> clock() of its last activity
+        self._turns = _Turns()
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        self._stop = threading.Event()
+        agent.model = _RecordingModel(agent.model, self._turns)
+        _wrap_tools(agent, self._turns)
+        self._flusher = threading.Thread(target=self._flush_idle, name="replay-recorder", daemon=True)
+        self._flusher.start()
+
+    def run(self, session_id, text):
+        """``ChatAgent.run``, recording the turn once it is complete"""
+        with self._lock:
+            n = self._counts[session_id] = self._counts.get(session_id, 0) + 1
+            self._active[session_id] = self._active.get(session_id, 0) + 1
+            self._seen[session_id] = self.clock()
+        record = {"session": session_id, "turn": n, "at": round(self.clock() - self.started, 3), "input": text,
+                  "steps": [], "tools": []}
+        self._turns.begin(session_id, record)
+        try:
+            yield from _collect(self.agent.run(session_id, text), record)
+        finally:
+            self._turns.end(session_id)
+            with self._lock:
+                self._active[session_id] -= 1
+                if not self._active[session_id]:
+                    del self._active[session_id]
+                self._seen[session_id] = self.clock()
+                if "totalMs" in record or "error" in record:
+                    self._held.setdefault(session_id, []).append(record)
+
+    def flush(self, idle_s=None):
+        """Write the held turns of sessions idle for ``idle_s`` (None: every session without a turn in progress)"""
+        with self._lock:
+            now = self.clock()
+            for session_id in [s for s in self._seen if s not in self._active]:
+                if idle_s is not None and now - self._seen[session_id] < idle_s:
+                    continue
+                del self._seen[session_id]
+                for record in self.anonymizer.turns(self._held.pop(session_id, [])):
+                    self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    self.turns += 1
+            self._file.flush()
+
+    def _flush_idle(self):
+        while not self._stop.wait(min(self.idle_s, 5.0)):
+            self.flush(self.idle_s)
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join()
+        self.flush()
+        with self._lock:
+            self._file.close()
+        self.agent.close()
+
+
+def load(path):
+    """Turn records from a recording or replay file, in recorded order"""
+    with open(path, encoding="utf-8") as f:
+        turns = [json.loads(line) for line in f if line.strip()]
+    return sorted(turns, key=lambda t: (t.get("at") or 0, t["session"], t["turn"]))
+
+
+def save(path, turns):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for turn in turns:
+            f.write(json.dumps(turn, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+class _IdMap:
+    """Recorded ticket IDs <-> the ones the replayed stack created"""
+
+    def __init__(self):
+        self.to_replay = {}
+        self.to_recorded = {}
+        self._lock = threading.Lock()
+
+    def add(self, recorded, replayed):
+        if recorded != replayed and all(TICKET_ID_IN_TEXT.fullmatch(str(i or "")) for i in (recorded, replayed)):
+            with self._lock:
+                self.to_replay[recorded] = replayed
+                self.to_recorded[replayed] = recorded
+
+    @staticmethod
+    def _apply(mapping, value):
+        if not mapping:
+            return value
+        text = json.dumps(value, ensure_ascii=False)
+        return json.loads(TICKET_ID_IN_TEXT.sub(lambda m: mapping.get(m.group(), m.group()), text))
+
+    def replayed(self, value):
+        return self._apply(self.to_replay, value)
+
+    def recorded(self, value):
+        return self._apply(self.to_recorded, value)
+
+
+class RecordedChatModel(ChatModel):
+    """Streams the recorded model steps of the turn being replayed, with their latencies times ``latency``"""
+
+    def __init__(self, ids, latency=1.0):
+        self.ids = ids
+        self.latency = latency
+        self._local = threading.local()
+
+    def bind(self, turn, record):
+        self._local.steps = iter(turn.get("steps") or ())
+        self._local.record = record
+
+    def stream(self, messages, tools):
+        step = next(self._local.steps, None)
+        record = self._local.record
+        record["steps"] += 1
+        if step is None:  # the replayed stack asked for more than was recorded
+            record["extraSteps"] = record.get("extraSteps", 0) + 1
+            return
+        text = self.ids.replayed(step.get("text") or "")
+        first_s = (step.get("firstMs") or 0) * self.latency / 1000
+        total_s = (step.get("ms") or 0) * self.latency / 1000
+        if text:
+            words = text.split(" ")
+            time.sleep(first_s)
+            gap = max(0.0, total_s - first_s) / max(1, len(words) - 1)
+            for n, word in enumerate(words):
+                if n:
+                    time.sleep(gap)
+                yield word if n == len(words) - 1 else word + " "
+        else:
+            time.sleep(total_s)
+        for call in step.get("toolCalls") or ():
+            yield ToolCall(call["id"], call["name"], self.ids.replayed(call["arguments"]))
+
+
+class Replayer:
+    """Replays recorded turns through ``build(model)`` (a ``ChatAgent`` on the local stack)"""
+
+    def __init__(self, build, speed=1.0, latency=1.0, workers=32):
+        self.ids = _IdMap()
+        self.model = RecordedChatModel(self.ids, latency)
+        self.agent = build(self.model)
+        self.speed = speed
+        self.workers = workers
+        self._turns = _Turns()
+        _wrap_tools(self.agent, self._turns, self._map_ids)
+
+    def _map_ids(self, turn, entry, result):
+        """Pair a replayed tool call with the recorded one at the same position to learn created ticket IDs"""
+        recorded = turn["_recorded"]
+        position = sum(1 for e in turn["tools"] if e["name"] == entry["name"]) - 1
+        same = [e for e in recorded.get("tools") or () if e["name"] == entry["name"]]
+        if position < len(same) and isinstance(result, dict) and isinstance(same[position]["result"], dict):
+            self.ids.add(same[position]["result"].get("ticketId"), result.get("ticketId"))
+
+    def replay(self, turns):
+        """Replayed turn records (same fields as recorded ones, IDs mapped back, plus ``lagMs``), in input order"""
+        sessions = {}
+        for n, turn in enumerate(turns):
+            sessions.setdefault(turn["session"], []).append((n, turn))
+        results = [None] * len(turns)
+        start = time.perf_counter()
+
+        def run_session(entries):
+            for n, turn in entries:
+                due = (turn.get("at") or 0) / self.speed if self.speed else 0.0
+                wait = due - (time.perf_counter() - start)
+                if wait > 0:
+                    time.sleep(wait)
+                results[n] = self._replay_turn(turn, max(0.0, -wait) * 1000)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="replay") as executor:
+            for future in [executor.submit(run_session, entries) for entries in sessions.values()]:
+                future.result()
+        self.agent.close()
+        return results
+
+    def _replay_turn(self, turn, lag_ms):
+        session = turn["session"]
+        record = {"session": session, "turn": turn["turn"], "at": turn.get("at"), "input": turn["input"],
+                  "steps": 0, "tools": [], "lagMs": round(lag_ms, 2), "_recorded": turn}
+        self.model.bind(turn, record)
+        self._turns.begin(session, record)
+        try:
+            for _ in _collect(self.agent.run(session, self.ids.replayed(turn["input"])), record):
+                pass
+        finally:
+            self._turns.end(session)
+        del record["_recorded"]
+        record["tools"] = self.ids.recorded(record["tools"])
+        if "output" in record:
+            record["output"] = self.ids.recorded(record["output"])
+        return record
+
+
+@dataclass
+class Regression:
+    metric: str  # "total", "ttft" or "tool <name>"
+    reference_ms: float  # p95
+    candidate_ms: float
+    count: int
+
+    @property
+    def ratio(self):
+        return self.candidate_ms / self.reference_ms if self.reference_ms else float("inf")
+
+
+@dataclass
+class Diff:
+    session: str
+    turn: int
+    what: str
+    reference: object
+    candidate: object
+
+    def render(self):
+        if isinstance(self.reference, str) and isinstance(self.candidate, str):
+            lines = difflib.unified_diff(self.reference.splitlines(), self.candidate.splitlines(), "reference",
+                                         "candidate", lineterm="", n=1)
+            body = "\n".join(f"      {line}" for line in list(lines)[2:])
+        else:
+            body = f"      - {json.dumps(self.reference, ensure_ascii=False)[:300]}\n" \
+                   f"      + {json.dumps(self.candidate, ensure_ascii=False)[:300]}"
+        return f"   {self.session} turn {self.turn}, {self.what}:\n{body}"
+
+
+@dataclass
+class Report:
+    turns: int
+    latencies: dict  # metric -> (reference p50, p95, candidate p50, p95, count)
+    regressions: list = field(default_factory=list)
+    diffs: list = field(default_factory=list)
+    missing: int = 0  # reference turns absent from the candidate
+
+    @property
+    def ok(self):
+        return not self.regressions and not self.diffs and not self.missing
+
+    def render(self, max_diffs=20):
+        missing = f", {self.missing} missing" if self.missing else ""
+        lines = [f"{'✅' if self.ok else '❌'} {self.turns} turns compared: {len(self.regressions)} latency "
+                 f"regressions, {len(self.diffs)} response diffs{missing}"]
+        lines.append(f"   {'metric':<28} {'ref p50':>9} {'p95':>9} {'new p50':>9} {'p95':>9}")
+        flagged = {r.metric for r in self.regressions}
+        for metric, (ref50, ref95, new50, new95, count) in self.latencies.items():
+            mark = "  ⚠️ regression" if metric in flagged else ""
+            lines.append(f"   {metric:<28} {ref50:8.1f}ms {ref95:8.1f}ms {new50:8.1f}ms {new95:8.1f}ms{mark}")
+        lines.extend(diff.render() for diff in self.diffs[:max_diffs])
+        if len(self.diffs) > max_diffs:
+            lines.append(f"   … {len(self.diffs) - max_diffs} more")
+        return "\n".join(lines)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def _normalized(value):
+    """Timestamps differ between runs; everything else should not"""
+    return json.loads(TIMESTAMP.sub("<time>", json.dumps(value, ensure_ascii=False)))
+
+
+def _tool_key(tools):
+    seen = {}
+    keyed = {}
+    for entry in tools:
+        n = seen[entry["name"]] = seen.get(entry["name"], -1) + 1
+        keyed[(entry["name"], n)] = entry
+    return keyed
+
+
+def compare(reference, candidate, threshold=0.2, min_ms=2.0):
+    """
+    A ``Report`` of ``candidate`` turns against ``reference`` ones (paired by session and turn).
+
+    A metric regresses when its p95 is over ``threshold`` (a fraction) and ``min_ms`` above the reference's.
+    """
+    by_key = {(t["session"], t["turn"]): t for t in candidate if t}
+    samples = {}
+    diffs = []
+    missing = 0
+    for ref in reference:
+        new = by_key.get((ref["session"], ref["turn"]))
+        if new is None:
+            missing += 1
+            continue
+        pairs = [("total", ref.get("totalMs"), new.get("totalMs")), ("ttft", ref.get("ttftMs"), new.get("ttftMs"))]
+        ref_tools, new_tools = _tool_key(ref.get("tools") or ()), _tool_key(new.get("tools") or ())
+        for key in ref_tools.keys() & new_tools.keys():
+            pairs.append((f"tool {key[0]}", ref_tools[key]["ms"], new_tools[key]["ms"]))
+        for metric, a, b in pairs:
+            if a is not None and b is not None:
+                samples.setdefault(metric, ([], []))
+                samples[metric][0].append(a)
+                samples[metric][1].append(b)
+
+        session, turn = ref["session"], ref["turn"]
+        if ref.get("error") != new.get("error"):
+            diffs.append(Diff(session, turn, "error", ref.get("error"), new.get("error")))
+        for key in sorted(ref_tools.keys() | new_tools.keys()):
+            a = _normalized(ref_tools[key]["result"]) if key in ref_tools else None
+            b = _normalized(new_tools[key]["result"]) if key in new_tools else None
+            if a != b:
+                diffs.append(Diff(session, turn, f"tool {key[0]}#{key[1]}", a, b))
+        if _normalized(ref.get("output")) != _normalized(new.get("output")):
+            diffs.append(Diff(session, turn, "output", ref.get("output"), new.get("output")))
+
+    latencies = {}
+    regressions = []
+    for metric in sorted(samples, key=lambda m: (m.startswith("tool"), m)):
+        a, b = samples[metric]
+        ref95, new95 = _percentile(a, 0.95), _percentile(b, 0.95)
+        latencies[metric] = (_percentile(a, 0.5), ref95, _percentile(b, 0.5), new95, len(a))
+        if new95 > ref95 * (1 + threshold) and new95 - ref95 > min_ms:
+            regressions.append(Regression(metric, ref95, new95, len(a)))
+    return Report(len(reference) - missing, latencies, regressions, diffs, missing)
+
+
+def _local_agent(model, args, registry):
+    """``ChatAgent`` on the local stack: in-memory tickets (seeded from ``--tickets``), knowledge from ``--vectors``"""
+    from .backend import TicketBackend
+    from .chat import ChatAgent, knowledge_tool, ticket_tool
+    from .retrieval import ContextPacker
+    from .retrieval.generations import KnowledgeBase
+    from .retrieval.ingest import HashingEmbedder
+    from .retrieval.vectors import VectorStore, as_chunks
+    from .router import Router
+    from .store import InMemoryTicketStore
+    from .tickets import read_csv, record_fields
+
+    records = [record_fields(r) for r in read_csv(args.tickets)] if args.tickets else ()
+    tools = [ticket_tool(TicketBackend(InMemoryTicketStore(records), registry=registry))]
+    if args.vectors:
+        vectors = KnowledgeBase(args.vectors, registry=registry) if os.path.isdir(args.vectors) \
+            else VectorStore(args.vectors)
+        embed = HashingEmbedder(args.dims)
+        tools.append(knowledge_tool(lambda query: as_chunks(vectors.search(embed.vector(query), k=20)),
+                                    packer=ContextPacker()))
+    return ChatAgent(model, tools, router=Router() if args.router else None, registry=registry)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record chat sessions and replay them against the local stack")
+    sub = parser.add_subparsers(dest="command", required=True)
+    record = sub.add_parser("record", help="serve the chat gateway, recording every turn")
+    record.add_argument("--out", default="sessions.jsonl")
+    record.add_argument("--host", default="127.0.0.1")
+    record.add_argument("--port", type=int, default=8081)
+    run = sub.add_parser("run", help="replay a recording and compare it with the recording or a baseline replay")
+    run.add_argument("recording")
+    run.add_argument("--speed", type=float, default=1.0, help="N× the recorded pacing (0: back to back)")
+    run.add_argument("--latency", type=float, default=1.0, help="scale of the recorded model latencies")
+    run.add_argument("--baseline", help="an earlier replay (--save) to compare with instead of the recording")
+    run.add_argument("--save", help="write the replayed turns here")
+    run.add_argument("--threshold", type=float, default=0.2, help="p95 increase counted as a regression")
+    run.add_argument("--min-ms", type=float, default=2.0)
+    run.add_argument("--workers", type=int, default=32)
+    diff = sub.add_parser("diff", help="compare two recordings or replays")
+    diff.add_argument("reference")
+    diff.add_argument("candidate")
+    diff.add_argument("--threshold", type=float, default=0.2)
+    diff.add_argument("--min-ms", type=float, default=2.0)
+    for command in (record, run):
+        command.add_argument("--tickets", help="seed the in-memory store from an Airtable CSV export")
+        command.add_argument("--vectors", help="knowledge base (.qvec or generations directory)")
+        command.add_argument("--dims", type=int, default=256, help="hashing embedder dimensions for --vectors")
+        command.add_argument("--router", action="store_true", help="answer trivial turns from templates")
+    args = parser.parse_args(argv)
+
+    from .chat import FakeChatModel, serve
+    from .metrics import Registry
+
+    if args.command == "record":
+        recorder = Recorder(_local_agent(FakeChatModel(first_token_s=0.3, token_s=0.03), args, Registry()),
+                            args.out)
+        server = serve(recorder, args.host, args.port)
+        print(f"✅ Serving POST http://{args.host}:{args.port}/chat, recording to {args.out}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+            recorder.close()
+            print(f"✅ {recorder.turns} turns recorded")
+        return 0
+
+    try:
+        if args.command == "diff":
+            reference, candidate = load(args.reference), load(args.candidate)
+        else:
+            turns = load(args.recording)
+            reference = load(args.baseline) if args.baseline else turns
+    except (OSError, ValueError, KeyError) as exc:
+        print(f"❌ {exc}")
+        return 1
+    if args.command == "run":
+        sessions = len({t["session"] for t in turns})
+        start = time.perf_counter()
+        candidate = Replayer(lambda model: _local_agent(model, args, Registry()), args.speed, args.latency,
+                             args.workers).replay(turns)
+        elapsed = time.perf_counter() - start
+        recorded_s = max((t.get("at") or 0) for t in turns) if turns else 0
+        lags = [t["lagMs"] for t in candidate]
+        print(f"✅ Replayed {len(turns)} turns of {sessions} sessions in {elapsed:.1f} s (recorded over "
+              f"{recorded_s:.0f} s, {args.speed:g}×); start lag p95 {_percentile(lags, 0.95):.1f} ms")
+        if args.save:
+            save(args.save, candidate)
+    report = compare(reference, candidate, args.threshold, args.min_ms)
+    print(report.render())
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Degraded mode for Airtable and notification outages.
+
+The backend calls each dependency (Airtable, and every notifier by its
+node name) through a ``Guard``: a call that takes longer than the guard's
+timeout is abandoned, and after repeated failures the dependency's
+``CircuitBreaker`` opens so calls fail fast with ``DependencyUnavailable``
+until a half-open probe finds it back. Chat requests therefore wait at most
+one timeout for a dependency that is down, and usually not at all.
+
+While Airtable is unavailable the backend answers instead of failing:
+
+* creates are written to a ``CreateJournal`` with the ticket's ``TCK-`` ID
+  and confirmed as provisional; ``TicketBackend.replay_journal`` files them
+  once Airtable answers again (skipping any that did reach Airtable), and
+  then sends the usual notifications;
+* status is answered from the last known status with ``stale: true``;
+* update and close ask the customer to try again shortly.
+
+Usage:
+    backend = TicketBackend(store, dependencies=Dependencies(timeout_s=2.0, reset_s=30),
+                            journal=CreateJournal("var/create-journal.jsonl"))
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from . import tickets
+from .outbound import CircuitBreaker, OutboundError
+from .store import StoreError, VersionConflict
+
+STATE_CODES = {"closed": 0, "half_open": 1, "open": 2}
+_DEFAULT = object()
+
+
+class DependencyUnavailable(StoreError):
+    """A dependency is down (circuit open) or did not answer in time; the call was abandoned"""
+
+    def __init__(self, dependency, reason):
+        super().__init__(f"{dependency} unavailable: {reason}")
+        self.dependency = dependency
+        self.reason = reason
+
+
+def is_outage(exc):
+    """True for errors that mean the dependency is down rather than that the request was bad"""
+    if isinstance(exc, VersionConflict):
+        return False
+    if isinstance(exc, (StoreError, OutboundError)):
+        return exc.status is None or exc.status == 429 or exc.status >= 500
+    return isinstance(exc, OSError)
+
+
+class Guard:
+    """Timeout and circuit breaker around the calls to one dependency"""
+
+    def __init__(self, name, timeout_s=5.0, breaker=None, max_workers=32, on_state=None):
+        self.name = name
+        self.timeout_s = timeout_s
+        self.breaker = breaker or CircuitBreaker()
+        self.max_workers = max_workers
+        self.on_state = on_state
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=f"guard-{self.name}")
+        return self._executor.submit(contextvars.copy_context().run, fn, *args)
+
+    def call(self, fn, *args, timeout_s=_DEFAULT):
+        """
+        ``fn(*args)``, or ``DependencyUnavailable`` without calling it while the circuit is open.
+
+        ``timeout_s`` overrides the guard's timeout (None: run in the calling thread and wait), e.g. for a full
+        table scan in a background thread.
+        """
+        if timeout_s is _DEFAULT:
+            timeout_s = self.timeout_s
+        if not self.breaker.allow():
+            raise DependencyUnavailable(self.name, "circuit open")
+        try:
+            if timeout_s is None:
+                result = fn(*args)
+            else:
+                # The call keeps its worker thread until it returns; the caller does not wait for it
+                result = self._submit(fn, args).result(timeout_s)
+        except FutureTimeout:
+            self._failed()
+            raise DependencyUnavailable(self.name, f"no answer within {timeout_s}s") from None
+        except Exception as exc:
+            if is_outage(exc):
+                self._failed()
+            else:
+                self._succeeded()
+            raise
+        except BaseException:
+            self._failed()
+            raise
+        self._succeeded()
+        return result
+
+    def _failed(self):
+        self.breaker.failure()
+        if self.on_state:
+            self.on_state(self.name, self.breaker.state)
+
+    def _succeeded(self):
+        self.breaker.success()
+        if self.on_state:
+            self.on_state(self.name, "closed")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Dependencies:
+    """One ``Guard`` per dependency name, created on first use"""
+
+    def __init__(self, timeout_s=5.0, failures=5, reset_s=30.0, timeouts=None, max_workers=32,
+                 clock=time.monotonic):
+        self.timeout_s = timeout_s
+        self.failures = failures
+        self.reset_s = reset_s
+        self.timeouts = dict(timeouts or {})
+        self.max_workers = max_workers
+        self.clock = clock
+        self.on_state = None
+        self._guards = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            guard = self._guards.get(name)
+            if guard is None:
+                breaker = CircuitBreaker(self.failures, self.reset_s, self.clock)
+                guard = self._guards[name] = Guard(name, self.timeouts.get(name, self.timeout_s), breaker,
+                                                   self.max_workers, self._state_changed)
+            return guard
+
+    def _state_changed(self, name, state):
+        if self.on_state:
+            self.on_state(name, state)
+
+    def states(self):
+        with self._lock:
+            guards = list(self._guards.values())
+        return {guard.name: guard.breaker.state for guard in guards}
+
+    def close(self):
+        with self._lock:
+            guards = list(self._guards.values())
+        for guard in guards:
+            guard.close()
+
+
+class CreateJournal:
+    """
+    Creates accepted while Airtable was unavailable, keyed by Ticket ID.
+
+    With a ``path`` the journal is an append-only JSONL file (``add`` and
+    ``done`` lines, fsynced), so queued tickets survive a restart; it is
+    compacted when loaded. Without one it is kept in memory only
+    (``durable`` is false) and queued tickets are lost if the process stops.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    @property
+    def durable(self):
+        return bool(self.path)
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    continue  # a write torn by a crash
+                if op.get("op") == "add":
+                    self._entries[op["ticketId"]] = {"fields": op["fields"], "queuedAt": op["queuedAt"]}
+                elif op.get("op") == "done":
+                    self._entries.pop(op["ticketId"], None)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for ticket_id, entry in self._entries.items():
+                f.write(json.dumps({"op": "add", "ticketId": ticket_id, **entry}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _append(self, op):
+        if not self.path:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(op) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def add(self, ticket_id, fields, queued_at):
+        with self._lock:
+            self._append({"op": "add", "ticketId": ticket_id, "fields": fields, "queuedAt": queued_at})
+            self._entries[ticket_id] = {"fields": fields, "queuedAt": queued_at}
+
+    def done(self, ticket_id):
+        with self._lock:
+            if self._entries.pop(ticket_id, None) is not None:
+                self._append({"op": "done", "ticketId": ticket_id})
+
+    def get(self, ticket_id):
+        with self._lock:
+            return self._entries.get(ticket_id)
+
+    def pending(self):
+        """``(ticket_id, entry)`` pairs, oldest first"""
+        with self._lock:
+            return list(self._entries.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def queued_create_response(fields, durable=True):
+    """Create response for a ticket written to the journal instead of Airtable"""
+    record = {"fields": fields}
+    ticket_id = fields.get("Ticket ID", "")
+    message = (f"I've logged your issue \"{fields.get('Subject', '')}\" as ticket {ticket_id}. Our ticket system is "
+               "briefly unavailable, so it will be filed automatically in a few minutes; ")
+    if durable:
+        message += "please keep this ID."
+    else:
+        message += ("please keep this ID, and if a status check in a few minutes can't find it, "
+                    "please send your issue again.")
+    response = tickets.build_action_response("create", record, message)
+    response.update(provisional=True, degraded=True)
+    return response
+
+
+def queued_response(action, ticket_id, entry):
+    """Status/update/close of a ticket still waiting in the journal"""
+    fields = entry["fields"]
+    if action == "status":
+        message = f"Ticket {ticket_id} is open and is still being filed. Subject: {fields.get('Subject', '')}."
+    else:
+        message = (f"Ticket {ticket_id} is still being filed, so I can't {action} it yet. "
+                   "Please try again in a few minutes.")
+    return {
+        "action": action,
+        "ticketId": ticket_id,
+        "status": "open",
+        "priority": fields.get("Priority", "medium"),
+        "messageForUser": message,
+        "internalNotes": "",
+        "provisional": True,
+        "degraded": True,
+        **({"skipUpdate": True} if action != "status" else {}),
+    }
+
+
+def stale_status_response(response, as_of_ms):
+    """A status response remembered from before the outage"""
+    stale = dict(response)
+    stale.update(stale=True, degraded=True, asOf=tickets.format_timestamp(as_of_ms))
+    stale["messageForUser"] = (f"{response['messageForUser']} (Last known status as of "
+                               f"{stale['asOf']}; our ticket system is briefly unavailable.)")
+    return stale
+
+
+def unavailable_response(action, ticket_id):
+    """Response when Airtable is down and there is nothing to answer from"""
+    response = {
+        "action": action,
+        "ticketId": ticket_id,
+        "status": "unavailable",
+        "priority": "",
+        "messageForUser": "Our ticket system is briefly unavailable. Please try again in a few minutes.",
+        "internalNotes": "",
+        "degraded": True,
+    }
+    if action in ("update", "close"):
+        response["skipUpdate"] = True
+    return response
@@ -0,0 +1,8 @@
+"""
+Knowledge-base retrieval: chunking documents and packing retrieved chunks into the prompt.
+"""
+
+from .packer import ContextPacker, PackedContext, Passage, estimate_tokens
+from .splitter import Chunk, split_text
+
+__all__ = ["Chunk", "ContextPacker", "PackedContext", "Passage", "estimate_tokens", "split_text"]
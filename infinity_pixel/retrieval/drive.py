@@ -0,0 +1,202 @@
+"""
+Google Drive change feed: the REST client and an in-memory fake.
+
+Both expose the calls ``ingest.Ingestor`` makes, with Drive v3 response
+shapes:
+
+* ``start_page_token()``: where the change feed starts (``changes.getStartPageToken``);
+* ``list_changes(token)``: one page of changes since ``token``, with
+  ``nextPageToken`` or, on the last page, ``newStartPageToken``;
+* ``list_files(folder_id)``: the files of a folder, for the initial sync;
+* ``download(file)``: a file's content; Google Docs are exported as text;
+* ``watch(token, address)``: push notifications of new changes to a webhook.
+
+``FakeDrive`` keeps files and the change log in memory, counts the calls
+made to it, and calls ``on_change`` (its stand-in for a watch channel)
+after each modification.
+
+Usage:
+    drive = GoogleDrive(access_token)
+    drive = FakeDrive(); file_id = drive.create("faq.md", "# FAQ", "folder-1")
+"""
+
+import json
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from datetime import datetime, timezone
+
+from ..outbound import OutboundError, get_client
+
+GOOGLE_APPS_PREFIX = "application/vnd.google-apps."
+FILE_FIELDS = "id,name,mimeType,parents,trashed,createdTime,modifiedTime,md5Checksum,version"
+
+
+class DriveError(Exception):
+    """A Drive API call failed; ``status`` is the HTTP status when there was a response"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def rfc3339(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def parse_rfc3339(value):
+    """Seconds since the epoch of a Drive timestamp such as ``2025-12-02T10:00:00.000Z``"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class GoogleDrive:
+    """Drive v3 REST calls with an OAuth access token, over the shared outbound client"""
+
+    API = "https://www.googleapis.com/drive/v3"
+
+    def __init__(self, token, timeout=30.0, client=None):
+        self.token = token
+        self.timeout = timeout
+        self.client = client or get_client()
+
+    def _request(self, method, path, params=None, body=None, raw=False):
+        url = f"{self.API}/{path}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Authorization": f"Bearer {self.token}"}
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+        try:
+            response = self.client.request(method, url, data, headers, timeout=self.timeout)
+        except OutboundError as exc:
+            raise DriveError(f"Drive {method} {path} failed: {exc.__cause__ or exc}") from exc
+        if response.status >= 400:
+            raise DriveError(f"Drive {method} {path} failed: HTTP {response.status}", response.status)
+        return response.data if raw else response.json()
+
+    def start_page_token(self):
+        return self._request("GET", "changes/startPageToken")["startPageToken"]
+
+    def list_changes(self, page_token, page_size=100):
+        return self._request("GET", "changes", {
+            "pageToken": page_token, "pageSize": page_size, "includeRemoved": "true",
+            "fields": f"nextPageToken,newStartPageToken,changes(fileId,removed,time,file({FILE_FIELDS}))",
+        })
+
+    def list_files(self, folder_id, page_token=None):
+        params = {"q": f"'{folder_id}' in parents and trashed = false", "pageSize": 1000,
+                  "fields": f"nextPageToken,files({FILE_FIELDS})"}
+        if page_token:
+            params["pageToken"] = page_token
+        return self._request("GET", "files", params)
+
+    def download(self, file):
+        if file.get("mimeType", "").startswith(GOOGLE_APPS_PREFIX):
+            return self._request("GET", f"files/{file['id']}/export", {"mimeType": "text/plain"}, raw=True)
+        return self._request("GET", f"files/{file['id']}", {"alt": "media"}, raw=True)
+
+    def watch(self, page_token, address, channel_id, ttl_s=86_400):
+        """Ask Drive to POST to ``address`` (HTTPS) whenever changes follow ``page_token``"""
+        return self._request("POST", "changes/watch", {"pageToken": page_token}, {
+            "id": channel_id, "type": "web_hook", "address": address,
+            "expiration": int((time.time() + ttl_s) * 1000),
+        })
+
+
+class FakeDrive:
+    """In-memory Drive with a change log, for tests and benchmarks"""
+
+    def __init__(self, clock=time.time, on_change=None):
+        self.clock = clock
+        self.on_change = on_change
+        self.files = {}  # id -> file resource
+        self.contents = {}
+        self.changes = []  # change resources; a page token is an index into this list
+        self.calls = Counter()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    # -- modifications (what users do in the Drive UI) --
+
+    def create(self, name, content, folder_id, mime_type="text/plain"):
+        with self._lock:
+            self._next_id += 1
+            file_id = f"file-{self._next_id}"
+            self.files[file_id] = {"id": file_id, "name": name, "mimeType": mime_type, "parents": [folder_id],
+                                   "trashed": False, "createdTime": rfc3339(self.clock()), "version": "0"}
+            self._write(file_id, content)
+        return self._changed(file_id)
+
+    def update(self, file_id, content=None, name=None):
+        with self._lock:
+            if name is not None:
+                self.files[file_id]["name"] = name
+            self._write(file_id, self.contents[file_id] if content is None else content)
+        return self._changed(file_id)
+
+    def move(self, file_id, folder_id):
+        with self._lock:
+            self.files[file_id]["parents"] = [folder_id]
+            self._write(file_id, self.contents[file_id])
+        return self._changed(file_id)
+
+    def trash(self, file_id):
+        with self._lock:
+            self.files[file_id]["trashed"] = True
+            self._write(file_id, self.contents[file_id])
+        return self._changed(file_id)
+
+    def delete(self, file_id):
+        with self._lock:
+            del self.files[file_id]
+            del self.contents[file_id]
+            self.changes.append({"fileId": file_id, "removed": True, "time": rfc3339(self.clock())})
+        return self._changed(file_id)
+
+    def _write(self, file_id, content):
+        file = self.files[file_id]
+        self.contents[file_id] = content.encode("utf-8") if isinstance(content, str) else content
+        file["version"] = str(int(file["version"]) + 1)
+        file["modifiedTime"] = rfc3339(self.clock())
+        self.changes.append({"fileId": file_id, "removed": False, "time": file["modifiedTime"], "file": dict(file)})
+
+    def _changed(self, file_id):
+        if self.on_change:
+            self.on_change(file_id)
+        return file_id
+
+    # -- API --
+
+    def start_page_token(self):
+        with self._lock:
+            self.calls["changes.getStartPageToken"] += 1
+            return str(len(self.changes))
+
+    def list_changes(self, page_token, page_size=100):
+        with self._lock:
+            self.calls["changes.list"] += 1
+            start = int(page_token)
+            page = [dict(c) for c in self.changes[start:start + page_size]]
+            end = start + len(page)
+            if end < len(self.changes):
+                return {"changes": page, "nextPageToken": str(end)}
+            return {"changes": page, "newStartPageToken": str(end)}
+
+    def list_files(self, folder_id, page_token=None):
+        with self._lock:
+            self.calls["files.list"] += 1
+            return {"files": [dict(f) for f in self.files.values()
+                              if folder_id in f["parents"] and not f["trashed"]]}
+
+    def download(self, file):
+        with self._lock:
+            self.calls["files.get"] += 1
+            if file["id"] not in self.contents:
+                raise DriveError(f"file {file['id']} not found", 404)
+            return self.contents[file["id"]]
+
+    def watch(self, page_token, address, channel_id, ttl_s=86_400):
+        self.calls["changes.watch"] += 1
+        return {"id": channel_id, "resourceId": "fake", "expiration": str(int((self.clock() + ttl_s) * 1000))}
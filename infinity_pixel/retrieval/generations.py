@@ -0,0 +1,365 @@
+"""
+Versioned knowledge-base builds with an atomic swap.
+
+The workflow's Drive triggers insert every changed document into the
+``Pinecone Vector Store`` in insert mode: while a document is re-inserted
+queries see its old and new chunks side by side, and the old vectors are
+never deleted. ``KnowledgeBase`` keeps the knowledge base as numbered
+generations of ``.qvec`` files (see ``vectors``) in one directory:
+
+* ``build`` writes the index into a new generation next to the live one,
+  off the read path, and validates it: it must open, have the live
+  generation's dimensions, keep at least ``min_ratio`` of its vectors
+  (a half-finished re-index is not published) and find its own probe
+  vectors; ``validate`` can add checks. A rejected build is deleted.
+* ``publish`` swaps the read pointer: the ``CURRENT`` file is replaced
+  with ``os.replace`` (atomic), then the in-process pointer, under a lock
+  held only for the swap.
+* Readers ``acquire`` a generation (or use ``snapshot``/``search``), which
+  counts a reference: a query, or a whole chat turn, sees one generation
+  from start to end while a newer one is published. A replaced generation
+  is closed when its last reader releases it, and its file deleted once
+  it is not among the ``keep`` newest previous generations (kept for
+  ``rollback``).
+* Other processes serving the same directory pick up a new ``CURRENT``
+  within ``check_s``; a file they still map stays readable after it is
+  deleted.
+
+Usage:
+    kb = KnowledgeBase("var/kb")
+    kb.build(index)                       # a KnowledgeIndex (see ingest), or kb.build(writer=fn(path))
+    with kb.snapshot() as generation:
+        generation.search(query_vector, k=20)
+    Ingestor(drive, index, embed, folder_id, publish=kb.build)   # publish after each settled batch
+
+    python -m infinity_pixel.retrieval.generations var/kb              # generations on disk
+    python -m infinity_pixel.retrieval.generations var/kb --rollback   # back to the previous one
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from ..metrics import get_registry
+from .vectors import VectorStore, VectorStoreError
+
+CURRENT = "CURRENT"
+_GENERATION = re.compile(r"^gen-(\d+)\.qvec$")
+
+
+class KnowledgeBaseError(Exception):
+    """A build was rejected, or the knowledge-base directory is unusable"""
+
+
+def generation_name(number):
+    return f"gen-{number:06d}.qvec"
+
+
+class Generation:
+    """One published build: an open ``VectorStore`` and its reader count"""
+
+    def __init__(self, number, path, store):
+        self.number = number
+        self.path = path
+        self.store = store
+        self.refs = 0
+        self.retired = False
+
+    def __len__(self):
+        return len(self.store)
+
+    def search(self, query, k=10, rerank=16):
+        return self.store.search(query, k, rerank)
+
+
+class KnowledgeBase:
+    """Generations of a knowledge base in ``root``; readers see the one ``CURRENT`` names"""
+
+    def __init__(self, root, keep=1, min_ratio=0.5, probes=8, validate=None, check_s=None, bits=8,
+                 registry=None, clock=time.monotonic):
+        self.root = root
+        self.keep = keep
+        self.min_ratio = min_ratio
+        self.probes = probes
+        self.validate = validate
+        self.check_s = check_s
+        self.bits = bits
+        self.clock = clock
+        self._current = None
+        self._retired = []  # replaced generations still held by readers
+        self._pointer = None  # (name, mtime) of CURRENT when last read
+        self._checked = None
+        self._building = None  # the generation being written and validated
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        registry = registry or get_registry()
+        self.publishes = registry.counter(
+            "knowledge_publishes_total", "Knowledge-base generations by result (published/rejected/rollback)",
+            ["result"])
+        self.build_ms = registry.histogram("knowledge_build_ms", "Knowledge-base generation build and validation "
+                                                                 "time in milliseconds")
+        self.readers = registry.gauge("knowledge_readers", "Queries holding a knowledge-base generation").labels()
+        self.refresh()
+
+    @property
+    def generation(self):
+        """The published generation's number (0 before the first)"""
+        current = self._current
+        return current.number if current else 0
+
+    def generations(self):
+        """Generation numbers on disk, oldest first"""
+        numbers = []
+        for name in os.listdir(self.root):
+            match = _GENERATION.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def path(self, number):
+        return os.path.join(self.root, generation_name(number))
+
+    # -- readers --
+
+    def acquire(self):
+        """The current ``Generation`` with a reference held (``None`` before the first build); ``release`` it"""
+        if self.check_s is not None and (self._checked is None or self.clock() - self._checked >= self.check_s):
+            self.refresh()
+        with self._lock:
+            generation = self._current
+            if generation is not None:
+                generation.refs += 1
+        if generation is not None:
+            self.readers.inc()
+        return generation
+
+    def release(self, generation):
+        if generation is None:
+            return
+        self.readers.dec()
+        with self._lock:
+            generation.refs -= 1
+            if not (generation.retired and generation.refs == 0):
+                return
+            self._retired.remove(generation)
+        generation.store.close()
+        self.collect()
+
+    @contextmanager
+    def snapshot(self):
+        """The current generation for the duration of a block"""
+        generation = self.acquire()
+        try:
+            yield generation
+        finally:
+            self.release(generation)
+
+    def search(self, query, k=10, rerank=16):
+        """``VectorStore.search`` on the current generation; no matches before the first build"""
+        with self.snapshot() as generation:
+            return generation.search(query, k, rerank) if generation is not None else []
+
+    def __len__(self):
+        with self.snapshot() as generation:
+            return len(generation) if generation is not None else 0
+
+    # -- builders --
+
+    def build(self, index=None, writer=None, force=False):
+        """
+        Write a new generation (``index.write(path, bits)``, or ``writer(path)``), validate and publish it.
+
+        Returns the published ``Generation``; raises ``KnowledgeBaseError`` (and deletes the build) when
+        validation fails. ``force`` skips the ``min_ratio`` check, e.g. after emptying the folder on purpose.
+        """
+        if (index is None) == (writer is None):
+            raise ValueError("pass an index or a writer")
+        started = self.clock()
+        with self._build_lock:
+            numbers = self.generations()
+            number = max(numbers + [self.generation]) + 1
+            path = self.path(number)
+            self._building = number
+            try:
+                count = index.write(path, self.bits) if writer is None else writer(path)
+                generation = self._open(number, path, count, force)
+            except Exception:
+                self._building = None
+                self.publishes.labels("rejected").inc()
+                for stale in (path, f"{path}.tmp"):
+                    if os.path.exists(stale):
+                        os.remove(stale)
+                raise
+            self.build_ms.observe((self.clock() - started) * 1000)
+            self._publish(generation)
+            self._building = None
+            self.publishes.labels("published").inc()
+        self.collect()
+        return generation
+
+    def _open(self, number, path, count=None, force=False):
+        try:
+            store = VectorStore(path)
+        except (OSError, VectorStoreError) as exc:
+            raise KnowledgeBaseError(f"generation {number}: {exc}") from exc
+        try:
+            self._check(store, count, force)
+        except Exception as exc:
+            store.close()
+            if isinstance(exc, KnowledgeBaseError):
+                raise KnowledgeBaseError(f"generation {number}: {exc}") from exc
+            raise KnowledgeBaseError(f"generation {number}: validation failed: {exc}") from exc
+        return Generation(number, path, store)
+
+    def _check(self, store, count, force):
+        n = len(store)
+        if count is not None and n != count:
+            raise KnowledgeBaseError(f"{n} vectors written, {count} expected")
+        current = self._current
+        if current is not None and len(current) and n:
+            if store.dims != current.store.dims:
+                raise KnowledgeBaseError(f"{store.dims} dimensions, the live generation has {current.store.dims}")
+        if current is not None and not force and n < self.min_ratio * len(current):
+            raise KnowledgeBaseError(f"{n} vectors, under {self.min_ratio:.0%} of the live generation's "
+                                     f"{len(current)}")
+        # probe vectors spread over the file find themselves (or, among identical chunks, one scoring
+        # as high); this also faults in the pages queries read first
+        for i in sorted({i * n // self.probes for i in range(self.probes)}) if n else ():
+            probe = store.vector(i)
+            hits = store.search(probe, k=5)
+            if store.id(i) in [m["id"] for m in hits]:
+                continue
+            own = store.score(probe, i)
+            if not hits or hits[0]["score"] < own - 1e-6 * max(1.0, abs(own)):
+                raise KnowledgeBaseError(f"vector {i} ({store.id(i)}) does not find itself")
+        if self.validate is not None:
+            self.validate(store)
+
+    def _publish(self, generation):
+        tmp = os.path.join(self.root, f"{CURRENT}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(generation_name(generation.number) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.root, CURRENT))
+        self._pointer = self._read_pointer()
+        self._swap(generation)
+
+    def _swap(self, generation):
+        with self._lock:
+            previous, self._current = self._current, generation
+            if previous is None:
+                return
+            previous.retired = True
+            if previous.refs:
+                self._retired.append(previous)
+                return
+        previous.store.close()
+
+    def rollback(self):
+        """Publish the newest generation on disk older than the current one; returns it"""
+        with self._build_lock:
+            older = [n for n in self.generations() if n < self.generation]
+            if not older:
+                raise KnowledgeBaseError("no previous generation to roll back to")
+            number = older[-1]
+            generation = self._open(number, self.path(number), force=True)
+            self._publish(generation)
+            self.publishes.labels("rollback").inc()
+        return generation
+
+    def collect(self):
+        """Delete generation files other than the current one, those held by readers and the ``keep`` newest;
+        returns the numbers deleted"""
+        with self._lock:
+            current = self.generation
+            held = {g.number for g in self._retired} | {self._building}
+        deleted = []
+        others = [n for n in self.generations() if n != current]
+        for number in others[:max(0, len(others) - self.keep)]:
+            if number not in held:
+                try:
+                    os.remove(self.path(number))
+                except FileNotFoundError:
+                    continue
+                deleted.append(number)
+        return deleted
+
+    # -- other processes --
+
+    def _read_pointer(self):
+        path = os.path.join(self.root, CURRENT)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with open(path, encoding="utf-8") as f:
+                return f.read().strip(), mtime
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Open the generation ``CURRENT`` names if it is not the one in use; returns whether it changed"""
+        self._checked = self.clock()
+        pointer = self._read_pointer()
+        if pointer is None or pointer == self._pointer:
+            return False
+        with self._build_lock:
+            match = _GENERATION.match(pointer[0])
+            if not match:
+                raise KnowledgeBaseError(f"{self.root}: {CURRENT} names {pointer[0]!r}")
+            number = int(match.group(1))
+            self._pointer = pointer
+            if number == self.generation:
+                return False
+            try:
+                store = VectorStore(self.path(number))
+            except (OSError, VectorStoreError) as exc:
+                raise KnowledgeBaseError(f"generation {number}: {exc}") from exc
+            self._swap(Generation(number, self.path(number), store))
+        return True
+
+    def close(self):
+        with self._lock:
+            generations = [g for g in [self._current, *self._retired] if g is not None]
+            self._current = None
+            self._retired = []
+        for generation in generations:
+            generation.store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List or roll back knowledge-base generations")
+    parser.add_argument("root", help="knowledge-base directory")
+    parser.add_argument("--rollback", action="store_true", help="publish the previous generation")
+    parser.add_argument("--collect", action="store_true", help="delete generations beyond --keep")
+    parser.add_argument("--keep", type=int, default=1, help="previous generations to keep")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.root):
+        print(f"❌ {args.root} is not a directory")
+        return 1
+    try:
+        kb = KnowledgeBase(args.root, keep=args.keep)
+        if args.rollback:
+            print(f"✅ Rolled back to generation {kb.rollback().number}")
+        if args.collect:
+            deleted = kb.collect()
+            print(f"✅ Deleted {len(deleted)} generations" + (f": {deleted}" if deleted else ""))
+    except KnowledgeBaseError as exc:
+        print(f"❌ {exc}")
+        return 1
+    for number in kb.generations():
+        size = os.path.getsize(kb.path(number))
+        marker = "→" if number == kb.generation else " "
+        print(f" {marker} {generation_name(number)}  {size / 1024:.0f} KiB")
+    if not kb.generation:
+        print("⚠️  Nothing published yet")
+    kb.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,488 @@
+"""
+Knowledge-base ingestion from the Google Drive change feed.
+
+The workflow's ``Google Drive File Created`` and ``Google Drive File
+Updated`` triggers each list the ``quantum-ops services`` folder every
+minute: two calls a minute whether or not anything changed, a new file
+fires both triggers and is inserted twice, a burst of saves is ingested
+once per minute it spans, and every change waits up to a minute.
+``Ingestor`` follows the Drive change feed instead (see ``drive``):
+
+* ``poll`` reads the changes since the saved page token, one call when
+  nothing changed. ``tick``/``run`` poll once ``changes.watch`` push
+  notifications (``notify``) have been quiet for ``quiet_s`` (at most
+  ``max_delay_s`` after the first), so a burst of saves costs one poll,
+  and otherwise every ``poll_s`` as a fallback.
+* Changes are coalesced per file and debounced: a file is ingested
+  ``debounce_s`` after its last change, and at most ``max_delay_s`` after
+  its first, so a burst of saves, or a create followed by edits, is
+  ingested once. A version that is already indexed is skipped.
+* Due files go through a bounded pipeline: ``workers`` threads download,
+  split (``chunk_size``/``chunk_overlap`` like the workflow's splitter),
+  embed in batches of ``embed_batch`` and replace the file's chunks in the
+  ``KnowledgeIndex``; at most ``max_in_flight`` files are in the pipeline,
+  the rest stay pending. Files removed, trashed or moved out of the folder
+  are deleted from the index, so no stale chunks are left behind.
+* The page token and indexed versions are saved to ``state_path`` so a
+  restart resumes the feed; without a token, ``sync`` lists the folder once.
+  With an empty index (a fresh ``KnowledgeIndex()`` after a restart) the
+  saved state is ignored and the folder is listed and ingested again.
+
+``KnowledgeIndex.write`` saves the chunks as a ``.qvec`` file (see
+``vectors``); with ``publish`` (e.g. ``KnowledgeBase.build``, see
+``generations``) the index is handed over whenever it changed and the
+pipeline is idle, so a batch of changes is published together.
+``HashingEmbedder`` is a local stand-in for ``Embeddings OpenAI``
+(``OpenAIEmbeddings``) in tests and demos.
+
+Usage:
+    ingestor = Ingestor(GoogleDrive(token), KnowledgeIndex(), OpenAIEmbeddings(key), folder_id)
+    threading.Thread(target=ingestor.run, daemon=True).start()   # the watch webhook calls ingestor.notify()
+    ingestor.index.write("var/kb.qvec")
+
+    python -m infinity_pixel.retrieval.ingest docs --out kb.qvec   # a folder through a fake Drive
+    python -m infinity_pixel.retrieval.ingest docs --kb var/kb     # ... published as a new generation
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from ..metrics import get_registry
+from ..outbound import get_client
+from ..search import tokenize
+from .drive import GOOGLE_APPS_PREFIX, DriveError, FakeDrive, parse_rfc3339
+from .generations import KnowledgeBase, KnowledgeBaseError
+from .splitter import split_text
+from .vectors import write_vectors
+
+TEXT_TYPES = ("application/json", "application/xml", "application/x-yaml", GOOGLE_APPS_PREFIX + "document")
+OPENAI_EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
+
+
+class HashingEmbedder:
+    """Feature-hashed bag of words: a deterministic local stand-in for an embedding model"""
+
+    def __init__(self, dims=256):
+        self.dims = dims
+
+    def __call__(self, texts):
+        return [self.vector(text) for text in texts]
+
+    def vector(self, text):
+        vector = [0.0] * self.dims
+        for token in tokenize(text):
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+            vector[h % self.dims] += 1.0 if h >> 63 else -1.0
+        return vector
+
+
+class OpenAIEmbeddings:
+    """The Embeddings API (``text-embedding-3-small`` at 1024 dimensions, like the workflow's node)"""
+
+    def __init__(self, api_key, model="text-embedding-3-small", dimensions=1024, url=OPENAI_EMBEDDINGS_URL,
+                 timeout=30.0, client=None):
+        self.api_key = api_key
+        self.model = model
+        self.dimensions = dimensions
+        self.url = url
+        self.timeout = timeout
+        self.client = client or get_client()
+
+    def __call__(self, texts):
+        body = json.dumps({"model": self.model, "input": list(texts), "dimensions": self.dimensions})
+        response = self.client.request("POST", self.url, body.encode("utf-8"), {
+            "Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}, timeout=self.timeout)
+        data = response.raise_for_status().json()["data"]
+        return [item["embedding"] for item in sorted(data, key=lambda item: item["index"])]
+
+
+class KnowledgeIndex:
+    """Chunks and their vectors by Drive file id"""
+
+    def __init__(self):
+        self._files = {}  # file id -> (chunks, vectors)
+        self.revision = 0  # bumped by every change
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(chunks) for chunks, _ in self._files.values())
+
+    def replace(self, file_id, chunks, vectors):
+        if len(chunks) != len(vectors):
+            raise ValueError("one vector per chunk")
+        with self._lock:
+            self._files[file_id] = (list(chunks), list(vectors))
+            self.revision += 1
+
+    def delete(self, file_id):
+        """Drop a file's chunks; returns whether it had any"""
+        with self._lock:
+            if self._files.pop(file_id, None) is None:
+                return False
+            self.revision += 1
+            return True
+
+    def files(self):
+        with self._lock:
+            return sorted(self._files)
+
+    def chunks(self, file_id):
+        with self._lock:
+            return list(self._files.get(file_id, ((), ()))[0])
+
+    def write(self, path, bits=8):
+        """Save every chunk as a ``.qvec`` file (metadata: the chunk's fields and ``fileId``); returns the count"""
+        with self._lock:
+            files = sorted(self._files.items())
+        ids, vectors, metadata = [], [], []
+        for file_id, (chunks, file_vectors) in files:
+            for chunk, vector in zip(chunks, file_vectors):
+                ids.append(f"{file_id}#{chunk.index}")
+                vectors.append(vector)
+                metadata.append({**vars(chunk), "fileId": file_id})
+        return write_vectors(path, vectors, ids, metadata, bits)
+
+
+@dataclass
+class _Pending:
+    file_id: str
+    file: dict  # latest file resource; None: remove the file from the index
+    first_seen: float
+    due: float
+    changes: int = 1
+    attempts: int = 0
+
+
+def _version(file):
+    return file.get("md5Checksum") or file.get("version") or file.get("modifiedTime")
+
+
+def _is_text(file):
+    mime_type = file.get("mimeType") or ""
+    return mime_type.startswith("text/") or mime_type in TEXT_TYPES
+
+
+class Ingestor:
+    """Keeps a ``KnowledgeIndex`` in step with one Drive folder through the change feed"""
+
+    def __init__(self, drive, index, embed, folder_id, debounce_s=5.0, max_delay_s=60.0, poll_s=300.0,
+                 quiet_s=15.0, workers=4, max_in_flight=8, chunk_size=1000, chunk_overlap=100, embed_batch=100,
+                 retries=3, retry_s=30.0, state_path=None, publish=None, registry=None, clock=time.monotonic,
+                 wall=time.time):
+        self.drive = drive
+        self.index = index
+        self.embed = embed
+        self.folder_id = folder_id
+        self.debounce_s = debounce_s
+        self.max_delay_s = max_delay_s
+        self.poll_s = poll_s
+        self.quiet_s = quiet_s
+        self.max_in_flight = max_in_flight
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.embed_batch = embed_batch
+        self.retries = retries
+        self.retry_s = retry_s
+        self.state_path = state_path
+        self.publish = publish
+        self.clock = clock
+        self.wall = wall
+        self.page_token = None
+        self.versions = {}  # file id -> indexed version
+        self.pending = {}  # file id -> _Pending
+        self._running = {}  # file id -> future
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._notified = None  # (first, latest) notification since the last poll
+        self._last_poll = None
+        self._published = index.revision
+        if state_path and os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            # resuming the feed would never bring back the files an empty index lost: list the folder instead
+            if index.files():
+                self.page_token = state.get("pageToken")
+                self.versions = state.get("versions") or {}
+        self.last_error = None
+        registry = registry or get_registry()
+        registry.gauge("ingest_pending_files", "Changed files waiting for ingestion",
+                       fn=lambda: len(self.pending) + len(self._running)).labels()
+        self.calls = registry.counter("ingest_drive_calls_total", "Google Drive API calls by method", ["call"])
+        self.results = registry.counter(
+            "ingest_files_total", "Ingested file changes by result (indexed/deleted/unchanged/unsupported/error)",
+            ["result"])
+        self.errors = registry.counter("ingest_errors_total", "Failed ingestion ticks by exception type", ["error"])
+        self.lag = registry.histogram(
+            "ingest_lag_ms", "Time from a file's modification in Drive to its chunks being indexed in milliseconds")
+
+    def _call(self, name, fn, *args):
+        self.calls.labels(name).inc()
+        return fn(*args)
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        with self._lock:
+            state = {"pageToken": self.page_token, "versions": dict(self.versions)}
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def sync(self):
+        """List the folder and schedule every file whose version is not indexed; returns the file count"""
+        token = self._call("changes.getStartPageToken", self.drive.start_page_token)  # before listing: no gap
+        listed = {}
+        page_token = None
+        while True:
+            page = self._call("files.list", self.drive.list_files, self.folder_id, page_token)
+            for file in page.get("files") or []:
+                listed[file["id"]] = file
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                break
+        now = self.clock()
+        with self._lock:
+            for file_id, file in listed.items():
+                if _version(file) != self.versions.get(file_id):
+                    self._schedule(file_id, file, now, debounce=False)
+            for file_id in set(self.versions) - set(listed):
+                self._schedule(file_id, None, now, debounce=False)
+            self.page_token = token
+        self._last_poll = now
+        self._save_state()
+        return len(listed)
+
+    def poll(self):
+        """Read the change feed since the saved page token (syncing first without one); returns the changes read"""
+        if self.page_token is None:
+            self.sync()
+            return 0
+        self._notified = None
+        self._last_poll = self.clock()
+        token = self.page_token
+        count = 0
+        while True:
+            page = self._call("changes.list", self.drive.list_changes, token)
+            now = self.clock()
+            with self._lock:
+                for change in page.get("changes") or []:
+                    self._on_change(change, now)
+                    count += 1
+            token = page.get("nextPageToken")
+            if not token:
+                self.page_token = page["newStartPageToken"]
+                break
+        self._save_state()
+        return count
+
+    def _on_change(self, change, now):
+        file_id = change["fileId"]
+        file = None if change.get("removed") else change.get("file")
+        if file is not None and not file.get("trashed") and self.folder_id in (file.get("parents") or ()):
+            self._schedule(file_id, file, now)
+        elif file_id in self.versions or file_id in self.pending or file_id in self._running:
+            self._schedule(file_id, None, now)  # removed, trashed or moved out of the folder
+
+    def _schedule(self, file_id, file, now, debounce=True):
+        entry = self.pending.get(file_id)
+        if entry is None:
+            entry = self.pending[file_id] = _Pending(file_id, file, now, now)
+        else:
+            entry.file = file
+            entry.changes += 1
+        entry.due = min(now + self.debounce_s, entry.first_seen + self.max_delay_s) if debounce else now
+
+    def dispatch(self):
+        """Start due files while the pipeline has room; returns how many started"""
+        now = self.clock()
+        started = 0
+        with self._lock:
+            due = sorted((e for e in self.pending.values() if e.due <= now and e.file_id not in self._running),
+                         key=lambda e: e.due)
+            for entry in due:
+                if len(self._running) >= self.max_in_flight:
+                    break
+                del self.pending[entry.file_id]
+                self._running[entry.file_id] = self._executor.submit(self._ingest, entry)
+                started += 1
+        return started
+
+    def _ingest(self, entry):
+        file_id, file = entry.file_id, entry.file
+        version = None
+        try:
+            if file is None:
+                result = "deleted" if self.index.delete(file_id) else "unchanged"
+            elif _version(file) == self.versions.get(file_id):
+                result = "unchanged"
+            elif not _is_text(file):
+                result = "unsupported"
+                version = _version(file)
+            else:
+                data = self._call("files.get", self.drive.download, file)
+                chunks = split_text(data.decode("utf-8", errors="replace"), file.get("name", file_id),
+                                    self.chunk_size, self.chunk_overlap)
+                vectors = []
+                for start in range(0, len(chunks), self.embed_batch):
+                    vectors.extend(self.embed([c.text for c in chunks[start:start + self.embed_batch]]))
+                self.index.replace(file_id, chunks, vectors)
+                result = "indexed"
+                version = _version(file)
+                if file.get("modifiedTime"):
+                    self.lag.observe(max(0.0, self.wall() - parse_rfc3339(file["modifiedTime"])) * 1000)
+        except Exception:
+            result = "error"
+        with self._lock:
+            del self._running[file_id]
+            if result == "deleted" or (file is None and result == "unchanged"):
+                self.versions.pop(file_id, None)
+            elif version is not None:
+                self.versions[file_id] = version
+            elif result == "error" and entry.attempts + 1 < self.retries and file_id not in self.pending:
+                entry.attempts += 1
+                entry.due = self.clock() + self.retry_s
+                self.pending[file_id] = entry
+        self.results.labels(result).inc()
+        if result in ("indexed", "deleted", "unsupported"):
+            self._save_state()
+        self._wake.set()
+        return result
+
+    def wait(self, timeout=None):
+        """Wait for the files in the pipeline"""
+        with self._lock:
+            futures = list(self._running.values())
+        wait(futures, timeout)
+
+    def flush(self):
+        """Ingest everything pending now, ignoring the debounce"""
+        while True:
+            with self._lock:
+                for entry in self.pending.values():
+                    entry.due = min(entry.due, self.clock())
+                if not self.pending and not self._running:
+                    break
+            self.dispatch()
+            self.wait(timeout=1.0)
+        self._publish_if_idle()
+
+    def _publish_if_idle(self):
+        """Hand the index to ``publish`` when it changed and no file is pending or in the pipeline"""
+        with self._lock:
+            revision = self.index.revision
+            if self.publish is None or revision == self._published or self.pending or self._running:
+                return False
+            self._published = revision
+        try:
+            self.publish(self.index)
+        except Exception:  # a rejected build (counted by the publisher); the next change publishes again
+            return False
+        return True
+
+    def notify(self):
+        """A push notification from the watch channel: new changes are waiting"""
+        now = self.clock()
+        self._notified = (self._notified[0] if self._notified else now, now)
+        self._wake.set()
+
+    def _notified_poll_at(self):
+        first, latest = self._notified
+        return min(latest + self.quiet_s, first + self.max_delay_s)
+
+    def tick(self):
+        """Poll if notified or ``poll_s`` passed, start due files; returns seconds until the next tick is due"""
+        now = self.clock()
+        since = None if self._last_poll is None else now - self._last_poll
+        if since is None or since >= self.poll_s or (self._notified and now >= self._notified_poll_at()):
+            self.poll()
+            now = self.clock()
+            since = 0.0
+        self.dispatch()
+        self._publish_if_idle()
+        delays = [self.poll_s - since]
+        if self._notified:
+            delays.append(self._notified_poll_at() - now)
+        with self._lock:
+            # entries that are due but waiting for room are started when a file finishes (which wakes ``run``)
+            delays.extend(e.due - now for e in self.pending.values() if e.due > now)
+        return max(0.0, min(delays))
+
+    def run(self):
+        """Tick until ``stop``; a failed tick (Drive, a bad change page, saving state) is retried after ``quiet_s``"""
+        while not self._stop.is_set():
+            try:
+                delay = self.tick()
+            except Exception as exc:
+                if isinstance(exc, DriveError):
+                    self.calls.labels("error").inc()
+                self.errors.labels(type(exc).__name__).inc()
+                self.last_error = exc
+                delay = self.quiet_s
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def close(self):
+        self.stop()
+        self._executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest a folder of text files through a fake Drive")
+    parser.add_argument("folder", help="directory of .md/.txt files")
+    parser.add_argument("--out", default="kb.qvec", help="vector file to write")
+    parser.add_argument("--dims", type=int, default=256, help="hashing embedder dimensions")
+    parser.add_argument("--bits", type=int, default=8, choices=(4, 8))
+    parser.add_argument("--kb", help="publish a new generation in this knowledge-base directory instead")
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(args.folder, "*.md")) + glob.glob(os.path.join(args.folder, "*.txt")))
+    if not paths:
+        print(f"❌ No .md or .txt files in {args.folder}")
+        return 1
+    drive = FakeDrive()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            drive.create(os.path.basename(path), f.read(), "folder")
+    ingestor = Ingestor(drive, KnowledgeIndex(), HashingEmbedder(args.dims), "folder")
+    try:
+        ingestor.sync()
+        ingestor.flush()
+    finally:
+        ingestor.close()
+    calls = ", ".join(f"{name} {n}" for name, n in sorted(drive.calls.items()))
+    if args.kb:
+        kb = KnowledgeBase(args.kb, bits=args.bits)
+        try:
+            generation = kb.build(ingestor.index)
+            count = len(generation)
+        except KnowledgeBaseError as exc:
+            print(f"❌ {exc}")
+            return 1
+        finally:
+            kb.close()
+        print(f"✅ {len(paths)} files, {count} chunks → {generation.path} (generation {generation.number}, "
+              f"Drive calls: {calls})")
+        return 0
+    count = ingestor.index.write(args.out, args.bits)
+    print(f"✅ {len(paths)} files, {count} chunks → {args.out} (Drive calls: {calls})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
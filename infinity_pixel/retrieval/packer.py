@@ -0,0 +1,203 @@
+"""
+Token-budget context packing for retrieved chunks.
+
+The knowledge-base tool pastes up to 20 retrieved chunks into the prompt
+as they come. Consecutive chunks of a document share ``chunkOverlap``
+characters, and several chunks of one file often match the same question,
+so the same text is paid for repeatedly. ``ContextPacker.pack``:
+
+1. merges chunks of the same source that overlap or are adjacent (by
+   offsets and chunk position when the splitter recorded them, otherwise by
+   matching the end of one chunk to the start of another) into passages,
+   dropping chunks contained in another;
+2. ranks passages by relevance per token (the sum of their chunks'
+   scores over the passage's tokens; retrieval order breaks ties);
+3. adds passages greedily while they fit ``budget_tokens``; a passage that
+   does not fit is replaced by its best chunk if that fits.
+
+The context lists each source once (``[file]`` header), best source
+first, with its passages in document order.
+
+Tokens are estimated at four characters each; pass ``count_tokens`` (e.g.
+``lambda s: len(tiktoken.get_encoding("o200k_base").encode(s))``) for
+exact counts.
+"""
+
+from dataclasses import dataclass, field
+
+MIN_TEXT_OVERLAP = 16  # shortest end/start match that counts as chunk overlap without offsets
+SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text):
+    """About four characters per token, the usual rule of thumb for English with OpenAI tokenizers"""
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class Passage:
+    source: str
+    text: str
+    chunks: list = field(default_factory=list)
+    rank: int = 0  # best retrieval rank among the chunks
+    tokens: int = 0
+
+    @property
+    def score(self):
+        return max((c.score for c in self.chunks), default=0.0)
+
+    @property
+    def position(self):
+        """Sort key for document order (retrieval order when offsets are unknown)"""
+        starts = [c.start for c in self.chunks if c.start is not None]
+        return (min(starts), 0) if starts else (0, self.rank)
+
+
+@dataclass
+class PackedContext:
+    text: str
+    passages: list
+    tokens: int
+    input_chunks: int
+    input_tokens: int  # the chunks concatenated as retrieved
+    dropped: int = 0  # passages left out for the budget
+
+    @property
+    def sources(self):
+        return list(dict.fromkeys(p.source for p in self.passages))
+
+
+def _header(source):
+    return f"[{source}]\n" if source else ""
+
+
+def render(passages):
+    """Context text: sources by their best passage, each with its passages in document order"""
+    by_source = {}
+    for passage in sorted(passages, key=lambda p: (-p.score, p.rank)):
+        by_source.setdefault(passage.source, []).append(passage)
+    return SEPARATOR.join(_header(source) + SEPARATOR.join(p.text for p in sorted(group, key=lambda p: p.position))
+                          for source, group in by_source.items())
+
+
+def _text_overlap(left, right):
+    """Length of the longest end of ``left`` that starts ``right`` (at least ``MIN_TEXT_OVERLAP``), or 0"""
+    longest = min(len(left), len(right))
+    for size in range(longest, MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_by_offsets(ranked):
+    """Passages from ``(rank, chunk)`` pairs of one source whose chunks carry offsets"""
+    passages = []
+    for rank, chunk in sorted(ranked, key=lambda item: item[1].start):
+        last = passages[-1] if passages else None
+        if last is not None:
+            end = max(c.end for c in last.chunks)
+            tail = last.chunks[-1]
+            adjacent = chunk.index is not None and tail.index is not None and chunk.index == tail.index + 1
+            if chunk.start <= end or adjacent:
+                if chunk.end > end:
+                    overlap = end - chunk.start
+                    last.text += chunk.text[overlap:] if overlap > 0 else "\n" + chunk.text
+                last.chunks.append(chunk)
+                last.rank = min(last.rank, rank)
+                continue
+        passages.append(Passage(chunk.source, chunk.text, [chunk], rank))
+    return passages
+
+
+def _merge_by_text(ranked):
+    """Passages from ``(rank, chunk)`` pairs of one source without offsets"""
+    passages = []
+    for rank, chunk in ranked:
+        for passage in passages:
+            if chunk.text in passage.text:
+                passage.chunks.append(chunk)
+                break
+        else:
+            passages.append(Passage(chunk.source, chunk.text, [chunk], rank))
+    merged = True
+    while merged:
+        merged = False
+        for left in passages:
+            for right in passages:
+                if left is right:
+                    continue
+                overlap = _text_overlap(left.text, right.text)
+                if overlap:
+                    left.text += right.text[overlap:]
+                    left.chunks.extend(right.chunks)
+                    left.rank = min(left.rank, right.rank)
+                    passages.remove(right)
+                    merged = True
+                    break
+            if merged:
+                break
+    return passages
+
+
+class ContextPacker:
+    """Deduplicates, merges and packs retrieved chunks into ``budget_tokens`` (None: no limit)"""
+
+    def __init__(self, budget_tokens=2000, count_tokens=estimate_tokens):
+        self.budget_tokens = budget_tokens
+        self.count_tokens = count_tokens
+
+    def passages(self, chunks):
+        """Retrieved ``Chunk``\\ s (best first) merged into ``Passage``\\ s"""
+        by_source = {}
+        for rank, chunk in enumerate(chunks):
+            by_source.setdefault(chunk.source, []).append((rank, chunk))
+        passages = []
+        for ranked in by_source.values():
+            with_offsets = [(r, c) for r, c in ranked if c.start is not None and c.end is not None]
+            passages.extend(_merge_by_offsets(with_offsets))
+            passages.extend(_merge_by_text([(r, c) for r, c in ranked if c.start is None or c.end is None]))
+        for passage in passages:
+            passage.tokens = self.count_tokens(passage.text)
+        return passages
+
+    def _cost(self, passage, sources):
+        """Tokens ``passage`` adds to a context already holding passages of ``sources``"""
+        if passage.source in sources:
+            return passage.tokens + self.separator_tokens
+        return passage.tokens + self.count_tokens(_header(passage.source)) + (self.separator_tokens if sources else 0)
+
+    @property
+    def separator_tokens(self):
+        return self.count_tokens(SEPARATOR)
+
+    def pack(self, chunks):
+        chunks = list(chunks)
+        input_tokens = self.count_tokens(SEPARATOR.join(c.text for c in chunks)) if chunks else 0
+        candidates = sorted(self.passages(chunks),
+                            key=lambda p: (-sum(c.score for c in p.chunks) / max(p.tokens, 1), p.rank))
+        budget = self.budget_tokens
+        selected = []
+        sources = set()
+        used = 0
+        for passage in candidates:
+            if len(passage.chunks) > 1 and budget is not None and used + self._cost(passage, sources) > budget:
+                best = min(passage.chunks, key=lambda c: (-c.score, chunks.index(c)))
+                passage = Passage(best.source, best.text, [best], passage.rank, self.count_tokens(best.text))
+            cost = self._cost(passage, sources)
+            if budget is None or used + cost <= budget:
+                selected.append(passage)
+                sources.add(passage.source)
+                used += cost
+        if not selected and candidates:
+            # nothing fits: the best passage, cut to the budget at a word boundary (or to nothing,
+            # when not even its source header fits)
+            top = min(candidates, key=lambda p: p.rank)
+            text = top.text
+            while text and self.count_tokens(_header(top.source) + text) > budget:
+                text = text[:int(len(text) * 0.9)].rsplit(" ", 1)[0]  # always shorter, so this ends
+            if text:
+                selected.append(Passage(top.source, text, top.chunks, top.rank, self.count_tokens(text)))
+        text = render(selected)
+        selected.sort(key=lambda p: (-p.score, p.rank))
+        return PackedContext(text, selected, self.count_tokens(text) if text else 0, len(chunks), input_tokens,
+                             len(candidates) - len(selected))
@@ -0,0 +1,77 @@
+"""
+Recursive character splitting with source offsets.
+
+Splits like the workflow's ``Recursive Character Text Splitter`` node
+(LangChain's ``RecursiveCharacterTextSplitter``: ``chunkSize`` 1000,
+``chunkOverlap`` 100, separators paragraph, line, word, character), but
+every ``Chunk`` also records its character offsets in the source text and
+its position in the document, so overlapping and adjacent chunks can be
+recognised and merged again after retrieval (see ``packer``).
+"""
+
+import re
+from dataclasses import dataclass
+
+SEPARATORS = ("\n\n", "\n", " ", "")
+
+
+@dataclass
+class Chunk:
+    source: str
+    text: str
+    start: int = None  # character offsets of ``text`` in the source (None when unknown)
+    end: int = None
+    index: int = None  # position among the source's chunks
+    score: float = 0.0  # retrieval relevance
+
+
+def _pieces(text, start, end, separators, chunk_size):
+    """Contiguous ``(start, end)`` pieces covering ``text[start:end]``, each within ``chunk_size`` if possible"""
+    segment = text[start:end]
+    for i, separator in enumerate(separators):
+        if separator == "" or separator in segment:
+            break
+    rest = separators[i + 1:]
+    if separator == "":
+        return [(p, p + 1) for p in range(start, end)]
+    # the separator stays at the start of the following piece, so pieces tile the text
+    bounds = [start, *(start + m.start() for m in re.finditer(re.escape(separator), segment) if m.start()), end]
+    pieces = []
+    for a, b in zip(bounds, bounds[1:]):
+        if b - a <= chunk_size or not rest:
+            pieces.append((a, b))
+        else:
+            pieces.extend(_pieces(text, a, b, rest, chunk_size))
+    return pieces
+
+
+def split_text(text, source="", chunk_size=1000, chunk_overlap=100, separators=SEPARATORS):
+    """``Chunk``\\ s of at most ``chunk_size`` characters, consecutive chunks sharing up to ``chunk_overlap``"""
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+    chunks = []
+
+    def emit(a, b):
+        piece = text[a:b]
+        stripped = piece.strip()
+        if not stripped:
+            return
+        a += len(piece) - len(piece.lstrip())
+        if chunks and chunks[-1].start == a:
+            return
+        chunks.append(Chunk(source, stripped, a, a + len(stripped), len(chunks)))
+
+    window = []
+    total = 0
+    for a, b in _pieces(text or "", 0, len(text or ""), tuple(separators), chunk_size):
+        size = b - a
+        if window and total + size > chunk_size:
+            emit(window[0][0], window[-1][1])
+            while window and (total > chunk_overlap or total + size > chunk_size):
+                total -= window[0][1] - window[0][0]
+                window.pop(0)
+        window.append((a, b))
+        total += size
+    if window:
+        emit(window[0][0], window[-1][1])
+    return chunks
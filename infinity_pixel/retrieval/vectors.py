@@ -0,0 +1,371 @@
+"""
+Quantized, memory-mapped vector store for knowledge-base embeddings.
+
+``Embeddings OpenAI`` produces 1024 float32 dimensions per chunk, 4 KiB
+per vector before any index overhead. A ``.qvec`` file stores each
+vector (normalized, so scores are cosine similarities) as an 8-bit (or,
+with ``bits=4``, 4-bit) scalar-quantized code per dimension, scaled to
+that dimension's range. Queries scan a 1-bit code per dimension (above or
+below that dimension's mean, 128 bytes at 1024 dimensions) by Hamming
+distance; it is derived from the stored codes when the store is first
+searched and kept in memory, not stored. The ``k * rerank`` best Hamming
+candidates are re-ranked by the dot product of their codes with the float
+query (asymmetric distance: the query is never quantized). 8-bit codes
+are 4x smaller than float32 and find the same neighbours (recall@10 0.99
+at ``rerank=16`` in ``scripts/bench_vectors.py``); 4-bit codes halve that
+again, but their rounding caps recall around 0.85 however many candidates
+are re-ranked.
+
+Ids and per-vector JSON metadata (e.g. the chunk's source and text) are
+stored in the same file. ``VectorStore`` memory-maps it, so opening only
+reads the header; the first query reads the codes once to derive the scan
+codes, later ones only the pages of their candidates. The Hamming scan
+uses numpy when it is installed.
+
+Usage:
+    write_vectors("var/kb.qvec", vectors, ids, metadata)
+    with VectorStore("var/kb.qvec") as store:
+        store.search(query_vector, k=20)   # [{"id", "score", "metadata"}]
+
+    python -m infinity_pixel.retrieval.vectors var/kb.qvec   # size and layout
+"""
+
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from operator import mul
+
+try:
+    import numpy
+except ImportError:  # optional: only speeds up the Hamming scan
+    numpy = None
+
+from .splitter import Chunk
+
+MAGIC = b"QVEC\x01\x00\x00\x00"
+_PREAMBLE = struct.Struct("<8sQ")
+CLIP_SIGMAS = {8: 4.0, 4: 3.5}  # quantization range per dimension, in standard deviations around the mean
+_LOW_NIBBLE = bytes(b & 0x0F for b in range(256))
+_HIGH_NIBBLE = bytes(b >> 4 for b in range(256))
+_POPCOUNT = numpy.array([bin(b).count("1") for b in range(256)], dtype=numpy.uint16) if numpy else None
+
+
+class VectorStoreError(Exception):
+    """Raised for unreadable or malformed vector files"""
+
+
+def _normalized(vector, padded):
+    values = [float(v) for v in vector]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values] + [0.0] * (padded - len(values))
+
+
+def _bit_code(vector, mean):
+    """One bit per dimension, set when the value is above the dimension's mean (dimension i is bit i)"""
+    code = 0
+    for i, (value, center) in enumerate(zip(vector, mean)):
+        if value > center:
+            code |= 1 << i
+    return code
+
+
+def _pad(buf):
+    buf.extend(b"\x00" * (-len(buf) % 8))
+
+
+def write_vectors(path, vectors, ids, metadata=None, bits=8):
+    """Write vectors with their ids (and optional JSON-serializable metadata); returns the count"""
+    if bits not in (4, 8):
+        raise ValueError("bits must be 4 or 8")
+    ids = [str(i) for i in ids]
+    metadata = list(metadata) if metadata is not None else [None] * len(ids)
+    rows = list(vectors)
+    if not len(rows) == len(ids) == len(metadata):
+        raise ValueError("vectors, ids and metadata must have the same length")
+    dims = len(rows[0]) if rows else 0
+    if any(len(v) != dims for v in rows):
+        raise ValueError("all vectors must have the same number of dimensions")
+    padded = dims + (-dims % 8)
+    rows = [_normalized(v, padded) for v in rows]
+
+    n = len(rows)
+    mean = [sum(column) / n for column in zip(*rows)] if n else [0.0] * padded
+    # each dimension's range, clipped to CLIP_SIGMAS standard deviations around its mean: a few outliers
+    # would otherwise spread the levels over values that hardly occur
+    low, high = [], []
+    for column, center in zip(zip(*rows), mean):
+        spread = CLIP_SIGMAS[bits] * math.sqrt(sum((v - center) ** 2 for v in column) / n)
+        low.append(max(min(column), center - spread))
+        high.append(min(max(column), center + spread))
+    if not n:
+        low = high = [0.0] * padded
+    levels = (1 << bits) - 1
+    scale = [(hi - lo) / levels for lo, hi in zip(low, high)]
+
+    codes = bytearray()
+    for row in rows:
+        quantized = [min(levels, max(0, round((v - lo) / s))) if s else 0 for v, lo, s in zip(row, low, scale)]
+        if bits == 8:
+            codes += bytes(quantized)
+        else:
+            codes += bytes(a | (b << 4) for a, b in zip(quantized[0::2], quantized[1::2]))
+
+    body = bytearray()
+    segments = {}
+
+    def add_segment(name, payload):
+        segments[name] = [len(body), len(payload)]
+        body.extend(payload)
+        _pad(body)
+
+    add_segment("mean", array("f", mean).tobytes())
+    add_segment("low", array("f", low).tobytes())
+    add_segment("scale", array("f", scale).tobytes())
+    add_segment("codes", codes)
+    for name, values in (("ids", ids), ("metadata", [json.dumps(m) for m in metadata])):
+        offsets = array("Q", [0])
+        data = bytearray()
+        for value in values:
+            data += value.encode("utf-8")
+            offsets.append(len(data))
+        add_segment(f"{name}_offsets", offsets.tobytes())
+        add_segment(name, data)
+
+    header = json.dumps({"version": 2, "count": n, "dims": dims, "padded": padded, "bits": bits,
+                         "metric": "cosine", "segments": segments}).encode("utf-8")
+    header += b" " * (-(len(header) + _PREAMBLE.size) % 8)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(body)
+    os.replace(tmp, path)
+    return n
+
+
+class VectorStore:
+    """Read-only, memory-mapped view of a ``.qvec`` file"""
+
+    def __init__(self, path, use_numpy=None):
+        self.path = path
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy and numpy is not None
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise VectorStoreError(f"{path}: empty vector file") from e
+        self._views = []
+        try:
+            magic, header_len = _PREAMBLE.unpack_from(self._map, 0)
+        except struct.error as e:
+            self.close()
+            raise VectorStoreError(f"{path}: truncated vector file") from e
+        if magic != MAGIC:
+            self.close()
+            raise VectorStoreError(f"{path}: not a vector file")
+        start = _PREAMBLE.size
+        try:
+            self.header = json.loads(bytes(self._map[start:start + header_len]))
+            self.dims = self.header["dims"]
+            self.bits = self.header["bits"]
+            self._padded = self.header["padded"]
+            self.header["segments"]["codes"]
+        except (ValueError, KeyError, TypeError) as e:  # JSONDecodeError and UnicodeDecodeError are ValueErrors
+            self.close()
+            raise VectorStoreError(f"{path}: corrupt header") from e
+        self._data_start = start + header_len
+        self._params = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.header["count"]
+
+    def close(self):
+        """Release segment views and unmap the file"""
+        self._params = None
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+
+    def _segment(self, name, typecode="B"):
+        offset, length = self.header["segments"][name]
+        base = memoryview(self._map)
+        view = base[self._data_start + offset:self._data_start + offset + length]
+        self._views += [base, view]
+        if typecode != "B":
+            view = view.cast(typecode)
+            self._views.append(view)
+        return view
+
+    def _parameters(self):
+        if self._params is None:
+            self._params = {
+                "mean": list(self._segment("mean", "f")),
+                "low": list(self._segment("low", "f")),
+                "scale": list(self._segment("scale", "f")),
+                "codes": self._segment("codes"),
+                "ids": (self._segment("ids_offsets", "Q"), self._segment("ids")),
+                "metadata": (self._segment("metadata_offsets", "Q"), self._segment("metadata")),
+            }
+            params = self._params
+            # version 1 files stored the scan codes
+            params["bits"] = self._segment("bits") if "bits" in self.header["segments"] else self._scan_codes(params)
+        return self._params
+
+    def _scan_codes(self, params):
+        """
+        The 1-bit codes (value above the dimension's mean) of every vector, derived from the stored codes.
+
+        One dimension at a time: a translate table turns the column's codes into 0/1 bytes, and those,
+        read as one integer per 8 dimensions, are shifted into place, so no per-vector loop runs in Python.
+        """
+        n, width = len(self), self._padded // 8
+        codes = bytes(params["codes"])
+        levels = (1 << self.bits) - 1
+        # code > threshold <=> the dequantized value is above the mean (a flat dimension never is)
+        thresholds = [(m - lo) / s if s else levels for m, lo, s in zip(params["mean"], params["low"], params["scale"])]
+        bits = bytearray(n * width)
+        for group in range(width):
+            word = 0
+            for j in range(8):
+                d = group * 8 + j
+                t = thresholds[d]
+                if self.bits == 8:
+                    column = codes[d::self._padded]
+                    table = bytes(c > t for c in range(256))
+                else:
+                    column = codes[d // 2::self._padded // 2]
+                    table = bytes(((b >> 4) if d % 2 else (b & 0x0F)) > t for b in range(256))
+                word |= int.from_bytes(column.translate(table), "little") << j
+            bits[group::width] = word.to_bytes(n, "little")
+        return bytes(bits)
+
+    def _text(self, name, i):
+        offsets, data = self._parameters()[name]
+        return str(data[offsets[i]:offsets[i + 1]], "utf-8")
+
+    def id(self, i):
+        return self._text("ids", i)
+
+    def metadata(self, i):
+        return json.loads(self._text("metadata", i))
+
+    def vector(self, i):
+        """Dequantized (normalized) vector ``i``"""
+        params = self._parameters()
+        codes = self._codes(i)
+        return [lo + c * s for lo, c, s in zip(params["low"], codes, params["scale"])][:self.dims]
+
+    def _codes(self, i):
+        codes = self._parameters()["codes"]
+        if self.bits == 8:
+            return codes[i * self._padded:(i + 1) * self._padded]
+        size = self._padded // 2
+        packed = bytes(codes[i * size:(i + 1) * size])
+        result = [0] * self._padded
+        result[0::2] = packed.translate(_LOW_NIBBLE)
+        result[1::2] = packed.translate(_HIGH_NIBBLE)
+        return result
+
+    def _hamming_candidates(self, query_bits, m):
+        n = len(self)
+        width = self._padded // 8
+        bits = self._parameters()["bits"]
+        if self.use_numpy:
+            codes = numpy.frombuffer(bits, dtype=numpy.uint8).reshape(n, width)
+            target = numpy.frombuffer(query_bits.to_bytes(width, "little"), dtype=numpy.uint8)
+            distances = _POPCOUNT[numpy.bitwise_xor(codes, target)].sum(axis=1)
+            top = numpy.argpartition(distances, m - 1)[:m] if m < n else numpy.arange(n)
+            return top.tolist()
+        from_bytes = int.from_bytes
+        distances = [(from_bytes(bits[p:p + width], "little") ^ query_bits).bit_count()
+                     for p in range(0, n * width, width)]
+        return heapq.nsmallest(m, range(n), key=distances.__getitem__)
+
+    def search(self, query, k=10, rerank=16):
+        """
+        The ``k`` most similar vectors to ``query`` as ``{"id", "score", "metadata"}`` dicts, best first.
+
+        ``k * rerank`` candidates from the Hamming scan are re-ranked with their quantized codes.
+        """
+        n = len(self)
+        if not n or k <= 0:
+            return []
+        if len(query) != self.dims:
+            raise ValueError(f"query has {len(query)} dimensions, the store {self.dims}")
+        params = self._parameters()
+        q = _normalized(query, self._padded)
+        candidates = self._hamming_candidates(_bit_code(q, params["mean"]), min(n, k * max(rerank, 1)))
+        base = sum(map(mul, q, params["low"]))
+        weights = list(map(mul, q, params["scale"]))
+        if self.bits == 8:
+            scored = [(base + sum(map(mul, weights, self._codes(i))), i) for i in candidates]
+        else:
+            codes = params["codes"]
+            size = self._padded // 2
+            even, odd = weights[0::2], weights[1::2]
+            scored = []
+            for i in candidates:
+                packed = bytes(codes[i * size:(i + 1) * size])
+                score = (base + sum(map(mul, even, packed.translate(_LOW_NIBBLE)))
+                         + sum(map(mul, odd, packed.translate(_HIGH_NIBBLE))))
+                scored.append((score, i))
+        return [{"id": self.id(i), "score": score, "metadata": self.metadata(i)}
+                for score, i in heapq.nlargest(k, scored)]
+
+    def score(self, query, i):
+        """``query``'s score against vector ``i``, as ``search`` ranks it"""
+        if len(query) != self.dims:
+            raise ValueError(f"query has {len(query)} dimensions, the store {self.dims}")
+        params = self._parameters()
+        q = _normalized(query, self._padded)
+        return sum(map(mul, q, params["low"])) + sum(map(mul, map(mul, q, params["scale"]), self._codes(i)))
+
+    def file_size(self):
+        return os.path.getsize(self.path)
+
+
+def as_chunks(matches):
+    """``Chunk``\\ s (for ``ContextPacker``) from matches whose metadata holds a chunk's fields"""
+    chunks = []
+    for match in matches:
+        meta = match["metadata"] or {}
+        chunks.append(Chunk(meta.get("source", ""), meta.get("text", ""), meta.get("start"), meta.get("end"),
+                            meta.get("index"), match["score"]))
+    return chunks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the size and layout of a quantized vector file")
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+    try:
+        store = VectorStore(args.path)
+    except (OSError, VectorStoreError) as exc:
+        print(f"❌ {exc}")
+        return 1
+    with store:
+        n, dims = len(store), store.dims
+        size = store.file_size()
+        raw = n * dims * 4
+        print(f"✅ {args.path}: {n} vectors × {dims} dims, {store.bits}-bit codes")
+        if n:
+            print(f"   {size / n:.0f} bytes/vector on disk vs {dims * 4} as float32 ({raw / size:.1f}x); "
+                  f"a query scans {store.header['padded'] // 8} bytes/vector")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
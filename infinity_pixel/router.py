@@ -0,0 +1,275 @@
+"""
+Routing tier in front of the chat model.
+
+Every chat message pays for a ``gpt-4.1-mini`` call, including greetings,
+thanks and "what services do you offer?", whose answer is the fixed list of
+six services in the system prompt. ``Router`` classifies each message with
+a local ``IntentClassifier`` (TF-IDF over words, word bigrams and character
+trigrams, and a multinomial logistic regression, all in pure Python; well
+under a millisecond per message) and answers the trivial intents from
+``TEMPLATES``. Everything else, and anything the classifier is not
+confident about, goes to the model:
+
+* an intent is answered locally only at ``thresholds[intent]`` probability
+  or above (``threshold`` for the rest);
+* messages with a ``TCK-`` ID or an email address, and messages longer
+  than ``max_words``, always go to the model;
+* so do messages with a clause (split at ``and``/``but``/``also``/``plus``
+  and sentence ends) the classifier sends to the model, such as "what
+  services do you offer and how much do they cost": the template would
+  drop the pricing question.
+
+The classifier ships trained on ``TRAINING_EXAMPLES``; retrain it on
+labelled transcripts (JSONL lines ``{"text": ..., "intent": ...}``, with
+``llm`` for turns the model must handle) and pass the saved model to
+``Router``.
+
+Usage:
+    agent = ChatAgent(model, tools, router=Router(threshold=0.8))
+
+    python -m infinity_pixel.router train transcripts.jsonl --out var/router.json
+    python -m infinity_pixel.router classify "hi there" [--model var/router.json]
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from .tickets import TICKET_ID_IN_TEXT
+
+LLM = "llm"
+CLAUSE_BREAK = re.compile(r"\s*(?:[?;.!]+|\b(?:and|but|also|plus)\b)\s*", re.IGNORECASE)
+SERVICES = ("Application Development", "Cloud Application Development", "Cloud Management",
+            "Custom Software Development", "SaaS Development", "Ads Management")
+
+TEMPLATES = {
+    "greeting": ("Hello! I'm the Quantum-Ops AI Service Assistant. I can tell you about our services or help "
+                 "you with a support ticket. How can I help you today?"),
+    "thanks": "You're welcome! Is there anything else I can help you with?",
+    "goodbye": "Thank you for contacting Quantum-Ops. Have a great day!",
+    "services": (f"Quantum-Ops offers {', '.join(SERVICES[:-1])} and {SERVICES[-1]}. "
+                 "Which of these can I help you with?"),
+}
+
+TRAINING_EXAMPLES = [
+    *[(text, "greeting") for text in (
+        "hi", "hello", "hey", "hi there", "hello there", "hey there", "good morning", "good afternoon",
+        "good evening", "hiya", "howdy", "greetings", "hello!", "hey, how are you?", "hi, anyone there?",
+        "hello, is this the support chat?", "yo", "hi!!", "morning", "hey assistant")],
+    *[(text, "thanks") for text in (
+        "thanks", "thank you", "thanks a lot", "thank you so much", "thx", "ty", "many thanks",
+        "thanks for your help", "thank you, that helps", "great, thanks", "perfect, thank you",
+        "awesome thanks", "cheers", "appreciate it", "thanks!", "ok thanks", "thank you very much",
+        "got it, thanks", "much appreciated", "that's helpful, thanks")],
+    *[(text, "goodbye") for text in (
+        "bye", "goodbye", "see you", "bye bye", "have a nice day", "that's all", "that is all for now",
+        "talk later", "see you later", "bye, thanks", "nothing else, bye", "i'm done", "good night",
+        "catch you later", "that's everything", "no that's all", "all good, bye", "farewell")],
+    *[(text, "services") for text in (
+        "what services do you offer?", "what do you offer", "which services do you provide",
+        "what can you help me with", "list your services", "what does quantum-ops do",
+        "tell me about your services", "what services are available", "what kind of services do you have",
+        "services?", "what do you do", "which services can i get", "show me your services",
+        "what are your offerings", "what solutions do you provide", "what can quantum-ops do for me",
+        "what are your services", "do you have a list of services", "what do you guys offer",
+        "what services does your company offer")],
+    *[(text, LLM) for text in (
+        "i want to create a ticket", "open a ticket for me", "my login is broken", "i can't log in",
+        "what is the status of my ticket", "please close my ticket", "add an update to my ticket",
+        "i need help with my cloud bill", "how much does app development cost", "can you build a mobile app",
+        "do you support aws migrations", "my website is down", "tell me about cloud management pricing",
+        "how long does saas development take", "i was charged twice", "can i talk to a human",
+        "i need a custom crm", "what is your refund policy", "my ads campaign stopped running",
+        "how do you handle security", "update my ticket with the error message", "the app crashes on startup",
+        "can you help me migrate to azure", "i have a problem with my account", "reset my password please",
+        "what's the difference between app development and custom software",
+        "do you offer google ads management", "my name is ada and my email changed", "priority should be high",
+        "yes please", "no", "ok", "the issue is still happening", "it's urgent", "where is my invoice",
+        "can you check ticket status", "i want to report a bug", "hi, my payment failed",
+        "thanks but the problem is back", "hello, i need to open a ticket about billing",
+        # pricing, alone or asked together with the services: the template only lists the services
+        "what are your prices", "how much do your services cost", "what are your rates", "pricing?",
+        "do you have a price list", "what does it cost", "what do your services cost",
+        "what services do you offer and how much do they cost", "what do you offer and what are your prices",
+        "which services do you provide and what do they cost", "list your services with prices",
+        "what services do you have and how much are they", "tell me about your services and pricing",
+        "what services do you offer and how long do they take")],
+]
+
+
+def features(text):
+    """Words, word bigrams and character trigrams of ``text`` (robust to typos like "thnks")"""
+    words = re.findall(r"[a-z0-9]+(?:['-][a-z0-9]+)*", (text or "").lower())
+    result = [f"w:{w}" for w in words]
+    result.extend(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"<{word}>"
+        result.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return result
+
+
+class IntentClassifier:
+    """TF-IDF features and multinomial logistic regression trained with SGD"""
+
+    def __init__(self, classes=(), idf=None, weights=None, bias=None):
+        self.classes = list(classes)
+        self.idf = dict(idf or {})
+        self.weights = dict(weights or {})  # feature -> weight per class
+        self.bias = list(bias or [0.0] * len(self.classes))
+
+    def vector(self, text):
+        """Sublinear TF-IDF of the known features, L2-normalized"""
+        counts = Counter(f for f in features(text) if f in self.idf)
+        vector = {f: (1 + math.log(n)) * self.idf[f] for f, n in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {f: v / norm for f, v in vector.items()}
+
+    def _probabilities(self, vector):
+        scores = list(self.bias)
+        for feature, value in vector.items():
+            for c, weight in enumerate(self.weights[feature]):
+                scores[c] += weight * value
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def predict(self, text):
+        """``(intent, probability)`` of the most likely intent"""
+        probabilities = self._probabilities(self.vector(text))
+        best = max(range(len(self.classes)), key=probabilities.__getitem__)
+        return self.classes[best], probabilities[best]
+
+    @classmethod
+    def train(cls, examples, epochs=40, learning_rate=0.5, l2=1e-4, seed=0):
+        """Fit on ``(text, intent)`` pairs"""
+        examples = list(examples)
+        classes = sorted({intent for _, intent in examples})
+        df = Counter(f for text, _ in examples for f in set(features(text)))
+        n = len(examples)
+        idf = {f: math.log((1 + n) / (1 + count)) + 1 for f, count in df.items()}
+        model = cls(classes, idf, {f: [0.0] * len(classes) for f in idf})
+        data = [(model.vector(text), classes.index(intent)) for text, intent in examples]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for vector, target in data:
+                probabilities = model._probabilities(vector)
+                gradient = [p - (c == target) for c, p in enumerate(probabilities)]
+                for c, g in enumerate(gradient):
+                    model.bias[c] -= rate * g
+                for feature, value in vector.items():
+                    weights = model.weights[feature]
+                    for c, g in enumerate(gradient):
+                        weights[c] -= rate * (g * value + l2 * weights[c])
+        return model
+
+    def to_dict(self):
+        return {"classes": self.classes, "idf": self.idf, "weights": self.weights, "bias": self.bias}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["classes"], data["idf"], data["weights"], data["bias"])
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_examples(path):
+    """``(text, intent)`` pairs from a JSONL file of ``{"text", "intent"}`` lines"""
+    with open(path, encoding="utf-8") as f:
+        return [(row["text"], row["intent"]) for row in map(json.loads, filter(str.strip, f))]
+
+
+_default_classifier = None
+
+
+def default_classifier():
+    """The classifier trained on ``TRAINING_EXAMPLES`` (trained once per process)"""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = IntentClassifier.train(TRAINING_EXAMPLES)
+    return _default_classifier
+
+
+@dataclass
+class Route:
+    intent: str
+    confidence: float
+    answer: str = None  # None: send the message to the model
+    reason: str = ""
+
+
+class Router:
+    """Answers trivial intents from templates; everything else goes to the model"""
+
+    def __init__(self, classifier=None, threshold=0.8, thresholds=None, templates=None, max_words=12):
+        self.classifier = classifier or default_classifier()
+        self.threshold = threshold
+        self.thresholds = dict(thresholds or {})
+        self.templates = dict(TEMPLATES if templates is None else templates)
+        self.max_words = max_words
+
+    def route(self, text):
+        text = text or ""
+        if TICKET_ID_IN_TEXT.search(text) or "@" in text:
+            return Route(LLM, 1.0, reason="ticket ID or email")
+        if len(text.split()) > self.max_words:
+            return Route(LLM, 1.0, reason="long message")
+        intent, confidence = self.classifier.predict(text)
+        if intent == LLM or intent not in self.templates:
+            return Route(intent, confidence, reason="classified")
+        if confidence < self.thresholds.get(intent, self.threshold):
+            return Route(intent, confidence, reason="low confidence")
+        clauses = [c for c in CLAUSE_BREAK.split(text) if c.strip()]
+        if len(clauses) > 1 and any(self.classifier.predict(c)[0] == LLM for c in clauses):
+            return Route(intent, confidence, reason="several requests")
+        return Route(intent, confidence, self.templates[intent], "template")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or try the chat routing classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="train on a JSONL file of {text, intent} lines")
+    train.add_argument("examples")
+    train.add_argument("--out", required=True)
+    train.add_argument("--with-defaults", action="store_true", help="also train on the built-in examples")
+    classify = commands.add_parser("classify", help="route one message")
+    classify.add_argument("text")
+    classify.add_argument("--model", help="model saved by train (default: built-in examples)")
+    classify.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        examples = load_examples(args.examples) + (TRAINING_EXAMPLES if args.with_defaults else [])
+        start = time.perf_counter()
+        model = IntentClassifier.train(examples)
+        model.save(args.out)
+        print(f"✅ Trained on {len(examples)} examples ({', '.join(model.classes)}) in "
+              f"{time.perf_counter() - start:.1f} s → {args.out}")
+        return 0
+
+    classifier = IntentClassifier.load(args.model) if args.model else None
+    route = Router(classifier, threshold=args.threshold).route(args.text)
+    if route.answer is None:
+        print(f"⚠️  {route.intent} ({route.confidence:.2f}, {route.reason}): send to the model")
+    else:
+        print(f"✅ {route.intent} ({route.confidence:.2f}): {route.answer}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""
+Prioritized, fair execution of ticket actions.
+
+Run inline on the webhook thread, a burst of creates delays status checks
+and urgent tickets wait behind low ones. ``Scheduler`` puts each request in
+a ``FairPriorityQueue`` and runs it on a bounded pool of asyncio workers
+(``TicketBackend.handle`` is blocking, so each worker hands it to a thread):
+
+* The level comes from the action and the ticket priority: reads
+  (status/list/search) first, then writes by priority; close and update
+  before create. Creates use the priority they ask for; updates and closes
+  use the stored ticket's priority as last read by this process (medium if
+  unknown), so a caller cannot jump the queue by adding ``priority``.
+  Requests waiting longer than ``aging_s`` per level are promoted so low
+  priority work is never starved.
+* Within a level, customers (email, else session, else ticket) take turns,
+  so one customer's burst cannot monopolise the workers. Requests submitted
+  with a ``tenant`` are grouped by tenant first: tenants take turns, then
+  their customers (see ``tenancy``).
+* ``read_slots`` workers never take writes, so status reads stay fast while
+  every other worker is busy writing.
+* A full queue, or a customer with ``max_per_customer`` requests already
+  queued, is rejected with ``QueueFull`` carrying a Retry-After estimate;
+  ``serve`` answers it with HTTP 429.
+
+Usage:
+    scheduler = Scheduler(TicketBackend(store), workers=8)
+    await scheduler.start()
+    response = await scheduler.submit(payload, session_id=session)
+
+    python -m infinity_pixel.scheduler --port 8080   # POST /webhook/tt against an in-memory store
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import tickets
+from .backend import ACTIONS
+
+READ_ACTIONS = ("status", "list", "search")
+WRITE_LEVELS = {"close": 2, "update": 2, "create": 3}
+PRIORITY_OFFSETS = {"urgent": -1, "high": -1, "medium": 0, "low": 1}
+
+
+def classify(payload, session_id=None, priority_of=None):
+    """
+    ``(level, customer, action)`` of a webhook payload; level 0 is served first.
+
+    ``priority_of(ticket_id)`` gives the stored priority of an existing
+    ticket (or None) for update and close.
+    """
+    request = tickets.normalize_inputs(tickets.normalize_action(payload, ACTIONS))
+    action = request["action"]
+    if action in READ_ACTIONS:
+        level = 0
+    else:
+        if action == "create":
+            priority = request.get("priority")
+        else:
+            priority = priority_of(request.get("ticketId") or "") if priority_of else None
+        offset = PRIORITY_OFFSETS.get(str(priority or "").lower(), 0)
+        level = max(1, WRITE_LEVELS.get(action, 3) + offset)
+    customer = str(request.get("customerEmail") or "").strip().lower() or session_id or request.get("ticketId") or ""
+    return level, customer, action
+
+
+class QueueFull(Exception):
+    """The scheduler is not accepting the request; retry after ``retry_after`` seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"queue full ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def known_priority(backend, ticket_id):
+    """Priority of a ticket as ``backend`` last read it, without calling the store; None if unknown"""
+    known = backend.last_known.get(ticket_id) if ticket_id else None
+    return known[0].get("priority") if known else None
+
+
+class _Entry:
+    __slots__ = ("level", "customer", "item", "enqueued", "group", "taken")
+
+    def __init__(self, level, customer, item, enqueued, group=None):
+        self.level = level
+        self.customer = customer
+        self.item = item
+        self.enqueued = enqueued
+        self.group = group
+        self.taken = False
+
+
+def _decrement(counts, key):
+    counts[key] -= 1
+    if not counts[key]:
+        del counts[key]
+
+
+class FairPriorityQueue:
+    """Priority levels of per-customer FIFOs served round-robin (within round-robin groups), with aging"""
+
+    def __init__(self, aging_s=2.0):
+        self.aging_s = aging_s
+        self.levels = {}  # level -> OrderedDict(group -> OrderedDict(customer -> deque of entries))
+        self.arrivals = {}  # level -> deque of entries in arrival order (taken ones dropped lazily)
+        self.per_customer = {}  # (group, customer) -> queued entries
+        self.per_group = {}
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def depth(self, customer, group=None):
+        return self.per_customer.get((group, customer), 0)
+
+    def group_depth(self, group):
+        return self.per_group.get(group, 0)
+
+    def push(self, level, customer, item, now, group=None):
+        groups = self.levels.setdefault(level, OrderedDict())
+        queues = groups.setdefault(group, OrderedDict())
+        entry = _Entry(level, customer, item, now, group)
+        queues.setdefault(customer, deque()).append(entry)
+        self.arrivals.setdefault(level, deque()).append(entry)
+        self.per_customer[(group, customer)] = self.per_customer.get((group, customer), 0) + 1
+        self.per_group[group] = self.per_group.get(group, 0) + 1
+        self._len += 1
+
+    def pop(self, now, max_level=None):
+        """The next item, or None; only levels up to ``max_level`` if given"""
+        best = None
+        for level, groups in self.levels.items():
+            if max_level is not None and level > max_level:
+                continue
+            arrivals = self.arrivals[level]
+            while arrivals[0].taken:
+                arrivals.popleft()
+            # Each aging_s of the level's longest wait, in any group, counts as one level of promotion
+            effective = level - (now - arrivals[0].enqueued) / self.aging_s if self.aging_s else level
+            if best is None or effective < best[0]:
+                best = (effective, level)
+        if best is None:
+            return None
+        groups = self.levels[best[1]]
+        group, queues = next(iter(groups.items()))
+        customer, fifo = next(iter(queues.items()))
+        entry = fifo.popleft()
+        entry.taken = True
+        if fifo:
+            queues.move_to_end(customer)  # next customer's turn
+        else:
+            del queues[customer]
+        if queues:
+            groups.move_to_end(group)  # next group's turn
+        else:
+            del groups[group]
+            if not groups:
+                del self.levels[best[1]]
+                del self.arrivals[best[1]]
+        _decrement(self.per_customer, (group, customer))
+        _decrement(self.per_group, group)
+        self._len -= 1
+        return entry
+
+
+class Scheduler:
+    """Runs ``backend.handle`` calls on ``workers`` threads in fair priority order"""
+
+    def __init__(self, backend, workers=8, read_slots=1, max_queue=1000, max_per_customer=50,
+                 aging_s=2.0, clock=time.monotonic, registry=None):
+        if not 0 <= read_slots < workers:
+            raise ValueError("read_slots must leave at least one worker for writes")
+        self.backend = backend
+        self.workers = workers
+        self.write_slots = workers - read_slots
+        self.max_queue = max_queue
+        self.max_per_customer = max_per_customer
+        self.clock = clock
+        self.queue = FairPriorityQueue(aging_s)
+        self.service_s = 0.05  # moving average of a request's run time, for Retry-After
+        self._writes_running = 0
+        self._cond = None
+        self._tasks = []
+        self._executor = None
+        registry = registry or backend.metrics.registry
+        registry.gauge("scheduler_queue_depth", "Ticket requests waiting for a worker", fn=lambda: len(self.queue))
+        self.rejected = registry.counter(
+            "scheduler_rejected_total", "Ticket requests rejected with 429 by reason", ["reason"])
+        self.wait = registry.histogram(
+            "scheduler_wait_ms", "Time ticket requests spent queued, by action", ["action"])
+
+    async def start(self):
+        self._cond = asyncio.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ticket-worker")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=True)
+
+    def _stored_priority(self, ticket_id, tenant):
+        return known_priority(self.backend, ticket_id)
+
+    def retry_after(self):
+        """Seconds until the current queue should have drained"""
+        return max(1, math.ceil(len(self.queue) * self.service_s / self.workers))
+
+    async def submit(self, payload, session_id=None, tenant=None):
+        """Queue one request and wait for its response; raises ``QueueFull``"""
+        level, customer, action = classify(
+            payload, session_id, lambda ticket_id: self._stored_priority(ticket_id, tenant))
+        if len(self.queue) >= self.max_queue:
+            self.rejected.labels("queue").inc()
+            raise QueueFull("queue", self.retry_after())
+        if self.queue.depth(customer, tenant) >= self.max_per_customer:
+            self.rejected.labels("customer").inc()
+            raise QueueFull("customer", self.retry_after())
+        future = asyncio.get_running_loop().create_future()
+        async with self._cond:
+            self.queue.push(level, customer, (payload, session_id, tenant, action, future), self.clock(), tenant)
+            self._cond.notify()
+        return await future
+
+    def _handle(self, payload, session_id, tenant):
+        """Run one request on a worker thread"""
+        return self.backend.handle(payload, session_id)
+
+    def _take(self):
+        entry = self.queue.pop(self.clock(), max_level=0 if self._writes_running >= self.write_slots else None)
+        if entry is not None and entry.level > 0:
+            self._writes_running += 1
+        return entry
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            async with self._cond:
+                entry = self._take()
+                while entry is None:
+                    await self._cond.wait()
+                    entry = self._take()
+            payload, session_id, tenant, action, future = entry.item
+            started = self.clock()
+            self.wait.labels(action).observe((started - entry.enqueued) * 1000)
+            try:
+                if not future.cancelled():
+                    response = await loop.run_in_executor(self._executor, self._handle, payload, session_id, tenant)
+                    if not future.cancelled():
+                        future.set_result(response)
+            except Exception as exc:
+                if not future.cancelled():
+                    future.set_exception(exc)
+            finally:
+                self.service_s = 0.9 * self.service_s + 0.1 * (self.clock() - started)
+                async with self._cond:
+                    if entry.level > 0:
+                        self._writes_running -= 1
+                    self._cond.notify_all()
+
+
+async def _read_request(reader):
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) < 2:
+        return None
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise ValueError("invalid Content-Length")
+    body = await reader.readexactly(length)
+    return request_line[0], request_line[1], headers, body
+
+
+def _http_response(status, reason, body, headers=()):
+    data = json.dumps(body).encode("utf-8")
+    lines = [f"HTTP/1.1 {status} {reason}", "Content-Type: application/json",
+             f"Content-Length: {len(data)}", "Connection: close", *headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data
+
+
+async def serve(scheduler, host="127.0.0.1", port=8080, path="/webhook/tt"):
+    """Accept the ``tt`` webhook's POSTs and answer them through ``scheduler``"""
+
+    async def handle(reader, writer):
+        try:
+            try:
+                request = await _read_request(reader)
+            except ValueError as exc:
+                writer.write(_http_response(400, "Bad Request", {"error": str(exc)}))
+                return
+            except asyncio.IncompleteReadError:  # the client went away mid-request
+                return
+            if request is None:
+                return
+            method, target, headers, body = request
+            if method != "POST" or target.split("?")[0] != path:
+                writer.write(_http_response(404, "Not Found", {"error": "not found"}))
+                return
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                writer.write(_http_response(400, "Bad Request", {"error": "invalid JSON"}))
+                return
+            if not isinstance(payload, dict):
+                writer.write(_http_response(400, "Bad Request", {"error": "expected a JSON object"}))
+                return
+            session_id = headers.get("x-session-id") or payload.get("sessionId")
+            tenant = headers.get("x-tenant-id") or payload.get("tenantId")
+            try:
+                response = await scheduler.submit(payload, session_id, tenant)
+            except QueueFull as exc:
+                writer.write(_http_response(429, "Too Many Requests", {"error": str(exc)},
+                                            [f"Retry-After: {exc.retry_after}"]))
+                return
+            except LookupError as exc:  # unknown tenant
+                writer.write(_http_response(404, "Not Found", {"error": str(exc)}))
+                return
+            writer.write(_http_response(200, "OK", response))
+        except Exception as exc:  # a failing backend or tenant still gets an answer
+            writer.write(_http_response(500, "Internal Server Error", {"error": f"{type(exc).__name__}: {exc}"}))
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+            except OSError:  # the client is gone
+                pass
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the ticket webhook through the scheduler")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    from .backend import TicketBackend
+    from .store import InMemoryTicketStore
+
+    async def run():
+        scheduler = Scheduler(TicketBackend(InMemoryTicketStore()), workers=args.workers, max_queue=args.max_queue)
+        await scheduler.start()
+        server = await serve(scheduler, args.host, args.port)
+        print(f"✅ Serving POST http://{args.host}:{args.port}/webhook/tt (Ctrl+C to stop)")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,445 @@
+"""
+Full-text search over tickets.
+
+An in-memory inverted index over ``Subject`` (weighted x2), ``Initial
+Description`` and ``Conversation Log`` with BM25 ranking, ``term*`` prefix
+queries and Status/Priority filters.
+
+Postings are append-only ``array``s kept twice: doc-ordered (for exact
+scoring) and split into impact-ordered segments, so a top-k query can
+process the highest-scoring postings first and stop early. Re-indexing a
+ticket appends a new document and marks the old one dead; ``compact()``
+drops dead documents once they make up a large share of the index. As in
+Lucene, document frequencies include dead documents until the next
+compaction, and length normalization uses the average length at indexing
+time (re-normalized when it drifts by more than 10%).
+
+Usage:
+    index = SearchIndex.from_records(records)
+    index.search("password reset", status="open", limit=10)
+
+    python -m infinity_pixel.search tickets.csv "password reset" [--status open] [--priority high]
+"""
+
+import argparse
+import heapq
+import math
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from itertools import compress
+from operator import add, itemgetter
+
+from .cache import BackgroundIndex
+from .tickets import PRIORITIES, STATUSES, read_csv, record_fields
+
+FIELD_WEIGHTS = {"Subject": 2, "Initial Description": 1, "Conversation Log": 1}
+MAX_PREFIX_TERMS = 64
+IMPACT_LEVELS = 32  # quantization of per-posting BM25 impacts into segments
+NORM_DRIFT = 0.1  # re-normalize stored impacts when the average length drifts this much
+CONJUNCTIVE_MAX_DOCS = 5000  # score docs matching every term directly when there are this few
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have i in is it its my of on or our so that the this
+to was we were will with you your me not can cannot do does
+""".split())
+
+_LOG_TIMESTAMP = re.compile(r"\[\d{4}-\d{2}-\d{2}T[0-9:.]+Z?\]", re.IGNORECASE)
+_WORD = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+
+def tokenize(text):
+    """Lower-cased word tokens without conversation-log timestamps or stopwords"""
+    text = _LOG_TIMESTAMP.sub(" ", (text or "").lower())
+    return [t for t in _WORD.findall(text) if t not in STOPWORDS]
+
+
+class SearchIndex:
+    """BM25 inverted index keyed by Ticket ID"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> (doc ids, term frequencies), doc-ordered
+        self.segments = {}  # term -> {impact level: (doc ids, impacts)}
+        self.terms = []  # sorted vocabulary, for prefix expansion
+        self.doc_ticket = []  # doc id -> Ticket ID
+        self.doc_len = array("I")
+        self.live = bytearray()
+        self.status = bytearray()
+        self.priority = bytearray()
+        self.subjects = []
+        self.by_ticket = {}  # Ticket ID -> live doc id
+        self.live_count = 0
+        self.live_length = 0
+        self.norm_avgdl = 0.0  # average length the stored impacts were computed with
+        self._status_codes = {s: i + 1 for i, s in enumerate(STATUSES)}
+        self._priority_codes = {p: i + 1 for i, p in enumerate(PRIORITIES)}
+        self._masks = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_records(cls, records, **kwargs):
+        index = cls(**kwargs)
+        for record in records:
+            index.upsert(record)
+        return index
+
+    def __len__(self):
+        return self.live_count
+
+    def _code(self, codes, value):
+        value = (value or "").strip().lower()
+        if value not in codes:
+            codes[value] = len(codes) + 1
+        return codes[value]
+
+    def _impact(self, tf, length):
+        """BM25 term-frequency component (without idf) for the stored normalization"""
+        k1 = self.k1
+        return tf * (k1 + 1) / (tf + k1 * (1 - self.b + self.b * length / self.norm_avgdl))
+
+    def _level(self, impact):
+        return min(IMPACT_LEVELS - 1, int(impact / (self.k1 + 1) * IMPACT_LEVELS))
+
+    def _level_bound(self, level):
+        return (level + 1) / IMPACT_LEVELS * (self.k1 + 1)
+
+    def upsert(self, record):
+        """Index a ticket (record or field dict), replacing any earlier version"""
+        fields = record_fields(record)
+        ticket_id = fields.get("Ticket ID")
+        if not ticket_id:
+            return
+        counts = {}
+        length = 0
+        for name, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(fields.get(name)):
+                counts[token] = counts.get(token, 0) + weight
+                length += weight
+        with self._lock:
+            self._delete(ticket_id)
+            self._masks.clear()
+            doc = len(self.doc_ticket)
+            self.doc_ticket.append(ticket_id)
+            self.doc_len.append(length)
+            self.live.append(1)
+            self.status.append(self._code(self._status_codes, fields.get("Status")))
+            self.priority.append(self._code(self._priority_codes, fields.get("Priority")))
+            self.subjects.append(fields.get("Subject") or "")
+            self.by_ticket[ticket_id] = doc
+            self.live_count += 1
+            self.live_length += length
+            avgdl = self.live_length / self.live_count
+            if not self.norm_avgdl or abs(avgdl - self.norm_avgdl) > NORM_DRIFT * self.norm_avgdl:
+                self.norm_avgdl = avgdl or 1.0
+                self._renormalize()
+            for term, tf in counts.items():
+                tf = min(tf, 0xFFFF)
+                entry = self.postings.get(term)
+                if entry is None:
+                    entry = self.postings[term] = (array("I"), array("H"))
+                    self.segments[term] = {}
+                    self.terms.insert(bisect_left(self.terms, term), term)
+                entry[0].append(doc)
+                entry[1].append(tf)
+                impact = self._impact(tf, length)
+                segment = self.segments[term].get(self._level(impact))
+                if segment is None:
+                    segment = self.segments[term][self._level(impact)] = (array("I"), array("f"))
+                segment[0].append(doc)
+                segment[1].append(impact)
+            if len(self.doc_ticket) > 1000 and self.live_count < len(self.doc_ticket) * 0.7:
+                self.compact()
+
+    def remove(self, ticket_id):
+        with self._lock:
+            self._delete(ticket_id)
+            self._masks.clear()
+
+    def _delete(self, ticket_id):
+        doc = self.by_ticket.pop(ticket_id, None)
+        if doc is not None:
+            self.live[doc] = 0
+            self.live_count -= 1
+            self.live_length -= self.doc_len[doc]
+
+    def _renormalize(self):
+        """Recompute every stored impact with ``norm_avgdl`` and re-bucket the segments"""
+        doc_len = self.doc_len
+        for term, (docs, tfs) in self.postings.items():
+            levels = {}
+            for d, tf in zip(docs, tfs):
+                impact = self._impact(tf, doc_len[d])
+                segment = levels.get(self._level(impact))
+                if segment is None:
+                    segment = levels[self._level(impact)] = (array("I"), array("f"))
+                segment[0].append(d)
+                segment[1].append(impact)
+            self.segments[term] = levels
+
+    def compact(self):
+        """Rewrite postings without dead documents, renumbering doc ids"""
+        with self._lock:
+            remap = {}
+            for old, alive in enumerate(self.live):
+                if alive:
+                    remap[old] = len(remap)
+            postings = {}
+            for term, (docs, tfs) in self.postings.items():
+                new_docs, new_tfs = array("I"), array("H")
+                for d, tf in zip(docs, tfs):
+                    new = remap.get(d)
+                    if new is not None:
+                        new_docs.append(new)
+                        new_tfs.append(tf)
+                if new_docs:
+                    postings[term] = (new_docs, new_tfs)
+            keep = list(remap)
+            self.postings = postings
+            self.terms = sorted(postings)
+            self.doc_ticket = [self.doc_ticket[d] for d in keep]
+            self.doc_len = array("I", (self.doc_len[d] for d in keep))
+            self.live = bytearray(b"\x01" * len(keep))
+            self.status = bytearray(self.status[d] for d in keep)
+            self.priority = bytearray(self.priority[d] for d in keep)
+            self.subjects = [self.subjects[d] for d in keep]
+            self.by_ticket = {t: i for i, t in enumerate(self.doc_ticket)}
+            self.norm_avgdl = (self.live_length / self.live_count) if self.live_count else 0.0
+            self.segments = {}
+            self._masks.clear()
+            if self.live_count:
+                self._renormalize()
+
+    def expand(self, term):
+        """Terms matching ``term`` (a ``prefix*`` expands to the most common matches)"""
+        if not term.endswith("*"):
+            return [term] if term in self.postings else []
+        prefix = term[:-1]
+        matches = []
+        i = bisect_left(self.terms, prefix)
+        while i < len(self.terms) and self.terms[i].startswith(prefix):
+            matches.append(self.terms[i])
+            i += 1
+        if len(matches) > MAX_PREFIX_TERMS:
+            matches = heapq.nlargest(MAX_PREFIX_TERMS, matches, key=lambda t: len(self.postings[t][0]))
+        return matches
+
+    def _query_terms(self, query):
+        terms = []
+        for raw in (query or "").lower().split():
+            if raw.endswith("*") and len(raw) > 1:
+                words = _WORD.findall(raw[:-1])
+                if words:
+                    terms.extend(w for w in words[:-1] if w not in STOPWORDS)
+                    terms.append(words[-1] + "*")
+            else:
+                terms.extend(tokenize(raw))
+        return terms
+
+    def _mask(self, status_code, priority_code):
+        """Bytes with 1 for live documents passing the filters (cached until the next write)"""
+        key = (status_code, priority_code)
+        mask = self._masks.get(key)
+        if mask is None:
+            n = len(self.live)
+            combined = int.from_bytes(self.live, "little")
+            for column, code in ((self.status, status_code), (self.priority, priority_code)):
+                if code is not None:
+                    table = bytes(1 if i == code else 0 for i in range(256))
+                    combined &= int.from_bytes(column.translate(table), "little")
+            mask = self._masks[key] = combined.to_bytes(n, "little")
+        return mask
+
+    def search(self, query, status=None, priority=None, limit=10):
+        """Top ``limit`` live tickets by BM25 as dicts with ticketId, subject, status, priority, score"""
+        with self._lock:
+            if not self.live_count or limit <= 0:
+                return []
+            status_code = self._status_codes.get(status.lower()) if status else None
+            priority_code = self._priority_codes.get(priority.lower()) if priority else None
+            if (status and status_code is None) or (priority and priority_code is None):
+                return []
+            terms = {t for term in self._query_terms(query) for t in self.expand(term)}
+            if not terms:
+                return []
+            scores = self._top(terms, self._mask(status_code, priority_code), limit)
+            statuses = {v: k for k, v in self._status_codes.items()}
+            priorities = {v: k for k, v in self._priority_codes.items()}
+            return [{
+                "ticketId": self.doc_ticket[d],
+                "subject": self.subjects[d],
+                "status": statuses.get(self.status[d], ""),
+                "priority": priorities.get(self.priority[d], ""),
+                "score": round(score, 4),
+            } for d, score in scores]
+
+    def _top(self, terms, mask, k):
+        """
+        Score-at-a-time top-k over impact-ordered segments.
+
+        Segments are processed in decreasing ``idf * impact bound`` order and
+        accumulated with C-level dict operations. Processing stops once no
+        document outside the current top k (seen or not) can still overtake
+        it; the survivors are then rescored exactly from the doc-ordered
+        postings.
+        """
+        n_docs = len(self.doc_ticket)
+        idf = {}
+        queue = []
+        remaining = {}
+        for term in terms:
+            df = len(self.postings[term][0])
+            idf[term] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            levels = sorted(self.segments[term], reverse=True)
+            for level in levels:
+                queue.append((idf[term] * self._level_bound(level), term, level))
+            remaining[term] = [idf[term] * self._level_bound(level) for level in levels]
+        queue.sort(reverse=True)
+
+        if 1 < len(terms) <= 4:
+            top = self._conjunctive_top(terms, mask, k, idf, {t: r[0] for t, r in remaining.items()})
+            if top is not None:
+                return top
+
+        acc = {}
+        bound = sum(r[0] for r in remaining.values())
+        checked_at = bound
+        for weight, term, level in queue:
+            docs, impacts = self.segments[term][level]
+            w = idf[term]
+            pairs = compress(zip(docs, map(w.__mul__, impacts)), map(mask.__getitem__, docs))
+            new = dict(pairs)
+            if acc:
+                common = list(acc.keys() & new.keys())
+                if common:
+                    new.update(zip(common, map(add, map(acc.__getitem__, common), map(new.__getitem__, common))))
+            acc.update(new)
+            remaining[term].pop(0)
+            bound = sum(r[0] for r in remaining.values() if r)
+            # Checking costs O(len(acc)); only do it once the bound has dropped noticeably
+            if len(acc) > k and bound <= checked_at * 0.75:
+                checked_at = bound
+                best = heapq.nlargest(k + 1, acc.values())
+                if best[k - 1] >= best[k] + bound:
+                    break
+
+        top = heapq.nlargest(k, acc.items(), key=itemgetter(1))
+        exact = [(d, self._score(d, terms, idf)) for d, _ in top]
+        exact.sort(key=lambda item: (-item[1], item[0]))
+        return exact
+
+    def _conjunctive_top(self, terms, mask, k, idf, max_scores):
+        """
+        Exact top-k when the documents matching every term decide it.
+
+        A document missing some term scores at most the sum of the other
+        terms' maxima; if the k-th best document containing all terms beats
+        that, no other document can enter the top k.
+        """
+        ordered = sorted(terms, key=lambda t: len(self.postings[t][0]))
+        docs = self.postings[ordered[0]][0]
+        common = set(compress(docs, map(mask.__getitem__, docs)))
+        for term in ordered[1:]:
+            if len(common) < k:
+                return None
+            common.intersection_update(self.postings[term][0])
+        if not k <= len(common) <= CONJUNCTIVE_MAX_DOCS:
+            return None
+        partial_bound = sum(max_scores.values()) - min(max_scores.values())
+        scored = sorted(((d, self._score(d, terms, idf)) for d in common), key=lambda item: (-item[1], item[0]))
+        if scored[k - 1][1] < partial_bound:
+            return None
+        return scored[:k]
+
+    def _score(self, doc, terms, idf):
+        score = 0.0
+        length = self.doc_len[doc]
+        for term in terms:
+            docs, tfs = self.postings[term]
+            i = bisect_left(docs, doc)
+            if i < len(docs) and docs[i] == doc:
+                score += idf[term] * self._impact(tfs[i], length)
+        return score
+
+
+class StoreSearchIndex(BackgroundIndex):
+    """A ``SearchIndex`` over a ticket store, rebuilt in the background every ``refresh_s``"""
+
+    def __init__(self, store, refresh_s=900.0, clock=time.monotonic, call=None, **kwargs):
+        super().__init__(store, refresh_s, call=call, clock=clock)
+        self.kwargs = kwargs
+
+    def build(self, records):
+        return SearchIndex.from_records(records, **self.kwargs)
+
+    def apply(self, index, record):
+        index.upsert(record)
+
+    def search(self, query, status=None, priority=None, limit=10):
+        return self.require().search(query, status, priority, limit)
+
+
+def search_params(item):
+    """Query, filters and limit of a ``search`` request (top level or ``body``)"""
+    body = item.get("body") or {}
+
+    def get(*names):
+        for name in names:
+            for source in (item, body):
+                if source.get(name):
+                    return source[name]
+        return ""
+
+    try:
+        limit = max(1, min(int(get("limit") or 10), 100))
+    except (TypeError, ValueError):
+        limit = 10
+    return {
+        "query": str(get("query", "q", "description")),
+        "statusFilter": str(get("statusFilter", "status")).lower(),
+        "priorityFilter": str(get("priorityFilter", "priority")).lower(),
+        "limit": limit,
+    }
+
+
+def search_response(params, results):
+    """Response of the ``search`` action, shaped like the other actions' responses"""
+    query = params["query"]
+    if results:
+        message = f"Found {len(results)} ticket{'s' if len(results) != 1 else ''} matching \"{query}\"."
+    else:
+        message = f"I could not find any tickets matching \"{query}\"."
+    return {
+        "action": "search",
+        "query": query,
+        "status": "ok" if results else "not_found",
+        "results": results,
+        "messageForUser": message,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search tickets in a CSV export")
+    parser.add_argument("csv")
+    parser.add_argument("query")
+    parser.add_argument("--status")
+    parser.add_argument("--priority")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    index = SearchIndex.from_records(read_csv(args.csv))
+    results = index.search(args.query, args.status, args.priority, args.limit)
+    if not results:
+        print(f"⚠️  No tickets match {args.query!r}")
+        return 1
+    for r in results:
+        print(f"{r['score']:>8.3f}  {r['ticketId']}  [{r['status']}/{r['priority']}]  {r['subject']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
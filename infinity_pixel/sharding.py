@@ -0,0 +1,302 @@
+"""
+Sharded ticket storage.
+
+``ShardedTicketStore`` spreads tickets over several ``TicketStore``s (for
+Airtable: one table or base per shard, each with its own rate limit) and
+is itself a ``TicketStore``, so ``TicketBackend`` uses it unchanged.
+
+* Placement is a consistent-hash ring (``HashRing``) over Ticket IDs with
+  ``vnodes`` points per shard; adding a shard moves only the keys it now
+  owns, about ``1 / shards`` of them.
+* ``add_shard`` rebalances online: creates go to the new owner at once,
+  reads try the new owner and then the old one, and each ticket is moved
+  (copy, then delete) under a per-record lock that updates also take, so
+  no write is lost while it moves.
+* The router remembers which shard holds each record ID it has seen (up to
+  ``max_records``, least recently used first out); a record ID it does not
+  know is located with a read on every shard, and only its shard is written.
+* Cross-shard queries (``all_records``, ``status_counts``, ``sla_breached``)
+  fan out to every shard in parallel and merge the results.
+
+Usage:
+    store = ShardedTicketStore({"s0": AirtableTicketStore(token, table_id="tbl..."),
+                                "s1": AirtableTicketStore(token, table_id="tbl...")})
+    backend = TicketBackend(store)
+    store.add_shard("s2", AirtableTicketStore(token, table_id="tbl..."))
+
+    python -m infinity_pixel.sharding s0 s1 s2 --add s3   # key-space shares and keys moved
+"""
+
+import argparse
+import hashlib
+import sys
+import threading
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .store import TicketStore, VersionConflict
+from .tickets import is_sla_breached, now_ms, record_fields
+
+LOCK_STRIPES = 64
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys to shard names"""
+
+    def __init__(self, shards=(), vnodes=64):
+        self.vnodes = vnodes
+        self.shards = []
+        self._points = []
+        self._owners = []
+        for shard in shards:
+            self.add(shard)
+
+    def _rebuild(self):
+        ring = sorted((_hash(f"{shard}#{i}"), shard) for shard in self.shards for i in range(self.vnodes))
+        self._points = [point for point, _ in ring]
+        self._owners = [shard for _, shard in ring]
+
+    def add(self, shard):
+        if shard in self.shards:
+            raise ValueError(f"shard {shard!r} is already on the ring")
+        self.shards.append(shard)
+        self._rebuild()
+
+    def remove(self, shard):
+        self.shards.remove(shard)
+        self._rebuild()
+
+    def copy(self):
+        ring = HashRing(vnodes=self.vnodes)
+        ring.shards = list(self.shards)
+        ring._points, ring._owners = self._points, self._owners
+        return ring
+
+    def owner(self, key):
+        if not self._points:
+            raise LookupError("the ring has no shards")
+        i = bisect_right(self._points, _hash(key))
+        return self._owners[i % len(self._owners)]
+
+    def shares(self):
+        """Fraction of the key space owned by each shard"""
+        shares = dict.fromkeys(self.shards, 0)
+        previous = self._points[-1] - (1 << 64)
+        for point, shard in zip(self._points, self._owners):
+            shares[shard] += point - previous
+            previous = point
+        return {shard: span / (1 << 64) for shard, span in shares.items()}
+
+    def to_dict(self):
+        """The shard map, for persisting alongside the shard configuration"""
+        return {"vnodes": self.vnodes, "shards": list(self.shards)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["shards"], data.get("vnodes", 64))
+
+
+class _LRU:
+    """Bounded map dropping the least recently used key"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ShardedTicketStore(TicketStore):
+    """A ``TicketStore`` over named shard stores placed by consistent hashing"""
+
+    def __init__(self, shards, vnodes=64, max_workers=32, max_records=100_000):
+        self.shards = dict(shards)
+        self.ring = HashRing(self.shards, vnodes)
+        self.previous = None  # ring before an in-progress rebalance
+        self._record_shards = _LRU(max_records)  # record id -> shard name
+        self._moved = _LRU(max_records)  # record id before a move -> record id after it
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._admin_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard")
+
+    def _stripe(self, record_id):
+        return self._stripes[hash(record_id) % LOCK_STRIPES]
+
+    def _owners(self, ticket_id):
+        ring, previous = self.ring, self.previous
+        owners = [ring.owner(ticket_id)]
+        if previous is not None and previous.owner(ticket_id) != owners[0]:
+            owners.append(previous.owner(ticket_id))
+        return owners
+
+    def scatter(self, fn):
+        """``{shard: fn(store)}`` with one call per shard, run in parallel"""
+        futures = {name: self._pool.submit(fn, store) for name, store in list(self.shards.items())}
+        return {name: future.result() for name, future in futures.items()}
+
+    def _shard_of(self, record_id):
+        """Name of the shard holding ``record_id``, reading every shard if it is not known; None if absent"""
+        name = self._record_shards.get(record_id)
+        if name is None:
+            found = [n for n, record in self.scatter(lambda store: store.get(record_id)).items() if record]
+            if not found:
+                return None
+            name = found[0]
+            self._record_shards.set(record_id, name)
+        return name
+
+    def get(self, record_id):
+        record_id = self._moved.get(record_id, record_id)
+        name = self._shard_of(record_id)
+        return self.shards[name].get(record_id) if name is not None else None
+
+    def find(self, ticket_id):
+        owners = self._owners(ticket_id)
+        if len(owners) > 1:
+            owners.append(owners[0])  # a ticket moved between the first two reads is on the new owner
+        for name in owners:
+            record = self.shards[name].find(ticket_id)
+            if record is not None:
+                self._record_shards.set(record["id"], name)
+                return record
+        return None
+
+    def all_records(self):
+        results = self.scatter(lambda store: list(store.all_records()))
+        return (record for records in results.values() for record in records)
+
+    def create(self, fields):
+        name = self.ring.owner(fields.get("Ticket ID") or "")
+        record = self.shards[name].create(fields)
+        self._record_shards.set(record["id"], name)
+        return record
+
+    def update(self, record_id, fields):
+        with self._stripe(record_id):
+            record_id = self._moved.get(record_id, record_id)
+            name = self._shard_of(record_id)
+            return self.shards[name].update(record_id, fields) if name is not None else None
+
+    def version(self, record):
+        name = self._shard_of(record["id"])
+        store = self.shards[name] if name is not None else next(iter(self.shards.values()))
+        return store.version(record)
+
+    def compare_and_swap(self, record_id, version, fields):
+        with self._stripe(record_id):
+            if record_id in self._moved:
+                # The copy on the new shard starts a new version history
+                raise VersionConflict(record_id)
+            name = self._shard_of(record_id)
+            return self.shards[name].compare_and_swap(record_id, version, fields) if name is not None else None
+
+    def delete(self, record_id):
+        with self._stripe(record_id):
+            record_id = self._moved.get(record_id, record_id)
+            name = self._shard_of(record_id)
+            self._record_shards.pop(record_id)
+            return self.shards[name].delete(record_id) if name is not None else False
+
+    def add_shard(self, name, store):
+        """Add a shard and move the tickets it now owns; returns how many moved"""
+        with self._admin_lock:
+            if name in self.shards:
+                raise ValueError(f"shard {name!r} already exists")
+            ring = self.ring.copy()
+            ring.add(name)
+            self.shards[name] = store
+            self.previous, self.ring = self.ring, ring
+            try:
+                moved = self.scatter(lambda source: self._migrate(source, ring))
+            finally:
+                self.previous = None
+            return sum(moved.values())
+
+    def _migrate(self, source, ring):
+        moved = 0
+        for record in list(source.all_records()):
+            ticket_id = record_fields(record).get("Ticket ID") or ""
+            target = ring.owner(ticket_id)
+            if self.shards[target] is source:
+                continue
+            with self._stripe(record["id"]):
+                current = source.find(ticket_id)  # pick up writes since the listing
+                if current is None:
+                    continue
+                copy = self.shards[target].create(record_fields(current))
+                self._record_shards.set(copy["id"], target)
+                self._moved.set(current["id"], copy["id"])
+                self._record_shards.pop(current["id"], None)
+                source.delete(current["id"])
+            moved += 1
+        return moved
+
+    def status_counts(self):
+        """Tickets per Status across all shards"""
+        def count(store):
+            return Counter(record_fields(r).get("Status") or "" for r in store.all_records())
+        return dict(sum(self.scatter(count).values(), Counter()))
+
+    def sla_breached(self, at_ms=None):
+        """Records of open tickets past their SLA across all shards"""
+        at_ms = now_ms() if at_ms is None else at_ms
+
+        def scan(store):
+            return [r for r in store.all_records() if is_sla_breached(record_fields(r), at_ms)]
+        return [record for records in self.scatter(scan).values() for record in records]
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show how a hash ring splits the ticket key space")
+    parser.add_argument("shards", nargs="+")
+    parser.add_argument("--add", help="shard to add, reporting the share of keys that move")
+    parser.add_argument("--vnodes", type=int, default=64)
+    parser.add_argument("--keys", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    ring = HashRing(args.shards, args.vnodes)
+    for shard, share in sorted(ring.shares().items()):
+        print(f"  {shard:<12} {share:6.1%}")
+    if args.add:
+        grown = ring.copy()
+        grown.add(args.add)
+        keys = [f"TCK-{1764314974531 + i}-{i % 1000:03d}" for i in range(args.keys)]
+        moved = sum(ring.owner(k) != grown.owner(k) for k in keys)
+        print(f"✅ Adding {args.add} moves {moved / len(keys):.1%} of keys "
+              f"(ideal {1 / len(grown.shards):.1%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+Near-duplicate ticket detection for the create path.
+
+Customers often open a new ticket for an issue they already reported.
+``DuplicateDetector`` keeps a MinHash signature of the subject and
+description of every open ticket, an LSH table over the signatures and an
+index by ``Customer Email``, so the likely duplicates of a new ticket are
+found without scanning the table:
+
+* open tickets with the same email match at ``email_threshold`` estimated
+  Jaccard similarity and are the customer's own (``sameCustomer``);
+* similar open tickets under any other email, found through LSH, match at
+  ``threshold`` with ``sameCustomer`` false, for agents only: they are
+  never offered to the customer. A matching customer name is not enough,
+  since anyone can type a name.
+
+Usage:
+    detector = DuplicateDetector.from_records(records)
+    detector.check("ada@example.com", "Ada", "Login fails", "Cannot log in since the reset")
+
+    python -m infinity_pixel.similarity tickets.csv   # possible duplicates in an export
+"""
+
+import argparse
+import hashlib
+import random
+import sys
+import threading
+import time
+from array import array
+
+from .cache import BackgroundIndex
+from .search import tokenize
+from .tickets import CLOSED_STATUSES, read_csv, record_fields
+
+HASH_PRIME = 4_294_967_291  # largest prime below 2**32, so hash values fit array("I")
+WORD_CACHE_SIZE = 20_000
+
+
+def features(subject, description):
+    """Distinct words of a ticket's subject and description; short paraphrases share few bigrams"""
+    return set(tokenize(f"{subject or ''} {description or ''}"))
+
+
+def _normalize(value):
+    return str(value or "").strip().lower()
+
+
+def allow_duplicate(item):
+    """Whether a create request asked to skip the duplicate check (top level or ``body``)"""
+    body = item.get("body") or {}
+    value = item.get("allowDuplicate", body.get("allowDuplicate"))
+    return value is True or _normalize(value) in ("true", "1", "yes")
+
+
+class MinHasher:
+    """
+    MinHash signatures from ``num_perm`` universal hash functions.
+
+    Ticket text reuses a small vocabulary, so each word's ``num_perm`` hash
+    values are computed once and cached; a signature is then the
+    column-wise minimum of its words' cached vectors.
+    """
+
+    def __init__(self, num_perm=96, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.params = [(rng.randrange(1, HASH_PRIME), rng.randrange(HASH_PRIME)) for _ in range(num_perm)]
+        self._words = {}
+
+    def _vector(self, feature):
+        vector = self._words.get(feature)
+        if vector is None:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            h = int.from_bytes(digest, "little") % HASH_PRIME
+            vector = array("I", [(a * h + b) % HASH_PRIME for a, b in self.params])
+            if len(self._words) >= WORD_CACHE_SIZE:
+                self._words.clear()
+            self._words[feature] = vector
+        return vector
+
+    def signature(self, feature_set):
+        """Tuple of ``num_perm`` minima, or None for an empty set"""
+        if not feature_set:
+            return None
+        return tuple(map(min, *map(self._vector, feature_set), [HASH_PRIME] * self.num_perm))
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(map(int.__eq__, sig_a, sig_b)) / len(sig_a)
+
+
+class DuplicateDetector:
+    """Open tickets indexed for near-duplicate lookup, keyed by Ticket ID"""
+
+    def __init__(self, threshold=0.6, email_threshold=0.5, num_perm=96, bands=32, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.email_threshold = email_threshold
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.tickets = {}  # ticket id -> (signature, email, subject, priority)
+        self.by_email = {}  # email -> ticket ids
+        self.buckets = {}  # (band, band values) -> ticket ids
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_records(cls, records, **kwargs):
+        detector = cls(**kwargs)
+        for record in records:
+            detector.upsert(record)
+        return detector
+
+    def __len__(self):
+        return len(self.tickets)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def upsert(self, record):
+        """Index an open ticket (record or field dict); closed and resolved tickets are dropped"""
+        fields = record_fields(record)
+        ticket_id = fields.get("Ticket ID")
+        if not ticket_id:
+            return
+        signature = None
+        if _normalize(fields.get("Status")) not in CLOSED_STATUSES:
+            signature = self.hasher.signature(features(fields.get("Subject"), fields.get("Initial Description")))
+        with self._lock:
+            self._remove(ticket_id)
+            if signature is None:
+                return
+            email = _normalize(fields.get("Customer Email"))
+            self.tickets[ticket_id] = (signature, email, fields.get("Subject") or "", fields.get("Priority") or "")
+            if email:
+                self.by_email.setdefault(email, set()).add(ticket_id)
+            for key in self._band_keys(signature):
+                self.buckets.setdefault(key, set()).add(ticket_id)
+
+    def remove(self, ticket_id):
+        with self._lock:
+            self._remove(ticket_id)
+
+    def _remove(self, ticket_id):
+        entry = self.tickets.pop(ticket_id, None)
+        if entry is None:
+            return
+        signature, email = entry[0], entry[1]
+        for index, key in [(self.by_email, email)] + [(self.buckets, k) for k in self._band_keys(signature)]:
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(ticket_id)
+                if not ids:
+                    del index[key]
+
+    def check(self, email, name, subject, description, limit=3):
+        """
+        Open tickets likely describing the same issue, best first.
+
+        Dicts with ticketId, subject, priority, similarity and sameCustomer
+        (only for an exact email match; ``name`` is not used to decide it);
+        same-customer matches come before other customers' similar tickets.
+        """
+        signature = self.hasher.signature(features(subject, description))
+        if signature is None:
+            return []
+        email = _normalize(email)
+        with self._lock:
+            candidates = set(self.by_email.get(email, ())) if email else set()
+            for key in self._band_keys(signature):
+                candidates.update(self.buckets.get(key, ()))
+            entries = [(ticket_id, self.tickets[ticket_id]) for ticket_id in candidates]
+        matches = []
+        for ticket_id, (other, other_email, other_subject, priority) in entries:
+            similarity = MinHasher.similarity(signature, other)
+            same_customer = bool(email) and email == other_email
+            if similarity < (self.email_threshold if same_customer else self.threshold):
+                continue
+            matches.append({"ticketId": ticket_id, "subject": other_subject, "priority": priority,
+                            "similarity": round(similarity, 3), "sameCustomer": same_customer})
+        matches.sort(key=lambda m: (not m["sameCustomer"], -m["similarity"], m["ticketId"]))
+        return matches[:limit]
+
+
+class StoreDuplicateDetector(BackgroundIndex):
+    """
+    A ``DuplicateDetector`` over a ticket store, rebuilt in the background every ``refresh_s``.
+
+    A create waits at most ``wait_s`` for the first build (a full table scan); past that it is
+    checked against nothing rather than held up.
+    """
+
+    def __init__(self, store, refresh_s=900.0, wait_s=0.5, clock=time.monotonic, call=None, **kwargs):
+        super().__init__(store, refresh_s, wait_s=wait_s, call=call, clock=clock)
+        self.kwargs = kwargs
+
+    def build(self, records):
+        return DuplicateDetector.from_records(records, **self.kwargs)
+
+    def apply(self, index, record):
+        index.upsert(record)
+
+    def check(self, email, name, subject, description, limit=3):
+        if self.current() is None and self.error is None:
+            return []  # the first build is still running
+        return self.require().check(email, name, subject, description, limit)
+
+
+def duplicate_response(request, matches):
+    """``create`` response offering to add to the customer's existing open ticket instead"""
+    best = matches[0]
+    return {
+        "action": "create",
+        "ticketId": best["ticketId"],
+        "status": "possible_duplicate",
+        "priority": best["priority"],
+        "subject": best["subject"],
+        "customerName": request.get("customerName") or "",
+        "customerEmail": request.get("customerEmail") or "",
+        "duplicates": matches,
+        "messageForUser": f"It looks like you already have an open ticket {best['ticketId']} about "
+                          f"\"{best['subject']}\". I can add your message to that ticket, or open a new "
+                          "ticket if this is a different issue.",
+        "internalNotes": "",
+    }
+
+
+def similar_tickets_note(matches):
+    """Internal note linking a new ticket to similar open tickets of other customers"""
+    return "Similar open tickets: " + ", ".join(f"{m['ticketId']} ({m['similarity']:.2f})" for m in matches)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List open tickets that look like duplicates of an earlier one")
+    parser.add_argument("csv")
+    parser.add_argument("--threshold", type=float, default=0.6)
+    args = parser.parse_args(argv)
+
+    detector = DuplicateDetector(threshold=args.threshold)
+    found = 0
+    start = time.perf_counter()
+    records = list(read_csv(args.csv))
+    for fields in records:
+        if _normalize(fields.get("Status")) not in CLOSED_STATUSES:
+            for match in detector.check(fields.get("Customer Email"), fields.get("Customer Name"),
+                                        fields.get("Subject"), fields.get("Initial Description")):
+                found += 1
+                who = "same customer" if match["sameCustomer"] else "other customer"
+                print(f"⚠️  {fields.get('Ticket ID')} ~ {match['ticketId']} "
+                      f"({match['similarity']:.2f}, {who}): {fields.get('Subject')}")
+        detector.upsert(fields)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"✅ Checked {len(records)} tickets in {elapsed_ms:.1f} ms, {found} possible duplicates")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+"""
+Columnar ticket snapshots for offline analytics.
+
+A snapshot is two files:
+
+* ``<name>.tcol``       header + fixed-width columns
+* ``<name>.tcol.blob``  UTF-8 bytes of the long-text columns
+
+``Status``/``Priority``/``Channel`` are dictionary-encoded to one code per
+row, timestamps are stored as int64 epoch milliseconds and every string
+column is an offsets array into a byte segment. Rows are clustered by
+status and ordered by ``SLA Due At`` inside each cluster, so status counts
+come straight from the header and SLA breach counts are a binary search.
+
+Both files are memory-mapped by ``Snapshot``; columns are returned as
+``memoryview`` objects over the mapping (``numpy.frombuffer`` accepts them
+as-is when numpy is available).
+
+Usage:
+    python -m infinity_pixel.snapshot export airtable_tickets_template.csv tickets.tcol
+    python -m infinity_pixel.snapshot stats tickets.tcol
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .tickets import (
+    CATEGORY_FIELDS,
+    CLOSED_STATUSES,
+    FIELDS,
+    LONG_TEXT_FIELDS,
+    TIMESTAMP_FIELDS,
+    format_timestamp,
+    now_ms,
+    parse_timestamp,
+    read_csv,
+    record_fields,
+)
+
+MAGIC = b"TCOL\x01\x00\x00\x00"
+BLOB_SUFFIX = ".blob"
+MISSING = -(2 ** 63)  # int64 sentinel for empty timestamps
+
+_PREAMBLE = struct.Struct("<8sQ")
+
+
+class SnapshotError(Exception):
+    """Raised for unreadable or malformed snapshot files"""
+
+
+def _pad(buf):
+    """Pad a bytearray to an 8-byte boundary"""
+    buf.extend(b"\x00" * (-len(buf) % 8))
+
+
+def _encode_text(values):
+    """Encode strings as (uint64 offsets, concatenated bytes)"""
+    offsets = array("Q", [0])
+    data = bytearray()
+    for value in values:
+        data.extend(value.encode("utf-8"))
+        offsets.append(len(data))
+    return offsets, data
+
+
+def write_snapshot(records, path):
+    """Write tickets (field dicts or Airtable records) to a snapshot; returns the row count"""
+    rows = [record_fields(r) for r in records]
+    n = len(rows)
+
+    dictionaries = {}
+    codes = {}
+    for name in CATEGORY_FIELDS:
+        values = [(row.get(name) or "") for row in rows]
+        dictionary = sorted(set(values))
+        lookup = {v: i for i, v in enumerate(dictionary)}
+        dictionaries[name] = dictionary
+        codes[name] = [lookup[v] for v in values]
+
+    timestamps = {}
+    for name in TIMESTAMP_FIELDS:
+        parsed = (parse_timestamp(row.get(name)) for row in rows)
+        timestamps[name] = [MISSING if ts is None else ts for ts in parsed]
+
+    # Cluster rows by status, then SLA due time within each cluster
+    order = sorted(range(n), key=lambda i: (codes["Status"][i], timestamps["SLA Due At"][i]))
+
+    body = bytearray()
+    blob = bytearray()
+    columns = []
+
+    def add_segment(target, payload):
+        start = len(target)
+        target.extend(payload)
+        _pad(target)
+        return [start, len(payload)]
+
+    for name in FIELDS:
+        if name in CATEGORY_FIELDS:
+            dictionary = dictionaries[name]
+            typecode = "B" if len(dictionary) <= 256 else "H"
+            col = array(typecode, (codes[name][i] for i in order))
+            columns.append({
+                "name": name, "kind": "dict", "type": typecode,
+                "values": dictionary, "data": add_segment(body, col.tobytes()),
+            })
+        elif name in TIMESTAMP_FIELDS:
+            col = array("q", (timestamps[name][i] for i in order))
+            columns.append({
+                "name": name, "kind": "timestamp", "type": "q",
+                "data": add_segment(body, col.tobytes()),
+            })
+        else:
+            offsets, data = _encode_text((rows[i].get(name) or "") for i in order)
+            target = blob if name in LONG_TEXT_FIELDS else body
+            columns.append({
+                "name": name, "kind": "text", "type": "Q",
+                "offsets": add_segment(body, offsets.tobytes()),
+                "blob": target is blob,
+                "data": add_segment(target, data),
+            })
+
+    status_codes = sorted(set(codes["Status"]))
+    sorted_status = [codes["Status"][i] for i in order]
+    clusters = {}
+    for code in status_codes:
+        clusters[dictionaries["Status"][code]] = [
+            bisect_left(sorted_status, code),
+            bisect_right(sorted_status, code),
+        ]
+
+    header = json.dumps({
+        "version": 1,
+        "rows": n,
+        "columns": columns,
+        "status_clusters": clusters,
+    }).encode("utf-8")
+    header += b" " * (-(len(header) + _PREAMBLE.size) % 8)
+
+    with open(path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(body)
+    with open(path + BLOB_SUFFIX, "wb") as f:
+        f.write(blob)
+    return n
+
+
+def export_csv(csv_path, out_path):
+    """Convert an Airtable CSV export into a snapshot"""
+    return write_snapshot(read_csv(csv_path), out_path)
+
+
+def _map(path):
+    """Memory-map a file read-only (empty files map to empty bytes)"""
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class TextColumn:
+    """Lazily decoded string column backed by an offsets array"""
+
+    def __init__(self, offsets, data):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self._data[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def raw(self, i):
+        """Return the encoded bytes of row ``i`` without decoding"""
+        return self._data[self._offsets[i]:self._offsets[i + 1]]
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a ticket snapshot"""
+
+    def __init__(self, path):
+        self.path = path
+        self._body = _map(path)
+        self._blob = _map(path + BLOB_SUFFIX)
+        self._views = []
+        try:
+            magic, header_len = _PREAMBLE.unpack_from(self._body, 0)
+        except struct.error as e:
+            self.close()
+            raise SnapshotError(f"{path}: truncated snapshot") from e
+        if magic != MAGIC:
+            self.close()
+            raise SnapshotError(f"{path}: not a ticket snapshot")
+        start = _PREAMBLE.size
+        self.header = json.loads(bytes(self._body[start:start + header_len]))
+        self._data_start = start + header_len
+        self._columns = {c["name"]: c for c in self.header["columns"]}
+        self._cache = {}
+
+    @classmethod
+    def open(cls, path):
+        return cls(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Release column views and unmap the files"""
+        self._cache = {}
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        for mapped in (self._body, self._blob):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def __len__(self):
+        return self.header["rows"]
+
+    @property
+    def column_names(self):
+        return list(self._columns)
+
+    def _segment(self, extent, blob=False, typecode="B"):
+        offset, length = extent
+        if blob:
+            source, offset = self._blob, offset
+        else:
+            source, offset = self._body, offset + self._data_start
+        base = memoryview(source)
+        self._views.append(base)
+        view = base[offset:offset + length]
+        self._views.append(view)
+        if typecode != "B":
+            view = view.cast(typecode)
+            self._views.append(view)
+        return view
+
+    def column(self, name):
+        """
+        Return a zero-copy column.
+
+        Dictionary columns yield their codes, timestamp columns int64 epoch
+        milliseconds (``MISSING`` when empty), text columns a ``TextColumn``.
+        """
+        if name in self._cache:
+            return self._cache[name]
+        try:
+            meta = self._columns[name]
+        except KeyError:
+            raise KeyError(f"no column {name!r} in snapshot") from None
+        if meta["kind"] == "text":
+            offsets = self._segment(meta["offsets"], typecode="Q")
+            data = self._segment(meta["data"], blob=meta["blob"])
+            col = TextColumn(offsets, data)
+        else:
+            col = self._segment(meta["data"], typecode=meta["type"])
+        self._cache[name] = col
+        return col
+
+    def dictionary(self, name):
+        """Return the value list of a dictionary-encoded column"""
+        return self._columns[name]["values"]
+
+    def value_counts(self, name):
+        """Count rows per value of a dictionary-encoded column"""
+        meta = self._columns[name]
+        if meta["kind"] != "dict":
+            raise ValueError(f"{name!r} is not dictionary-encoded")
+        codes = self.column(name)
+        if meta["type"] == "B":
+            raw = codes.tobytes()
+            counts = [raw.count(code) for code in range(len(meta["values"]))]
+        else:
+            counts = [0] * len(meta["values"])
+            for code in codes:
+                counts[code] += 1
+        return {v: c for v, c in zip(meta["values"], counts) if c}
+
+    def status_counts(self):
+        """Row count per status, read from the cluster index"""
+        return {s: hi - lo for s, (lo, hi) in self.header["status_clusters"].items()}
+
+    def status_range(self, status):
+        """Row range ``(start, stop)`` holding tickets with the given status"""
+        lo, hi = self.header["status_clusters"].get(status, (0, 0))
+        return lo, hi
+
+    def sla_breached_ranges(self, at_ms=None, exclude=CLOSED_STATUSES):
+        """Yield ``(status, start, stop)`` row ranges of tickets past their SLA"""
+        at_ms = now_ms() if at_ms is None else at_ms
+        due = self.column("SLA Due At")
+        for status, (lo, hi) in self.header["status_clusters"].items():
+            if status in exclude:
+                continue
+            first = bisect_right(due, MISSING, lo, hi)
+            stop = bisect_left(due, at_ms, first, hi)
+            if stop > first:
+                yield status, first, stop
+
+    def sla_breaches(self, at_ms=None, exclude=CLOSED_STATUSES):
+        """Count open tickets whose SLA due time is before ``at_ms``"""
+        return sum(stop - start for _, start, stop in self.sla_breached_ranges(at_ms, exclude))
+
+    def row(self, i):
+        """Decode row ``i`` back into an Airtable-style field dict"""
+        fields = {}
+        for name in FIELDS:
+            meta = self._columns[name]
+            value = self.column(name)[i]
+            if meta["kind"] == "dict":
+                value = meta["values"][value]
+            elif meta["kind"] == "timestamp":
+                value = "" if value == MISSING else format_timestamp(value)
+            fields[name] = value
+        return fields
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar ticket snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="convert a CSV export into a snapshot")
+    p_export.add_argument("csv")
+    p_export.add_argument("out")
+    p_stats = sub.add_parser("stats", help="print status and SLA summary")
+    p_stats.add_argument("snapshot")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        n = export_csv(args.csv, args.out)
+        print(f"✅ Wrote {n} tickets to {args.out}")
+        return 0
+
+    with Snapshot(args.snapshot) as snap:
+        print(f"Tickets:      {len(snap)}")
+        for status, count in sorted(snap.status_counts().items()):
+            print(f"  {status or '(empty)':<12} {count}")
+        print(f"SLA breaches: {snap.sla_breaches()}")
+        for priority, count in sorted(snap.value_counts("Priority").items()):
+            print(f"  {priority or '(empty)':<12} {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,252 @@
+"""
+Ticket storage used by the Python ticket backend.
+
+``TicketStore`` is the small interface the backend needs from the Airtable
+table: find a record by Ticket ID (or get it by record ID), create a
+record, update fields of a record and delete a record (used when moving
+tickets between shards).
+Records have the Airtable shape ``{"id", "createdTime", "fields"}``.
+
+Writes that depend on what was read (appending to the Conversation Log) use
+``compare_and_swap`` with the record's ``version``, so concurrent writers
+get a ``VersionConflict`` instead of overwriting each other.
+
+``InMemoryTicketStore`` backs tests and local runs; ``AirtableTicketStore``
+talks to the Airtable REST API over the shared ``outbound.OutboundClient``
+(keep-alive connections, using only the standard library).
+"""
+
+import itertools
+import json
+import threading
+import urllib.parse
+
+from .outbound import OutboundError, get_client
+from .tickets import AIRTABLE_BASE_ID, AIRTABLE_TABLE_ID, format_timestamp, now_ms, record_fields
+
+
+class StoreError(Exception):
+    """An Airtable request failed"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class VersionConflict(StoreError):
+    """A compare-and-swap found the record changed since it was read"""
+
+    def __init__(self, record_id, current=None):
+        super().__init__(f"record {record_id} changed since it was read", 409)
+        self.record_id = record_id
+        self.current = current
+
+
+class TicketStore:
+    """Interface of a ticket table"""
+
+    def find(self, ticket_id):
+        """The record whose Ticket ID matches, or None"""
+        raise NotImplementedError
+
+    def get(self, record_id):
+        """The record with this record ID, or None"""
+        raise NotImplementedError
+
+    def ticket_ids(self):
+        """Iterate over every Ticket ID in the table"""
+        return (record["fields"].get("Ticket ID") for record in self.all_records()
+                if record["fields"].get("Ticket ID"))
+
+    def all_records(self):
+        """Iterate over every record in the table"""
+        raise NotImplementedError
+
+    def create(self, fields):
+        raise NotImplementedError
+
+    def update(self, record_id, fields):
+        """Update some fields of a record; returns the full record or None if unknown"""
+        raise NotImplementedError
+
+    def version(self, record):
+        """Opaque version of a record as read; every write changes it"""
+        return record_fields(record).get("Updated At")
+
+    def compare_and_swap(self, record_id, version, fields):
+        """``update`` only if the record is still at ``version``, else raise ``VersionConflict``"""
+        raise NotImplementedError
+
+    def delete(self, record_id):
+        """Delete a record; returns False if it was unknown"""
+        raise NotImplementedError
+
+
+# Record IDs are unique across stores, like Airtable's, so shards can be told apart by ID
+_record_ids = itertools.count(1)
+
+
+class InMemoryTicketStore(TicketStore):
+    """Thread-safe dict-backed table"""
+
+    def __init__(self, records=()):
+        self.records = {}
+        self._lock = threading.Lock()
+        for fields in records:
+            self.create(fields)
+
+    def _copy(self, record):
+        return {**record, "fields": dict(record["fields"])}
+
+    def find(self, ticket_id):
+        with self._lock:
+            for record in self.records.values():
+                if record["fields"].get("Ticket ID") == ticket_id:
+                    return self._copy(record)
+        return None
+
+    def get(self, record_id):
+        with self._lock:
+            record = self.records.get(record_id)
+            return self._copy(record) if record is not None else None
+
+    def all_records(self):
+        with self._lock:
+            records = [self._copy(r) for r in self.records.values()]
+        return iter(records)
+
+    def create(self, fields):
+        with self._lock:
+            record_id = f"rec{next(_record_ids):014d}"
+            record = {"id": record_id, "createdTime": format_timestamp(now_ms()), "fields": dict(fields),
+                      "version": 1}
+            self.records[record_id] = record
+            return self._copy(record)
+
+    def update(self, record_id, fields):
+        with self._lock:
+            record = self.records.get(record_id)
+            if record is None:
+                return None
+            record["fields"].update(fields)
+            record["version"] += 1
+            return self._copy(record)
+
+    def version(self, record):
+        return record.get("version")
+
+    def compare_and_swap(self, record_id, version, fields):
+        with self._lock:
+            record = self.records.get(record_id)
+            if record is None:
+                return None
+            if record["version"] != version:
+                raise VersionConflict(record_id, self._copy(record))
+            record["fields"].update(fields)
+            record["version"] += 1
+            return self._copy(record)
+
+    def delete(self, record_id):
+        with self._lock:
+            return self.records.pop(record_id, None) is not None
+
+
+def _formula_literal(value):
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+class AirtableTicketStore(TicketStore):
+    """The Airtable tickets table over the REST API"""
+
+    API = "https://api.airtable.com/v0"
+
+    def __init__(self, token, base_id=AIRTABLE_BASE_ID, table_id=AIRTABLE_TABLE_ID, timeout=10.0, client=None):
+        self.token = token
+        self.url = f"{self.API}/{base_id}/{table_id}"
+        self.timeout = timeout
+        self.client = client or get_client()
+        self._cas_locks = [threading.Lock() for _ in range(64)]
+
+    def _request(self, method, url, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"}
+        try:
+            response = self.client.request(method, url, data, headers, timeout=self.timeout)
+        except OutboundError as exc:
+            raise StoreError(f"Airtable {method} failed: {exc.__cause__ or exc}") from exc
+        if response.status >= 400:
+            raise StoreError(f"Airtable {method} failed: HTTP {response.status}", response.status)
+        return response.json()
+
+    def find(self, ticket_id):
+        query = urllib.parse.urlencode({
+            "filterByFormula": f"{{Ticket ID}}={_formula_literal(ticket_id)}",
+            "maxRecords": 1,
+        })
+        records = self._request("GET", f"{self.url}?{query}").get("records") or []
+        return records[0] if records else None
+
+    def get(self, record_id):
+        try:
+            return self._request("GET", f"{self.url}/{record_id}")
+        except StoreError as exc:
+            if exc.status == 404:
+                return None
+            raise
+
+    def _pages(self, fields=()):
+        offset = None
+        while True:
+            params = [("fields[]", name) for name in fields] + [("pageSize", 100)]
+            if offset:
+                params.append(("offset", offset))
+            page = self._request("GET", f"{self.url}?{urllib.parse.urlencode(params)}")
+            for record in page.get("records") or []:
+                record.setdefault("fields", {})
+                yield record
+            offset = page.get("offset")
+            if not offset:
+                return
+
+    def ticket_ids(self):
+        return (r["fields"]["Ticket ID"] for r in self._pages(["Ticket ID"]) if r["fields"].get("Ticket ID"))
+
+    def all_records(self):
+        return self._pages()
+
+    def create(self, fields):
+        return self._request("POST", self.url, {"fields": fields, "typecast": True})
+
+    def update(self, record_id, fields):
+        try:
+            return self._request("PATCH", f"{self.url}/{record_id}", {"fields": fields, "typecast": True})
+        except StoreError as exc:
+            if exc.status == 404:
+                return None
+            raise
+
+    def compare_and_swap(self, record_id, version, fields):
+        """
+        Check ``Updated At`` then PATCH.
+
+        Airtable has no conditional update, so this only serializes writers in
+        this process; a write from elsewhere (the n8n workflow) between the
+        read and the PATCH is still possible. Every write must set a new
+        ``Updated At`` for the check to see it.
+        """
+        with self._cas_locks[hash(record_id) % len(self._cas_locks)]:
+            current = self.get(record_id)
+            if current is None:
+                return None
+            if self.version(current) != version:
+                raise VersionConflict(record_id, current)
+            return self.update(record_id, fields)
+
+    def delete(self, record_id):
+        try:
+            self._request("DELETE", f"{self.url}/{record_id}")
+            return True
+        except StoreError as exc:
+            if exc.status == 404:
+                return False
+            raise
@@ -0,0 +1,418 @@
+"""
+Multi-tenant serving: one deployment, many client brands.
+
+The workflow is wired to one Airtable base, one Pinecone namespace
+(``customer-service``) and the Quantum-Ops system prompt. A
+``TenantConfig`` names each tenant's own:
+
+* ticket store (Airtable base and table; in memory without a base), with
+  its own ``TicketBackend`` caches (status, idempotency, search index,
+  duplicate detector), circuit breakers and create journal;
+* knowledge-base namespace: a ``.qvec`` file (see ``retrieval.vectors``),
+  or a directory of generations that ingestion publishes to (see
+  ``retrieval.generations``);
+* system prompt and chat session memory;
+* quotas: ``requests_per_minute`` (a token bucket allowing ``burst``) and
+  ``max_queued`` requests waiting in the scheduler.
+
+``TenantRegistry`` builds a tenant's state on its first request and
+evicts it once idle for ``idle_s`` (or, beyond ``max_loaded`` tenants,
+least recently used first), closing its vector file and thread pools, so
+hundreds of configured tenants cost memory only while active. A tenant is
+never evicted while a request holds it (``lease``), while creates wait in
+its journal, or while its in-memory store holds tickets. Tenants share the
+``TenantRegistry.registry`` metrics with a ``tenant`` label (a registry of
+their own by default: a ``TicketBackend`` on the process registry owns the
+same metric names without it) and the process tracer with trace IDs scoped
+to the tenant.
+
+``TenantScheduler`` is the ``scheduler.Scheduler`` with requests grouped
+by tenant: within a priority level tenants take turns, then their
+customers, so one tenant's burst cannot delay the others. Over-quota
+requests raise ``QuotaExceeded`` (a ``QueueFull``: HTTP 429 with
+Retry-After); unknown tenants ``UnknownTenant`` (HTTP 404).
+
+Usage:
+    tenants = TenantRegistry(load_tenants("tenants.json"), model=OpenAIChatModel(key), embed=embed)
+    tenants.handle("acme", {"action": "status", "ticketId": "TCK-..."})
+    for event in tenants.chat("acme", session_id, "Hi!"):
+        ...
+    scheduler = TenantScheduler(tenants, workers=8)   # await scheduler.submit(payload, session, "acme")
+
+    python -m infinity_pixel.tenancy tenants.json              # validate and list tenants
+    python -m infinity_pixel.tenancy tenants.json --port 8080  # POST /webhook/tt with X-Tenant-Id
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+
+from . import tickets
+from .backend import TicketBackend
+from .cache import TTLCache
+from .chat import SYSTEM_PROMPT, ChatAgent, SessionMemory, knowledge_tool, ticket_tool
+from .metrics import Registry
+from .retrieval import ContextPacker
+from .retrieval.generations import KnowledgeBase
+from .retrieval.vectors import VectorStore, as_chunks
+from .scheduler import QueueFull, Scheduler, known_priority, serve
+from .store import AirtableTicketStore, InMemoryTicketStore, StoreError
+from .tracing import get_tracer
+
+TENANT_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+class UnknownTenant(LookupError):
+    """No tenant is configured under this id"""
+
+
+class QuotaExceeded(QueueFull):
+    """A tenant is over its rate or queue quota; retry after ``retry_after`` seconds"""
+
+    def __init__(self, tenant, reason, retry_after):
+        super().__init__(reason, retry_after)
+        self.tenant = tenant
+        self.args = (f"tenant {tenant} over its {reason} quota, retry after {retry_after}s",)
+
+
+@dataclass
+class TenantConfig:
+    tenant_id: str
+    name: str = ""
+    system_prompt: str = None  # None: chat.SYSTEM_PROMPT
+    airtable_base_id: str = None  # None: an in-memory store (demos and tests)
+    airtable_table_id: str = tickets.AIRTABLE_TABLE_ID
+    airtable_token_env: str = "AIRTABLE_TOKEN"
+    vectors: str = None  # the tenant's knowledge-base namespace, a .qvec file or a generations directory
+    requests_per_minute: float = 600.0  # 0: unlimited
+    burst: int = 60
+    max_queued: int = 200
+    max_sessions: int = 1000
+    cache_entries: int = 1000
+
+    @classmethod
+    def from_dict(cls, data):
+        known = {f.name for f in fields(cls)}
+        data = {"tenant_id": data.get("id"), **{k: v for k, v in data.items() if k != "id"}}
+        unknown = sorted(set(data) - known)
+        if unknown:
+            raise ValueError(f"unknown tenant settings: {', '.join(unknown)}")
+        if not TENANT_ID.match(str(data["tenant_id"] or "")):
+            raise ValueError(f"invalid tenant id {data['tenant_id']!r}")
+        return cls(**data)
+
+
+def load_tenants(path):
+    """``{tenant_id: TenantConfig}`` from a JSON file (a list of tenants, or ``{"tenants": [...]}``)
+
+    Relative ``vectors`` paths are resolved against the file's directory.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    configs = {}
+    for entry in data["tenants"] if isinstance(data, dict) else data:
+        config = TenantConfig.from_dict(entry)
+        if config.tenant_id in configs:
+            raise ValueError(f"duplicate tenant id {config.tenant_id!r}")
+        if config.vectors:
+            config.vectors = os.path.join(os.path.dirname(os.path.abspath(path)), config.vectors)
+        configs[config.tenant_id] = config
+    return configs
+
+
+class Tenant:
+    """A tenant's loaded state"""
+
+    def __init__(self, config, backend, agent=None, vectors=None, metrics=None):
+        self.config = config
+        self.backend = backend
+        self.agent = agent
+        self.vectors = vectors
+        self.metrics = metrics  # the tenant's LabelledRegistry view
+        self.active = 0  # requests holding the tenant
+        self.last_used = 0.0
+
+    @property
+    def evictable(self):
+        """False while requests hold it or evicting would lose tickets (queued creates, an in-memory store)"""
+        if self.active or self.backend.journal:
+            return False
+        store = self.backend.store
+        return not (isinstance(store, InMemoryTicketStore) and store.records)
+
+    def close(self):
+        if self.agent is not None:
+            self.agent.close()
+        if self.backend.dependencies is not None:
+            self.backend.dependencies.close()
+        if self.vectors is not None:
+            self.vectors.close()
+        if self.metrics is not None:
+            self.metrics.close()
+
+
+def build_tenant(config, registry=None, model=None, embed=None, top_k=20):
+    """
+    A ``Tenant`` for ``config``: its ticket store and backend, and with a chat ``model`` its agent.
+
+    The agent gets a ``knowledge_base`` tool over the tenant's vectors when ``embed`` (text -> vector) is given.
+    """
+    if config.airtable_base_id:
+        token = os.environ.get(config.airtable_token_env)
+        if not token:
+            raise StoreError(f"{config.airtable_token_env} is not set (tenant {config.tenant_id})")
+        store = AirtableTicketStore(token, config.airtable_base_id, config.airtable_table_id)
+    else:
+        store = InMemoryTicketStore()
+    metrics = (registry or Registry()).labelled(tenant=config.tenant_id)
+    tracer = get_tracer().scoped(config.tenant_id)
+    backend = TicketBackend(store, tracer=tracer, registry=metrics,
+                            status_cache=TTLCache(config.cache_entries, ttl=60.0))
+    if config.vectors and os.path.isdir(config.vectors):
+        vectors = KnowledgeBase(config.vectors, check_s=5.0, registry=metrics)
+    else:
+        vectors = VectorStore(config.vectors) if config.vectors else None
+    agent = None
+    if model is not None:
+        tools = [ticket_tool(backend)]
+        if vectors is not None and embed is not None:
+            tools.append(knowledge_tool(lambda query: as_chunks(vectors.search(embed(query), k=top_k)),
+                                        packer=ContextPacker()))
+        agent = ChatAgent(model, tools, config.system_prompt or SYSTEM_PROMPT,
+                          memory=SessionMemory(max_sessions=config.max_sessions), tracer=tracer, registry=metrics)
+    return Tenant(config, backend, agent, vectors, metrics)
+
+
+class TenantRegistry:
+    """Configured tenants, loaded on demand and evicted when idle"""
+
+    def __init__(self, configs, factory=None, idle_s=600.0, max_loaded=256, registry=None, model=None,
+                 embed=None, clock=time.monotonic):
+        self.configs = dict(configs)
+        self.registry = registry or Registry()
+        self.factory = factory or (lambda config: build_tenant(config, self.registry, model, embed))
+        self.idle_s = idle_s
+        self.max_loaded = max_loaded
+        self.clock = clock
+        self._loaded = OrderedDict()  # tenant id -> Tenant, least recently used first
+        self._loading = {}  # tenant id -> lock held while it is built
+        self._buckets = {}  # tenant id -> [tokens, updated]
+        self._lock = threading.Lock()
+        registry = self.registry
+        registry.gauge("tenants_loaded", "Tenants with state in memory", fn=lambda: len(self._loaded)).labels()
+        self.loads = registry.counter("tenant_loads_total", "Tenant states built")
+        self.evictions = registry.counter("tenant_evictions_total", "Tenant states evicted by reason", ["reason"])
+        self.load_ms = registry.histogram("tenant_load_ms", "Time to build a tenant's state in milliseconds")
+        self.requests = registry.counter("tenant_requests_total", "Tenant requests by result", ["tenant", "result"])
+
+    def __len__(self):
+        return len(self._loaded)
+
+    def config(self, tenant_id):
+        config = self.configs.get(tenant_id)
+        if config is None:
+            raise UnknownTenant(f"unknown tenant {tenant_id!r}")
+        return config
+
+    def loaded(self):
+        with self._lock:
+            return list(self._loaded)
+
+    def peek(self, tenant_id):
+        """The tenant if it is loaded, else None; neither loads it nor counts as use"""
+        with self._lock:
+            return self._loaded.get(tenant_id)
+
+    def admit(self, tenant_id):
+        """Take one request from the tenant's rate quota; raises ``QuotaExceeded``"""
+        config = self.config(tenant_id)
+        rate = config.requests_per_minute / 60.0
+        if rate > 0:
+            now = self.clock()
+            with self._lock:
+                bucket = self._buckets.setdefault(tenant_id, [float(config.burst), now])
+                bucket[0] = min(float(config.burst), bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                allowed = bucket[0] >= 1.0
+                if allowed:
+                    bucket[0] -= 1.0
+                else:
+                    retry_after = max(1, math.ceil((1.0 - bucket[0]) / rate))
+            if not allowed:
+                self.requests.labels(tenant_id, "rate").inc()
+                raise QuotaExceeded(tenant_id, "rate", retry_after)
+        self.requests.labels(tenant_id, "admitted").inc()
+
+    def _acquire(self, tenant_id):
+        config = self.config(tenant_id)
+        with self._lock:
+            tenant = self._loaded.get(tenant_id)
+            if tenant is not None:
+                return self._hold(tenant)
+            loading = self._loading.setdefault(tenant_id, threading.Lock())
+        with loading:
+            with self._lock:
+                tenant = self._loaded.get(tenant_id)
+                if tenant is not None:
+                    return self._hold(tenant)
+            start = time.perf_counter()
+            tenant = self.factory(config)  # outside the registry lock: other tenants keep being served
+            self.load_ms.observe((time.perf_counter() - start) * 1000)
+            self.loads.inc()
+            with self._lock:
+                self._loaded[tenant_id] = tenant
+                self._loading.pop(tenant_id, None)
+                self._hold(tenant)
+                evicted = self._select_evictions()
+        self._close(evicted)
+        return tenant
+
+    def _hold(self, tenant):
+        tenant.active += 1
+        tenant.last_used = self.clock()
+        self._loaded.move_to_end(tenant.config.tenant_id)
+        return tenant
+
+    def _release(self, tenant):
+        with self._lock:
+            tenant.active -= 1
+            tenant.last_used = self.clock()
+
+    def _select_evictions(self):
+        """Remove idle tenants past ``idle_s``, then the least recently used beyond ``max_loaded``"""
+        now = self.clock()
+        evicted = []
+        for tenant_id, tenant in list(self._loaded.items()):
+            if not tenant.evictable:
+                continue
+            if now - tenant.last_used >= self.idle_s:
+                evicted.append((tenant, "idle"))
+            elif len(self._loaded) - len(evicted) > self.max_loaded:
+                evicted.append((tenant, "capacity"))
+            else:
+                continue
+            del self._loaded[tenant_id]
+        return evicted
+
+    def _close(self, evicted):
+        for tenant, reason in evicted:
+            tenant.close()
+            self.evictions.labels(reason).inc()
+
+    def evict_idle(self):
+        """Evict tenants idle for ``idle_s`` (and any beyond ``max_loaded``); returns how many"""
+        with self._lock:
+            evicted = self._select_evictions()
+        self._close(evicted)
+        return len(evicted)
+
+    @contextmanager
+    def lease(self, tenant_id):
+        """The tenant's state (built if needed), kept loaded until the block exits"""
+        tenant = self._acquire(tenant_id)
+        try:
+            yield tenant
+        finally:
+            self._release(tenant)
+
+    def handle(self, tenant_id, payload, session_id=None):
+        """One ticket request for the tenant; raises ``QuotaExceeded`` or ``UnknownTenant``"""
+        self.admit(tenant_id)
+        with self.lease(tenant_id) as tenant:
+            return tenant.backend.handle(payload, session_id)
+
+    def chat(self, tenant_id, session_id, text):
+        """Yield the tenant's agent's ``ChatEvent``\\ s for one message"""
+        self.admit(tenant_id)
+        with self.lease(tenant_id) as tenant:
+            if tenant.agent is None:
+                raise ValueError("no chat model configured")
+            yield from tenant.agent.run(session_id, text)
+
+    def close(self):
+        with self._lock:
+            evicted = [(tenant, "shutdown") for tenant in self._loaded.values()]
+            self._loaded.clear()
+        self._close(evicted)
+
+
+class TenantScheduler(Scheduler):
+    """``Scheduler`` over a ``TenantRegistry``: tenants take turns, with per-tenant quotas"""
+
+    def __init__(self, tenants, workers=8, read_slots=1, max_queue=1000, max_per_customer=50, aging_s=2.0,
+                 clock=time.monotonic):
+        super().__init__(None, workers, read_slots, max_queue, max_per_customer, aging_s, clock,
+                         registry=tenants.registry)
+        self.tenants = tenants
+
+    async def submit(self, payload, session_id=None, tenant=None):
+        config = self.tenants.config(tenant)
+        if self.queue.group_depth(tenant) >= config.max_queued:
+            self.tenants.requests.labels(tenant, "queue").inc()
+            raise QuotaExceeded(tenant, "queue", self.retry_after())
+        self.tenants.admit(tenant)
+        return await super().submit(payload, session_id, tenant)
+
+    def _stored_priority(self, ticket_id, tenant):
+        state = self.tenants.peek(tenant)  # an unloaded tenant has read nothing yet
+        return known_priority(state.backend, ticket_id) if state is not None else None
+
+    def _handle(self, payload, session_id, tenant):
+        with self.tenants.lease(tenant) as state:
+            return state.backend.handle(payload, session_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate a tenants file, or serve the ticket webhook for it")
+    parser.add_argument("config", help="tenants JSON file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="serve POST /webhook/tt (tenant from X-Tenant-Id or tenantId)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--idle", type=float, default=600.0, help="seconds before an idle tenant is evicted")
+    args = parser.parse_args(argv)
+
+    try:
+        configs = load_tenants(args.config)
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        print(f"❌ {args.config}: {exc}")
+        return 1
+    print(f"✅ {len(configs)} tenants")
+    for config in configs.values():
+        store = f"Airtable {config.airtable_base_id}/{config.airtable_table_id}" if config.airtable_base_id \
+            else "in-memory tickets"
+        quota = f"{config.requests_per_minute:g}/min" if config.requests_per_minute else "unlimited"
+        print(f"   {config.tenant_id:<20} {store}, knowledge {config.vectors or '-'}, {quota}")
+        if config.vectors and not os.path.exists(config.vectors):
+            print(f"   ⚠️  {config.vectors} does not exist")
+    if args.port is None:
+        return 0
+
+    async def run():
+        tenants = TenantRegistry(configs, idle_s=args.idle)
+        scheduler = TenantScheduler(tenants, workers=args.workers)
+        await scheduler.start()
+        server = await serve(scheduler, args.host, args.port)
+        print(f"✅ Serving POST http://{args.host}:{args.port}/webhook/tt (Ctrl+C to stop)")
+        async with server:
+            while True:  # evict idle tenants between requests
+                await asyncio.sleep(min(args.idle, 60.0))
+                tenants.evict_idle()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+"""
+Ticket schema shared by the Python tooling.
+
+Mirrors the Airtable table defined by ``airtable_tickets_template.csv`` and
+the conventions used by the ``Ticket Manager (Airtable)`` workflow code nodes.
+"""
+
+import csv
+import random
+import re
+from datetime import datetime, timezone
+
+# Column order of the Airtable table / CSV template
+FIELDS = [
+    "Ticket ID",
+    "Customer Name",
+    "Customer Email",
+    "Channel",
+    "Subject",
+    "Initial Description",
+    "Conversation Log",
+    "Priority",
+    "Status",
+    "Created At",
+    "Updated At",
+    "SLA Due At",
+    "Internal Notes",
+]
+
+TIMESTAMP_FIELDS = ["Created At", "Updated At", "SLA Due At"]
+CATEGORY_FIELDS = ["Status", "Priority", "Channel"]
+LONG_TEXT_FIELDS = ["Initial Description", "Conversation Log", "Internal Notes"]
+
+PRIORITIES = ["low", "medium", "high", "urgent"]
+STATUSES = ["open", "in_progress", "resolved", "closed"]
+CLOSED_STATUSES = ("closed", "resolved")
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+TICKET_ID_RE = re.compile(r"^TCK-(\d{13})-(\d{3})$")
+TICKET_ID_IN_TEXT = re.compile(r"\bTCK-\d{13}-\d{3}\b")  # ticket IDs mentioned in a chat message
+
+
+def sla_days(priority):
+    """SLA window in days, matching 'Code - Prepare Create'"""
+    priority = (priority or "medium").lower()
+    if priority == "high":
+        return 1
+    if priority == "low":
+        return 7
+    return 3
+
+
+def now_ms():
+    """Current time as epoch milliseconds (JS ``Date.getTime()``)"""
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+def new_ticket_id(ts_ms=None, rng=random):
+    """Generate a ticket ID in the TCK-{timestamp}-{random} format"""
+    ts_ms = now_ms() if ts_ms is None else ts_ms
+    return f"TCK-{ts_ms}-{rng.randrange(1000):03d}"
+
+
+def ticket_id_timestamp(ticket_id):
+    """Creation time (epoch ms) embedded in a ticket ID, or None if malformed"""
+    m = TICKET_ID_RE.match(ticket_id or "")
+    return int(m.group(1)) if m else None
+
+
+def parse_timestamp(value):
+    """Parse an ISO-8601 timestamp into epoch milliseconds, or None if empty"""
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def format_timestamp(ts_ms):
+    """Format epoch milliseconds the way JS ``toISOString()`` does"""
+    if ts_ms is None:
+        return ""
+    dt = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{ts_ms % 1000:03d}Z"
+
+
+def record_fields(record):
+    """Return the field dict of an Airtable record (``rec.fields || rec``)"""
+    return record.get("fields") or record
+
+
+def is_sla_breached(fields, at_ms=None):
+    """True if an open ticket is past its SLA due time"""
+    if fields.get("Status") in CLOSED_STATUSES:
+        return False
+    due = parse_timestamp(fields.get("SLA Due At"))
+    if due is None:
+        return False
+    return due < (now_ms() if at_ms is None else at_ms)
+
+
+def read_csv(path):
+    """Yield ticket field dicts from a CSV export of the Airtable table"""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield {name: row.get(name) or "" for name in FIELDS}
+
+
+def write_csv(path, records):
+    """Write ticket field dicts (or Airtable records) as CSV"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record_fields(record))
+
+
+# ---------------------------------------------------------------------------
+# Ports of the 'Ticket Manager (Airtable)' code nodes
+# ---------------------------------------------------------------------------
+
+ACTIONS = ("create", "status", "update", "close")
+
+AIRTABLE_BASE_ID = "appEQ1o4iqY0Nv5bB"
+AIRTABLE_TABLE_ID = "tbl9AlVNEOqUcpRCb"
+
+PRIORITY_EMOJI = {"high": "🔴", "urgent": "🔴", "medium": "🟡", "low": "🟢"}
+
+# Prepared ticket keys -> Airtable columns ('Airtable - Create Ticket' mapping)
+COLUMN_MAP = {
+    "ticketId": "Ticket ID",
+    "customerName": "Customer Name",
+    "customerEmail": "Customer Email",
+    "channel": "Channel",
+    "subject": "Subject",
+    "initialDescription": "Initial Description",
+    "conversationLog": "Conversation Log",
+    "priority": "Priority",
+    "status": "Status",
+    "createdAt": "Created At",
+    "updatedAt": "Updated At",
+    "slaDueAt": "SLA Due At",
+    "additionalContext": "Internal Notes",
+}
+
+
+def _first(*values, default=""):
+    """JS ``a || b || default``"""
+    for value in values:
+        if value:
+            return value
+    return default
+
+
+def _coalesce(*values, default=""):
+    """JS ``a ?? b ?? default``"""
+    for value in values:
+        if value is not None:
+            return value
+    return default
+
+
+def normalize_action(item, actions=ACTIONS):
+    """Port of 'Normalize & Validate Action': settle on a valid action and ticketId"""
+    body = item.get("body") or {}
+    query = item.get("query") if isinstance(item.get("query"), dict) else {}  # JS: "text".action is undefined
+    action = str(_first(item.get("action"), query.get("action"), body.get("action"))).lower().strip()
+
+    if action not in actions:
+        has_ticket_id = bool(_first(item.get("ticketId"), item.get("ticket_id"),
+                                    body.get("ticketId"), body.get("ticket_id")))
+        has_description = bool(item.get("description") or body.get("description"))
+        has_subject = bool(item.get("subject") or body.get("subject"))
+        has_name = bool(item.get("name") or body.get("name"))
+        has_email = bool(item.get("email") or body.get("email"))
+
+        if has_ticket_id and has_description and not has_subject:
+            action = "update"
+        elif has_ticket_id and not has_description and not has_subject:
+            action = "status"
+        elif has_name and has_email and has_subject and has_description:
+            action = "create"
+        elif has_ticket_id and "closed" in (item.get("status"), body.get("status")):
+            action = "close"
+        elif has_ticket_id:
+            action = "status"
+        else:
+            action = "create"
+
+    ticket_id = _first(item.get("ticketId"), item.get("ticket_id"),
+                       body.get("ticketId"), body.get("ticket_id"))
+    return {**item, "action": action, "ticketId": ticket_id}
+
+
+def normalize_inputs(item):
+    """Port of 'Code in JavaScript': flatten the payload into the fields the actions use"""
+    body = item.get("body") or {}
+    return {
+        "action": _coalesce(item.get("action"), body.get("action")),
+        "ticketId": _coalesce(item.get("ticketId"), body.get("ticketId")),
+        "customerName": _coalesce(item.get("customerName"), item.get("name"),
+                                  body.get("customerName"), body.get("name")),
+        "customerEmail": _coalesce(item.get("customerEmail"), item.get("email"),
+                                   body.get("customerEmail"), body.get("email")),
+        "channel": _coalesce(item.get("channel"), body.get("channel"), default="chat"),
+        "subject": _coalesce(item.get("subject"), body.get("subject"), default="No subject provided"),
+        "description": _coalesce(item.get("description"), body.get("description")),
+        "priority": _coalesce(item.get("priority"), body.get("priority"), default="medium"),
+        "additionalContext": _coalesce(item.get("additionalContext"), body.get("additionalContext")),
+    }
+
+
+def prepare_create(item, ts_ms=None, rng=random):
+    """Port of 'Code - Prepare Create': build a new open ticket"""
+    ts_ms = now_ms() if ts_ms is None else ts_ms
+    now = format_timestamp(ts_ms)
+    priority = (item.get("priority") or "medium").lower()
+    return {
+        "ticketId": new_ticket_id(ts_ms, rng),
+        "customerName": item.get("customerName"),
+        "customerEmail": item.get("customerEmail"),
+        "channel": item.get("channel"),
+        "subject": item.get("subject"),
+        "initialDescription": item.get("description"),
+        "conversationLog": f"[{now}] Initial: {item.get('description') or ''}",
+        "priority": priority,
+        "status": "open",
+        "createdAt": now,
+        "updatedAt": now,
+        "slaDueAt": format_timestamp(ts_ms + sla_days(priority) * DAY_MS),
+        "additionalContext": item.get("additionalContext") or "",
+    }
+
+
+def to_airtable_fields(prepared):
+    """Map prepared ticket keys onto Airtable column names"""
+    return {column: prepared[key] for key, column in COLUMN_MAP.items() if key in prepared}
+
+
+def not_found_response(action):
+    """The ``items.length === 0`` branch of the status/update/close code nodes"""
+    messages = {
+        "status": "I could not find a ticket with that ID. Please check the ID or create a new ticket.",
+        "update": "I could not find a ticket with that ID to update. Please check the ID.",
+        "close": "I could not find a ticket with that ID to close.",
+    }
+    response = {
+        "action": action,
+        "ticketId": "",
+        "status": "not_found",
+        "priority": "",
+        "messageForUser": messages[action],
+        "internalNotes": "",
+    }
+    if action == "update":
+        response.update(subject="", customerName="", customerEmail="", skipUpdate=True)
+    return response
+
+
+def build_status_response(record):
+    """Port of 'Code - Build Status Response' for one found record"""
+    fields = record_fields(record)
+    ticket_id = fields.get("Ticket ID") or record.get("ticketId") or ""
+    status = fields.get("Status") or record.get("status") or ""
+    subject = fields.get("Subject") or record.get("subject") or ""
+    return {
+        "action": "status",
+        "ticketId": ticket_id,
+        "status": status,
+        "priority": fields.get("Priority") or record.get("priority") or "medium",
+        "messageForUser": f"Ticket {ticket_id or 'unknown'} is currently {status or 'unknown'}. "
+                          f"Subject: {subject or 'unspecified'}.",
+        "internalNotes": fields.get("Internal Notes") or record.get("internalNotes") or "",
+    }
+
+
+def append_log(old_log, update_text, ts_ms):
+    """Append a user update line to a conversation log"""
+    line = f"[{format_timestamp(ts_ms)}] User update: {update_text}"
+    return f"{old_log}\n{line}" if old_log else line
+
+
+def prepare_update(record, update_text, ts_ms=None):
+    """Port of 'Code - Prepare Update': validate and append to the conversation log"""
+    ts_ms = now_ms() if ts_ms is None else ts_ms
+    fields = record_fields(record)
+    ticket_id = fields.get("Ticket ID") or record.get("ticketId") or ""
+    current_status = fields.get("Status") or record.get("status") or "open"
+    update_text = (update_text or "").strip()
+    base = {
+        "ticketId": ticket_id,
+        "status": current_status,
+        "priority": fields.get("Priority") or record.get("priority") or "medium",
+        "subject": fields.get("Subject") or record.get("subject") or "",
+        "customerName": fields.get("Customer Name") or record.get("customerName") or "",
+        "customerEmail": fields.get("Customer Email") or record.get("customerEmail") or "",
+        "internalNotes": fields.get("Internal Notes") or record.get("internalNotes") or "",
+    }
+    if current_status in CLOSED_STATUSES:
+        return {
+            "action": "update", **base,
+            "messageForUser": f"Ticket {ticket_id} is {current_status} and cannot be updated. "
+                              "Please open a new ticket or ask to reopen.",
+            "skipUpdate": True,
+        }
+    if not update_text:
+        return {
+            "action": "update", **base,
+            "messageForUser": "Please provide the update details so I can add them to your ticket.",
+            "skipUpdate": True,
+        }
+    old_log = fields.get("Conversation Log") or record.get("conversationLog") or ""
+    return {
+        "airtableRecordId": record.get("id"),
+        **base,
+        "conversationLog": append_log(old_log, update_text, ts_ms),
+        "updatedAt": format_timestamp(ts_ms),
+        "messageForUser": "",
+        "skipUpdate": False,
+    }
+
+
+def prepare_close(record, ts_ms=None):
+    """Port of 'Code - Prepare Close'"""
+    ts_ms = now_ms() if ts_ms is None else ts_ms
+    fields = record_fields(record)
+    ticket_id = fields.get("Ticket ID") or record.get("ticketId") or ""
+    already_closed = (fields.get("Status") or record.get("status") or "open") == "closed"
+    return {
+        "airtableRecordId": record.get("id"),
+        "ticketId": ticket_id,
+        "status": "closed",
+        "priority": fields.get("Priority") or record.get("priority") or "medium",
+        "updatedAt": format_timestamp(ts_ms),
+        "messageForUser": f"Ticket {ticket_id} is already closed." if already_closed else
+        f"I've closed ticket {ticket_id}. If you run into the issue again, you can create a new ticket anytime.",
+        "internalNotes": fields.get("Internal Notes") or record.get("internalNotes") or "",
+    }
+
+
+def build_action_response(action, record, message=""):
+    """Ports of 'Code - Build Create/Update/Close Response' for a written record"""
+    fields = record_fields(record)
+    ticket_id = record.get("ticketId") or fields.get("Ticket ID") or ""
+    subject = fields.get("Subject") or record.get("subject") or ""
+    defaults = {
+        "create": f"I've created ticket {ticket_id} for your issue \"{subject}\". "
+                  "Our team will get back to you soon.",
+        "update": f"I've updated your ticket {ticket_id} with your latest message.",
+        "close": f"I've closed ticket {ticket_id}. If you run into the issue again, "
+                 "you can create a new ticket anytime.",
+    }
+    return {
+        "action": action,
+        "ticketId": ticket_id,
+        "status": record.get("status") or fields.get("Status") or ("closed" if action == "close" else "open"),
+        "priority": fields.get("Priority") or record.get("priority") or "medium",
+        "subject": subject,
+        "customerName": fields.get("Customer Name") or record.get("customerName") or "",
+        "customerEmail": fields.get("Customer Email") or record.get("customerEmail") or "",
+        "messageForUser": message or record.get("messageForUser") or defaults[action],
+        "internalNotes": fields.get("Internal Notes") or record.get("internalNotes") or "",
+    }
+
+
+def airtable_link(record_id, base_id=AIRTABLE_BASE_ID, table_id=AIRTABLE_TABLE_ID):
+    return f"https://airtable.com/{base_id}/{table_id}/{record_id}"
+
+
+def slack_message(event, record):
+    """Ports of the 'Code - Prepare Slack Message (Create/Update/Close)' nodes"""
+    fields = record_fields(record)
+    ticket_id = fields.get("Ticket ID") or record.get("ticketId") or ""
+    subject = fields.get("Subject") or "No subject"
+    priority = fields.get("Priority") or "medium"
+    status = fields.get("Status") or "open"
+    emoji = PRIORITY_EMOJI.get(priority.lower(), "🟡")
+    link = airtable_link(record.get("id", ""))
+
+    def clip(text):
+        return text[:200] + ("..." if len(text) > 200 else "")
+
+    if event == "create":
+        description = fields.get("Initial Description") or ""
+        name = fields.get("Customer Name") or "Unknown"
+        email = fields.get("Customer Email") or ""
+        text = (f"🎫 *New Ticket Created*\n\n*Ticket ID:* {ticket_id}\n*Subject:* {subject}\n"
+                f"*Priority:* {emoji} {priority.upper()}\n*Status:* {status}\n"
+                f"*Customer:* {name} ({email})\n\n*Description:*\n{clip(description)}\n\n"
+                f"📋 *View in Airtable:*\n{link}")
+    elif event == "update":
+        latest = (fields.get("Conversation Log") or "").split("\n[")[-1]
+        text = (f"📝 *Ticket Updated*\n\n*Ticket ID:* {ticket_id}\n*Subject:* {subject}\n"
+                f"*Priority:* {emoji} {priority.upper()}\n*Status:* {status}\n\n"
+                f"*Latest Update:*\n{clip(latest)}\n\n📋 *View in Airtable:*\n{link}")
+    else:
+        name = fields.get("Customer Name") or "Unknown"
+        text = (f"✅ *Ticket Closed*\n\n*Ticket ID:* {ticket_id}\n*Subject:* {subject}\n"
+                f"*Priority:* {emoji} {priority.upper()}\n*Customer:* {name}\n*Status:* CLOSED\n\n"
+                f"📋 *View in Airtable:*\n{link}")
+    return {"text": text, "ticketId": ticket_id, "airtableLink": link, "recordId": record.get("id", "")}
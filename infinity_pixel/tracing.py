@@ -0,0 +1,402 @@
+"""
+Per-request tracing for the ticket backend and retrieval components.
+
+A trace starts where a chat session enters (``When chat message received``)
+and its ID is derived from the n8n ``sessionId``, so every tool call made
+for that session lands in the same trace. Spans propagate through
+``contextvars`` (threads and asyncio tasks see their own current span),
+finished spans go to a fixed-size in-process ring buffer, and complete
+traces are handed to exporters: JSONL files or an OpenTelemetry collector
+over OTLP/HTTP JSON. Exporters run on a background thread, in batches of up
+to ``export_batch`` spans, so a slow collector never delays a request;
+beyond ``export_queue`` traces waiting, new ones are dropped
+(``export_dropped``). ``tracer.scoped(tenant)`` shares the buffer and
+exporters but derives trace IDs from the tenant and the session, so equal
+session IDs of two tenants do not share a trace.
+
+Usage:
+    tracer = Tracer(exporters=[JsonlExporter("traces.jsonl")])
+    with tracer.trace("chat", session_id=session_id):
+        with tracer.span("Airtable - Find Ticket (Status)", ticketId=ticket_id):
+            ...
+
+    python -m infinity_pixel.tracing summary traces.jsonl   # per-stage latency breakdown
+"""
+
+import argparse
+import contextvars
+import copy
+import functools
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+DEFAULT_BUFFER_SIZE = 4096
+DEFAULT_EXPORT_QUEUE = 1024  # traces
+DEFAULT_EXPORT_BATCH = 512  # spans
+DEFAULT_OTLP_ENDPOINT = "http://localhost:4318/v1/traces"
+
+
+@dataclass(slots=True)
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: str
+    name: str
+    start_ns: int
+    end_ns: int = 0
+    attributes: dict = field(default_factory=dict)
+    error: str = ""
+
+    @property
+    def duration_ms(self):
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        data = asdict(self)
+        data["duration_ms"] = round(self.duration_ms, 3)
+        return data
+
+
+_current = contextvars.ContextVar("infinity_pixel_span", default=None)
+_root = contextvars.ContextVar("infinity_pixel_root_span", default=None)
+
+
+def current_span():
+    """The active span in this thread/task, or None"""
+    return _current.get()
+
+
+def trace_id_for_session(session_id, namespace=""):
+    """Stable 128-bit trace ID (32 hex chars) for an n8n chat ``sessionId`` (within ``namespace``)"""
+    key = f"{namespace}/{session_id}" if namespace else str(session_id)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def _random_id(n_bytes):
+    return os.urandom(n_bytes).hex()
+
+
+class Tracer:
+    """Creates spans, keeps the most recent ones and exports finished traces"""
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, exporters=(), enabled=True, namespace="",
+                 export_queue=DEFAULT_EXPORT_QUEUE, export_batch=DEFAULT_EXPORT_BATCH):
+        self.enabled = enabled
+        self.namespace = namespace
+        self.exporters = list(exporters)
+        self.buffer = deque(maxlen=buffer_size)
+        self._exports = _ExportQueue(self.exporters, export_queue, export_batch)
+        self._open = {}  # root span_id -> finished spans under a root that is still running
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name, session_id=None, trace_id=None, **attributes):
+        """Root span; the trace ID comes from ``session_id`` when given"""
+        if trace_id is None:
+            trace_id = trace_id_for_session(session_id, self.namespace) if session_id else _random_id(16)
+        if session_id:
+            attributes["session.id"] = session_id
+        if self.namespace:
+            attributes["tenant.id"] = self.namespace
+        with self._span(name, trace_id, "", attributes) as span:
+            yield span
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Child of the current span (a new trace if there is none)"""
+        parent = _current.get()
+        if parent is None:
+            with self.trace(name, **attributes) as span:
+                yield span
+            return
+        with self._span(name, parent.trace_id, parent.span_id, attributes) as span:
+            yield span
+
+    @contextmanager
+    def _span(self, name, trace_id, parent_id, attributes):
+        if not self.enabled:
+            yield Span(trace_id, "", parent_id, name, 0)
+            return
+        span = Span(trace_id, _random_id(8), parent_id, name, time.time_ns(), attributes=attributes)
+        # Spans are collected per root, not per trace: concurrent requests of one session share a trace ID
+        root_token = None
+        if parent_id:
+            root = _root.get()
+        else:
+            root = span.span_id
+            root_token = _root.set(root)
+            with self._lock:
+                self._open[root] = []
+        token = _current.set(span)
+        start = time.perf_counter_ns()
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            span.end_ns = span.start_ns + (time.perf_counter_ns() - start)
+            _current.reset(token)
+            if root_token is not None:
+                _root.reset(root_token)
+            self._finish(span, root)
+
+    def _finish(self, span, root):
+        with self._lock:
+            self.buffer.append(span)
+            pending = self._open.get(root)
+            if pending is None:
+                done = [span]  # orphan child of a trace started elsewhere
+            elif span.parent_id:
+                pending.append(span)
+                return
+            else:
+                done = self._open.pop(root) + [span]
+        if self.exporters:
+            self._exports.put(done)
+
+    @property
+    def export_errors(self):
+        """Exporter calls that raised"""
+        return self._exports.errors
+
+    @property
+    def export_dropped(self):
+        """Traces dropped because the export queue was full"""
+        return self._exports.dropped
+
+    def flush(self, timeout=None):
+        """Wait until every queued trace has been exported; returns whether it was"""
+        return self._exports.flush(timeout)
+
+    def scoped(self, namespace):
+        """This tracer (same buffer, exporters and open traces) with trace IDs derived within ``namespace``"""
+        scoped = copy.copy(self)
+        scoped.namespace = namespace
+        return scoped
+
+    def recent(self, trace_id=None):
+        """Spans still in the ring buffer, optionally for one trace"""
+        with self._lock:
+            spans = list(self.buffer)
+        return [s for s in spans if trace_id is None or s.trace_id == trace_id]
+
+    def breakdown(self, trace_id):
+        """Total milliseconds per span name within one trace"""
+        totals = {}
+        for span in self.recent(trace_id):
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        return totals
+
+    def close(self, timeout=5.0):
+        """Export what is queued (waiting up to ``timeout``) and close the exporters"""
+        self._exports.close(timeout)
+        for exporter in self.exporters:
+            getattr(exporter, "close", lambda: None)()
+
+
+class _ExportQueue:
+    """Finished traces waiting for the exporters, drained in batches by one background thread"""
+
+    def __init__(self, exporters, max_traces, batch_spans):
+        self.exporters = exporters
+        self.max_traces = max_traces
+        self.batch_spans = batch_spans
+        self.errors = 0
+        self.dropped = 0
+        self._traces = deque()
+        self._busy = False
+        self._closed = False
+        self._thread = None
+        self._cond = threading.Condition()
+
+    def put(self, spans):
+        with self._cond:
+            if self._closed or len(self._traces) >= self.max_traces:
+                self.dropped += 1
+                return
+            self._traces.append(spans)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: self._traces or self._closed)
+                if not self._traces:
+                    return
+                batch = []
+                while self._traces and len(batch) < self.batch_spans:
+                    batch.extend(self._traces.popleft())
+                self._busy = True
+            for exporter in self.exporters:
+                try:
+                    exporter.export(batch)
+                except Exception:
+                    # Tracing must never fail a request, nor stop exporting
+                    with self._cond:
+                        self.errors += 1
+
+    def flush(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._traces and not self._busy, timeout)
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+_default = Tracer()
+
+
+def get_tracer():
+    return _default
+
+
+def set_tracer(tracer):
+    """Replace the process-wide tracer used by ``traced``; returns the old one"""
+    global _default
+    old, _default = _default, tracer
+    return old
+
+
+def traced(name=None, **attributes):
+    """Decorator running a function inside a span of the process-wide tracer"""
+    def wrap(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with _default.span(span_name, **attributes):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+class JsonlExporter:
+    """Appends one JSON object per span to a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        lines = "".join(json.dumps(s.to_dict(), ensure_ascii=False) + "\n" for s in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(spans, service_name="infinity-pixel"):
+    """OTLP/JSON ``ExportTraceServiceRequest`` body for a list of spans"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "infinity_pixel.tracing"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id,
+                    "name": s.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                    "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+                } for s in spans],
+            }],
+        }],
+    }
+
+
+class OtlpHttpExporter:
+    """Posts finished traces to an OpenTelemetry collector (OTLP/HTTP, JSON encoding)"""
+
+    def __init__(self, endpoint=DEFAULT_OTLP_ENDPOINT, service_name="infinity-pixel", timeout=2.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, spans):
+        body = json.dumps(otlp_payload(spans, self.service_name)).encode("utf-8")
+        request = urllib.request.Request(self.endpoint, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def summarize(spans):
+    """Per-stage latency: count, p50, p95 and share of root time, by span name"""
+    by_name = {}
+    root_total = 0.0
+    for s in spans:
+        by_name.setdefault(s["name"], []).append(s["duration_ms"])
+        if not s["parent_id"]:
+            root_total += s["duration_ms"]
+    rows = []
+    for name, durations in by_name.items():
+        rows.append({
+            "name": name,
+            "count": len(durations),
+            "p50_ms": _percentile(durations, 0.5),
+            "p95_ms": _percentile(durations, 0.95),
+            "share": sum(durations) / root_total if root_total else 0.0,
+        })
+    return sorted(rows, key=lambda r: -r["share"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trace tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("summary", help="per-stage latency breakdown of a JSONL trace file")
+    p.add_argument("path")
+    args = parser.parse_args(argv)
+
+    with open(args.path, encoding="utf-8") as f:
+        spans = [json.loads(line) for line in f if line.strip()]
+    traces = len({s["trace_id"] for s in spans})
+    print(f"{len(spans)} spans in {traces} traces")
+    print(f"  {'stage':<44} {'count':>6} {'p50':>9} {'p95':>9} {'share':>6}")
+    for row in summarize(spans):
+        print(f"  {row['name']:<44} {row['count']:>6} {row['p50_ms']:>6.1f} ms "
+              f"{row['p95_ms']:>6.1f} ms {row['share']:>6.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
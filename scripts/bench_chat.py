@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark perceived chat latency: first streamed token vs the complete answer.
+
+Runs the streaming gateway (``infinity_pixel.chat``) with the fake model set
+to typical hosted-LLM timings and a ticket store whose calls take
+``--store-ms``, then sends knowledge and ticket questions over SSE. The
+"blocking" column is when a non-streaming chat (the n8n chat trigger) would
+show anything; "first token" is when the streamed answer starts and
+"first event" when the first interim status or token arrives.
+
+Usage:
+    python scripts/bench_chat.py [--runs 5] [--first-token-ms 600] [--token-ms 25] [--store-ms 300]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.backend import TicketBackend  # noqa: E402
+from infinity_pixel.chat import ChatAgent, FakeChatModel, serve, ticket_tool  # noqa: E402
+from infinity_pixel.metrics import Registry  # noqa: E402
+from infinity_pixel.store import InMemoryTicketStore  # noqa: E402
+from infinity_pixel.tracing import Tracer  # noqa: E402
+
+TICKET_ID = "TCK-1764314974531-001"
+ANSWER = " ".join(["Our Cloud Management service covers monitoring, cost optimisation, security reviews and "
+                   "on-call support for AWS, Azure and GCP workloads."] * 4)
+
+
+class SlowStore(InMemoryTicketStore):
+    def __init__(self, records, latency):
+        super().__init__(records)
+        self.latency = latency
+
+    def find(self, ticket_id):
+        time.sleep(self.latency)
+        return super().find(ticket_id)
+
+
+def ask(port, session_id, text):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    start = time.perf_counter()
+    conn.request("POST", "/chat", json.dumps({"sessionId": session_id, "chatInput": text}),
+                 {"Accept": "text/event-stream", "Content-Type": "application/json"})
+    response = conn.getresponse()
+    first_event = first_token = None
+    name = None
+    for line in response:
+        line = line.decode().rstrip("\n")
+        if line.startswith("event: "):
+            name = line[7:]
+            first_event = first_event or time.perf_counter() - start
+            if name == "token" and first_token is None:
+                first_token = time.perf_counter() - start
+    conn.close()
+    return first_event * 1000, first_token * 1000, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--first-token-ms", type=float, default=600)
+    parser.add_argument("--token-ms", type=float, default=25)
+    parser.add_argument("--store-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    store = SlowStore([{"Ticket ID": TICKET_ID, "Subject": "Login", "Status": "open"}], args.store_ms / 1000)
+    backend = TicketBackend(store, tracer=Tracer(enabled=False), registry=Registry(), status_cache=False,
+                            search_index=False, duplicates=False, customers=False)
+    model = FakeChatModel(ANSWER, args.first_token_ms / 1000, args.token_ms / 1000)
+    agent = ChatAgent(model, [ticket_tool(backend)], tracer=Tracer(enabled=False), registry=Registry())
+    server = serve(agent, port=0)
+    port = server.server_address[1]
+
+    print(f"fake model: first token {args.first_token_ms:.0f} ms, {args.token_ms:.0f} ms/token; "
+          f"ticket lookup {args.store_ms:.0f} ms; {args.runs} runs each")
+    print(f"  {'question':<10} {'blocking':>10} {'first token':>12} {'first event':>12}")
+    for label, text in (("knowledge", "Tell me about Cloud Management"),
+                        ("ticket", f"What is the status of {TICKET_ID}?")):
+        results = [ask(port, f"bench-{label}-{n}", text) for n in range(args.runs)]
+        mean = [sum(r[i] for r in results) / len(results) for i in range(3)]
+        print(f"  {label:<10} {mean[2]:8.0f} ms {mean[1]:9.0f} ms {mean[0]:9.0f} ms")
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent updates to a single ticket.
+
+``--writers`` threads each append ``--updates`` messages to the same ticket
+through ``TicketBackend``; every store call takes ``--latency-ms``. The
+blind mode replays the workflow's read-modify-write (find, append, full
+write of the log) for comparison. Reports throughput, latency and how many
+appended messages are missing from the final Conversation Log.
+
+Usage:
+    python scripts/bench_contention.py [--writers 100] [--updates 5] [--latency-ms 2]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel import tickets  # noqa: E402
+from infinity_pixel.backend import TicketBackend  # noqa: E402
+from infinity_pixel.metrics import Registry  # noqa: E402
+from infinity_pixel.store import InMemoryTicketStore  # noqa: E402
+from infinity_pixel.tracing import Tracer  # noqa: E402
+
+TICKET_ID = "TCK-1764314974531-001"
+
+
+class LatencyStore(InMemoryTicketStore):
+    """In-memory table whose calls each take ``latency`` seconds, like a round trip to Airtable"""
+
+    def __init__(self, records, latency):
+        super().__init__(records)
+        self.latency = latency
+
+    def find(self, ticket_id):
+        time.sleep(self.latency)
+        return super().find(ticket_id)
+
+    def update(self, record_id, fields):
+        time.sleep(self.latency)
+        return super().update(record_id, fields)
+
+    def compare_and_swap(self, record_id, version, fields):
+        time.sleep(self.latency)
+        return super().compare_and_swap(record_id, version, fields)
+
+
+def run(mode, args):
+    store = LatencyStore([{"Ticket ID": TICKET_ID, "Subject": "Login", "Status": "open"}], args.latency_ms / 1000)
+    backend = TicketBackend(store, tracer=Tracer(enabled=False), registry=Registry(), idempotency=False,
+                            status_cache=False, ticket_ids=False, search_index=False, duplicates=False,
+                            customers=False)
+    latencies = []
+    failed = []
+
+    def blind(text):
+        record = store.find(TICKET_ID)
+        prepared = tickets.prepare_update(record, text)
+        store.update(record["id"], {"Conversation Log": prepared["conversationLog"],
+                                    "Updated At": prepared["updatedAt"]})
+
+    def writer(w):
+        for u in range(args.updates):
+            text = f"writer {w} message {u}"
+            start = time.perf_counter()
+            if mode == "blind":
+                blind(text)
+            elif backend.handle({"action": "update", "ticketId": TICKET_ID, "description": text})["status"] != "open":
+                failed.append(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(args.writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    log = store.find(TICKET_ID)["fields"].get("Conversation Log", "") + "\n"
+    expected = args.writers * args.updates
+    lost = sum(f"User update: writer {w} message {u}\n" not in log
+               for w in range(args.writers) for u in range(args.updates))
+    latencies.sort()
+    conflicts = backend.metrics.write_conflicts.labels("update").value
+    print(f"  {mode:<6} {expected / elapsed:7.0f} updates/s  p50 {latencies[len(latencies) // 2]:6.1f} ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:7.1f} ms  lost {lost - len(failed)}/{expected}  "
+          f"rejected {len(failed)}  retries/update {conflicts / expected:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=100)
+    parser.add_argument("--updates", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers x {args.updates} updates on one ticket, {args.latency_ms} ms per store call")
+    for mode in ("blind", "cas"):
+        run(mode, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
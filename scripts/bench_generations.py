@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmark knowledge-base re-indexing: insert mode vs generations with an atomic swap.
+
+A knowledge base of ``--docs`` documents of ``--chunks`` chunks each
+(clustered ``--dims``-dimensional vectors, one cluster per document) is
+re-indexed ``--rebuilds`` times, every chunk tagged with its version,
+while ``--readers`` threads query it for a random document's chunks:
+
+* insert mode, like the workflow's ``Pinecone Vector Store``: each
+  re-indexed document's chunks are inserted next to the old ones;
+* ``KnowledgeBase`` generations built in a background thread of the
+  serving process, and in a separate process (readers pick the new
+  ``CURRENT`` up with ``check_s``).
+
+Reports the vectors left in the index, the queries that saw a document's
+chunks from more than one version, and for generations the query latency
+while idle and while a build runs (the readers never wait for a build;
+in-process builds still compete for the interpreter).
+
+Usage:
+    python scripts/bench_generations.py [--docs 200] [--chunks 8] [--dims 256] [--rebuilds 3] [--readers 1]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.metrics import Registry  # noqa: E402
+from infinity_pixel.retrieval.generations import KnowledgeBase  # noqa: E402
+from infinity_pixel.retrieval.vectors import write_vectors  # noqa: E402
+
+
+def centers(args):
+    rng = random.Random(1)
+    return [[rng.gauss(0, 1) for _ in range(args.dims)] for _ in range(args.docs)]
+
+
+def document(args, center, doc, version):
+    """One document's chunks: ids, vectors and metadata tagged with ``version``"""
+    rng = random.Random(doc * 1000 + version)
+    vectors = [[c + rng.gauss(0, 0.3) for c in center] for _ in range(args.chunks)]
+    ids = [f"doc{doc}#{n}" for n in range(args.chunks)]
+    metadata = [{"fileId": f"doc{doc}", "version": version} for _ in range(args.chunks)]
+    return ids, vectors, metadata
+
+
+def mixed(matches):
+    """Whether a document's chunks came back from more than one version"""
+    versions = {}
+    for match in matches:
+        meta = match["metadata"]
+        versions.setdefault(meta["fileId"], set()).add(meta["version"])
+    return any(len(v) > 1 for v in versions.values())
+
+
+def dot(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def insert_mode(args, docs):
+    """Re-indexed chunks are appended next to the old ones; queries read whatever is there"""
+    rows = []
+    for doc, center in enumerate(docs):
+        rows.extend(zip(*document(args, center, doc, 0)))
+    lock = threading.Lock()
+    done = threading.Event()
+    queries = [0, 0]  # total, mixed
+
+    def reader(seed):
+        rng = random.Random(seed)
+        while not done.is_set():
+            doc = rng.randrange(args.docs)
+            with lock:
+                candidates = [r for r in rows if r[2]["fileId"] == f"doc{doc}"]
+            scored = sorted(candidates, key=lambda r: dot(r[1], docs[doc]), reverse=True)[:args.chunks]
+            queries[0] += 1
+            queries[1] += mixed([{"metadata": r[2]} for r in scored])
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    for version in range(1, args.rebuilds + 1):
+        for doc, center in enumerate(docs):
+            batch = list(zip(*document(args, center, doc, version)))
+            with lock:
+                rows.extend(batch)
+            time.sleep(0.0005)  # embedding the next document
+    done.set()
+    for thread in threads:
+        thread.join()
+    return len(rows), queries
+
+
+def build(args, docs, kb, version):
+    def writer(path):
+        ids, vectors, metadata = [], [], []
+        for doc, center in enumerate(docs):
+            for column, values in zip((ids, vectors, metadata), document(args, center, doc, version)):
+                column.extend(values)
+            time.sleep(0.0005)
+        return write_vectors(path, vectors, ids, metadata)
+
+    kb.build(writer=writer)
+
+
+def build_process(args, root, start):
+    docs = centers(args)
+    kb = KnowledgeBase(root, registry=Registry())
+    start.wait()
+    for version in range(1, args.rebuilds + 1):
+        build(args, docs, kb, version)
+    kb.close()
+
+
+def generations(args, docs, in_process):
+    root = tempfile.mkdtemp(prefix="kb-")
+    kb = KnowledgeBase(root, registry=Registry(), check_s=None if in_process else 0.05)
+    build(args, docs, kb, 0)
+    building = threading.Event()
+    done = threading.Event()
+    latencies = {False: [], True: []}
+    queries = [0, 0]
+    seen = set()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        while not done.is_set():
+            doc = rng.randrange(args.docs)
+            during = building.is_set()
+            start = time.perf_counter()
+            with kb.snapshot() as generation:
+                matches = generation.search(docs[doc], k=args.chunks)
+                seen.add(generation.number)
+            latencies[during].append((time.perf_counter() - start) * 1000)
+            queries[0] += 1
+            queries[1] += mixed(matches)
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(1.0)
+    building.set()
+    if in_process:
+        for version in range(1, args.rebuilds + 1):
+            build(args, docs, kb, version)
+    else:
+        start = multiprocessing.Event()
+        process = multiprocessing.Process(target=build_process, args=(args, root, start))
+        process.start()
+        start.set()
+        process.join()
+        time.sleep(0.2)  # the readers pick up the last CURRENT
+    building.clear()
+    time.sleep(0.5)
+    done.set()
+    for thread in threads:
+        thread.join()
+    size = len(kb)
+    on_disk = len(kb.generations())
+    kb.close()
+    shutil.rmtree(root)
+    return size, on_disk, queries, latencies, len(seen)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=8)
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--rebuilds", type=int, default=3)
+    parser.add_argument("--readers", type=int, default=1)
+    args = parser.parse_args()
+
+    docs = centers(args)
+    live = args.docs * args.chunks
+    print(f"{args.docs} documents × {args.chunks} chunks ({live} live vectors, {args.dims} dims), "
+          f"{args.rebuilds} re-indexes, {args.readers} reader threads")
+    size, (total, bad) = insert_mode(args, docs)
+    print(f"  insert mode             {size:6d} vectors in the index, {bad}/{total} queries saw mixed versions")
+    for label, in_process in (("generations, thread", True), ("generations, process", False)):
+        size, on_disk, (total, bad), latencies, seen = generations(args, docs, in_process)
+        idle, busy = latencies[False], latencies[True]
+        print(f"  {label:<22}  {size:6d} vectors in the index, {bad}/{total} queries saw mixed versions; "
+              f"{seen} generations served, {on_disk} on disk")
+        print(f"  {'':<22}  query p50/p99 idle {statistics.median(idle):.2f}/{percentile(idle, 0.99):.2f} ms, "
+              f"during builds {statistics.median(busy):.2f}/{percentile(busy, 0.99):.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Benchmark knowledge-base ingestion: per-minute folder polling vs the Drive change feed.
+
+Simulates ``--hours`` of edits to a Drive folder of ``--files`` documents
+(bursts of saves to a random document about every two minutes, a new
+document followed by a few saves about every ten minutes, the odd file
+trashed) on a ``FakeDrive`` with a simulated clock, and ingests it:
+
+* like the workflow: ``File Updated`` and ``File Created`` triggers each
+  listing the folder every minute and inserting every file they report;
+* with ``Ingestor`` polling the change feed every minute;
+* with ``Ingestor`` woken by watch-channel push notifications (default
+  15 s quiet period and 5 s debounce, a fallback poll every 10 minutes).
+
+Reports Drive API calls, chunks embedded, the chunks left in the index
+against the documents' live chunks, and the freshness lag from each save
+until its content was indexed: over all saves, and over the last save of
+each burst ("settled").
+
+Usage:
+    python scripts/bench_ingest.py [--hours 1] [--files 20] [--seed 5]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.metrics import Registry  # noqa: E402
+from infinity_pixel.retrieval import split_text  # noqa: E402
+from infinity_pixel.retrieval.drive import FakeDrive, parse_rfc3339  # noqa: E402
+from infinity_pixel.retrieval.ingest import HashingEmbedder, Ingestor, KnowledgeIndex  # noqa: E402
+
+FOLDER = "quantum-ops-services"
+START = 1_764_000_000.0
+SETTLED_S = 60
+WORDS = ("service", "pricing", "support", "cloud", "migration", "audit", "security", "backup", "network",
+         "monitoring", "contract", "onboarding", "uptime", "incident", "report", "training")
+
+
+class Clock:
+    def __init__(self):
+        self.now = START
+
+    def __call__(self):
+        return self.now
+
+
+def document(rng, n):
+    paragraphs = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) for _ in range(rng.randint(3, 8))]
+    return f"# Document {n}\n\n" + "\n\n".join(paragraphs)
+
+
+def schedule(rng, hours, files):
+    """``(second, action, file number)`` events: save bursts, new documents, trashed files"""
+    events = []
+    end = int(hours * 3600)
+    t = 0.0
+    while True:
+        t += rng.expovariate(1 / 120)
+        if t >= end:
+            break
+        target, at = rng.randrange(files), t
+        for _ in range(rng.randint(1, 6)):
+            events.append((int(at), "save", target))
+            at += rng.uniform(3, 15)
+    t = 0.0
+    created = files
+    while True:
+        t += rng.expovariate(1 / 600)
+        if t >= end:
+            break
+        events.append((int(t), "create", created))
+        for k in range(rng.randint(0, 3)):
+            events.append((int(t) + 5 * (k + 1), "save", created))
+        created += 1
+    for _ in range(max(1, int(hours * 2))):
+        events.append((rng.randrange(end), "trash", rng.randrange(files)))
+    return sorted(events), end
+
+
+class Simulation:
+    """A FakeDrive that records saves, and which version each download returned"""
+
+    def __init__(self, seed, files, on_change=None):
+        self.rng = random.Random(seed)
+        self.clock = Clock()
+        self.drive = FakeDrive(self.clock, on_change)
+        self.ids = {}
+        self.saves = []  # (time, file id, version)
+        self.indexed = {}  # file id -> [(time, version)]
+        self.trashed = set()
+        for n in range(files):
+            self.ids[n] = self.drive.create(f"doc{n}.md", document(self.rng, n), FOLDER)
+        download = self.drive.download
+
+        def recording_download(file):
+            data = download(file)
+            version = int(self.drive.files[file["id"]]["version"])
+            self.indexed.setdefault(file["id"], []).append((self.clock.now, version))
+            return data
+
+        self.drive.download = recording_download
+
+    def apply(self, action, n):
+        if action == "create":
+            self.ids[n] = self.drive.create(f"doc{n}.md", document(self.rng, n), FOLDER)
+        elif n in self.ids and self.ids[n] not in self.trashed:
+            file_id = self.ids[n]
+            if action == "save":
+                self.drive.update(file_id, document(self.rng, n))
+            else:
+                self.drive.trash(file_id)
+                self.trashed.add(file_id)
+                return
+        else:
+            return
+        file_id = self.ids[n]
+        self.saves.append((self.clock.now, file_id, int(self.drive.files[file_id]["version"])))
+
+    def lags(self, settled=False):
+        """Seconds from each save until that version (or a later one) was indexed; with ``settled`` only
+        for the last save of a burst (no further save to the file within ``SETTLED_S``)"""
+        lags = []
+        for n, (saved_at, file_id, version) in enumerate(self.saves):
+            if file_id in self.trashed:
+                continue
+            if settled and any(f == file_id and t - saved_at < SETTLED_S for t, f, _ in self.saves[n + 1:]):
+                continue
+            done = [t for t, v in self.indexed.get(file_id, ()) if v >= version and t >= saved_at]
+            if done:
+                lags.append(min(done) - saved_at)
+        return lags
+
+    def live_chunks(self):
+        return sum(len(split_text(data.decode("utf-8"))) for file_id, data in self.drive.contents.items()
+                   if not self.drive.files[file_id]["trashed"])
+
+
+def polling(args, events, end):
+    """Two folder-polling triggers, inserting every file they report (Pinecone insert mode)"""
+    sim = Simulation(args.seed, args.files)
+    embedder = HashingEmbedder(64)
+    inserted = embedded = 0
+    for file in sim.drive.list_files(FOLDER)["files"]:  # the initial import
+        chunks = split_text(sim.drive.download(file).decode("utf-8"))
+        embedder([c.text for c in chunks])
+        inserted += len(chunks)
+    sim.drive.calls.clear()
+    last = START
+    pending = iter(events)
+    event = next(pending, None)
+    for second in range(end + 1):
+        sim.clock.now = START + second
+        while event is not None and event[0] <= second:
+            sim.apply(event[1], event[2])
+            event = next(pending, None)
+        if second % 60 or not second:
+            continue
+        now = sim.clock.now
+        for field in ("modifiedTime", "createdTime"):  # File Updated, File Created
+            for file in sim.drive.list_files(FOLDER)["files"]:
+                if last < parse_rfc3339(file[field]) <= now:
+                    chunks = split_text(sim.drive.download(file).decode("utf-8"))
+                    embedder([c.text for c in chunks])
+                    embedded += len(chunks)
+                    inserted += len(chunks)
+        last = now
+    return sim, embedded, inserted
+
+
+def change_feed(args, events, end, push):
+    ingestor = None
+    sim = Simulation(args.seed, args.files, on_change=lambda file_id: push and ingestor and ingestor.notify())
+    embedded = [0]
+    embedder = HashingEmbedder(64)
+
+    def embed(texts):
+        embedded[0] += len(texts)
+        return embedder(texts)
+
+    ingestor = Ingestor(sim.drive, KnowledgeIndex(), embed, FOLDER, poll_s=600 if push else 60, registry=Registry(),
+                        clock=sim.clock, wall=sim.clock)
+    ingestor.sync()  # the initial import
+    ingestor.flush()
+    sim.drive.calls.clear()
+    embedded[0] = 0
+    pending = iter(events)
+    event = next(pending, None)
+    for second in range(end + 1):
+        sim.clock.now = START + second
+        while event is not None and event[0] <= second:
+            sim.apply(event[1], event[2])
+            event = next(pending, None)
+        ingestor.tick()
+        ingestor.wait()
+    ingestor.close()
+    return sim, embedded[0], len(ingestor.index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    events, end = schedule(random.Random(args.seed + 1), args.hours, args.files)
+    saves = sum(1 for e in events if e[1] != "trash")
+    print(f"{args.hours:g} h, {args.files} documents, {saves} saves/creates, "
+          f"{sum(1 for e in events if e[1] == 'trash')} trashed")
+    print(f"  {'mode':<22} {'API calls':>9} {'list':>5} {'get':>4} {'embedded':>8} {'index':>6} {'live':>5} "
+          f"{'lag mean':>8} {'max':>5} {'settled':>8} {'max':>5}")
+    runs = [("poll folder ×2 / min", *polling(args, events, end))]
+    runs.append(("change feed / min", *change_feed(args, events, end, push=False)))
+    runs.append(("change feed + push", *change_feed(args, events, end, push=True)))
+    for label, sim, embedded, index_chunks in runs:
+        calls = sim.drive.calls
+        lists = calls["files.list"] + calls["changes.list"]
+        lags, settled = sorted(sim.lags()), sorted(sim.lags(settled=True))
+        print(f"  {label:<22} {sum(calls.values()):9d} {lists:5d} {calls['files.get']:4d} {embedded:8d} "
+              f"{index_chunks:6d} {sim.live_chunks():5d} {statistics.mean(lags):7.1f}s {lags[-1]:4.0f}s "
+              f"{statistics.mean(settled):7.1f}s {settled[-1]:4.0f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark the outbound calls of each ticket action, fresh connections vs pooled.
+
+Starts local fake Airtable, Slack and notify-customer servers (HTTPS with a
+throwaway self-signed certificate when ``openssl`` is available) and replays
+the HTTP calls each action makes: once with ``urllib`` (a new connection per
+call, as the workflow's nodes do) and once through ``outbound.OutboundClient``.
+``--rtt-ms`` adds a simulated network round trip per request and two per new
+connection (TCP + TLS 1.3 handshakes). Reports latency and connections
+opened per action.
+
+Usage:
+    python scripts/bench_outbound.py [--actions 50] [--rtt-ms 20] [--plain]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.metrics import Registry  # noqa: E402
+from infinity_pixel.outbound import OutboundClient  # noqa: E402
+
+# (server, method, path) per call, in the order the workflow makes them
+ACTIONS = {
+    "create": [("airtable", "POST", "/v0/app/tbl"), ("slack", "POST", "/api/chat.postMessage"),
+               ("notify", "POST", "/webhook/notify-customer")],
+    "status": [("airtable", "GET", "/v0/app/tbl?maxRecords=1")],
+    "update": [("airtable", "GET", "/v0/app/tbl?maxRecords=1"), ("airtable", "GET", "/v0/app/tbl/rec1"),
+               ("airtable", "PATCH", "/v0/app/tbl/rec1"), ("slack", "POST", "/api/chat.postMessage"),
+               ("notify", "POST", "/webhook/notify-customer")],
+    "close": [("airtable", "GET", "/v0/app/tbl?maxRecords=1"), ("airtable", "PATCH", "/v0/app/tbl/rec1"),
+              ("slack", "POST", "/api/chat.postMessage"), ("notify", "POST", "/webhook/notify-customer")],
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+        time.sleep(2 * self.server.rtt)  # TCP + TLS handshakes
+
+    def _reply(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.server.rtt)
+        data = json.dumps({"ok": True, "id": "rec1", "fields": {}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PATCH = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(rtt, tls_context):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.rtt = rtt
+    server.connections = 0
+    if tls_context is not None:
+        server.socket = tls_context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_certificate(directory):
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost", "-keyout", key, "-out", cert],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def run(mode, servers, scheme, client_context, args):
+    client = OutboundClient(registry=Registry(), ssl_context=client_context)
+    body = json.dumps({"fields": {"Status": "open"}}).encode()
+    headers = {"Content-Type": "application/json"}
+
+    def call(name, method, path):
+        url = f"{scheme}://localhost:{servers[name].server_address[1]}{path}"
+        data = body if method != "GET" else None
+        if mode == "urllib":
+            request = urllib.request.Request(url, data=data, method=method, headers=headers)
+            with urllib.request.urlopen(request, timeout=10, context=client_context) as response:
+                response.read()
+        else:
+            client.request(method, url, data, headers).raise_for_status()
+
+    print(f"  {mode}:")
+    for action, calls in ACTIONS.items():
+        before = sum(s.connections for s in servers.values())
+        latencies = []
+        for _ in range(args.actions):
+            start = time.perf_counter()
+            for name, method, path in calls:
+                call(name, method, path)
+            latencies.append((time.perf_counter() - start) * 1000)
+        opened = sum(s.connections for s in servers.values()) - before
+        latencies.sort()
+        print(f"    {action:<6} {len(calls)} calls  mean {sum(latencies) / len(latencies):6.1f} ms  "
+              f"p50 {latencies[len(latencies) // 2]:6.1f} ms  connections/action {opened / args.actions:.2f}")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--actions", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=20.0)
+    parser.add_argument("--plain", action="store_true", help="plain HTTP even if openssl is available")
+    args = parser.parse_args()
+
+    tls = not args.plain and shutil.which("openssl") is not None
+    with tempfile.TemporaryDirectory() as directory:
+        server_context = client_context = None
+        if tls:
+            cert, key = make_certificate(directory)
+            server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            server_context.load_cert_chain(cert, key)
+            client_context = ssl.create_default_context(cafile=cert)
+        servers = {name: start_server(args.rtt_ms / 1000, server_context) for name in ("airtable", "slack", "notify")}
+        scheme = "https" if tls else "http"
+        print(f"{args.actions} of each action over {scheme}, simulated RTT {args.rtt_ms} ms")
+        for mode in ("urllib", "pooled"):
+            run(mode, servers, scheme, client_context, args)
+        for server in servers.values():
+            server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark prompt tokens per knowledge answer: retrieved chunks as-is vs packed.
+
+Splits the Markdown and text files in ``docs/`` (and the README) like the
+workflow's ``Recursive Character Text Splitter`` (1000 characters, 100
+overlap), retrieves the top ``--top-k`` chunks per question with TF-IDF
+cosine similarity (a stand-in for the Pinecone index) and compares the
+tokens of the chunks concatenated as retrieved with
+``infinity_pixel.retrieval.ContextPacker`` at several budgets. "Top-5
+kept" is the share of the five best chunks' text that is in the packed
+context.
+
+Usage:
+    python scripts/bench_packer.py [--top-k 20] [--docs docs]
+"""
+
+import argparse
+import glob
+import math
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.retrieval import Chunk, ContextPacker, split_text  # noqa: E402
+from infinity_pixel.search import tokenize  # noqa: E402
+
+QUESTIONS = (
+    "Why did closing a ticket fail and how was it fixed?",
+    "How do Slack notifications for new tickets work?",
+    "What should I test for the status action?",
+    "Should the ticket manager be a webhook or a sub-workflow?",
+    "Which Airtable fields does a ticket have?",
+    "How do I update a ticket with new information?",
+    "What services does Quantum-Ops offer?",
+    "How are ticket IDs generated?",
+    "What are the next steps after the close fix?",
+    "How do I run the test scripts?",
+)
+
+
+class LexicalIndex:
+    """TF-IDF cosine similarity over chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        vectors = [Counter(tokenize(c.text)) for c in chunks]
+        df = Counter(t for v in vectors for t in v)
+        self.idf = {t: math.log(len(chunks) / n) + 1 for t, n in df.items()}
+        self.vectors = [self._weigh(v) for v in vectors]
+
+    def _weigh(self, counts):
+        vector = {t: (1 + math.log(n)) * self.idf.get(t, 0.0) for t, n in counts.items()}
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {t: w / norm for t, w in vector.items()}
+
+    def search(self, query, k):
+        q = self._weigh(Counter(tokenize(query)))
+        scored = sorted(((sum(w * v.get(t, 0.0) for t, w in q.items()), i) for i, v in enumerate(self.vectors)),
+                        reverse=True)[:k]
+        return [Chunk(**{**vars(self.chunks[i]), "score": score}) for score, i in scored]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", default=os.path.join(os.path.dirname(__file__), "..", "docs"))
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.docs, "*.md")) + glob.glob(os.path.join(args.docs, "*.txt")))
+    paths.append(os.path.join(args.docs, "..", "README.md"))
+    chunks = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            chunks.extend(split_text(f.read(), os.path.basename(path)))
+    index = LexicalIndex(chunks)
+    print(f"{len(paths)} files, {len(chunks)} chunks; top {args.top_k} per question, {len(QUESTIONS)} questions")
+
+    results = [index.search(question, args.top_k) for question in QUESTIONS]
+    baseline = sum(ContextPacker(None).pack(r).input_tokens for r in results) / len(results)
+    print(f"  {'budget':>8} {'tokens':>8} {'saved':>7} {'passages':>9} {'top-5 kept':>11} {'pack time':>10}")
+    print(f"  {'as-is':>8} {baseline:8.0f} {'-':>7} {args.top_k:9d} {1:11.0%} {'-':>10}")
+    for budget in (None, 3000, 2000, 1500, 1000):
+        packer = ContextPacker(budget)
+        tokens = passages = kept = 0.0
+        start = time.perf_counter()
+        packed = [packer.pack(r) for r in results]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(results)
+        for retrieved, context in zip(results, packed):
+            tokens += context.tokens
+            passages += len(context.passages)
+            top = retrieved[:5]
+            kept += sum(len(c.text) for c in top if c.text in context.text) / sum(len(c.text) for c in top)
+        n = len(results)
+        label = "none" if budget is None else str(budget)
+        print(f"  {label:>8} {tokens / n:8.0f} {1 - tokens / n / baseline:6.0%} {passages / n:9.1f} "
+              f"{kept / n:11.0%} {elapsed_ms:7.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark chat turn latency with and without speculative prefetch.
+
+Runs the agent (``infinity_pixel.chat``) with the fake model, a knowledge
+base whose searches take ``--retrieval-ms`` and a ticket store whose
+lookups take ``--store-ms``. The agent searches the knowledge base, then
+looks up the ticket, then answers; with prefetch both reads start when the
+message arrives. Reports mean turn time and time to first token per
+question, and the prefetch hit and waste rates over all turns.
+
+Usage:
+    python scripts/bench_prefetch.py [--runs 5] [--first-token-ms 600] [--token-ms 25] [--retrieval-ms 250]
+                                     [--store-ms 300]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.backend import TicketBackend  # noqa: E402
+from infinity_pixel.chat import ChatAgent, FakeChatModel, knowledge_tool, ticket_tool  # noqa: E402
+from infinity_pixel.metrics import Registry  # noqa: E402
+from infinity_pixel.prefetch import Prefetcher  # noqa: E402
+from infinity_pixel.store import InMemoryTicketStore  # noqa: E402
+from infinity_pixel.tracing import Tracer  # noqa: E402
+
+TICKET_ID = "TCK-1764314974531-001"
+QUESTIONS = (
+    ("knowledge", "Tell me about Cloud Management"),
+    ("status", f"What is the status of {TICKET_ID}?"),
+    ("close", f"Please close {TICKET_ID}, it works now"),
+)
+
+
+class SlowStore(InMemoryTicketStore):
+    def __init__(self, records, latency):
+        super().__init__(records)
+        self.latency = latency
+
+    def find(self, ticket_id):
+        time.sleep(self.latency)
+        return super().find(ticket_id)
+
+
+def make_agent(args, prefetch):
+    store = SlowStore([{"Ticket ID": TICKET_ID, "Subject": "Login", "Status": "open"}], args.store_ms / 1000)
+    backend = TicketBackend(store, tracer=Tracer(enabled=False), registry=Registry(), status_cache=False,
+                            search_index=False, duplicates=False, customers=False)
+
+    def retrieve(query):
+        time.sleep(args.retrieval_ms / 1000)
+        return ["Our Cloud Management service covers monitoring, cost optimisation and security reviews."]
+
+    registry = Registry()
+    model = FakeChatModel(first_token_s=args.first_token_ms / 1000, token_s=args.token_ms / 1000)
+    return ChatAgent(model, [knowledge_tool(retrieve), ticket_tool(backend)], tracer=Tracer(enabled=False),
+                     registry=registry, prefetcher=Prefetcher(registry=registry) if prefetch else False)
+
+
+def turn(agent, session_id, text):
+    start = time.perf_counter()
+    first_token = None
+    for event in agent.run(session_id, text):
+        if event.type == "token" and first_token is None:
+            first_token = time.perf_counter() - start
+    return first_token * 1000, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--first-token-ms", type=float, default=600)
+    parser.add_argument("--token-ms", type=float, default=25)
+    parser.add_argument("--retrieval-ms", type=float, default=250)
+    parser.add_argument("--store-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    print(f"fake model: first token {args.first_token_ms:.0f} ms; retrieval {args.retrieval_ms:.0f} ms; "
+          f"ticket lookup {args.store_ms:.0f} ms; {args.runs} runs each")
+    print(f"  {'question':<10} {'serial':>10} {'prefetch':>10} {'first token':>20}")
+    agents = {False: make_agent(args, False), True: make_agent(args, True)}
+    for label, text in QUESTIONS:
+        means = {}
+        for prefetch, agent in agents.items():
+            results = [turn(agent, f"bench-{label}-{n}", text) for n in range(args.runs)]
+            means[prefetch] = [sum(r[i] for r in results) / len(results) for i in range(2)]
+        print(f"  {label:<10} {means[False][1]:7.0f} ms {means[True][1]:7.0f} ms "
+              f"{means[False][0]:7.0f} → {means[True][0]:5.0f} ms")
+    stats = agents[True].prefetcher.stats()
+    print(f"prefetch: {stats['started']} started, {stats['hit']} hits, {stats['waste']} wasted, "
+          f"{stats['miss']} misses (hit rate {stats['hitRate']:.0%}, waste rate {stats['wasteRate']:.0%})")
+    for agent in agents.values():
+        agent.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
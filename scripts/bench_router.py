@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark the chat routing tier: accuracy vs cost and latency per threshold.
+
+Routes a labelled held-out set of chat messages (none of them in the
+router's training examples) with ``infinity_pixel.router`` at several
+confidence thresholds. For each it reports the share of turns answered
+locally, the precision of those answers (a wrong template is a bad
+answer), the share of trivial turns caught, the model cost per 1000 turns
+at ``gpt-4.1-mini`` prices and the mean turn latency, taking
+``--llm-ms`` for a model turn and the measured classifier time otherwise.
+
+Usage:
+    python scripts/bench_router.py [--llm-ms 1500] [--input-tokens 1200] [--output-tokens 150]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.router import LLM, Router, default_classifier  # noqa: E402
+
+PRICE_PER_M = {"input": 0.40, "output": 1.60}  # gpt-4.1-mini, USD per million tokens
+HELD_OUT = [
+    *[(text, "greeting") for text in (
+        "hello :)", "hi team", "hey, good morning", "hello, anybody here?", "good day", "hi hi",
+        "hey hey", "hello quantum-ops")],
+    *[(text, "thanks") for text in (
+        "thank you!", "thanks so much", "ok, thank you", "great, thx", "thanks, that's perfect",
+        "thanks mate", "awesome, appreciate it", "thank you for the quick reply")],
+    *[(text, "goodbye") for text in (
+        "bye!", "ok bye", "see ya", "that's all, goodbye", "have a good one", "bye for now", "goodbye and thanks")],
+    *[(text, "services") for text in (
+        "what services do you have", "what do you provide?", "what can you do?", "which services do you sell",
+        "what does your company do", "can you list what you offer", "what are the services you provide",
+        "what kinds of work do you do")],
+    *[(text, LLM) for text in (
+        "I need to open a support ticket", "what's the status of TCK-1764314974531-001?",
+        "close TCK-1764314974531-001 please", "my app keeps logging me out", "how much is cloud management?",
+        "do you do shopify development", "can you migrate our servers to gcp", "I got billed twice this month",
+        "my email is ada@example.com", "the fix didn't work", "what's included in saas development",
+        "hi, I can't access my dashboard", "thanks, but I still have the error", "can I speak to an engineer",
+        "how do I reset my password", "yes", "sure", "my name is Grace Hopper", "priority: urgent",
+        "what is the difference between cloud app development and cloud management",
+        "do you offer facebook ads", "is my data secure with you", "when will my ticket be resolved",
+        "update my ticket: the server is back up", "our website loads slowly", "I'd like a quote for an app",
+        "hello, I need help with a failed deployment", "can you build an ios and android app",
+        "what time zone is your support in", "how long does a custom crm take to build",
+        "I want to cancel my subscription", "your last update broke the login page")],
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--llm-ms", type=float, default=1500, help="mean model turn latency")
+    parser.add_argument("--input-tokens", type=int, default=1200, help="prompt tokens per model turn")
+    parser.add_argument("--output-tokens", type=int, default=150, help="completion tokens per model turn")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    classifier = default_classifier()
+    print(f"classifier trained in {(time.perf_counter() - start) * 1000:.0f} ms; "
+          f"{len(HELD_OUT)} held-out messages, {sum(i != LLM for _, i in HELD_OUT)} trivial")
+    turn_cost = (args.input_tokens * PRICE_PER_M["input"] + args.output_tokens * PRICE_PER_M["output"]) / 1e6
+    trivial = sum(intent != LLM for _, intent in HELD_OUT)
+    print(f"  {'threshold':>9} {'local':>7} {'precision':>10} {'caught':>8} {'$/1k turns':>11} "
+          f"{'mean turn':>10} {'classify':>9}")
+    print(f"  {'no router':>9} {0:6.0%} {'-':>10} {0:7.0%} {turn_cost * 1000:10.3f} {args.llm_ms:7.0f} ms {'-':>9}")
+    for threshold in (0.5, 0.7, 0.8, 0.9, 0.95):
+        router = Router(classifier, threshold=threshold)
+        local = correct = 0
+        classify_s = 0.0
+        for text, intent in HELD_OUT:
+            start = time.perf_counter()
+            route = router.route(text)
+            classify_s += time.perf_counter() - start
+            if route.answer is not None:
+                local += 1
+                correct += route.intent == intent
+        n = len(HELD_OUT)
+        classify_ms = classify_s * 1000 / n
+        cost = (n - local) / n * turn_cost * 1000
+        latency = classify_ms + (n - local) / n * args.llm_ms
+        precision = f"{correct / local:9.0%}" if local else f"{'-':>9}"
+        print(f"  {threshold:9.2f} {local / n:6.0%} {precision} {correct / trivial:8.0%} {cost:10.3f} "
+              f"{latency:7.0f} ms {classify_ms * 1000:6.0f} µs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
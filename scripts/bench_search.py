@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ticket full-text search index.
+
+Generates N synthetic tickets (subjects from product area x problem pairs,
+text padded with a Zipf-distributed vocabulary), builds a ``SearchIndex``
+and times a mix of term, multi-term, prefix and filtered queries.
+
+Usage:
+    python scripts/bench_search.py [--tickets 1000000] [--repeat 20]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.search import SearchIndex  # noqa: E402
+from infinity_pixel.tickets import PRIORITIES, STATUSES, format_timestamp  # noqa: E402
+
+AREAS = ("password", "login", "billing", "invoice", "dashboard", "export", "import", "slack", "webhook",
+         "api", "mobile", "android", "iphone", "email", "notification", "report", "search", "upload",
+         "sso", "permissions")
+PROBLEMS = ("reset", "failure", "error", "timeout", "duplicate", "missing", "slow", "crash", "blank",
+            "wrong", "locked", "expired", "stuck", "disabled", "broken")
+SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "ta", "vo", "zi", "pe", "sa", "do", "gu", "fi", "he")
+
+QUERIES = [
+    ("password reset", {}),
+    ("webhook timeout", {}),
+    ("invoice duplicate", {"status": "open"}),
+    ("export*", {}),
+    ("slow*", {"priority": "high"}),
+    ("sso locked account", {"status": "in_progress", "priority": "urgent"}),
+]
+
+
+def vocabulary(n, rng):
+    words = set()
+    while len(words) < n:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randrange(2, 5))))
+    return sorted(words)
+
+
+def synthetic_tickets(n, seed=7):
+    """Subjects from area x problem pairs; descriptions and logs padded with Zipf-distributed filler"""
+    rng = random.Random(seed)
+    words = vocabulary(3000, rng)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    start = 1764314974531
+    for i in range(n):
+        area, problem = rng.choice(AREAS), rng.choice(PROBLEMS)
+        created = start + i * 1000
+        filler = rng.choices(words, cum_weights=cum_weights, k=rng.randrange(5, 40))
+        updates = [f"[{format_timestamp(created + (u + 1) * 60000)}] User update: "
+                   + " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randrange(3, 15)))
+                   for u in range(rng.randrange(0, 3))]
+        yield {
+            "Ticket ID": f"TCK-{created}-{i % 1000:03d}",
+            "Subject": f"{area.title()} {problem}",
+            "Initial Description": f"{area} {problem} " + " ".join(filler),
+            "Conversation Log": "\n".join([f"[{format_timestamp(created)}] Initial: {area} {problem}"] + updates),
+            "Status": rng.choice(STATUSES),
+            "Priority": rng.choice(PRIORITIES),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"Indexing {args.tickets} tickets...")
+    t0 = time.perf_counter()
+    index = SearchIndex.from_records(synthetic_tickets(args.tickets))
+    print(f"  build {time.perf_counter() - t0:10.2f} s  ({len(index.terms)} terms)")
+
+    print("Queries (mean of repeats, top 10):")
+    for query, filters in QUERIES:
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            results = index.search(query, limit=10, **filters)
+        ms = (time.perf_counter() - t0) / args.repeat * 1000
+        label = query + "".join(f" {k}={v}" for k, v in filters.items())
+        print(f"  {label:<40} {ms:10.2f} ms  ({len(results)} hits)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark ticket throughput against the number of shards.
+
+Each shard is an in-memory store behind a fixed per-call latency and a
+concurrency limit, standing in for an Airtable base (every base has its own
+request budget). Client threads run a create / status / update mix through
+``TicketBackend`` over a ``ShardedTicketStore`` with 1, 2, 4 and 8 shards.
+
+Usage:
+    python scripts/bench_shards.py [--requests 2000] [--clients 32] [--latency-ms 5] [--per-shard 4]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.backend import TicketBackend  # noqa: E402
+from infinity_pixel.metrics import Registry  # noqa: E402
+from infinity_pixel.sharding import ShardedTicketStore  # noqa: E402
+from infinity_pixel.store import InMemoryTicketStore, TicketStore  # noqa: E402
+from infinity_pixel.tracing import Tracer  # noqa: E402
+
+
+class LimitedStore(TicketStore):
+    """A store that serves at most ``concurrency`` calls at a time, each taking ``latency`` seconds"""
+
+    def __init__(self, latency, concurrency):
+        self.inner = InMemoryTicketStore()
+        self.latency = latency
+        self.slots = threading.BoundedSemaphore(concurrency)
+
+    def _call(self, fn, *args):
+        with self.slots:
+            time.sleep(self.latency)
+            return fn(*args)
+
+    def find(self, ticket_id):
+        return self._call(self.inner.find, ticket_id)
+
+    def all_records(self):
+        return self._call(self.inner.all_records)
+
+    def create(self, fields):
+        return self._call(self.inner.create, fields)
+
+    def update(self, record_id, fields):
+        return self._call(self.inner.update, record_id, fields)
+
+    def delete(self, record_id):
+        return self._call(self.inner.delete, record_id)
+
+
+def run(shards, args):
+    store = ShardedTicketStore({f"s{i}": LimitedStore(args.latency_ms / 1000, args.per_shard)
+                                for i in range(shards)})
+    backend = TicketBackend(store, tracer=Tracer(enabled=False), registry=Registry(), idempotency=False,
+                            status_cache=False, ticket_ids=False, search_index=False, duplicates=False,
+                            customers=False)
+
+    def session(n):
+        created = backend.handle({"action": "create", "name": "Ada", "email": f"c{n}@example.com",
+                                  "subject": f"Issue {n}", "description": "Benchmark ticket"})
+        backend.handle({"action": "status", "ticketId": created["ticketId"]})
+        backend.handle({"action": "update", "ticketId": created["ticketId"], "description": "More detail"})
+
+    sessions = args.requests // 3
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        list(pool.map(session, range(sessions)))
+    elapsed = time.perf_counter() - start
+    store.close()
+    return sessions * 3 / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--per-shard", type=int, default=4, help="concurrent calls each shard serves")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, {args.clients} clients, {args.latency_ms} ms per store call, "
+          f"{args.per_shard} concurrent calls per shard")
+    baseline = None
+    for shards in (1, 2, 4, 8):
+        throughput = run(shards, args)
+        baseline = baseline or throughput
+        print(f"  {shards} shard{'s' if shards > 1 else ' '}  {throughput:8.0f} req/s  ({throughput / baseline:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark columnar ticket snapshots against row-by-row CSV scans.
+
+Generates N synthetic tickets, writes both a CSV export and a snapshot, then
+times the status-count and SLA-breach queries on each.
+
+Usage:
+    python scripts/bench_snapshot.py [--tickets 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.snapshot import Snapshot, write_snapshot  # noqa: E402
+from infinity_pixel.tickets import (  # noqa: E402
+    DAY_MS, STATUSES, format_timestamp, is_sla_breached, read_csv, sla_days, write_csv,
+)
+
+
+def synthetic_tickets(n, seed=7):
+    rng = random.Random(seed)
+    start = 1764314974531
+    for i in range(n):
+        created = start + rng.randrange(90 * DAY_MS)
+        priority = rng.choice(["low", "medium", "high", "urgent"])
+        yield {
+            "Ticket ID": f"TCK-{created}-{i % 1000:03d}",
+            "Customer Name": f"Customer {i % 5000}",
+            "Customer Email": f"customer{i % 5000}@example.com",
+            "Channel": rng.choice(["chat", "email", "web"]),
+            "Subject": f"Issue #{i}",
+            "Initial Description": "Synthetic description " * rng.randrange(1, 8),
+            "Conversation Log": f"[{format_timestamp(created)}] Initial: synthetic",
+            "Priority": priority,
+            "Status": rng.choice(STATUSES),
+            "Created At": format_timestamp(created),
+            "Updated At": format_timestamp(created),
+            "SLA Due At": format_timestamp(created + sla_days(priority) * DAY_MS),
+            "Internal Notes": "",
+        }
+
+
+def timed(label, fn):
+    t0 = time.perf_counter()
+    result = fn()
+    print(f"  {label:<28} {(time.perf_counter() - t0) * 1000:10.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    now = 1764314974531 + 45 * DAY_MS
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "tickets.csv")
+        snap_path = os.path.join(tmp, "tickets.tcol")
+        tickets = list(synthetic_tickets(args.tickets))
+        print(f"Preparing {args.tickets} tickets...")
+        timed("write CSV", lambda: write_csv(csv_path, tickets))
+        timed("write snapshot", lambda: write_snapshot(tickets, snap_path))
+        del tickets
+
+        print("CSV (row by row):")
+        timed("status counts", lambda: Counter(r["Status"] for r in read_csv(csv_path)))
+        timed("SLA breaches", lambda: sum(is_sla_breached(r, now) for r in read_csv(csv_path)))
+
+        print("Snapshot (mmap):")
+        snap = timed("open", lambda: Snapshot(snap_path))
+        timed("status counts", snap.status_counts)
+        timed("priority counts", lambda: snap.value_counts("Priority"))
+        breaches = timed("SLA breaches", lambda: snap.sla_breaches(now))
+        print(f"  ({breaches} tickets past SLA)")
+        snap.close()
+
+
+if __name__ == "__main__":
+    main()
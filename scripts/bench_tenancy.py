@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark tenant state memory, lazy loading and fairness across tenants.
+
+Loads ``--tenants`` tenants (in-memory ticket stores, fake chat model)
+one request each and reports the memory each loaded tenant holds, the
+cold (first request builds the tenant) and warm request times, and what
+``evict_idle`` gives back. Then a noisy tenant submits ``--burst``
+creates from as many customers while ``--quiet`` other tenants submit a
+few creates each, through ``TenantScheduler`` with and without grouping
+by tenant; writes take ``--write-ms``.
+
+Usage:
+    python scripts/bench_tenancy.py [--tenants 500] [--burst 400] [--quiet 10] [--write-ms 5]
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.backend import TicketBackend  # noqa: E402
+from infinity_pixel.chat import FakeChatModel  # noqa: E402
+from infinity_pixel.metrics import Registry  # noqa: E402
+from infinity_pixel.scheduler import FairPriorityQueue  # noqa: E402
+from infinity_pixel.store import InMemoryTicketStore  # noqa: E402
+from infinity_pixel.tenancy import Tenant, TenantConfig, TenantRegistry, TenantScheduler  # noqa: E402
+from infinity_pixel.tracing import Tracer  # noqa: E402
+
+STATUS = {"action": "status", "ticketId": "TCK-1764314974531-001"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowWriteStore(InMemoryTicketStore):
+    def __init__(self, write_s):
+        self.write_s = write_s
+        super().__init__()
+
+    def create(self, fields):
+        time.sleep(self.write_s)
+        return super().create(fields)
+
+
+class UngroupedQueue(FairPriorityQueue):
+    """Customers take turns, tenants do not"""
+
+    def push(self, level, customer, item, now, group=None):
+        super().push(level, customer, item, now)
+
+
+def create(tenant, n):
+    return {"action": "create", "name": "Ada", "email": f"c{n}@{tenant}.example", "subject": "Login",
+            "description": f"Cannot log in ({n})", "priority": "medium"}
+
+
+def memory(n_tenants):
+    clock = Clock()
+    configs = {f"tenant-{n}": TenantConfig(f"tenant-{n}") for n in range(n_tenants)}
+    tenants = TenantRegistry(configs, registry=Registry(), model=FakeChatModel(), idle_s=60, max_loaded=n_tenants,
+                             clock=clock)
+    tracemalloc.start()
+    gc.collect()
+    base = tracemalloc.get_traced_memory()[0]
+    cold = []
+    for tenant_id in configs:
+        start = time.perf_counter()
+        tenants.handle(tenant_id, STATUS)
+        cold.append((time.perf_counter() - start) * 1000)
+    gc.collect()
+    loaded = tracemalloc.get_traced_memory()[0] - base
+    warm = []
+    for tenant_id in configs:
+        start = time.perf_counter()
+        tenants.handle(tenant_id, STATUS)
+        warm.append((time.perf_counter() - start) * 1000)
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    clock.now += 61
+    start = time.perf_counter()
+    evicted = tenants.evict_idle()
+    evict_ms = (time.perf_counter() - start) * 1000
+    gc.collect()
+    freed = before - tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{n_tenants} tenants (in-memory stores, chat agents)")
+    print(f"  loaded: {loaded / 2**20:.1f} MB, {loaded / n_tenants / 1024:.0f} KB per tenant "
+          f"(with their traces and metrics)")
+    print(f"  first request (builds the tenant): p50 {statistics.median(cold):.2f} ms, "
+          f"max {max(cold):.2f} ms; warm p50 {statistics.median(warm):.2f} ms")
+    print(f"  evict_idle: {evicted} tenants in {evict_ms:.0f} ms, {freed / 2**20:.1f} MB freed")
+    tenants.close()
+
+
+async def fairness(args, grouped):
+    def factory(config):
+        backend = TicketBackend(SlowWriteStore(args.write_ms / 1000), tracer=Tracer(), registry=Registry(),
+                                idempotency=False, duplicates=False, search_index=False, customers=False,
+                                ticket_ids=False)
+        return Tenant(config, backend)
+
+    names = ["noisy"] + [f"quiet-{n}" for n in range(args.quiet)]
+    configs = {name: TenantConfig(name, requests_per_minute=0, max_queued=10_000) for name in names}
+    tenants = TenantRegistry(configs, factory=factory, registry=Registry())
+    scheduler = TenantScheduler(tenants, workers=4, read_slots=1, max_queue=10_000, max_per_customer=10_000)
+    if not grouped:
+        scheduler.queue = UngroupedQueue(scheduler.queue.aging_s)
+    await scheduler.start()
+
+    async def timed(payload, tenant):
+        start = time.perf_counter()
+        await scheduler.submit(payload, tenant=tenant)
+        return tenant, (time.perf_counter() - start) * 1000
+
+    jobs = [timed(create("noisy", n), "noisy") for n in range(args.burst)]
+    for n in range(5):
+        jobs += [timed(create(name, n), name) for name in names[1:]]
+    start = time.perf_counter()
+    results = await asyncio.gather(*jobs)
+    total_s = time.perf_counter() - start
+    await scheduler.stop()
+    tenants.close()
+    quiet = sorted(ms for tenant, ms in results if tenant != "noisy")
+    noisy = sorted(ms for tenant, ms in results if tenant == "noisy")
+    label = "by tenant" if grouped else "by customer"
+    print(f"  {label:<12} quiet p50 {statistics.median(quiet):7.0f} ms  p99 {quiet[int(len(quiet) * 0.99)]:7.0f} ms"
+          f"  noisy p50 {statistics.median(noisy):7.0f} ms  total {total_s:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tenants", type=int, default=500)
+    parser.add_argument("--burst", type=int, default=400)
+    parser.add_argument("--quiet", type=int, default=10)
+    parser.add_argument("--write-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    memory(args.tenants)
+    print(f"Noisy tenant: {args.burst} creates; {args.quiet} quiet tenants: 5 creates each; "
+          f"3 write workers, {args.write_ms:g} ms per write")
+    for grouped in (False, True):
+        asyncio.run(fairness(args, grouped))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
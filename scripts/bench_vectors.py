@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark the quantized vector store against exact float32 search.
+
+Generates clustered, embedding-like vectors (1024 dimensions like the
+workflow's ``Embeddings OpenAI`` node), writes them as raw float32 and as
+``.qvec`` files with 8- and 4-bit codes, and reports file size, startup
+time (loading the float32 file vs memory-mapping the ``.qvec`` and
+deriving its scan codes on the first query), query
+time and recall@k against exact float32 cosine search for several
+re-rank factors.
+
+Usage:
+    python scripts/bench_vectors.py [--vectors 10000] [--dims 1024] [--queries 20] [--k 10]
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+from operator import mul
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from infinity_pixel.retrieval.vectors import VectorStore, write_vectors  # noqa: E402
+
+
+def normalized(vector):
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def synthetic(n, dims, clusters, rng):
+    """Vectors around ``clusters`` random topics, like chunks of a few dozen documents"""
+    centers = [[rng.gauss(0, 1) for _ in range(dims)] for _ in range(clusters)]
+    for _ in range(n):
+        center = rng.choice(centers)
+        yield [c + rng.gauss(0, 0.8) for c in center]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=10000)
+    parser.add_argument("--dims", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    clusters = max(args.vectors // 100, 1)
+    vectors = list(synthetic(args.vectors + args.queries, args.dims, clusters, rng))
+    queries, vectors = vectors[:args.queries], vectors[args.queries:]
+    ids = [f"chunk-{i}" for i in range(len(vectors))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, "kb.f32")
+        with open(raw_path, "wb") as f:
+            for vector in vectors:
+                array("f", normalized(vector)).tofile(f)
+        start = time.perf_counter()
+        flat = array("f")
+        with open(raw_path, "rb") as f:
+            flat.fromfile(f, len(vectors) * args.dims)
+        rows = [flat[i * args.dims:(i + 1) * args.dims] for i in range(len(vectors))]
+        load_ms = (time.perf_counter() - start) * 1000
+        raw_size = os.path.getsize(raw_path)
+
+        start = time.perf_counter()
+        exact = []
+        for query in queries:
+            q = normalized(query)
+            scores = [sum(map(mul, q, row)) for row in rows]
+            exact.append(set(sorted(range(len(rows)), key=scores.__getitem__, reverse=True)[:args.k]))
+        exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{len(vectors)} vectors × {args.dims} dims ({clusters} clusters), {len(queries)} queries, "
+              f"recall@{args.k} vs exact float32 search")
+        print(f"  {'format':<14} {'size':>9} {'ratio':>6} {'startup':>9} {'rerank':>7} {'query':>9} {'recall':>7}")
+        print(f"  {'float32':<14} {raw_size / 2**20:6.1f} MB {1:5.1f}x {load_ms:6.1f} ms {'-':>7} "
+              f"{exact_ms:6.1f} ms {1:7.3f}")
+
+        for bits in (8, 4):
+            path = os.path.join(tmp, f"kb{bits}.qvec")
+            write_vectors(path, vectors, ids, bits=bits)
+            size = os.path.getsize(path)
+            start = time.perf_counter()
+            store = VectorStore(path)
+            store.search(queries[0], 1)  # the first query derives the 1-bit scan codes
+            open_ms = (time.perf_counter() - start) * 1000
+            with store:
+                for rerank in (2, 4, 8, 16):
+                    found = 0
+                    start = time.perf_counter()
+                    for query, truth in zip(queries, exact):
+                        hits = store.search(query, args.k, rerank)
+                        found += len(truth & {int(h["id"].split("-")[1]) for h in hits})
+                    query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+                    print(f"  {f'qvec {bits}-bit':<14} {size / 2**20:6.1f} MB {raw_size / size:5.1f}x "
+                          f"{open_ms:6.1f} ms {rerank:7d} {query_ms:6.1f} ms {found / (len(queries) * args.k):7.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.bloom import BloomFilter, TicketIdGuard
+from infinity_pixel.metrics import Registry
+from infinity_pixel.store import InMemoryTicketStore, StoreError
+from infinity_pixel.tickets import DAY_MS, now_ms
+from infinity_pixel.tracing import Tracer
+
+CREATE = {"action": "create", "name": "Ada", "email": "ada@example.com",
+          "subject": "Login", "description": "Cannot log in"}
+OLD_ID = "TCK-1764314974531-916"
+
+
+class CountingStore(InMemoryTicketStore):
+    finds = 0
+
+    def find(self, ticket_id):
+        self.finds += 1
+        return super().find(ticket_id)
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bloom_filter_error_rate():
+    bloom = BloomFilter(20_000, error_rate=0.01)
+    bloom.update(f"TCK-{i}" for i in range(20_000))
+    assert all(f"TCK-{i}" in bloom for i in range(20_000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(20_000))
+    assert false_positives / 20_000 < 0.02
+    assert abs(bloom.false_positive_rate() - 0.01) < 0.005
+
+
+def test_unknown_ids_never_reach_the_store():
+    store = CountingStore()
+    backend = TicketBackend(store, tracer=Tracer(), registry=Registry(), status_cache=False)
+    ticket_id = backend.handle(CREATE)["ticketId"]
+    for bad in ("TCK-123", "TCK-CURRENT-ID", OLD_ID, "tck-1764314974531-916"):
+        for action in ("status", "update", "close"):
+            response = backend.handle({"action": action, "ticketId": bad, "description": "x"})
+            assert response["status"] == "not_found"
+    assert store.finds == 0
+    assert backend.handle({"action": "status", "ticketId": ticket_id})["status"] == "open"
+    assert store.finds == 1
+    assert backend.metrics.cache.labels("bloom", "hit").value == 12
+
+
+def test_recent_ids_fall_through_then_hit_the_negative_cache():
+    clock = Clock()
+    store = CountingStore()
+    guard = TicketIdGuard(store, negative_ttl=30, clock=clock)
+    backend = TicketBackend(store, tracer=Tracer(), registry=Registry(), status_cache=False, ticket_ids=guard)
+    recent = f"TCK-{now_ms()}-001"
+    for _ in range(5):
+        backend.handle({"action": "status", "ticketId": recent})
+    assert store.finds == 1  # first miss is cached for 30 s
+    assert backend.metrics.cache.labels("negative", "hit").value == 4
+
+    # The workflow creates it directly in Airtable; after the negative TTL it is found
+    store.create({"Ticket ID": recent, "Status": "open"})
+    clock.now = 31
+    assert backend.handle({"action": "status", "ticketId": recent})["status"] == "open"
+
+
+def test_refresh_picks_up_tickets_created_elsewhere():
+    clock = Clock()
+    store = InMemoryTicketStore()
+    guard = TicketIdGuard(store, refresh_s=60, clock=clock, wall_ms=lambda: now_ms() + DAY_MS)
+    assert guard.might_exist(OLD_ID) == (False, "bloom")
+    store.create({"Ticket ID": OLD_ID})  # imported from a CSV, say
+    assert guard.might_exist(OLD_ID) == (False, "bloom")
+    clock.now = 61
+    assert guard.might_exist(OLD_ID) == (False, "bloom")  # the old filter answers while the new one builds
+    assert guard.join(5)
+    assert guard.might_exist(OLD_ID) == (True, "bloom")
+
+
+class DownForScans(CountingStore):
+    scans = 0
+
+    def all_records(self):
+        self.scans += 1
+        raise StoreError("Airtable unavailable")
+
+
+def test_failed_rebuild_is_not_retried_on_every_request():
+    store = DownForScans()
+    backend = TicketBackend(store, tracer=Tracer(), registry=Registry(), status_cache=False)
+    for _ in range(5):
+        assert backend.handle({"action": "status", "ticketId": OLD_ID})["status"] == "not_found"
+    assert store.scans == 1 and store.finds == 1  # let through while there is no filter, then negative
+    assert backend.metrics.airtable_calls.labels("scan").value == 1
+    assert backend.ticket_ids.failures == 1
@@ -0,0 +1,141 @@
+import http.client
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.chat import ChatAgent, FakeChatModel, OpenAIChatModel, Tool, ToolCall, serve, ticket_tool
+from infinity_pixel.metrics import Registry
+from infinity_pixel.outbound import OutboundClient
+from infinity_pixel.store import InMemoryTicketStore
+from infinity_pixel.tracing import Tracer
+
+TICKET = {"Ticket ID": "TCK-1764314974531-001", "Subject": "Login", "Status": "open"}
+
+
+def make_agent(model, **kwargs):
+    backend = TicketBackend(InMemoryTicketStore([TICKET]), tracer=Tracer(), registry=Registry(),
+                            search_index=False, duplicates=False, customers=False)
+    return ChatAgent(model, [ticket_tool(backend)], tracer=Tracer(), registry=Registry(), **kwargs)
+
+
+def test_tokens_stream_before_the_answer_is_complete():
+    agent = make_agent(FakeChatModel(first_token_s=0.05, token_s=0.01))
+    start = time.perf_counter()
+    arrivals = [(event, time.perf_counter() - start) for event in agent.run("s1", "What services do you offer?")]
+    tokens = [(e, t) for e, t in arrivals if e.type == "token"]
+    done, done_at = arrivals[-1]
+    assert done.type == "done" and done.data["output"] == "".join(e.data["text"] for e, _ in tokens)
+    assert tokens[0][1] < done_at / 2 and done.data["ttftMs"] < done.data["totalMs"] / 2
+    assert agent.memory.get("s1")[-1] == {"role": "assistant", "content": done.data["output"]}
+    assert agent.ttft.labels().count == 1
+
+
+def test_ticket_tool_call_emits_interim_status_first():
+    agent = make_agent(FakeChatModel())
+    events = list(agent.run("s1", "What is the status of TCK-1764314974531-001?"))
+    assert events[0].type == "status" and events[0].data == {"message": "Looking up your ticket…",
+                                                             "tool": "ManageTickets"}
+    assert "TCK-1764314974531-001 is currently open" in events[-1].data["output"]
+    assert agent.tool_calls.labels("ManageTickets").value == 1
+    schema = agent.tools["ManageTickets"].parameters
+    assert {"search", "list"} <= set(schema["properties"]["action"]["enum"])
+    assert {"query", "status", "cursor"} <= set(schema["properties"])
+
+    slow = Tool("ManageTickets", "slow", {}, lambda args, session_id: time.sleep(0.25) or {"messageForUser": "ok"},
+                lambda args: "Looking up your ticket…")
+    agent = ChatAgent(FakeChatModel(), [slow], interim_every_s=0.1, tracer=Tracer(), registry=Registry())
+    statuses = [e for e in agent.run("s2", "Status of TCK-1764314974531-001") if e.type == "status"]
+    assert len(statuses) >= 3 and statuses[-1].data["stillWorking"]
+
+
+def read_sse(port, payload, accept="text/event-stream"):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("POST", "/chat", json.dumps(payload), {"Accept": accept, "Content-Type": "application/json"})
+    response = conn.getresponse()
+    start = time.perf_counter()
+    events = []
+    if accept != "text/event-stream":
+        return response.getheader("Content-Type"), json.loads(response.read())
+    name = None
+    for line in response:
+        line = line.decode().rstrip("\n")
+        if line.startswith("event: "):
+            name = line[7:]
+        elif line.startswith("data: "):
+            events.append((name, json.loads(line[6:]), time.perf_counter() - start))
+    return response.getheader("Content-Type"), events
+
+
+def test_gateway_relays_server_sent_events():
+    agent = make_agent(FakeChatModel(first_token_s=0.02, token_s=0.01))
+    server = serve(agent, port=0)
+    try:
+        port = server.server_address[1]
+        content_type, events = read_sse(port, {"sessionId": "s1", "chatInput": "Close TCK-1764314974531-001"})
+        assert content_type == "text/event-stream"
+        assert [e[0] for e in events[:2]] == ["status", "token"] and events[-1][0] == "done"
+        assert events[1][2] < events[-1][2]
+        assert "closed ticket TCK-1764314974531-001" in events[-1][1]["output"]
+
+        content_type, body = read_sse(port, {"sessionId": "s2", "chatInput": "hi"}, accept="application/json")
+        assert content_type == "application/json" and body["output"].startswith("Quantum-Ops offers")
+
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        conn.request("POST", "/chat", "[]", {"Content-Type": "application/json"})
+        assert conn.getresponse().status == 400
+    finally:
+        server.shutdown()
+
+
+class FakeOpenAI(BaseHTTPRequestHandler):
+    """Streams a tool call (split across chunks) on the first turn and text after the tool result"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.bodies.append(body)
+        if body["messages"][-1]["role"] == "tool":
+            deltas = [{"content": "Ticket "}, {"content": "is open."}]
+        else:
+            deltas = [{"tool_calls": [{"index": 0, "id": "call_1", "function": {"name": "ManageTickets",
+                                                                                "arguments": '{"action": "sta'}}]},
+                      {"tool_calls": [{"index": 0, "function": {"arguments": 'tus", "ticketId": "TCK-1"}'}}]}]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for delta in deltas + ["[DONE]"]:
+            data = "[DONE]" if delta == "[DONE]" else json.dumps({"choices": [{"index": 0, "delta": delta}]})
+            chunk = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_openai_model_parses_streamed_tokens_and_tool_calls():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAI)
+    server.bodies = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        model = OpenAIChatModel("sk-test", url=f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions",
+                                client=OutboundClient(registry=Registry()))
+        calls = []
+        tool = Tool("ManageTickets", "tickets", {"type": "object"},
+                    lambda args, session_id: calls.append(args) or {"messageForUser": "Ticket TCK-1 is open."})
+        assert list(model.stream([{"role": "user", "content": "status?"}], [tool])) == [
+            ToolCall("call_1", "ManageTickets", {"action": "status", "ticketId": "TCK-1"})]
+        assert server.bodies[0]["stream"] and server.bodies[0]["tools"][0]["function"]["name"] == "ManageTickets"
+
+        agent = ChatAgent(model, [tool], tracer=Tracer(), registry=Registry())
+        events = list(agent.run("s1", "status of TCK-1?"))
+        assert [e.type for e in events] == ["status", "token", "token", "done"]
+        assert events[-1].data["output"] == "Ticket is open." and calls == [{"action": "status", "ticketId": "TCK-1"}]
+        assert server.bodies[-1]["messages"][-1] == {"role": "tool", "tool_call_id": "call_1",
+                                                     "content": json.dumps({"messageForUser": "Ticket TCK-1 is open."})}
+    finally:
+        server.shutdown()
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.combine import WriteCombiner
+from infinity_pixel.metrics import Registry
+from infinity_pixel.sharding import ShardedTicketStore
+from infinity_pixel.store import InMemoryTicketStore, VersionConflict
+from infinity_pixel.tracing import Tracer
+
+TICKET = {"Ticket ID": "TCK-1764314974531-001", "Subject": "Login", "Status": "open",
+          "Conversation Log": "[2025-11-28T07:29:34.531Z] Initial: Cannot log in"}
+
+
+class SlowReadStore(InMemoryTicketStore):
+    """Widens the read-modify-write window so concurrent updates really interleave"""
+
+    def find(self, ticket_id):
+        record = super().find(ticket_id)
+        time.sleep(0.001)
+        return record
+
+
+def test_compare_and_swap():
+    store = InMemoryTicketStore([TICKET])
+    record = store.find(TICKET["Ticket ID"])
+    version = store.version(record)
+    assert store.compare_and_swap(record["id"], version, {"Status": "in_progress"})["fields"]["Status"] == "in_progress"
+    with pytest.raises(VersionConflict) as conflict:
+        store.compare_and_swap(record["id"], version, {"Status": "closed"})
+    assert conflict.value.status == 409 and conflict.value.current["fields"]["Status"] == "in_progress"
+    assert store.compare_and_swap("recUnknown", 1, {}) is None
+
+    sharded = ShardedTicketStore({"a": InMemoryTicketStore(), "b": InMemoryTicketStore()})
+    created = sharded.create(TICKET)
+    assert sharded.compare_and_swap(created["id"], sharded.version(created), {"Status": "closed"})
+    with pytest.raises(VersionConflict):
+        sharded.compare_and_swap(created["id"], sharded.version(created), {"Status": "open"})
+
+
+@pytest.mark.parametrize("combiner", [None, False])
+def test_concurrent_updates_are_all_kept(combiner):
+    store = SlowReadStore([TICKET])
+    backend = TicketBackend(store, tracer=Tracer(), registry=Registry(), status_cache=False, ticket_ids=False,
+                            combiner=combiner, write_retries=50)
+    responses = []
+
+    def writer(n):
+        responses.append(backend.handle({"action": "update", "ticketId": TICKET["Ticket ID"],
+                                         "description": f"note {n}"}))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(100)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(r["action"] == "update" and r["status"] == "open" for r in responses)
+    log = store.find(TICKET["Ticket ID"])["fields"]["Conversation Log"]
+    assert all(f"User update: note {n}\n" in log + "\n" for n in range(100))
+    assert log.count("User update:") == 100
+    if combiner is None:
+        assert backend.combiner.items == 100 and backend.combiner.batches < 100
+    else:
+        assert backend.metrics.write_conflicts.labels("update").value > 0
+
+
+def test_combiner_shares_writes_and_errors():
+    combiner = WriteCombiner()
+    release = threading.Event()
+    writes = []
+
+    def write(items):
+        release.wait()
+        writes.append(list(items))
+        if "boom" in items:
+            raise ValueError("boom")
+        return len(items)
+
+    results = {}
+
+    def submit(item):
+        try:
+            results[item] = combiner.submit("rec1", item, write)
+        except ValueError as exc:
+            results[item] = exc
+
+    first = threading.Thread(target=submit, args=("a",))
+    first.start()
+    while not combiner._keys.get("rec1") or combiner._keys["rec1"][0] is not None:
+        time.sleep(0.001)  # "a" is being written; the next arrivals share one batch
+    rest = [threading.Thread(target=submit, args=(item,)) for item in ("b", "c", "boom")]
+    for t in rest:
+        t.start()
+    while len(combiner._keys["rec1"][0].items if combiner._keys["rec1"][0] else ()) < 3:
+        time.sleep(0.001)
+    release.set()
+    for t in [first] + rest:
+        t.join()
+
+    assert writes[0] == ["a"] and sorted(writes[1]) == ["b", "boom", "c"]
+    assert results["a"] == 1 and all(isinstance(results[i], ValueError) for i in ("b", "c", "boom"))
+    assert combiner._keys == {}
@@ -0,0 +1,131 @@
+import threading
+import time
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.cache import TTLCache
+from infinity_pixel.idempotency import IdempotencyCache, idempotency_key
+from infinity_pixel.metrics import Registry
+from infinity_pixel.notifications import RecordingNotifier
+from infinity_pixel.store import InMemoryTicketStore, VersionConflict
+from infinity_pixel.tracing import Tracer
+
+CREATE = {"action": "create", "name": "Ada", "email": "ada@example.com",
+          "subject": "Login", "description": "Cannot log in"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_backend(store=None, **kwargs):
+    slack = RecordingNotifier("Send a message")
+    backend = TicketBackend(store or InMemoryTicketStore(), notifiers=[slack], tracer=Tracer(),
+                            registry=Registry(), **kwargs)
+    return backend, slack
+
+
+def test_ttl_cache_expiry_and_lru():
+    clock = Clock()
+    cache = TTLCache(max_entries=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert "b" not in cache and cache.get("a") == 1
+    clock.now = 11
+    assert cache.get("a") is None and cache.get("c") is None
+    assert cache.hits == 2 and cache.misses == 2
+
+
+def test_retried_create_returns_stored_response():
+    store = InMemoryTicketStore()
+    backend, slack = make_backend(store, duplicates=False)
+    first = backend.handle(CREATE, session_id="s1")
+    retry = backend.handle({**CREATE, "action": " CREATE "}, session_id="s1")
+    assert retry == first
+    assert len(store.records) == 1 and len(slack.sent) == 1
+    assert backend.metrics.requests.labels("create", "duplicate").value == 1
+
+    # A different session, or different content, is a new request
+    other = backend.handle(CREATE, session_id="s2")
+    assert other["ticketId"] != first["ticketId"] and len(store.records) == 2
+    assert idempotency_key({"a": 1}, "s1") != idempotency_key({"a": 1}, "s2")
+
+
+def test_status_is_never_replayed():
+    backend, _ = make_backend()
+    ticket_id = backend.handle(CREATE, session_id="s1")["ticketId"]
+    assert backend.handle({"action": "status", "ticketId": ticket_id}, "s1")["status"] == "open"
+    backend.handle({"action": "close", "ticketId": ticket_id}, "s1")
+    assert backend.handle({"action": "status", "ticketId": ticket_id}, "s1")["status"] == "closed"
+
+
+class SlowStore(InMemoryTicketStore):
+    def create(self, fields):
+        time.sleep(0.05)
+        return super().create(fields)
+
+
+def test_concurrent_retries_are_coalesced():
+    store = SlowStore()
+    backend, slack = make_backend(store)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(backend.handle(CREATE, "s1"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(store.records) == 1 and len(slack.sent) == 1
+    assert len({r["ticketId"] for r in results}) == 1
+
+
+def test_failed_attempt_is_not_cached():
+    cache = IdempotencyCache()
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise TimeoutError("Airtable timed out")
+        return {"ticketId": "TCK-1"}
+
+    try:
+        cache.run("k", flaky)
+    except TimeoutError:
+        pass
+    assert cache.run("k", flaky) == ({"ticketId": "TCK-1"}, False)
+    assert cache.run("k", flaky) == ({"ticketId": "TCK-1"}, True)
+    assert len(calls) == 2
+
+
+def test_empty_cache_passed_in_is_used():
+    shared = TTLCache(max_entries=10, ttl=60)
+    cache = IdempotencyCache(cache=shared)
+    assert cache.cache is shared
+    cache.run("k", lambda: {"ticketId": "TCK-1"})
+    assert shared.get("k") == {"ticketId": "TCK-1"}
+
+
+class ContendedStore(InMemoryTicketStore):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.swaps = 0
+
+    def compare_and_swap(self, record_id, version, fields):
+        self.swaps += 1
+        raise VersionConflict(record_id)
+
+
+def test_conflict_response_is_not_cached():
+    store = ContendedStore()
+    backend, _ = make_backend(store, combiner=False, write_retries=0)
+    created = backend.handle(CREATE)
+    update = {"action": "update", "ticketId": created["ticketId"], "description": "More detail"}
+    assert backend.handle(update)["status"] == "conflict"
+    assert backend.handle(update)["status"] == "conflict"
+    assert store.swaps == 2
+    assert backend.metrics.requests.labels("update", "duplicate").value == 0
@@ -0,0 +1,65 @@
+import pytest
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.listing import CustomerIndex, decode_cursor, encode_cursor
+from infinity_pixel.metrics import Registry
+from infinity_pixel.store import InMemoryTicketStore
+from infinity_pixel.tickets import format_timestamp
+from infinity_pixel.tracing import Tracer
+
+BASE_MS = 1764314974531
+
+
+def ticket(i, email="ada@example.com", status="open", updated_ms=None):
+    return {"Ticket ID": f"TCK-{BASE_MS + i}-{i % 1000:03d}", "Customer Email": email,
+            "Subject": f"Issue {i}", "Status": status, "Priority": "medium",
+            "Updated At": format_timestamp(BASE_MS + i * 1000 if updated_ms is None else updated_ms)}
+
+
+def test_pages_cover_every_ticket_newest_first():
+    statuses = ["open", "in_progress", "closed"]
+    index = CustomerIndex.from_records(
+        [ticket(i, status=statuses[i % 3]) for i in range(2500)] + [ticket(5000, email="bob@example.com")])
+    seen, cursor = [], None
+    while True:
+        page, cursor = index.page("Ada@Example.com", limit=100, cursor=cursor)
+        seen.extend(t["ticketId"] for t in page)
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 2500
+    assert seen == [ticket(i)["Ticket ID"] for i in reversed(range(2500))]
+
+    open_page, cursor = index.page("ada@example.com", status="open", limit=5)
+    assert [t["status"] for t in open_page] == ["open"] * 5 and cursor
+    assert index.page("carol@example.com") == ([], None)
+
+    # An update moves the ticket to the front of every list it is in, without repeats
+    index.upsert(ticket(0, status="closed", updated_ms=BASE_MS + 10_000_000))
+    first, _ = index.page("ada@example.com", status="closed", limit=1)
+    assert first[0]["ticketId"] == ticket(0)["Ticket ID"]
+    assert ticket(0)["Ticket ID"] not in [t["ticketId"] for t in index.page("ada@example.com", "open", 2500)[0]]
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    key = (-BASE_MS, "TCK-1764314974531-000")
+    assert decode_cursor(encode_cursor(key)) == key
+    for bad in ("not-a-cursor", encode_cursor(key)[:-3], "W10"):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_list_action():
+    store = InMemoryTicketStore([ticket(i) for i in range(15)])
+    backend = TicketBackend(store, tracer=Tracer(), registry=Registry())
+    first = backend.handle({"action": "list", "email": "ada@example.com", "limit": 10})
+    assert first["status"] == "ok" and len(first["tickets"]) == 10 and first["nextCursor"]
+    second = backend.handle({"action": "list", "email": "ada@example.com", "cursor": first["nextCursor"]})
+    assert len(second["tickets"]) == 5 and second["nextCursor"] == ""
+
+    created = backend.handle({"action": "create", "name": "Ada", "email": "ada@example.com",
+                              "subject": "Dark mode", "description": "Please add a dark theme"})
+    newest = backend.handle({"action": "list", "email": "ada@example.com", "status": "open", "limit": 1})
+    assert newest["tickets"][0]["ticketId"] == created["ticketId"]
+
+    assert backend.handle({"action": "list", "email": "ada@example.com", "cursor": "x"})["status"] == "not_found"
+    assert "email" in backend.handle({"action": "list"})["messageForUser"]
@@ -0,0 +1,137 @@
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.metrics import HistogramValue, Registry, serve
+from infinity_pixel.notifications import RecordingNotifier
+from infinity_pixel.store import InMemoryTicketStore, StoreError
+from infinity_pixel.tickets import DAY_MS, now_ms
+from infinity_pixel.tracing import Tracer
+
+CREATE = {"action": "create", "name": "Ada", "email": "ada@example.com",
+          "subject": "Login", "description": "Cannot log in", "priority": "high"}
+
+
+def test_counters_are_exact_across_threads():
+    registry = Registry()
+    counter = registry.counter("hits_total", "Hits", ["kind"])
+
+    def work():
+        child = counter.labels("a")
+        for _ in range(10_000):
+            child.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counter.labels("a").value == 80_000
+
+
+def test_exited_threads_fold_into_the_base_cell():
+    registry = Registry()
+    counter = registry.counter("hits_total", "Hits").labels()
+    hist = registry.histogram("h_ms", "h").labels()
+
+    def work():
+        counter.inc()
+        hist.observe(5.0)
+
+    for _ in range(1000):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    assert len(counter._cells) == len(hist._cells) == 0
+    assert counter.value == 1000 and hist.count == 1000
+    assert abs(hist.quantile(0.5) - 5.0) < 0.1
+
+
+def test_histogram_quantiles_within_bucket_error():
+    hist = HistogramValue(unit=0.001)
+    for ms in range(1, 10_001):
+        hist.observe(float(ms))
+    qs = hist.quantiles((0.5, 0.99))
+    assert abs(qs[0.5] - 5000) / 5000 < 0.02
+    assert abs(qs[0.99] - 9900) / 9900 < 0.02
+    for x in (0, 1, 127, 128, 1000, 123_456_789):
+        low, high = hist.bucket_bounds(hist.bucket_index(x))
+        assert low <= x <= high
+
+
+class ThrottledStore(InMemoryTicketStore):
+    def find(self, ticket_id):
+        raise StoreError("Airtable GET failed: HTTP 429", 429)
+
+
+def test_backend_metrics_and_endpoint():
+    registry = Registry()
+    store = InMemoryTicketStore()
+    backend = TicketBackend(store, notifiers=[RecordingNotifier("Send a message")],
+                            tracer=Tracer(), registry=registry, status_cache=False, ticket_ids=False,
+                            clock=lambda: now_ms() - 2 * DAY_MS)
+    created = backend.handle(CREATE)
+    backend.clock = now_ms
+    backend.handle({"action": "status", "ticketId": created["ticketId"]})
+    backend.handle({"action": "status", "ticketId": "TCK-none"})
+    throttled = TicketBackend(ThrottledStore(), tracer=Tracer(), registry=registry, ticket_ids=False)
+    assert throttled.handle({"action": "status", "ticketId": "TCK-1"})["status"] == "unavailable"
+
+    m = backend.metrics
+    assert m.requests.labels("create", "ok").value == 1
+    assert m.requests.labels("status", "not_found").value == 1
+    assert m.requests.labels("status", "degraded").value == 1
+    assert m.airtable_calls.labels("search").value == 3
+    assert m.airtable_throttled.labels("search").value == 1
+    assert m.sla_breaches.labels("status").value == 1  # high priority, created two days ago
+    assert m.notifications.labels("Send a message", "ok").value == 1
+    assert m.notification_queue.labels("Send a message").value == 0
+
+    server = serve(registry, port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            text = response.read().decode()
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert "# TYPE ticket_request_duration_ms summary" in text
+    assert 'ticket_requests_total{action="create",outcome="ok"} 1' in text
+    assert 'ticket_request_duration_ms{action="status",quantile="0.99"}' in text
+    assert 'airtable_throttled_total{operation="search"} 1' in text
+
+
+def test_hot_path_overhead_is_small():
+    registry = Registry()
+    counter = registry.counter("c_total", "c").labels()
+    hist = registry.histogram("h_ms", "h").labels()
+    n = 100_000
+    start = time.perf_counter()
+    for i in range(n):
+        counter.inc()
+        hist.observe(i % 500 + 0.25)
+    per_op_us = (time.perf_counter() - start) / n * 1e6
+    assert per_op_us < 20  # about 2 µs for both calls on a laptop
+
+
+def test_labelled_view_adds_constant_labels():
+    registry = Registry()
+    acme = registry.labelled(tenant="acme")
+    acme.counter("hits_total", "Hits", ["kind"]).labels("a").inc()
+    acme.gauge("depth", "Depth", fn=lambda: 7)
+    assert 'hits_total{tenant="acme",kind="a"} 1' in registry.render()
+    assert 'depth{tenant="acme"} 7' in registry.render()
+    acme.close()
+    assert 'depth{tenant="acme"} 0' in registry.render()
+
+
+def test_reregistering_with_other_labels_fails_at_registration():
+    registry = Registry()
+    registry.counter("hits_total", "Hits", ["kind"])
+    assert registry.counter("hits_total", "Hits", ["kind"]) is registry.get("hits_total")
+    with pytest.raises(ValueError, match="already registered with labels"):
+        registry.labelled(tenant="acme").counter("hits_total", "Hits", ["kind"])
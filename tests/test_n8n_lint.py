@@ -0,0 +1,83 @@
+import os
+import time
+
+from infinity_pixel.n8n import Workflow, load_workflow, load_workflows
+from infinity_pixel.n8n.lint import analyze, estimate_actions, main
+
+WORKFLOWS = os.path.join(os.path.dirname(__file__), "..", "workflows")
+TICKET_MANAGER = os.path.join(WORKFLOWS, "Ticket Manager (Airtable).json")
+
+
+def node(name, type_, y=0, **params):
+    return {"name": name, "type": f"n8n-nodes-base.{type_}", "position": [0, y], "parameters": params}
+
+
+def link(*targets):
+    return {"main": [[{"node": t, "type": "main", "index": 0} for t in targets]]}
+
+
+def test_execution_order_follows_canvas_position():
+    wf = Workflow.from_dict({
+        "nodes": [
+            node("Webhook", "webhook", responseMode="responseNode"),
+            node("Save", "airtable", operation="create"),
+            node("Notify", "slack", y=-100),
+            node("Respond", "respondToWebhook", y=100),
+        ],
+        "connections": {"Webhook": link("Save"), "Save": link("Respond", "Notify")},
+    })
+    assert wf.execution_order("Webhook") == ["Webhook", "Save", "Notify", "Respond"]
+    [est] = estimate_actions(wf, costs={"airtable": 100, "slack": 50})
+    assert est.response_ms == 151
+    assert est.response_calls == ["Save", "Notify"]
+    findings = analyze([wf]).findings
+    assert [f.rule for f in findings] == ["blocking-notification"]
+
+
+def test_ticket_manager_findings():
+    report = analyze([load_workflow(TICKET_MANAGER)])
+    rules = {f.rule: f for f in report.findings}
+    assert rules["redundant-lookup"].nodes == [
+        "Airtable - Find Ticket (Close)",
+        "Airtable - Find Ticket (Status)",
+        "Airtable - Find Ticket (Update)",
+    ]
+    blocking = {n for f in report.findings if f.rule == "blocking-notification" for n in f.nodes}
+    assert "Send a message" in blocking
+    assert "Send a message2" not in blocking
+    actions = {e.action: e for e in report.estimates}
+    assert set(actions) == {"create", "update", "status", "close"}
+    assert actions["status"].response_calls == ["Airtable - Find Ticket (Status)"]
+    assert actions["close"].deferred_calls
+
+
+def test_all_workflows_fast_and_flag_copies():
+    start = time.perf_counter()
+    report = analyze(load_workflows(WORKFLOWS))
+    assert time.perf_counter() - start < 1.0
+    rules = {f.rule for f in report.findings}
+    assert {"duplicated-workflow", "polling-trigger", "duplicated-subgraph"} <= rules
+
+
+def test_cli_fail_on(capsys):
+    assert main([TICKET_MANAGER, "--fail-on", "warning"]) == 1
+    assert main([TICKET_MANAGER, "--format", "json", "--fail-on", "never"]) == 0
+    assert '"redundant-lookup"' in capsys.readouterr().out
+
+
+def test_baseline_only_new_findings_fail(tmp_path):
+    baseline = str(tmp_path / "baseline.json")
+    assert main([TICKET_MANAGER, "--fail-on", "error"]) == 1  # blocking notifications are errors
+    assert main([TICKET_MANAGER, "--baseline", baseline, "--write-baseline"]) == 0
+    assert main([TICKET_MANAGER, "--baseline", baseline, "--fail-on", "warning"]) == 0
+    assert main([WORKFLOWS, "--baseline", baseline, "--fail-on", "warning"]) == 1
+
+
+def test_polling_every_zero_minutes():
+    wf = Workflow.from_dict({
+        "nodes": [node("Drive", "googleDriveTrigger", pollTimes={"item": [{"mode": "everyX", "value": 0,
+                                                                           "unit": "minutes"}]})],
+        "connections": {},
+    })
+    [finding] = [f for f in analyze([wf]).findings if f.rule == "polling-trigger"]
+    assert "unbounded" in finding.message
@@ -0,0 +1,62 @@
+import os
+
+from infinity_pixel.n8n import load_workflow
+from infinity_pixel.n8n.expressions import Context, evaluate
+from infinity_pixel.n8n.fakes import default_services
+from infinity_pixel.n8n.simulator import SAMPLE_PAYLOADS, Simulator, main, summarize
+
+WORKFLOWS = os.path.join(os.path.dirname(__file__), "..", "workflows")
+TICKET_MANAGER = os.path.join(WORKFLOWS, "Ticket Manager (Airtable).json")
+
+
+def constant_services():
+    return default_services(0, airtable=100, slack=200, http=300, email=400)
+
+
+def test_expressions():
+    ctx = Context({"body": {"action": " Close "}}, {"Prep": [{"json": {"ticketId": "TCK-1"}}]})
+    assert evaluate("={{ ($json.body.action || '').trim().toLowerCase() }}", ctx) == "close"
+    assert evaluate("=id={{ $('Prep').item.json.ticketId }}", ctx) == "id=TCK-1"
+    assert evaluate("={{ $json.missing?.x ?? 'n/a' }}", ctx) == "n/a"
+    assert evaluate("={{ { ok: !$json.body.none, n: 2 } }}", ctx) == {"ok": True, "n": 2}
+
+
+def test_ticket_lifecycle_through_webhook():
+    sim = Simulator(load_workflow(TICKET_MANAGER), services=constant_services())
+    create, status, update, close, missing = sim.replay(SAMPLE_PAYLOADS, "Webhook")
+
+    ticket_id = create.response["ticketId"]
+    assert ticket_id.startswith("TCK-") and create.response["status"] == "open"
+    assert status.response["ticketId"] == ticket_id
+    assert update.response["action"] == "update"
+    assert close.response["action"] == "close"
+    [record] = sim.services["airtable"].records.values()
+    assert record["fields"]["Status"] == "closed"
+    assert "Still failing after reset" in record["fields"]["Conversation Log"]
+    assert sim.services["slack"].messages
+
+    # Find Ticket has no "Always Output Data": an unknown ID never reaches a response
+    assert missing.response is None and missing.warnings
+
+
+def test_timing_follows_execution_order():
+    sim = Simulator(load_workflow(TICKET_MANAGER), services=constant_services(),
+                    node_costs={"code": 0, "set": 0, "switch": 0, "if": 0, "respondToWebhook": 0})
+    create = sim.run(SAMPLE_PAYLOADS[0], "Webhook")
+    names = [s.node for s in create.spans]
+    assert names.index("Respond to Webhook") > names.index("Airtable - Create Ticket")
+    # Airtable create, Slack and the customer notification precede the response
+    assert create.response_ms == 100 + 200 + 300
+    assert create.total_ms >= create.response_ms
+    assert all(a.end_ms <= b.start_ms for a, b in zip(create.spans, create.spans[1:]))
+
+
+def test_compare_entry_points(capsys):
+    sim = Simulator(load_workflow(TICKET_MANAGER), services=constant_services())
+    entries = sim.entry_points()
+    assert "Webhook" in entries and len(entries) == 2
+    executions = [ex for entry in entries for ex in sim.replay(SAMPLE_PAYLOADS[:1], entry)]
+    rows = summarize(executions)
+    assert {r["entry"] for r in rows} == set(entries)
+    assert main([TICKET_MANAGER, "--compare", "--runs", "2"]) == 0
+    assert "When Executed by Another Workflow" in capsys.readouterr().out
@@ -0,0 +1,190 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from infinity_pixel.metrics import Registry
+from infinity_pixel.notifications import CustomerNotifier
+from infinity_pixel.outbound import CircuitOpenError, OutboundClient, OutboundError, PoolTimeout
+from infinity_pixel.store import AirtableTicketStore, StoreError
+
+
+class FakeServer(ThreadingHTTPServer):
+    """Keep-alive HTTP/1.1 server; ``routes`` maps a path to ``(status, body, delay_s)``"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = []
+        self.routes = {}
+        self.drop_idle = False
+        self.hang_up = 0  # requests to read and then close the connection on without answering
+        super().__init__(("127.0.0.1", 0), FakeHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def get_request(self):
+        self.connections += 1
+        return super().get_request()
+
+    def url(self, path):
+        return f"http://localhost:{self.server_address[1]}{path}"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        self.server.requests.append((self.command, self.path, body))
+        if self.server.hang_up:
+            self.server.hang_up -= 1
+            self.close_connection = True
+            return
+        status, reply, delay = self.server.routes.get(self.path.split("?")[0], (200, {"ok": True}, 0))
+        time.sleep(delay)
+        data = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.close_connection = self.server.drop_idle
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FakeServer()
+    yield server
+    server.stop()
+
+
+def counting_resolver(calls):
+    def resolve(host, port, *args):
+        calls.append(host)
+        return socket.getaddrinfo("127.0.0.1", port, *args)
+    return resolve
+
+
+def test_keep_alive_reuses_one_connection_and_caches_dns(server):
+    lookups = []
+    client = OutboundClient(registry=Registry(), resolver=counting_resolver(lookups))
+    for n in range(20):
+        assert client.request("POST", server.url("/hook"), {"n": n}).raise_for_status().json() == {"ok": True}
+    assert server.connections == 1 and lookups == ["localhost"]
+    stats = client.stats()[f"localhost:{server.server_address[1]}"]
+    assert stats["requests"] == 20 and stats["connections"] == 1 and stats["reused"] == 19
+    assert stats["idle"] == 1 and stats["breaker"] == "closed"
+    assert server.requests[-1] == ("POST", "/hook", {"n": 19})
+
+
+def test_concurrent_requests_are_bounded_per_host(server):
+    server.routes["/slow"] = (200, {}, 0.05)
+    client = OutboundClient(max_per_host=3, registry=Registry())
+    threads = [threading.Thread(target=client.request, args=("GET", server.url("/slow"))) for _ in range(9)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert server.connections == 3 and client.stats()[f"localhost:{server.server_address[1]}"]["idle"] == 3
+
+
+def test_server_closed_idle_connection_is_replaced(server):
+    server.drop_idle = True  # closes each connection after answering, without saying so
+    client = OutboundClient(registry=Registry())
+    for path in ("/a", "/b", "/c"):
+        assert client.request("PUT", server.url(path), {}).status == 200
+    assert [r[1] for r in server.requests] == ["/a", "/b", "/c"] and server.connections == 3
+
+
+def test_only_unsent_or_idempotent_requests_are_retried(server):
+    client = OutboundClient(registry=Registry())
+    client.request("GET", server.url("/warm"))
+    server.hang_up = 1
+    assert client.request("PUT", server.url("/put"), {}).status == 200
+    assert [r[1] for r in server.requests].count("/put") == 2
+
+    server.hang_up = 1
+    with pytest.raises(OutboundError):
+        client.request("POST", server.url("/post"), {})  # may have been applied: not sent again
+    assert [r[1] for r in server.requests].count("/post") == 1
+
+
+def test_waiting_for_a_connection_is_not_a_host_failure(server):
+    server.routes["/slow"] = (200, {}, 0.3)
+    client = OutboundClient(max_per_host=1, breaker_failures=1, registry=Registry())
+    busy = threading.Thread(target=client.request, args=("GET", server.url("/slow")))
+    busy.start()
+    while not server.requests:  # the only connection is now busy
+        time.sleep(0.005)
+    with pytest.raises(PoolTimeout):
+        client.request("GET", server.url("/ok"), timeout=0.05)
+    busy.join()
+    assert client.stats()[f"localhost:{server.server_address[1]}"]["breaker"] == "closed"
+
+
+def test_a_rejected_header_does_not_leak_the_connection(server):
+    client = OutboundClient(max_per_host=1, registry=Registry())
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            client.request("GET", server.url("/ok"), headers={"X-Note": "one\r\ntwo"}, timeout=0.2)
+    assert client.request("GET", server.url("/ok"), timeout=0.2).status == 200
+
+
+def test_timeouts_and_circuit_breaker(server):
+    server.routes["/slow"] = (200, {}, 0.5)
+    server.routes["/down"] = (503, {"error": "down"}, 0)
+    now = [0.0]
+    registry = Registry()
+    client = OutboundClient(timeout=0.1, breaker_failures=3, breaker_reset_s=30, registry=registry,
+                            clock=lambda: now[0])
+    with pytest.raises(OutboundError):
+        client.request("GET", server.url("/slow"))
+    assert client.request("GET", server.url("/down")).status == 503
+    assert client.request("GET", server.url("/down")).status == 503
+
+    seen = len(server.requests)
+    with pytest.raises(CircuitOpenError):
+        client.request("GET", server.url("/ok"))
+    assert len(server.requests) == seen  # failed fast
+    label = f"localhost:{server.server_address[1]}"
+    assert client.stats()[label]["breaker"] == "open"
+    assert registry.get("outbound_requests_total").labels(label, "open").value == 1
+
+    now[0] = 31
+    assert client.request("GET", server.url("/ok")).status == 200
+    assert client.stats()[label]["breaker"] == "closed"
+
+
+def test_store_and_notifier_use_the_client(server):
+    server.routes["/v0/app/tbl"] = (200, {"records": [{"id": "rec1", "fields": {"Ticket ID": "TCK-1"}}]}, 0)
+    server.routes["/v0/app/tbl/recMissing"] = (404, {"error": "NOT_FOUND"}, 0)
+    server.routes["/v0/app/tbl/recBad"] = (422, {"error": "INVALID"}, 0)
+    client = OutboundClient(registry=Registry())
+    store = AirtableTicketStore("key", "app", "tbl", client=client)
+    store.url = server.url("/v0/app/tbl")
+
+    assert store.find("TCK-1")["id"] == "rec1"
+    assert store.update("recMissing", {"Status": "closed"}) is None
+    with pytest.raises(StoreError) as error:
+        store.update("recBad", {"Status": "closed"})
+    assert error.value.status == 422
+
+    CustomerNotifier(server.url("/notify-customer"), client=client).notify(
+        "create", {}, {"ticketId": "TCK-1", "status": "open"})
+    assert server.requests[-1][2]["ticketId"] == "TCK-1"
+    assert server.connections == 1  # Airtable and the webhook share the pooled connection to this host
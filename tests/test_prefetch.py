@@ -0,0 +1,85 @@
+import time
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.chat import ChatAgent, FakeChatModel, knowledge_tool, ticket_tool
+from infinity_pixel.metrics import Registry
+from infinity_pixel.prefetch import Prefetcher, RetrievalSpeculation
+from infinity_pixel.store import InMemoryTicketStore
+from infinity_pixel.tracing import Tracer
+
+TICKET = {"Ticket ID": "TCK-1764314974531-001", "Subject": "Login", "Status": "open"}
+
+
+class SlowStore(InMemoryTicketStore):
+    def __init__(self, records=(), delay_s=0.15):
+        super().__init__(records)
+        self.delay_s = delay_s
+        self.finds = 0
+
+    def find(self, ticket_id):
+        self.finds += 1
+        time.sleep(self.delay_s)
+        return super().find(ticket_id)
+
+
+def make_agent(prefetch, store=None):
+    store = store or SlowStore([TICKET])
+    backend = TicketBackend(store, tracer=Tracer(), registry=Registry(), status_cache=False,
+                            search_index=False, duplicates=False, customers=False)
+    queries = []
+
+    def retrieve(query):
+        queries.append(query)
+        time.sleep(0.15)
+        return ["Quantum-Ops offers Cloud Management."]
+
+    registry = Registry()
+    prefetcher = Prefetcher(registry=registry) if prefetch else False
+    agent = ChatAgent(FakeChatModel(first_token_s=0.2), [knowledge_tool(retrieve), ticket_tool(backend)],
+                      tracer=Tracer(), registry=registry, prefetcher=prefetcher)
+    return agent, store, queries
+
+
+def timed_run(agent, text):
+    start = time.perf_counter()
+    events = list(agent.run("s1", text))
+    return events, time.perf_counter() - start
+
+
+def test_prefetch_overlaps_retrieval_and_ticket_lookup_with_the_model():
+    text = "What is the status of TCK-1764314974531-001?"
+    serial, store, _ = make_agent(prefetch=False)
+    events, serial_s = timed_run(serial, text)
+    assert "is currently open" in events[-1].data["output"] and store.finds == 1
+
+    agent, store, queries = make_agent(prefetch=True)
+    events, prefetch_s = timed_run(agent, text)
+    assert [e.data["tool"] for e in events if e.type == "status"] == ["knowledge_base", "ManageTickets"]
+    assert "is currently open" in events[-1].data["output"]
+    assert serial_s - prefetch_s > 0.2  # both 150 ms lookups ran during the model's first step
+    assert store.finds == 1 and queries == [text]
+    stats = agent.prefetcher.stats()
+    assert stats["started"] == 2 and stats["hit"] == 2 and stats["waste"] == 0 and stats["hitRate"] == 1.0
+    assert agent.prefetcher.requests.labels("ManageTickets", "hit").value == 1
+
+
+def test_close_invalidates_the_prefetched_status():
+    agent, store, _ = make_agent(prefetch=True)
+    events = list(agent.run("s1", "Please close TCK-1764314974531-001"))
+    assert "closed ticket TCK-1764314974531-001" in events[-1].data["output"]
+    tools = agent.prefetcher.stats()["tools"]
+    assert tools["ManageTickets"] == {"started": 1, "hit": 0, "waste": 1, "miss": 0}  # a close is not predictable
+
+    turn = agent.prefetcher.start("s2", "Any news?", agent.tools)
+    assert turn.take("ManageTickets", {"action": "status", "ticketId": "TCK-1764314974531-001"}) is None
+    turn.finish()
+    assert agent.prefetcher.stats()["tools"]["ManageTickets"]["miss"] == 1
+    assert tools["knowledge_base"]["hit"] == 1
+
+
+def test_retrieval_speculation_matches_rephrased_queries():
+    speculation = RetrievalSpeculation()
+    [predicted] = speculation.predict("What cloud services do you offer?")
+    assert speculation.accepts(predicted, {"query": "Quantum-Ops cloud services"})
+    assert not speculation.accepts(predicted, {"query": "refund policy"})
+    assert speculation.predict("?") == []
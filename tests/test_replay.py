@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.chat import ChatAgent, ChatModel, FakeChatModel, Tool, ToolCall, ticket_tool
+from infinity_pixel.metrics import Registry
+from infinity_pixel.replay import Anonymizer, Recorder, Replayer, compare, load, save
+from infinity_pixel.store import InMemoryTicketStore
+from infinity_pixel.tracing import Tracer
+
+
+class ScriptedModel(ChatModel):
+    """Opens a ticket for "New ticket: ..." messages, otherwise the fake model"""
+
+    def __init__(self):
+        self.fake = FakeChatModel()
+
+    def stream(self, messages, tools):
+        text = next(m["content"] for m in reversed(messages) if m["role"] == "user")
+        if text.startswith("New ticket") and messages[-1]["role"] == "user":
+            yield "One moment. "
+            yield ToolCall("call_1", "ManageTickets", {
+                "action": "create", "name": "Ada Lovelace", "email": "ada@lovelace.org", "phone": "+44 20 7946 0958",
+                "subject": "Login", "description": text})
+            return
+        yield from self.fake.stream(messages, tools)
+
+
+def make_agent(model, store=None):
+    backend = TicketBackend(store or InMemoryTicketStore(), tracer=Tracer(), registry=Registry(),
+                            search_index=False, duplicates=False, customers=False)
+    return ChatAgent(model, [ticket_tool(backend)], tracer=Tracer(), registry=Registry(), prefetcher=False)
+
+
+def record(path, sessions=3):
+    recorder = Recorder(make_agent(ScriptedModel()), str(path), Anonymizer(b"key"))
+    for n in range(sessions):
+        events = list(recorder.run(f"session-{n}", f"New ticket: I'm Ada Lovelace (ada@lovelace.org), "
+                                                     f"call me on +44 20 7946 0958. Login fails ({n})"))
+        ticket_id = events[-1].data["output"].split("ticket ")[1].split(" ")[0]
+        list(recorder.run(f"session-{n}", f"What is the status of {ticket_id}?"))
+        list(recorder.run(f"session-{n}", f"Please close {ticket_id}"))
+    recorder.close()
+    return load(str(path))
+
+
+def test_recordings_are_anonymized(tmp_path):
+    turns = record(tmp_path / "sessions.jsonl")
+    raw = (tmp_path / "sessions.jsonl").read_text()
+    assert len(turns) == 9 and not any(s in raw for s in ("Ada", "Lovelace", "lovelace.org", "7946", "session-"))
+    create, status, close = [t for t in turns if t["session"] == turns[0]["session"]]
+    assert [t["turn"] for t in (create, status, close)] == [1, 2, 3]
+    arguments = create["tools"][0]["arguments"]
+    assert arguments["name"].startswith("Customer ") and arguments["name"] in create["input"]
+    assert arguments["email"].endswith("@example.com") and arguments["email"] in create["input"]
+    assert arguments["phone"].startswith("+1-555-") and arguments["phone"] in create["input"]
+    ticket_id = create["tools"][0]["result"]["ticketId"]
+    assert ticket_id in status["input"] and ticket_id in close["output"]  # ticket IDs are kept
+    assert create["steps"][0]["text"] == "One moment. " and create["steps"][0]["toolCalls"][0]["name"] == \
+        "ManageTickets" and len(create["steps"]) == 2
+    assert all(t["totalMs"] >= t["tools"][0]["ms"] for t in turns)
+
+
+def test_names_given_before_the_create_call_are_anonymized(tmp_path):
+    class GreetingModel(ScriptedModel):
+        def stream(self, messages, tools):
+            if messages[-1]["role"] == "user" and messages[-1]["content"].startswith("Hi"):
+                yield "Thanks Ada Lovelace, what can I help with?"
+                return
+            yield from super().stream(messages, tools)
+
+    now = [0.0]
+    path = tmp_path / "sessions.jsonl"
+    recorder = Recorder(make_agent(GreetingModel()), str(path), Anonymizer(b"key"), clock=lambda: now[0], idle_s=60)
+    list(recorder.run("s", "Hi, I'm Ada Lovelace"))
+    list(recorder.run("s", "New ticket: login fails"))
+    recorder.flush(idle_s=60)
+    assert recorder.turns == 0 and path.read_text() == ""  # the session is not idle yet
+    now[0] = 61.0
+    recorder.flush(idle_s=60)
+    greeting, create = load(str(path))
+    assert "Ada" not in path.read_text() and recorder.turns == 2
+    pseudonym = create["tools"][0]["arguments"]["name"]
+    assert pseudonym in greeting["input"] and pseudonym in greeting["output"]
+    list(recorder.run("s", "Ada Lovelace again"))  # the session's names outlive the flush
+    recorder.close()
+    assert "Ada" not in path.read_text() and recorder.turns == 3
+
+
+def test_names_are_only_replaced_in_the_session_that_gave_them():
+    anonymizer = Anonymizer(b"key", max_sessions=2)
+
+    def turn(session, text, name=None):
+        tools = [{"name": "ManageTickets", "arguments": {"name": name}, "result": {}, "ms": 1}] if name else []
+        return anonymizer.turn({"session": session, "input": text, "steps": [], "tools": tools})
+
+    first = turn("a", "I'm Will Smith, Will is fine", "Will Smith")
+    assert "Will Smith" not in first["input"] and first["input"].startswith("I'm Customer ")
+    turn("a", "call me Will", "Will")
+    assert "Will" not in turn("a", "Will Smith here, or just Will")["input"]
+    assert turn("b", "Will this ticket be closed?")["input"] == "Will this ticket be closed?"
+    turn("c", "hello")
+    assert len(anonymizer._sessions) == 2 and "a" not in anonymizer._sessions
+
+
+def test_concurrent_turns_of_one_session_keep_their_own_tool_calls(tmp_path):
+    both_started = threading.Barrier(2)
+
+    class LookupModel(ChatModel):
+        def stream(self, messages, tools):
+            if messages[-1]["role"] == "tool":
+                yield "done"
+                return
+            yield ToolCall("call_1", "Lookup", {"query": messages[-1]["content"]})
+
+    def lookup(arguments, session_id=None):
+        both_started.wait(5)
+        return {"found": arguments["query"]}
+
+    agent = ChatAgent(LookupModel(), [Tool("Lookup", "Look up", {"type": "object"}, lookup)], tracer=Tracer(),
+                      registry=Registry(), prefetcher=False)
+    recorder = Recorder(agent, str(tmp_path / "sessions.jsonl"), Anonymizer(b"key"))
+    threads = [threading.Thread(target=lambda q=q: list(recorder.run("s", q))) for q in ("one", "two")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    recorder.close()
+    turns = load(str(tmp_path / "sessions.jsonl"))
+    assert sorted((t["input"], [e["result"]["found"] for e in t["tools"]]) for t in turns) == \
+        [("one", ["one"]), ("two", ["two"])]
+
+
+def test_replay_maps_new_ticket_ids_and_matches_the_recording(tmp_path):
+    turns = record(tmp_path / "sessions.jsonl")
+    replayed = Replayer(make_agent, speed=0, latency=0).replay(turns)
+    report = compare(turns, replayed, min_ms=50)  # no latencies recorded from a real model
+    assert report.ok and report.turns == 9, report.render()
+    recorded_ids = {t["tools"][0]["result"]["ticketId"] for t in turns}
+    assert {t["tools"][0]["result"]["ticketId"] for t in replayed} == recorded_ids
+    assert [t["output"] for t in replayed] == [t["output"] for t in turns]
+    save(str(tmp_path / "replay.jsonl"), replayed)
+    assert not compare(load(str(tmp_path / "replay.jsonl")), turns, min_ms=50).diffs
+
+    paced = [dict(t, at=n * 0.05) for n, t in enumerate(turns[:3])]
+    start = time.perf_counter()
+    Replayer(make_agent, speed=2, latency=0).replay(paced)
+    assert time.perf_counter() - start >= 0.05
+
+
+def test_regressions_and_response_diffs_are_reported(tmp_path):
+    turns = record(tmp_path / "sessions.jsonl")
+    baseline = Replayer(make_agent, speed=0, latency=0).replay(turns)
+
+    class SlowStore(InMemoryTicketStore):
+        def find(self, ticket_id):
+            time.sleep(0.01)
+            return super().find(ticket_id)
+
+        def create(self, fields):
+            return super().create({**fields, "Subject": fields["Subject"].upper()})
+
+    candidate = Replayer(lambda model: make_agent(model, SlowStore()), speed=0, latency=0).replay(turns)
+    report = compare(baseline, candidate, threshold=0.2, min_ms=2.0)
+    assert [r.metric for r in report.regressions] == ["total", "ttft", "tool ManageTickets"]
+    assert report.regressions[2].candidate_ms >= 10
+    # the answers are the recorded model's, so the changed subject shows in the tool results
+    assert {(d.what, d.turn) for d in report.diffs} == {("tool ManageTickets#0", n) for n in (1, 2, 3)}
+    rendered = report.render()
+    assert rendered.startswith("❌ 9 turns compared: 3 latency regressions") and '"subject": "LOGIN"' in rendered
+    assert json.loads(json.dumps(candidate))  # replays are saved and compared like recordings
@@ -0,0 +1,206 @@
+import threading
+import time
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.metrics import Registry
+from infinity_pixel.notifications import Notifier, RecordingNotifier
+from infinity_pixel.outbound import CircuitBreaker
+from infinity_pixel.resilience import CreateJournal, Dependencies
+from infinity_pixel.store import InMemoryTicketStore, StoreError
+from infinity_pixel.tracing import Tracer
+
+CREATE = {"action": "create", "name": "Ada", "email": "ada@example.com",
+          "subject": "Login", "description": "Cannot log in"}
+
+
+class FaultyStore(InMemoryTicketStore):
+    """``fault`` None, "down" (connection errors), "error" (HTTP 500) or "hang" (every call takes ``hang_s``)"""
+
+    def __init__(self, records=()):
+        super().__init__(records)
+        self.fault = None
+        self.hang_s = 1.0
+        self.calls = 0
+
+    def _inject(self):
+        self.calls += 1
+        if self.fault == "down":
+            raise StoreError("Airtable GET failed: [Errno 111] Connection refused")
+        if self.fault == "error":
+            raise StoreError("Airtable GET failed: HTTP 500", 500)
+        if self.fault == "hang":
+            time.sleep(self.hang_s)
+
+    def find(self, ticket_id):
+        self._inject()
+        return super().find(ticket_id)
+
+    def create(self, fields):
+        self._inject()
+        return super().create(fields)
+
+    def update(self, record_id, fields):
+        self._inject()
+        return super().update(record_id, fields)
+
+
+class HangingNotifier(Notifier):
+    name = "Send a message"
+
+    def notify(self, event, record, response):
+        time.sleep(1.0)
+
+
+def make_backend(store, now, notifiers=(), journal=None, **kwargs):
+    dependencies = Dependencies(timeout_s=0.1, failures=3, reset_s=30, clock=lambda: now[0])
+    return TicketBackend(store, notifiers=notifiers, tracer=Tracer(), registry=Registry(), status_cache=False,
+                         ticket_ids=False, search_index=False, duplicates=False, customers=False,
+                         dependencies=dependencies, journal=journal, **kwargs)
+
+
+def timed(backend, payload):
+    start = time.perf_counter()
+    response = backend.handle(payload)
+    return response, time.perf_counter() - start
+
+
+def test_breaker_half_open_probe():
+    now = [0.0]
+    breaker = CircuitBreaker(failures=2, reset_s=10, clock=lambda: now[0])
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] = 10
+    assert breaker.state == "half_open"
+    assert breaker.allow() and not breaker.allow()  # one probe at a time
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] = 20
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+def test_hanging_airtable_is_bounded_and_status_served_stale():
+    now = [0.0]
+    store = FaultyStore()
+    backend = make_backend(store, now)
+    ticket_id = backend.handle(CREATE)["ticketId"]
+    assert backend.handle({"action": "status", "ticketId": ticket_id})["status"] == "open"
+
+    store.fault = "hang"
+    latencies = []
+    for _ in range(8):
+        response, elapsed = timed(backend, {"action": "status", "ticketId": ticket_id})
+        assert response["status"] == "open" and response["stale"] and response["degraded"]
+        latencies.append(elapsed)
+    assert max(latencies) < 0.5  # one timeout, not the store's 1 s
+    assert max(latencies[3:]) < 0.05  # circuit open after three timeouts: no waiting at all
+    assert store.calls == 3 + 2  # the create and first status, then three abandoned calls
+    assert backend.dependencies.states()["airtable"] == "open"
+    assert backend.metrics.dependency_state.labels("airtable").value == 2
+
+    response = backend.handle({"action": "update", "ticketId": ticket_id, "description": "Still broken"})
+    assert response["status"] == "unavailable" and response["skipUpdate"]
+    unknown = backend.handle({"action": "status", "ticketId": "TCK-1764314974531-999"})
+    assert unknown["status"] == "unavailable"
+    assert backend.metrics.requests.labels("status", "degraded").value == 9
+
+    store.fault = None
+    now[0] = 31  # half-open: the next call probes Airtable and closes the circuit
+    response = backend.handle({"action": "status", "ticketId": ticket_id})
+    assert response["status"] == "open" and "stale" not in response
+    assert backend.dependencies.states()["airtable"] == "closed"
+
+
+def test_creates_are_journaled_and_replayed(tmp_path):
+    now = [0.0]
+    store = FaultyStore()
+    notifier = RecordingNotifier("Send a message")
+    path = str(tmp_path / "journal.jsonl")
+    backend = make_backend(store, now, [notifier], CreateJournal(path))
+    existing = backend.handle(CREATE)["ticketId"]
+
+    store.fault = "error"
+    created = backend.handle({**CREATE, "subject": "Billing", "description": "Charged twice"})
+    ticket_id = created["ticketId"]
+    assert ticket_id.startswith("TCK-") and created["provisional"] and created["status"] == "open"
+    assert backend.metrics.degraded.labels("create", "queued").value == 1
+    status = backend.handle({"action": "status", "ticketId": ticket_id})
+    assert status["provisional"] and "still being filed" in status["messageForUser"]
+    assert backend.handle({"action": "close", "ticketId": ticket_id})["skipUpdate"]
+    assert len(notifier.sent) == 1  # only the ticket filed before the outage
+
+    restarted = CreateJournal(path)  # survives a restart
+    assert [t for t, _ in restarted.pending()] == [ticket_id]
+
+    store.fault = None
+    now[0] = 31
+    backend.handle({"action": "status", "ticketId": existing})  # Airtable answers: replay starts
+    deadline = time.time() + 2
+    while len(backend.journal) and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(backend.journal) == 0 and backend.replay_journal() == 0
+    record = store.find(ticket_id)
+    assert record["fields"]["Subject"] == "Billing"
+    assert [r["fields"]["Ticket ID"] for r in store.all_records()].count(ticket_id) == 1
+    assert notifier.sent[-1][:2] == ("create", ticket_id)
+    assert backend.handle({"action": "status", "ticketId": ticket_id})["status"] == "open"
+    assert len(CreateJournal(path)) == 0
+
+
+def test_timed_out_create_is_not_filed_twice():
+    now = [0.0]
+    store = FaultyStore()
+    store.fault, store.hang_s = "hang", 0.2
+    notifier = RecordingNotifier("Send a message")
+    backend = make_backend(store, now, [notifier])
+    created = backend.handle(CREATE)
+    assert created["provisional"]
+    time.sleep(0.3)  # the abandoned create reached the store after all
+    store.fault = None
+    assert backend.replay_journal() == 1
+    assert len(list(store.all_records())) == 1 and notifier.sent[0][1] == created["ticketId"]
+
+
+def test_hanging_notifier_does_not_slow_tickets():
+    now = [0.0]
+    backend = make_backend(FaultyStore(), now, [HangingNotifier()])
+    latencies = [timed(backend, {**CREATE, "description": f"Cannot log in ({n})"})[1] for n in range(6)]
+    assert max(latencies) < 0.5 and max(latencies[3:]) < 0.05
+    assert backend.dependencies.states() == {"airtable": "closed", "Send a message": "open"}
+    assert backend.metrics.notifications.labels("Send a message", "error").value == 6
+
+
+def test_one_replay_worker_and_honest_message_without_a_journal_file():
+    now = [0.0]
+    store = FaultyStore()
+    backend = make_backend(store, now)
+    existing = backend.handle(CREATE)["ticketId"]
+    store.fault = "error"
+    created = backend.handle({**CREATE, "subject": "Billing", "description": "Charged twice"})
+    assert created["provisional"] and "send your issue again" in created["messageForUser"]
+
+    store.fault = None
+    now[0] = 31
+    replays = []
+    replay = backend.replay_journal
+
+    def slow_replay():
+        replays.append(1)
+        time.sleep(0.2)
+        return replay()
+
+    backend.replay_journal = slow_replay
+    threads = [threading.Thread(target=backend.handle, args=({"action": "status", "ticketId": existing},))
+               for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for t in [t for t in threading.enumerate() if t.name == "journal-replay"]:
+        t.join(5)
+    assert len(replays) == 1 and len(backend.journal) == 0
@@ -0,0 +1,347 @@
+import math
+import random
+import threading
+import time
+
+import pytest
+
+from infinity_pixel.chat import knowledge_tool
+from infinity_pixel.metrics import Registry
+from infinity_pixel.retrieval import Chunk, ContextPacker, split_text
+from infinity_pixel.retrieval.drive import DriveError, FakeDrive
+from infinity_pixel.retrieval.generations import KnowledgeBase, KnowledgeBaseError
+from infinity_pixel.retrieval.ingest import HashingEmbedder, Ingestor, KnowledgeIndex
+from infinity_pixel.retrieval.vectors import VectorStore, VectorStoreError, as_chunks, write_vectors
+
+WORDS = " ".join(f"word{n}" for n in range(600))
+DOC = "\n\n".join(f"Paragraph {n}. " + " ".join(f"p{n}w{m}" for m in range(40)) for n in range(12))
+
+
+def scored(chunks, scores):
+    return [Chunk(c.source, c.text, c.start, c.end, c.index, s) for c, s in zip(chunks, scores)]
+
+
+def test_split_text_tracks_offsets_and_overlap():
+    chunks = split_text(WORDS, "words.md", chunk_size=200, chunk_overlap=50)
+    assert len(chunks) > 10 and all(WORDS[c.start:c.end] == c.text and len(c.text) <= 200 for c in chunks)
+    assert [c.index for c in chunks] == list(range(len(chunks)))
+    overlaps = [a.end - b.start for a, b in zip(chunks, chunks[1:])]
+    assert all(0 < o <= 50 for o in overlaps)
+
+    paragraphs = split_text(DOC, "doc.md")
+    assert all(DOC[c.start:c.end] == c.text and len(c.text) <= 1000 for c in paragraphs)
+    assert paragraphs[0].text.startswith("Paragraph 0.") and paragraphs[-1].text.endswith("p11w39")
+
+
+def test_overlapping_and_adjacent_chunks_merge_into_one_passage():
+    chunks = split_text(WORDS, "words.md", chunk_size=200, chunk_overlap=50)
+    retrieved = scored([chunks[5], chunks[3], chunks[4], chunks[9]], [0.9, 0.8, 0.7, 0.6])
+    packed = ContextPacker(None).pack(retrieved)
+    assert [p.text for p in packed.passages] == [WORDS[chunks[3].start:chunks[5].end], chunks[9].text]
+    assert packed.text.startswith("[words.md]\n") and packed.text.count("[words.md]") == 1
+    assert packed.tokens < packed.input_tokens
+
+    # without offsets the overlap is found in the text; contained chunks are dropped
+    bare = [Chunk("words.md", c.text, score=c.score) for c in retrieved]
+    bare.append(Chunk("words.md", chunks[4].text[:60], score=0.5))
+    assert [p.text for p in ContextPacker(None).pack(bare).passages] == [p.text for p in packed.passages]
+
+    paragraphs = split_text(DOC, "doc.md", chunk_size=300, chunk_overlap=20)
+    [passage] = ContextPacker(None).pack(scored(paragraphs[2:4], [0.5, 0.5])).passages
+    assert passage.text.startswith(paragraphs[2].text) and passage.text.endswith(paragraphs[3].text)
+
+
+def test_packing_respects_the_budget_by_relevance_per_token():
+    short = Chunk("faq.md", "Refunds take five days.", 0, 23, 0, 0.5)
+    long = Chunk("guide.md", "Refund policy details. " * 40, 0, 920, 0, 0.6)
+    other = Chunk("guide.md", "Unrelated notes. " * 10, 5000, 5170, 9, 0.1)
+    packed = ContextPacker(budget_tokens=60).pack([long, short, other])
+    assert packed.tokens <= 60 and [p.source for p in packed.passages] == ["faq.md", "guide.md"]
+    assert packed.dropped == 1 and packed.sources == ["faq.md", "guide.md"]
+
+    packed = ContextPacker(budget_tokens=20).pack([long])
+    assert 0 < packed.tokens <= 20 and long.text.startswith(packed.passages[0].text)
+
+    for budget in (0, 2):  # smaller than the source header: nothing fits at all
+        packed = ContextPacker(budget_tokens=budget).pack([long])
+        assert packed.text == "" and packed.passages == [] and packed.tokens == 0
+
+
+def test_knowledge_tool_returns_packed_context():
+    chunks = split_text(WORDS, "words.md", chunk_size=200, chunk_overlap=50)
+    tool = knowledge_tool(lambda query: scored(chunks[:3], [0.9, 0.8, 0.7]), packer=ContextPacker(500))
+    result = tool.fn({"query": "words"})
+    assert result["sources"] == ["words.md"] and result["context"] == "[words.md]\n" + WORDS[:chunks[2].end]
+
+
+def clustered(n, dims, seed=3, clusters=40):
+    rng = random.Random(seed)
+    centers = [[rng.gauss(0, 1) for _ in range(dims)] for _ in range(clusters)]
+    return [[c + rng.gauss(0, 0.5) for c in rng.choice(centers)] for _ in range(n)]
+
+
+def cosine(a, b):
+    return sum(x * y for x, y in zip(a, b)) / math.sqrt(sum(x * x for x in a) * sum(y * y for y in b))
+
+
+def test_quantized_store_matches_exact_search(tmp_path):
+    vectors = clustered(400, 100)  # not a multiple of 8: padded internally
+    path = str(tmp_path / "kb.qvec")
+    assert write_vectors(path, vectors, [f"c{i}" for i in range(400)], [{"n": i} for i in range(400)]) == 400
+    rng = random.Random(4)
+    queries = [[v + rng.gauss(0, 0.5) for v in vectors[i]] for i in range(0, 400, 40)]
+    found = 0
+    with VectorStore(path, use_numpy=False) as store:
+        assert len(store) == 400 and store.dims == 100
+        assert store.file_size() < 400 * 100 * 4
+        assert store.header["segments"]["codes"][1] == 400 * 104 and "bits" not in store.header["segments"]
+        for query in queries:
+            exact = sorted(range(400), key=lambda i: -cosine(query, vectors[i]))[:10]
+            hits = store.search(query, k=10, rerank=8)
+            assert [h["metadata"]["n"] for h in hits] == [int(h["id"][1:]) for h in hits]
+            assert all(abs(h["score"] - cosine(query, vectors[int(h["id"][1:])])) < 0.02 for h in hits)
+            found += len(set(exact) & {h["metadata"]["n"] for h in hits})
+        assert max(abs(a - b) for a, b in zip(store.vector(7), vectors[7])) > 0  # dequantized, normalized
+        with pytest.raises(ValueError):
+            store.search([1.0] * 8)
+    assert found / 100 >= 0.9
+
+    write_vectors(path, vectors, range(400), bits=4)
+    with VectorStore(path) as store:
+        assert store.bits == 4 and store.search(queries[0], k=1)[0]["score"] > 0.8
+        norm = math.sqrt(sum(v * v for v in vectors[3]))
+        assert max(abs(a - b / norm) for a, b in zip(store.vector(3), vectors[3])) < 0.05
+
+
+def test_vector_store_errors_and_chunks(tmp_path):
+    bad = tmp_path / "bad.qvec"
+    bad.write_bytes(b"not a vector file at all")
+    with pytest.raises(VectorStoreError):
+        VectorStore(str(bad))
+    corrupt = tmp_path / "corrupt.qvec"
+    corrupt.write_bytes(b"QVEC\x01\x00\x00\x00" + (8).to_bytes(8, "little") + b"{broken}")
+    with pytest.raises(VectorStoreError, match="corrupt header"):
+        VectorStore(str(corrupt))
+    empty = str(tmp_path / "empty.qvec")
+    write_vectors(empty, [], [])
+    with VectorStore(empty) as store:
+        assert store.search([0.5] * 4) == []
+
+    chunks = split_text(WORDS, "words.md", chunk_size=200, chunk_overlap=50)[:3]
+    path = str(tmp_path / "kb.qvec")
+    write_vectors(path, clustered(3, 16), [f"words.md#{c.index}" for c in chunks], [vars(c) for c in chunks])
+    with VectorStore(path) as store:
+        retrieved = as_chunks(store.search(clustered(3, 16)[0], k=3))
+    assert {c.index for c in retrieved} == {0, 1, 2} and all(c.score for c in retrieved)
+    assert ContextPacker(None).pack(retrieved).passages[0].text == WORDS[:chunks[2].end]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_764_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_change_feed_ingestion_debounces_and_dedupes():
+    clock = Clock()
+    drive = FakeDrive(clock)
+    ingestor = Ingestor(drive, KnowledgeIndex(), HashingEmbedder(64), "services", debounce_s=5, max_delay_s=20,
+                        chunk_size=200, chunk_overlap=20, registry=Registry(), clock=clock, wall=clock)
+    assert ingestor.sync() == 0
+    file_id = drive.create("pricing.md", "Draft", "services")
+    for n in range(3):  # a burst of saves right after the create
+        clock.now += 1
+        drive.update(file_id, f"Pricing v{n}. " + WORDS[:400])
+    drive.create("private.md", "Not in the folder", "elsewhere")
+    clock.now += 1
+    assert ingestor.poll() == 5 and list(ingestor.pending) == [file_id]
+    assert ingestor.tick() == 5.0 and drive.calls["files.get"] == 0  # due debounce_s after the poll saw it
+    clock.now += 5
+    ingestor.tick()
+    ingestor.wait()
+    assert drive.calls["files.get"] == 1 and ingestor.index.files() == [file_id]
+    assert ingestor.index.chunks(file_id)[0].text.startswith("Pricing v2.")
+    ingestor.sync()  # same version: not downloaded again
+    ingestor.flush()
+    assert drive.calls["files.get"] == 1
+
+    for _ in range(30):  # edits every 2 s never settle, but max_delay_s bounds the wait
+        clock.now += 2
+        drive.update(file_id, "Pricing v3. " + WORDS[:200])
+        ingestor.poll()
+        ingestor.dispatch()
+        ingestor.wait()
+    assert drive.calls["files.get"] == 3  # at 20 s and 42 s of the 60 s of edits
+    drive.move(file_id, "archive")
+    ingestor.poll()
+    ingestor.flush()
+    assert ingestor.index.files() == [] and file_id not in ingestor.versions
+    ingestor.close()
+
+
+def test_ingestion_pipeline_is_bounded_and_resumes(tmp_path):
+    drive = FakeDrive()
+    ids = [drive.create(f"doc{n}.md", f"Document {n}. " + WORDS[:300], "services") for n in range(10)]
+    drive.create("logo.png", b"\x89PNG", "services", mime_type="image/png")
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def embed(texts):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return HashingEmbedder(32)(texts)
+
+    failing = {ids[3]}
+    download = drive.download
+
+    def flaky(file):
+        if file["id"] in failing:
+            failing.clear()
+            raise DriveError("timeout")
+        return download(file)
+
+    drive.download = flaky
+    state = str(tmp_path / "ingest.json")
+    ingestor = Ingestor(drive, KnowledgeIndex(), embed, "services", workers=4, max_in_flight=2, retry_s=0,
+                        state_path=state, registry=Registry())
+    ingestor.sync()
+    ingestor.flush()
+    ingestor.close()
+    assert peak[0] <= 2 and ingestor.index.files() == sorted(ids)
+    path = str(tmp_path / "kb.qvec")
+    assert ingestor.index.write(path) == len(ingestor.index)
+    with VectorStore(path) as store:
+        hits = as_chunks(store.search(HashingEmbedder(32).vector("Document 7. " + WORDS[:300]), k=1))
+    assert hits[0].source == "doc7.md"
+
+    drive.update(ids[0], "Rewritten")
+    resumed = Ingestor(drive, ingestor.index, embed, "services", state_path=state, registry=Registry())
+    assert resumed.poll() == 1  # from the saved page token, no second sync
+    resumed.flush()
+    resumed.close()
+    assert drive.calls["files.list"] == 1 and drive.calls["files.get"] == 11
+    assert [c.text for c in resumed.index.chunks(ids[0])] == ["Rewritten"]
+
+    restarted = Ingestor(drive, KnowledgeIndex(), embed, "services", state_path=state, registry=Registry())
+    assert restarted.page_token is None and restarted.versions == {}  # the saved state outlived the index
+    restarted.poll()
+    restarted.flush()
+    restarted.close()
+    assert drive.calls["files.list"] == 2 and restarted.index.files() == resumed.index.files()
+
+
+def test_ingestor_run_survives_unexpected_errors():
+    drive = FakeDrive()
+    drive.create("doc.md", "Hello there", "services")
+    start_page_token = drive.start_page_token
+    calls = []
+
+    def broken():
+        calls.append(1)
+        if len(calls) == 1:
+            raise KeyError("startPageToken")
+        return start_page_token()
+
+    drive.start_page_token = broken
+    ingestor = Ingestor(drive, KnowledgeIndex(), HashingEmbedder(32), "services", quiet_s=0.01, registry=Registry())
+    thread = threading.Thread(target=ingestor.run)
+    thread.start()
+    deadline = time.time() + 5
+    while not ingestor.index.files() and time.time() < deadline:
+        time.sleep(0.01)
+    ingestor.close()
+    thread.join(5)
+    assert ingestor.index.files() and isinstance(ingestor.last_error, KeyError)
+    assert ingestor.errors.labels("KeyError").value == 1
+
+
+def index_of(docs, dims=64):
+    index = KnowledgeIndex()
+    embedder = HashingEmbedder(dims)
+    for file_id, text in docs.items():
+        chunks = split_text(text, f"{file_id}.md", chunk_size=200, chunk_overlap=20)
+        index.replace(file_id, chunks, embedder([c.text for c in chunks]))
+    return index
+
+
+def test_generations_swap_atomically_and_old_ones_are_collected(tmp_path):
+    root = str(tmp_path / "kb")
+    registry = Registry()
+    kb = KnowledgeBase(root, keep=1, registry=registry)
+    assert kb.generation == 0 and kb.search([1.0] * 64) == [] and len(kb) == 0
+    docs = {f"doc{n}": " ".join(f"d{n}w{m}" for m in range(60)) for n in range(6)}
+    first = kb.build(index_of(docs))
+    query = HashingEmbedder(64).vector(docs["doc2"][:150])
+
+    with kb.snapshot() as held:  # a reader in the middle of a big re-index
+        assert held is first and held.refs == 1
+        kb.build(index_of({**docs, "doc2": "Rewritten pricing page"}))
+        assert kb.generation == 2 and held.search(query, k=1)[0]["metadata"]["fileId"] == "doc2"
+        assert registry.get("knowledge_readers").labels().value == 1
+        assert kb.search(query, k=1)[0]["metadata"]["text"] != held.search(query, k=1)[0]["metadata"]["text"]
+        kb.build(index_of(docs))
+        assert kb.generations() == [1, 2, 3]  # generation 1 is still being read
+    assert kb.generations() == [2, 3] and registry.get("knowledge_readers").labels().value == 0
+
+    with pytest.raises(KnowledgeBaseError, match="under 50%"):  # a half-finished re-index
+        kb.build(index_of({"doc0": docs["doc0"]}))
+    with pytest.raises(KnowledgeBaseError, match="dimensions"):
+        kb.build(index_of(docs, dims=32))
+    assert kb.generation == 3 and kb.generations() == [2, 3] and not any(p.name.endswith(".tmp")
+                                                                         for p in (tmp_path / "kb").iterdir())
+    assert registry.get("knowledge_publishes_total").labels("rejected").value == 2
+
+    reader = KnowledgeBase(root, check_s=0, registry=Registry())  # another process serving the same directory
+    assert reader.generation == 3
+    assert kb.rollback().number == 2 and kb.generation == 2
+    texts = [m["metadata"]["text"] for m in reader.search(query, k=100)]
+    assert reader.generation == 2 and "Rewritten pricing page" in texts and not any("d2w" in t for t in texts)
+    assert kb.build(index_of({"doc0": docs["doc0"]}), force=True).number == 4
+    assert kb.generations() == [3, 4] and len(reader) == len(kb) == 2
+    reader.close()
+    kb.close()
+
+
+def test_identical_chunks_pass_the_probe(tmp_path):
+    rng = random.Random(5)
+    vectors = [[0.3, -0.2, 0.9, 0.1] * 8] * 8 + [[rng.gauss(0, 1) for _ in range(32)] for _ in range(50)]
+    ids = [f"id{i}" for i in range(len(vectors))]
+    kb = KnowledgeBase(str(tmp_path / "kb"), registry=Registry())
+    kb.build(writer=lambda path: write_vectors(path, vectors, ids, [{"text": i} for i in ids]))
+    assert kb.generation == 1 and len(kb) == 58
+    kb.close()
+
+
+def test_ingestor_publishes_settled_batches(tmp_path):
+    clock = Clock()
+    drive = FakeDrive(clock)
+    ids = [drive.create(f"doc{n}.md", f"Document {n}. " + WORDS[:300], "services") for n in range(4)]
+    kb = KnowledgeBase(str(tmp_path / "kb"), registry=Registry(), clock=clock)
+    ingestor = Ingestor(drive, KnowledgeIndex(), HashingEmbedder(32), "services", debounce_s=5, chunk_size=200,
+                        chunk_overlap=20, publish=kb.build, registry=Registry(), clock=clock, wall=clock)
+    ingestor.sync()
+    ingestor.flush()
+    assert kb.generation == 1 and len(kb) == len(ingestor.index)
+    ingestor.tick()
+    assert kb.generation == 1  # nothing changed
+
+    for n in range(2):
+        drive.update(ids[n], f"Document {n} rewritten")
+    ingestor.poll()
+    clock.now += 1
+    ingestor.tick()
+    assert kb.generation == 1  # the batch is still pending
+    clock.now += 5
+    ingestor.tick()
+    ingestor.wait()
+    ingestor.tick()
+    assert kb.generation == 2
+    texts = {m["metadata"]["text"] for m in kb.search(HashingEmbedder(32).vector("rewritten"), k=len(kb))}
+    assert {"Document 0 rewritten", "Document 1 rewritten"} <= texts and len(kb) == len(ingestor.index)
+    ingestor.close()
+    kb.close()
@@ -0,0 +1,67 @@
+import json
+
+from infinity_pixel.chat import ChatAgent, ChatModel, FakeChatModel
+from infinity_pixel.metrics import Registry
+from infinity_pixel.router import TEMPLATES, TRAINING_EXAMPLES, IntentClassifier, Router, load_examples
+from infinity_pixel.tracing import Tracer
+
+
+class CountingModel(ChatModel):
+    def __init__(self):
+        self.calls = 0
+        self.model = FakeChatModel()
+
+    def stream(self, messages, tools):
+        self.calls += 1
+        return self.model.stream(messages, tools)
+
+
+def test_trivial_intents_are_answered_from_templates():
+    router = Router()
+    for text, intent in (("hey there!", "greeting"), ("thank u so much", "thanks"), ("ok bye", "goodbye"),
+                         ("Which services do you have?", "services")):
+        route = router.route(text)
+        assert (route.intent, route.answer) == (intent, TEMPLATES[intent]), text
+    for text in ("I want to open a ticket", "how much does a mobile app cost", "my dashboard is down"):
+        assert router.route(text).answer is None, text
+
+
+def test_guards_and_thresholds_send_turns_to_the_model():
+    router = Router()
+    assert router.route("hi, status of TCK-1764314974531-001").reason == "ticket ID or email"
+    assert router.route("thanks, it's ada@example.com").answer is None
+    assert router.route("hello " * 13).reason == "long message"
+    assert Router(thresholds={"greeting": 1.01}).route("hello").reason == "low confidence"
+    assert Router(thresholds={"greeting": 1.01}).route("thanks").answer == TEMPLATES["thanks"]
+    for text in ("what services do you offer and how much do they cost", "What are your prices?"):
+        assert router.route(text).answer is None, text  # the services template would drop the pricing question
+    clause_only = Router(IntentClassifier.train([(t, i) for t, i in TRAINING_EXAMPLES if "cost" not in t]))
+    route = clause_only.route("Which services do you offer? And what do they cost?")
+    assert route.answer is None and route.reason == "several requests"
+    assert router.route("Hello! Which services do you offer?").answer == TEMPLATES["services"]
+
+
+def test_trained_model_round_trips(tmp_path):
+    path = tmp_path / "examples.jsonl"
+    rows = [{"text": t, "intent": "hours"} for t in ("opening hours", "when are you open", "what are your hours")]
+    rows += [{"text": t, "intent": "llm"} for t in ("my app crashed", "create a ticket", "billing problem")]
+    path.write_text("\n".join(json.dumps(r) for r in rows) + "\n")
+    model = IntentClassifier.train(load_examples(str(path)))
+    model.save(str(tmp_path / "router.json"))
+    loaded = IntentClassifier.load(str(tmp_path / "router.json"))
+    assert loaded.predict("what are your opening hours?") == model.predict("what are your opening hours?")
+    router = Router(loaded, threshold=0.5, templates={"hours": "We are open 9-5."})
+    assert router.route("when are you open?").answer == "We are open 9-5."
+
+
+def test_agent_answers_routed_turns_without_the_model():
+    model = CountingModel()
+    agent = ChatAgent(model, [], tracer=Tracer(), registry=Registry(), router=Router())
+    events = list(agent.run("s1", "hello"))
+    assert [e.type for e in events] == ["token", "done"] and model.calls == 0
+    assert events[-1].data["route"] == "greeting" and events[-1].data["output"] == TEMPLATES["greeting"]
+    assert agent.memory.get("s1")[-1]["content"] == TEMPLATES["greeting"]
+
+    events = list(agent.run("s1", "Do you build custom CRMs for retailers?"))
+    assert events[-1].data["route"] == "llm" and model.calls == 1
+    assert agent.routes.labels("greeting").value == 1 and agent.routes.labels("llm").value == 1
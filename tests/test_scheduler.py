@@ -0,0 +1,165 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.metrics import Registry
+from infinity_pixel.scheduler import FairPriorityQueue, QueueFull, Scheduler, classify, serve
+from infinity_pixel.store import InMemoryTicketStore
+from infinity_pixel.tracing import Tracer
+
+
+class SlowWriteStore(InMemoryTicketStore):
+    def __init__(self, records=(), write_s=0.05):
+        self.write_s = write_s
+        super().__init__(records)
+
+    def create(self, fields):
+        time.sleep(self.write_s)
+        return super().create(fields)
+
+
+def create(email, priority="medium"):
+    return {"action": "create", "name": "Ada", "email": email, "subject": "Login",
+            "description": f"Cannot log in ({email})", "priority": priority}
+
+
+def make_backend(store):
+    return TicketBackend(store, tracer=Tracer(), registry=Registry(), idempotency=False, duplicates=False,
+                         search_index=False, customers=False, ticket_ids=False)
+
+
+def test_classify_and_queue_order():
+    assert classify({"action": "status", "ticketId": "TCK-1"})[0] == 0
+    assert classify(create("a@x.com", "urgent"))[0] < classify(create("a@x.com", "low"))[0]
+    assert classify({"action": "update", "ticketId": "TCK-1", "description": "x"}, "s1")[1:] == ("s1", "update")
+
+    queue = FairPriorityQueue(aging_s=0)
+    for n in range(3):
+        queue.push(3, "bulk", f"bulk{n}", now=0)
+    queue.push(3, "ada", "ada0", now=0)
+    queue.push(0, "bob", "status", now=0)
+    order = [queue.pop(now=0).item for _ in range(5)]
+    assert order == ["status", "bulk0", "ada0", "bulk1", "bulk2"]
+    assert queue.pop(now=0) is None and len(queue) == 0
+
+    aged = FairPriorityQueue(aging_s=1.0)
+    aged.push(4, "old", "low", now=0)
+    aged.push(1, "new", "urgent", now=10)
+    assert aged.pop(now=10).item == "low"  # waited 10 levels' worth
+
+
+def test_reads_stay_fast_under_write_burst_and_backpressure():
+    store = SlowWriteStore([{"Ticket ID": "TCK-1764314974531-001", "Subject": "Login", "Status": "open"}])
+
+    async def run():
+        scheduler = Scheduler(make_backend(store), workers=4, read_slots=1, max_queue=60, max_per_customer=40)
+        await scheduler.start()
+        writes = [asyncio.create_task(scheduler.submit(create(f"c{n % 5}@example.com"))) for n in range(50)]
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        status = await scheduler.submit({"action": "status", "ticketId": "TCK-1764314974531-001"})
+        status_ms = (time.perf_counter() - start) * 1000
+
+        with pytest.raises(QueueFull) as full:
+            await asyncio.gather(*[scheduler.submit(create("c0@example.com")) for _ in range(40)])
+        created = await asyncio.gather(*writes)
+        await scheduler.stop()
+        return scheduler, status, status_ms, full.value, created
+
+    scheduler, status, status_ms, full, created = asyncio.run(run())
+    assert status["status"] == "open" and status_ms < 50  # 50 creates x 50 ms are queued ahead
+    assert full.reason in ("queue", "customer") and full.retry_after >= 1
+    assert all(r["status"] == "open" for r in created)
+    assert scheduler.rejected.labels(full.reason).value >= 1
+
+
+def test_webhook_answers_429_with_retry_after():
+    async def run():
+        scheduler = Scheduler(make_backend(SlowWriteStore(write_s=0.2)), workers=2, max_queue=1)
+        await scheduler.start()
+        server = await serve(scheduler, port=0)
+        port = server.sockets[0].getsockname()[1]
+
+        async def post(payload):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            body = json.dumps(payload).encode()
+            writer.write(b"POST /webhook/tt HTTP/1.1\r\nHost: x\r\nContent-Type: application/json\r\n"
+                         + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            raw = await reader.read()
+            writer.close()
+            head, _, data = raw.partition(b"\r\n\r\n")
+            return head.decode(), json.loads(data)
+
+        first = asyncio.create_task(post(create("a@example.com")))
+        await asyncio.sleep(0.05)  # running on the only write slot
+        second = asyncio.create_task(post(create("b@example.com")))
+        await asyncio.sleep(0.05)  # queued
+        head, body = await post(create("c@example.com"))
+        results = await asyncio.gather(first, second)
+        not_object = await post([])
+        server.close()
+        await server.wait_closed()
+        await scheduler.stop()
+        return head, body, results, not_object
+
+    head, body, results, not_object = asyncio.run(run())
+    assert not_object[0].startswith("HTTP/1.1 400")
+    assert head.startswith("HTTP/1.1 429") and "Retry-After: " in head and "queue full" in body["error"]
+    assert all(h.startswith("HTTP/1.1 200") and b["status"] == "open" for h, b in results)
+
+
+def test_updates_use_the_stored_priority_and_aging_spans_groups():
+    backend = make_backend(InMemoryTicketStore([
+        {"Ticket ID": "TCK-1764314974531-001", "Subject": "Login", "Status": "open", "Priority": "low"}]))
+    backend.handle({"action": "status", "ticketId": "TCK-1764314974531-001"})
+    scheduler = Scheduler(backend, workers=2)
+    update = {"action": "update", "ticketId": "TCK-1764314974531-001", "description": "x", "priority": "urgent"}
+    assert classify(update)[0] == 2  # unknown ticket: the payload's priority is ignored
+    assert classify(update, priority_of=lambda ticket_id: scheduler._stored_priority(ticket_id, None))[0] == 3
+
+    queue = FairPriorityQueue(aging_s=1.0)
+    queue.push(3, "ada", "a0", now=0, group="acme")
+    queue.push(3, "ada", "a1", now=1, group="acme")
+    queue.push(3, "bob", "b0", now=2, group="globex")
+    assert queue.pop(now=2).item == "a0"
+    queue.push(1, "cy", "urgent", now=3.5)
+    # globex is next in turn, but acme's a1 has waited 2.5 levels' worth
+    assert [queue.pop(now=3.5).item for _ in range(3)] == ["b0", "a1", "urgent"]
+
+
+def test_webhook_answers_errors_instead_of_dropping_the_connection():
+    class BrokenBackend(TicketBackend):
+        def handle(self, payload, session_id=None):
+            raise RuntimeError("store exploded")
+
+    async def run():
+        backend = BrokenBackend(InMemoryTicketStore(), tracer=Tracer(), registry=Registry(), customers=False)
+        scheduler = Scheduler(backend, workers=2)
+        await scheduler.start()
+        server = await serve(scheduler, port=0)
+        port = server.sockets[0].getsockname()[1]
+
+        async def send(raw):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            head, _, data = response.partition(b"\r\n\r\n")
+            return head.decode(), json.loads(data)
+
+        body = json.dumps(create("a@example.com")).encode()
+        failed = await send(b"POST /webhook/tt HTTP/1.1\r\n" + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        malformed = await send(b"POST /webhook/tt HTTP/1.1\r\nContent-Length: lots\r\n\r\n{}")
+        server.close()
+        await server.wait_closed()
+        await scheduler.stop()
+        return failed, malformed
+
+    (failed_head, failed), (malformed_head, malformed) = asyncio.run(run())
+    assert failed_head.startswith("HTTP/1.1 500") and failed["error"] == "RuntimeError: store exploded"
+    assert malformed_head.startswith("HTTP/1.1 400") and malformed["error"] == "invalid Content-Length"
@@ -0,0 +1,159 @@
+import math
+import random
+import threading
+
+import pytest
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.metrics import Registry
+from infinity_pixel.search import SearchIndex, StoreSearchIndex, tokenize
+from infinity_pixel.store import InMemoryTicketStore, StoreError
+from infinity_pixel.tracing import Tracer
+
+
+def ticket(i, subject, description="", log="", status="open", priority="medium"):
+    return {"Ticket ID": f"TCK-{1764314974531 + i}-{i % 1000:03d}", "Subject": subject,
+            "Initial Description": description, "Conversation Log": log,
+            "Status": status, "Priority": priority}
+
+
+def brute_force(index, query):
+    """Textbook BM25 over the live documents, using the index's own normalization"""
+    terms = set(tokenize(query))
+    n = len(index.doc_ticket)
+    scores = {}
+    for term in terms:
+        if term not in index.postings:
+            continue
+        docs, tfs = index.postings[term]
+        idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+        for d, tf in zip(docs, tfs):
+            if index.live[d]:
+                scores[d] = scores.get(d, 0.0) + idf * index._impact(tf, index.doc_len[d])
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def test_tokenize_drops_log_timestamps_and_stopwords():
+    log = "[2025-11-28T07:29:34.531Z] Initial: The password reset link is broken"
+    assert tokenize(log) == ["initial", "password", "reset", "link", "broken"]
+    assert tokenize("The software update failed for the user") == ["software", "update", "failed", "user"]
+
+
+def test_ranking_filters_and_prefix():
+    index = SearchIndex.from_records([
+        ticket(1, "Password reset", "Reset link expired", status="open", priority="high"),
+        ticket(2, "Billing", "Charged twice; password manager unrelated", status="closed"),
+        ticket(3, "Login failure", "Cannot log in after password reset email", status="open"),
+        ticket(4, "Export", "CSV exports time out", status="in_progress"),
+    ])
+    ids = [r["ticketId"] for r in index.search("password reset")]
+    assert ids[0].startswith("TCK-1764314974532")  # subject match on both terms wins
+    assert len(ids) == 3
+    assert [r["status"] for r in index.search("password", status="open")] == ["open", "open"]
+    assert len(index.search("password", priority="high")) == 1
+    assert [r["subject"] for r in index.search("expor*")] == ["Export"]
+    assert index.search("password", status="no-such-status") == []
+
+
+def test_updates_replace_documents_and_compaction_keeps_results():
+    index = SearchIndex()
+    for i in range(1200):
+        index.upsert(ticket(i, f"Issue {i}", "dashboard blank" if i % 2 else "slack webhook"))
+    index.upsert(ticket(5, "Issue 5", "now about invoices", log="[2025-12-01T00:00:00.000Z] User update: refund"))
+    assert len(index) == 1200
+    assert "TCK-1764314974536-005" not in [r["ticketId"] for r in index.search("dashboard", limit=1000)]
+    assert [r["ticketId"] for r in index.search("refund")] == ["TCK-1764314974536-005"]
+    for i in range(0, 1200, 2):
+        index.upsert(ticket(i, f"Issue {i}", "closed out", status="closed"))
+    assert len(index.doc_ticket) < 1800  # compacted
+    assert len(index.search("closed", status="closed", limit=1000)) == 600
+    assert len(index.search("slack webhook", limit=1000)) == 0
+
+
+def test_early_termination_matches_exhaustive_scoring():
+    rng = random.Random(3)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+    index = SearchIndex.from_records(
+        ticket(i, rng.choice(words), " ".join(rng.choices(words, k=rng.randrange(1, 30))))
+        for i in range(3000)
+    )
+    for i in range(3000, 3005):
+        index.upsert(ticket(i, "omega", "omega alpha" if i % 2 else "beta"))
+    # Multi-term queries take the all-terms shortcut when it decides the top k, else fall back
+    for query in ("alpha", "beta gamma", "delta epsilon zeta", "omega alpha", "omega beta gamma"):
+        expected = brute_force(index, query)[:10]
+        got = index.search(query, limit=10)
+        assert [r["score"] for r in got] == [round(s, 4) for _, s in expected]
+
+
+def test_search_action():
+    backend = TicketBackend(InMemoryTicketStore(), tracer=Tracer(), registry=Registry())
+    created = backend.handle({"action": "create", "name": "Ada", "email": "ada@example.com",
+                              "subject": "Password reset", "description": "Reset link expired"})
+    backend.handle({"action": "create", "name": "Bo", "email": "bo@example.com",
+                    "subject": "Billing", "description": "Charged twice"})
+    response = backend.handle({"action": "search", "query": "password"})
+    assert response["action"] == "search" and response["status"] == "ok"
+    assert [r["ticketId"] for r in response["results"]] == [created["ticketId"]]
+
+    backend.handle({"action": "close", "ticketId": created["ticketId"]})
+    backend.handle({"action": "update", "ticketId": created["ticketId"], "description": "x"})
+    assert backend.handle({"body": {"action": "search", "q": "password", "status": "open"}})["results"] == []
+    assert backend.handle({"action": "search", "query": "password", "status": "closed"})["results"]
+    assert backend.handle({"action": "search", "query": "nothing"})["status"] == "not_found"
+
+
+class GatedStore(InMemoryTicketStore):
+    """A store whose full scans wait for ``gate`` (or fail while ``down``)"""
+
+    def __init__(self, records=()):
+        super().__init__(records)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.scans = 0
+        self.down = False
+
+    def all_records(self):
+        self.scans += 1
+        if self.down:
+            raise StoreError("Airtable unavailable")
+        self.gate.wait(5)
+        return super().all_records()
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_store_index_rebuilds_in_the_background_and_keeps_upserts():
+    clock = Clock()
+    store = GatedStore([ticket(1, "Printer jam")])
+    index = StoreSearchIndex(store, refresh_s=60, clock=clock)
+    assert [r["subject"] for r in index.search("printer")] == ["Printer jam"]
+
+    store.gate.clear()  # the next scan is slow
+    clock.now = 61
+    assert [r["subject"] for r in index.search("printer")] == ["Printer jam"]  # answered by the old index
+    late = store.create(ticket(2, "Printer offline"))  # after the scan started
+    index.upsert(late)
+    store.gate.set()
+    assert index.join(5)
+    assert store.scans == 2 and len(index.search("printer")) == 2
+
+
+def test_failed_build_backs_off():
+    clock = Clock()
+    store = GatedStore([ticket(1, "Printer jam")])
+    store.down = True
+    index = StoreSearchIndex(store, refresh_s=900, clock=clock)
+    for _ in range(5):
+        with pytest.raises(StoreError):
+            index.search("printer")
+    assert store.scans == 1
+    store.down = False
+    clock.now = 31  # retry_s
+    index.search("printer")
+    assert store.scans == 2 and index.failures == 0
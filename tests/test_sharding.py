@@ -0,0 +1,96 @@
+import threading
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.metrics import Registry
+from infinity_pixel.sharding import HashRing, ShardedTicketStore
+from infinity_pixel.store import InMemoryTicketStore
+from infinity_pixel.tickets import format_timestamp
+from infinity_pixel.tracing import Tracer
+
+KEYS = [f"TCK-{1764314974531 + i}-{i % 1000:03d}" for i in range(20_000)]
+
+
+def ticket(i, status="open", due_ms=None):
+    return {"Ticket ID": KEYS[i], "Subject": f"Issue {i}", "Status": status,
+            "SLA Due At": format_timestamp(due_ms) if due_ms else ""}
+
+
+def test_ring_balances_and_moves_only_new_owner_keys():
+    ring = HashRing(["s0", "s1", "s2", "s3"], vnodes=128)
+    counts = {}
+    for key in KEYS:
+        counts[ring.owner(key)] = counts.get(ring.owner(key), 0) + 1
+    assert all(abs(c / len(KEYS) - 0.25) < 0.06 for c in counts.values())
+    assert abs(sum(ring.shares().values()) - 1) < 1e-9
+
+    grown = ring.copy()
+    grown.add("s4")
+    moved = [k for k in KEYS if ring.owner(k) != grown.owner(k)]
+    assert all(grown.owner(k) == "s4" for k in moved)
+    assert 0.12 < len(moved) / len(KEYS) < 0.28
+    assert HashRing.from_dict(grown.to_dict()).owner(KEYS[0]) == grown.owner(KEYS[0])
+
+
+def test_backend_over_shards_and_scatter_gather():
+    shards = {f"s{i}": InMemoryTicketStore() for i in range(3)}
+    store = ShardedTicketStore(shards)
+    for i in range(300):
+        store.create(ticket(i, status="closed" if i % 3 == 0 else "open", due_ms=1000 if i % 5 == 0 else None))
+    assert all(len(s.records) > 50 for s in shards.values())
+    assert store.status_counts() == {"closed": 100, "open": 200}
+    assert len(store.sla_breached(at_ms=2000)) == len([i for i in range(300) if i % 5 == 0 and i % 3])
+
+    backend = TicketBackend(store, tracer=Tracer(), registry=Registry())
+    assert backend.handle({"action": "status", "ticketId": KEYS[7]})["status"] == "open"
+    updated = backend.handle({"action": "update", "ticketId": KEYS[7], "description": "More detail"})
+    assert updated["action"] == "update"
+    assert "More detail" in store.find(KEYS[7])["fields"]["Conversation Log"]
+
+    # A fresh router over the same shards has no record-id map: it reads every shard, writes one
+    class Counting(InMemoryTicketStore):
+        def update(self, record_id, fields):
+            self.updates = getattr(self, "updates", 0) + 1
+            return super().update(record_id, fields)
+
+    counted = {name: Counting() for name in shards}
+    for name, shard in shards.items():
+        counted[name].records = shard.records
+    fresh = ShardedTicketStore(counted, max_records=2)
+    record = store.find(KEYS[8])
+    assert fresh.update(record["id"], {"Status": "closed"})["fields"]["Status"] == "closed"
+    assert sum(getattr(s, "updates", 0) for s in counted.values()) == 1
+    assert fresh.update("rec-unknown", {"Status": "closed"}) is None
+    assert sum(getattr(s, "updates", 0) for s in counted.values()) == 1
+    for i in range(10):
+        fresh.find(KEYS[i])
+    assert len(fresh._record_shards) == 2
+
+
+def test_online_rebalance_loses_no_writes():
+    shards = {f"s{i}": InMemoryTicketStore() for i in range(2)}
+    store = ShardedTicketStore(shards)
+    records = [store.create(ticket(i)) for i in range(2000)]
+    written = {}
+    stop = threading.Event()
+
+    def writer(offset):
+        n = 0
+        while not stop.is_set():
+            for record in records[offset::4]:
+                n += 1
+                store.update(record["id"], {"Internal Notes": str(n)})
+                written[record["fields"]["Ticket ID"]] = str(n)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    moved = store.add_shard("s2", InMemoryTicketStore())
+    stop.set()
+    for t in threads:
+        t.join()
+
+    assert 400 < moved < 1000 and store.previous is None
+    assert sum(len(s.records) for s in store.shards.values()) == 2000
+    for ticket_id, notes in written.items():
+        record = store.shards[store.ring.owner(ticket_id)].find(ticket_id)
+        assert record["fields"]["Internal Notes"] == notes
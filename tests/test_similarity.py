@@ -0,0 +1,102 @@
+import time
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.metrics import Registry
+from infinity_pixel.similarity import DuplicateDetector, MinHasher, allow_duplicate, features
+from infinity_pixel.store import InMemoryTicketStore
+from infinity_pixel.tracing import Tracer
+
+
+def ticket(i, email, name, subject, description, status="open"):
+    return {"Ticket ID": f"TCK-{1764314974531 + i}-{i % 1000:03d}", "Customer Email": email,
+            "Customer Name": name, "Subject": subject, "Initial Description": description,
+            "Status": status, "Priority": "medium"}
+
+
+def test_minhash_estimates_jaccard():
+    hasher = MinHasher(num_perm=256)
+    a = {f"w{i}" for i in range(100)}
+    b = {f"w{i}" for i in range(50, 150)}  # Jaccard 1/3
+    estimate = MinHasher.similarity(hasher.signature(a), hasher.signature(b))
+    assert abs(estimate - 1 / 3) < 0.1
+    assert MinHasher.similarity(hasher.signature(a), hasher.signature(set(a))) == 1.0
+    assert hasher.signature(set()) is None
+    assert features("Password reset", "for my account") == {"password", "reset", "account"}
+
+
+def test_detector_matches_customer_then_others():
+    detector = DuplicateDetector.from_records([
+        ticket(1, "ada@example.com", "Ada", "Password reset email never arrives",
+               "I requested a password reset link twice and no email arrived"),
+        ticket(2, "bob@example.com", "Bob", "Password reset email never arrives",
+               "I requested a password reset link and no email arrived"),
+        ticket(3, "ada@example.com", "Ada", "Invoice shows wrong amount", "Charged twice for March"),
+        ticket(4, "ada@example.com", "Ada", "Password reset email never arrives", "closed one", status="closed"),
+    ])
+    assert len(detector) == 3
+
+    matches = detector.check("ADA@example.com ", "Ada", "Password reset email not arriving",
+                             "No password reset email arrived after I requested the link")
+    ids = [(m["ticketId"][-3:], m["sameCustomer"]) for m in matches]
+    assert ids == [("001", True), ("002", False)]
+
+    # A matching name under another email is someone else's ticket; unrelated text matches nothing
+    other_email = detector.check("ada@work.example", "Ada", "Password reset email never arrives",
+                                 "I requested a password reset link twice and no email arrived")
+    assert other_email[0]["ticketId"].endswith("001") and not any(m["sameCustomer"] for m in other_email)
+    assert detector.check("ada@example.com", "Ada", "Dark mode request", "Please add a dark theme") == []
+
+    detector.upsert({**ticket(1, "ada@example.com", "Ada", "", ""), "Status": "resolved"})
+    assert "TCK-1764314974532-001" not in detector.tickets
+    assert not any(m["ticketId"].endswith("001") for m in detector.check(
+        "ada@example.com", "Ada", "Password reset email never arrives", "no email arrived"))
+
+
+def test_create_offers_existing_ticket():
+    store = InMemoryTicketStore([
+        ticket(1, "bob@example.com", "Bob", "Webhook deliveries time out",
+               "Our webhook endpoint receives timeouts for every delivery since Monday"),
+    ])
+    backend = TicketBackend(store, tracer=Tracer(), registry=Registry())
+    create = {"action": "create", "name": "Ada", "email": "ada@example.com",
+              "subject": "Webhook deliveries time out",
+              "description": "Every webhook delivery to our endpoint times out since Monday"}
+
+    first = backend.handle(create)
+    assert first["status"] == "open"
+    notes = store.find(first["ticketId"])["fields"]["Internal Notes"]
+    assert notes.startswith("Similar open tickets: TCK-1764314974532-001")
+
+    again = backend.handle({**create, "description": "Webhook deliveries still time out since Monday"})
+    assert again["status"] == "possible_duplicate" and again["ticketId"] == first["ticketId"]
+    assert first["ticketId"] in again["messageForUser"] and len(store.records) == 2
+    assert backend.metrics.requests.labels("create", "possible_duplicate").value == 1
+
+    forced = backend.handle({**create, "body": {"allowDuplicate": "true"}})
+    assert forced["status"] == "open" and len(store.records) == 3
+    assert allow_duplicate({"allowDuplicate": True}) and not allow_duplicate({"allowDuplicate": "no"})
+
+    # Closing a ticket removes it from the candidates
+    backend.handle({"action": "close", "ticketId": first["ticketId"]})
+    backend.handle({"action": "close", "ticketId": forced["ticketId"]})
+    assert backend.handle(create)["status"] == "open"
+
+
+def test_create_does_not_wait_for_the_first_scan():
+    class SlowScanStore(InMemoryTicketStore):
+        def all_records(self):
+            time.sleep(1.0)
+            return super().all_records()
+
+    store = SlowScanStore([ticket(1, "ada@example.com", "Ada", "Webhook deliveries time out",
+                                  "Our webhook endpoint receives timeouts for every delivery since Monday")])
+    backend = TicketBackend(store, tracer=Tracer(), registry=Registry(), search_index=False, customers=False,
+                            ticket_ids=False)
+    create = {"action": "create", "name": "Ada", "email": "ada@example.com", "subject": "Webhook deliveries time out",
+              "description": "Every webhook delivery to our endpoint times out since Monday"}
+    start = time.perf_counter()
+    assert backend.handle(create)["status"] == "open"  # checked against nothing while the scan runs
+    assert time.perf_counter() - start < 0.9
+    assert backend.duplicates.join(5)
+    again = backend.handle({**create, "description": "Webhook deliveries still time out since Monday"})
+    assert again["status"] == "possible_duplicate"
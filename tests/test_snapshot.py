@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from infinity_pixel.snapshot import MISSING, Snapshot, SnapshotError, export_csv, write_snapshot
+from infinity_pixel.tickets import parse_timestamp
+
+TEMPLATE = os.path.join(os.path.dirname(__file__), "..", "airtable_tickets_template.csv")
+
+
+def make_ticket(n, status="open", priority="medium", due="2025-12-01T00:00:00.000Z"):
+    return {
+        "Ticket ID": f"TCK-1764314974531-{n:03d}",
+        "Customer Name": "Sample User",
+        "Customer Email": "sample@example.com",
+        "Channel": "chat",
+        "Subject": f"Subject {n}",
+        "Initial Description": "Long description ✓ " * 3,
+        "Conversation Log": f"[2025-11-28T07:29:34.531Z] Initial: ticket {n}",
+        "Priority": priority,
+        "Status": status,
+        "Created At": "2025-11-28T07:29:34.531Z",
+        "Updated At": "2025-11-28T07:29:34.531Z",
+        "SLA Due At": due,
+        "Internal Notes": "",
+    }
+
+
+def test_export_template_roundtrip(tmp_path):
+    out = str(tmp_path / "tickets.tcol")
+    assert export_csv(TEMPLATE, out) == 1
+    with Snapshot(out) as snap:
+        row = snap.row(0)
+        assert row["Ticket ID"] == "TCK-1764314974531-916"
+        assert row["Status"] == "open"
+        assert row["Created At"] == "2025-11-28T07:29:34.531Z"
+        assert snap.column("Created At")[0] == parse_timestamp("2025-11-28T07:29:34.531Z")
+
+
+def test_dictionary_encoding_and_counts(tmp_path):
+    out = str(tmp_path / "t.tcol")
+    tickets = [make_ticket(i, status=s, priority=p) for i, (s, p) in enumerate(
+        [("open", "high"), ("closed", "low"), ("open", "medium"), ("in_progress", "high")])]
+    write_snapshot(tickets, out)
+    with Snapshot(out) as snap:
+        assert snap.dictionary("Status") == ["closed", "in_progress", "open"]
+        assert snap.status_counts() == {"closed": 1, "in_progress": 1, "open": 2}
+        assert snap.value_counts("Priority") == {"high": 2, "low": 1, "medium": 1}
+        assert isinstance(snap.column("Status"), memoryview)
+
+
+def test_sla_breaches_skip_closed_and_missing(tmp_path):
+    out = str(tmp_path / "t.tcol")
+    tickets = [
+        make_ticket(1, due="2025-01-01T00:00:00.000Z"),
+        make_ticket(2, due="2030-01-01T00:00:00.000Z"),
+        make_ticket(3, status="closed", due="2025-01-01T00:00:00.000Z"),
+        make_ticket(4, due=""),
+    ]
+    write_snapshot(tickets, out)
+    with Snapshot(out) as snap:
+        now = parse_timestamp("2026-01-01T00:00:00Z")
+        assert snap.sla_breaches(now) == 1
+        assert MISSING in list(snap.column("SLA Due At"))
+        [(status, start, stop)] = snap.sla_breached_ranges(now)
+        assert snap.row(start)["Ticket ID"].endswith("-001")
+
+
+def test_long_text_lives_in_blob(tmp_path):
+    out = str(tmp_path / "t.tcol")
+    write_snapshot([make_ticket(7)], out)
+    blob = (tmp_path / "t.tcol.blob").read_bytes()
+    assert "Long description ✓".encode() in blob
+    assert b"Subject 7" not in blob
+    with Snapshot(out) as snap:
+        assert snap.column("Initial Description")[0].startswith("Long description ✓")
+
+
+def test_rejects_foreign_file(tmp_path):
+    bogus = tmp_path / "bogus.tcol"
+    bogus.write_bytes(b"not a snapshot at all")
+    (tmp_path / "bogus.tcol.blob").write_bytes(b"")
+    with pytest.raises(SnapshotError):
+        Snapshot(str(bogus))
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.cache import ReadThroughCache, TTLCache
+from infinity_pixel.metrics import Registry
+from infinity_pixel.store import InMemoryTicketStore
+from infinity_pixel.tracing import Tracer
+
+CREATE = {"action": "create", "name": "Ada", "email": "ada@example.com",
+          "subject": "Login", "description": "Cannot log in"}
+
+
+class CountingStore(InMemoryTicketStore):
+    def __init__(self):
+        super().__init__()
+        self.finds = 0
+
+    def find(self, ticket_id):
+        self.finds += 1
+        return super().find(ticket_id)
+
+
+def make_backend(**kwargs):
+    store = CountingStore()
+    return TicketBackend(store, tracer=Tracer(), registry=Registry(), **kwargs), store
+
+
+def test_status_polls_skip_the_store():
+    backend, store = make_backend()
+    ticket_id = backend.handle(CREATE)["ticketId"]
+    for _ in range(50):
+        assert backend.handle({"action": "status", "ticketId": ticket_id})["status"] == "open"
+    assert store.finds == 0  # primed by create
+    assert backend.metrics.cache.labels("status", "hit").value == 50
+
+
+def test_update_and_close_invalidate():
+    backend, store = make_backend()
+    ticket_id = backend.handle(CREATE)["ticketId"]
+    backend.handle({"action": "update", "ticketId": ticket_id, "description": "More detail"})
+    backend.handle({"action": "status", "ticketId": ticket_id})
+    finds = store.finds
+    backend.handle({"action": "close", "ticketId": ticket_id})
+    assert backend.handle({"action": "status", "ticketId": ticket_id})["status"] == "closed"
+    assert store.finds == finds + 2  # close lookup + one reload after invalidation
+
+
+def test_unknown_ids_are_not_cached():
+    backend, store = make_backend(ticket_ids=False)
+    for _ in range(3):
+        assert backend.handle({"action": "status", "ticketId": "TCK-1"})["status"] == "not_found"
+    assert store.finds == 3
+
+
+def test_ttl_expiry_and_disabled_cache():
+    now = [0.0]
+    backend, store = make_backend(status_cache=TTLCache(ttl=30, clock=lambda: now[0]))
+    ticket_id = backend.handle(CREATE)["ticketId"]
+    backend.handle({"action": "status", "ticketId": ticket_id})
+    now[0] = 31
+    backend.handle({"action": "status", "ticketId": ticket_id})
+    assert store.finds == 1
+
+    uncached, store = make_backend(status_cache=False)
+    ticket_id = uncached.handle(CREATE)["ticketId"]
+    uncached.handle({"action": "status", "ticketId": ticket_id})
+    uncached.handle({"action": "status", "ticketId": ticket_id})
+    assert store.finds == 2
+
+
+def test_invalidation_during_load_is_not_overwritten():
+    cache = ReadThroughCache(TTLCache())
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_load():
+        loading.set()
+        release.wait()
+        return "stale"
+
+    reader = threading.Thread(target=lambda: cache.get_or_load("k", slow_load))
+    reader.start()
+    loading.wait()
+    cache.invalidate("k")  # a write lands while the read is in flight
+    release.set()
+    reader.join()
+    assert cache.get_or_load("k", lambda: "fresh") == ("fresh", False)
+    for n in range(1000):  # invalidating tickets nobody is reading leaves nothing behind
+        cache.invalidate(f"TCK-{n}")
+    assert cache._generations == {} and cache._loading == {}
+
+
+def test_cached_status_is_fast():
+    backend, _ = make_backend()
+    ticket_id = backend.handle(CREATE)["ticketId"]
+    request = {"action": "status", "ticketId": ticket_id}
+    n = 2000
+    start = time.perf_counter()
+    for _ in range(n):
+        backend.handle(request)
+    assert (time.perf_counter() - start) / n < 0.001
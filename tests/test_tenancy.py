@@ -0,0 +1,163 @@
+import asyncio
+import json
+
+import pytest
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.chat import KNOWLEDGE_TOOL, FakeChatModel
+from infinity_pixel.metrics import Registry
+from infinity_pixel.retrieval.generations import KnowledgeBase
+from infinity_pixel.retrieval.vectors import write_vectors
+from infinity_pixel.scheduler import FairPriorityQueue
+from infinity_pixel.store import InMemoryTicketStore
+from infinity_pixel.tenancy import (QuotaExceeded, TenantConfig, TenantRegistry, TenantScheduler, UnknownTenant,
+                                    load_tenants)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def create(email):
+    return {"action": "create", "name": "Ada", "email": email, "subject": "Login", "description": "Cannot log in"}
+
+
+def test_tenants_are_isolated(tmp_path):
+    def writer(tenant, source):
+        return lambda path: write_vectors(path, [[1.0, 0.0, 0.5, 0.2]], ["c0"], [
+            {"source": source, "text": f"{tenant} answers", "start": 0, "end": 12, "index": 0}])
+
+    writer("acme", "acme-faq.md")(str(tmp_path / "acme.qvec"))
+    KnowledgeBase(str(tmp_path / "globex"), registry=Registry()).build(writer=writer("globex", "globex-faq.md"))
+    config = tmp_path / "tenants.json"
+    config.write_text(json.dumps({"tenants": [
+        {"id": "acme", "system_prompt": "You are the Acme assistant.", "vectors": "acme.qvec"},
+        {"id": "globex", "vectors": "globex"},  # a directory of generations
+    ]}))
+    configs = load_tenants(str(config))
+    assert configs["acme"].vectors == str(tmp_path / "acme.qvec")
+    tenants = TenantRegistry(configs, registry=Registry(), model=FakeChatModel(), embed=lambda text: [1.0, 0, 0, 0])
+
+    created = tenants.handle("acme", create("a@x.com"))
+    assert tenants.handle("acme", {"action": "status", "ticketId": created["ticketId"]})["status"] == "open"
+    assert tenants.handle("globex", {"action": "status", "ticketId": created["ticketId"]})["status"] == "not_found"
+
+    events = list(tenants.chat("acme", "s1", "hello"))
+    assert events[-1].type == "done"
+    with tenants.lease("acme") as acme, tenants.lease("globex") as globex:
+        assert acme.agent.system_prompt == "You are the Acme assistant." != globex.agent.system_prompt
+        assert len(acme.agent.memory.get("s1")) == 2 and globex.agent.memory.get("s1") == []
+        assert acme.agent.tools[KNOWLEDGE_TOOL].fn({"query": "x"})["sources"] == ["acme-faq.md"]
+        assert globex.agent.tools[KNOWLEDGE_TOOL].fn({"query": "x"})["sources"] == ["globex-faq.md"]
+
+    with pytest.raises(UnknownTenant):
+        tenants.handle("initech", create("a@x.com"))
+    with pytest.raises(ValueError):
+        TenantConfig.from_dict({"id": "acme", "pinecone_index": "x"})
+    tenants.close()
+
+
+def test_tenants_load_lazily_and_idle_ones_are_evicted():
+    clock = Clock()
+    registry = Registry()
+    configs = {f"t{n}": TenantConfig(f"t{n}") for n in range(300)}
+    tenants = TenantRegistry(configs, idle_s=60, max_loaded=100, registry=registry, clock=clock)
+    assert len(tenants) == 0
+    for n in range(150):
+        clock.now += 0.1
+        tenants.handle(f"t{n}", {"action": "status", "ticketId": "TCK-1764314974531-001"})
+    assert len(tenants) == 100 and tenants.loaded()[0] == "t50"  # least recently used evicted first
+
+    with tenants.lease("t60") as held:
+        clock.now += 120
+        assert tenants.evict_idle() == 99  # not the one in use
+        assert tenants.loaded() == ["t60"]
+    clock.now += 120
+    assert tenants.evict_idle() == 1 and len(tenants) == 0
+    tenants.handle("t60", {"action": "status", "ticketId": "TCK-1764314974531-001"})
+    with tenants.lease("t60") as reloaded:
+        assert reloaded is not held
+    assert registry.get("tenant_loads_total").labels().value == 151
+    assert "tenants_loaded 1" in registry.render()
+
+
+def test_tenants_holding_tickets_stay_loaded_and_are_told_apart():
+    clock = Clock()
+    registry = Registry()
+    tenants = TenantRegistry({"acme": TenantConfig("acme"), "globex": TenantConfig("globex")}, idle_s=60,
+                             registry=registry, clock=clock)
+    tenants.handle("acme", create("a@x.com"), session_id="s1")
+    tenants.handle("globex", {"action": "status", "ticketId": "TCK-1764314974531-001"}, session_id="s1")
+    text = registry.render()
+    assert 'ticket_requests_total{tenant="acme",action="create",outcome="ok"} 1' in text
+    assert 'ticket_requests_total{tenant="globex",action="status",outcome="not_found"} 1' in text
+
+    with tenants.lease("acme") as acme:
+        spans = acme.backend.tracer.recent()
+    trace_ids = {tenant: {s.trace_id for s in spans if s.attributes.get("tenant.id") == tenant
+                          and s.attributes.get("session.id") == "s1"} for tenant in ("acme", "globex")}
+    assert trace_ids["acme"] and trace_ids["globex"] and not trace_ids["acme"] & trace_ids["globex"]
+
+    clock.now += 120
+    assert tenants.evict_idle() == 1 and tenants.loaded() == ["acme"]  # its tickets exist only in memory
+    tenants.close()
+
+
+def test_rate_quota_refills():
+    clock = Clock()
+    tenants = TenantRegistry({"acme": TenantConfig("acme", requests_per_minute=60, burst=2),
+                              "globex": TenantConfig("globex", requests_per_minute=0)},
+                             registry=Registry(), clock=clock)
+    tenants.admit("acme")
+    tenants.admit("acme")
+    with pytest.raises(QuotaExceeded) as exc:
+        tenants.admit("acme")
+    assert exc.value.retry_after == 1 and exc.value.tenant == "acme"
+    for _ in range(100):
+        tenants.admit("globex")  # unlimited; other tenants are unaffected
+    clock.now += 1
+    tenants.admit("acme")
+
+
+def test_tenants_take_turns_in_the_queue():
+    queue = FairPriorityQueue(aging_s=0)
+    for n in range(6):
+        queue.push(3, f"c{n % 3}", f"noisy{n}", 0, group="noisy")
+    queue.push(3, "c0", "quiet0", 0, group="quiet")
+    queue.push(3, "c1", "quiet1", 0, group="quiet")
+    assert queue.group_depth("noisy") == 6 and queue.depth("c0", "noisy") == 2 and queue.depth("c0") == 0
+    order = [queue.pop(now=0).item for _ in range(8)]
+    assert order == ["noisy0", "quiet0", "noisy1", "quiet1", "noisy2", "noisy3", "noisy4", "noisy5"]
+    assert len(queue) == 0 and queue.per_group == {}
+
+    async def scenario():
+        tenants = TenantRegistry({"acme": TenantConfig("acme", max_queued=1)}, registry=Registry())
+        scheduler = TenantScheduler(tenants, workers=2)
+        await scheduler.start()
+        try:
+            response = await scheduler.submit(create("a@x.com"), tenant="acme")
+            assert response["status"] == "open"
+            with pytest.raises(UnknownTenant):
+                await scheduler.submit(create("a@x.com"), tenant="globex")
+            scheduler.queue.push(3, "x", None, 0, group="acme")  # one already waiting
+            with pytest.raises(QuotaExceeded):
+                await scheduler.submit(create("a@x.com"), tenant="acme")
+            scheduler.queue.pop(0)
+        finally:
+            await scheduler.stop()
+            tenants.close()
+
+    asyncio.run(scenario())
+
+
+def test_tenants_run_beside_a_backend_on_the_process_registry():
+    backend = TicketBackend(InMemoryTicketStore())  # unlabelled metrics on the default registry
+    tenants = TenantRegistry({"acme": TenantConfig("acme")})
+    assert tenants.handle("acme", create("a@x.com"))["status"] == "open"
+    assert backend.handle(create("b@x.com"))["status"] == "open"
+    assert 'ticket_requests_total{tenant="acme",action="create",outcome="ok"} 1' in tenants.registry.render()
+    tenants.close()
@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from infinity_pixel.backend import TicketBackend
+from infinity_pixel.notifications import RecordingNotifier
+from infinity_pixel.store import InMemoryTicketStore
+from infinity_pixel.tracing import (
+    JsonlExporter, OtlpHttpExporter, Tracer, current_span, main, trace_id_for_session,
+)
+
+CREATE = {"action": "create", "name": "Ada", "email": "ada@example.com",
+          "subject": "Login", "description": "Cannot log in", "priority": "high"}
+
+
+def test_backend_spans_share_the_session_trace():
+    tracer = Tracer()
+    slack = RecordingNotifier("Send a message")
+    backend = TicketBackend(InMemoryTicketStore(), notifiers=[slack], tracer=tracer)
+    created = backend.handle(CREATE, session_id="b3a771f1983740fab4f05fc7e60ff8df")
+    updated = backend.handle({"action": "update", "ticketId": created["ticketId"],
+                              "description": "Still broken"}, session_id="b3a771f1983740fab4f05fc7e60ff8df")
+    assert updated["action"] == "update" and len(slack.sent) == 2
+
+    trace_id = trace_id_for_session("b3a771f1983740fab4f05fc7e60ff8df")
+    spans = tracer.recent(trace_id)
+    names = [s.name for s in spans]
+    assert "Airtable - Create Ticket" in names and "Airtable - Find Ticket (Update)" in names
+    roots = [s for s in spans if not s.parent_id]
+    assert len(roots) == 2 and all(r.name == "Ticket Manager" for r in roots)
+    root_ids = {r.span_id for r in roots}
+    assert all(s.parent_id in root_ids for s in spans if s.parent_id)
+    assert set(tracer.breakdown(trace_id)) == set(names)
+
+
+def test_ring_buffer_and_errors():
+    tracer = Tracer(buffer_size=3)
+    for i in range(5):
+        with tracer.span(f"s{i}"):
+            pass
+    assert [s.name for s in tracer.recent()] == ["s2", "s3", "s4"]
+    try:
+        with tracer.span("boom"):
+            raise ValueError("bad")
+    except ValueError:
+        pass
+    assert tracer.recent()[-1].error == "ValueError: bad"
+    assert current_span() is None
+
+
+def test_context_is_per_thread():
+    tracer = Tracer()
+    seen = {}
+
+    def worker(n):
+        with tracer.trace("root", session_id=f"s{n}"):
+            with tracer.span("child") as span:
+                seen[n] = span.trace_id
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert seen == {n: trace_id_for_session(f"s{n}") for n in range(8)}
+
+
+def test_concurrent_requests_of_one_session_export_their_own_spans():
+    exported = []
+    tracer = Tracer(exporters=[type("Sink", (), {"export": lambda self, spans: exported.append(spans)})()])
+    first_open, second_done = threading.Event(), threading.Event()
+
+    def slow():
+        with tracer.trace("slow", session_id="s"):
+            with tracer.span("slow child"):
+                first_open.set()
+                second_done.wait(5)
+
+    thread = threading.Thread(target=slow)
+    thread.start()
+    first_open.wait(5)
+    with tracer.trace("fast", session_id="s"):
+        with tracer.span("fast child"):
+            pass
+    second_done.set()
+    thread.join()
+    assert tracer.flush(5)
+    assert [s.name for spans in exported for s in spans] == ["fast child", "fast", "slow child", "slow"]
+
+
+def test_jsonl_export_and_summary(tmp_path, capsys):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(exporters=[JsonlExporter(str(path))])
+    backend = TicketBackend(InMemoryTicketStore(), tracer=tracer)
+    backend.handle(CREATE, session_id="abc")
+    backend.handle({"action": "status", "ticketId": "TCK-missing"}, session_id="abc")
+    tracer.close()
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert {s["name"] for s in spans} >= {"Ticket Manager", "Airtable - Find Ticket (Status)"}
+    assert main(["summary", str(path)]) == 0
+    assert "in 1 traces" in capsys.readouterr().out  # same session -> one trace
+
+
+def test_otlp_export_to_local_collector():
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    thread = threading.Thread(target=server.handle_request)
+    thread.start()
+    tracer = Tracer(exporters=[OtlpHttpExporter(f"http://127.0.0.1:{server.server_port}/v1/traces")])
+    with tracer.trace("chat", session_id="s1"):
+        with tracer.span("OpenAI Chat Model", model="gpt-4o-mini"):
+            pass
+    assert tracer.flush(5)
+    thread.join(5)
+    server.server_close()
+    [payload] = received
+    spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [s["name"] for s in spans] == ["OpenAI Chat Model", "chat"]
+    assert spans[0]["traceId"] == trace_id_for_session("s1") and tracer.export_errors == 0
+
+
+def test_a_slow_exporter_does_not_delay_requests():
+    release = threading.Event()
+    exported = []
+
+    class SlowCollector:
+        def export(self, spans):
+            release.wait(5)
+            exported.append(len(spans))
+
+    tracer = Tracer(exporters=[SlowCollector()], export_queue=2)
+    start = time.perf_counter()
+    for n in range(5):
+        with tracer.trace("request", session_id=f"s{n}"):
+            with tracer.span("child"):
+                pass
+    assert time.perf_counter() - start < 1.0
+    assert tracer.export_dropped >= 2  # one trace in the exporter, two queued, the rest dropped
+    release.set()
+    assert tracer.flush(5)
+    assert sum(exported) == 2 * (5 - tracer.export_dropped) and len(exported) <= 2  # queued traces share a batch